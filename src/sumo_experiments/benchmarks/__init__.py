@@ -0,0 +1,3 @@
+from .scenarios import SCENARIOS, STRATEGIES, DEFAULT_SCENARIOS, parse_scenario, build_network, build_strategy
+from .benchmark import Benchmark
+from .compare import METRICS, compare_results, welch_test
@@ -0,0 +1,65 @@
+import sys
+import argparse
+
+import pandas as pd
+
+from sumo_experiments.benchmarks import Benchmark, STRATEGIES, DEFAULT_SCENARIOS, compare_results
+
+
+def main(argv=None):
+    """
+    Command line interface of the benchmarks.
+    python -m sumo_experiments.benchmarks run -o results.json : Run the benchmark and save the results.
+    python -m sumo_experiments.benchmarks compare baseline.json results.json : Compare results with a baseline. The exit
+    code is 1 if a regression is found.
+    :param argv: The arguments. Default is sys.argv[1:].
+    :type argv: list
+    :return: The exit code
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(prog='python -m sumo_experiments.benchmarks', description='Performance benchmarks of sumo-experiments.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run the benchmark and save the results in a JSON file.')
+    run_parser.add_argument('-o', '--output', required=True, help='The JSON file of the results.')
+    run_parser.add_argument('--scenarios', nargs='+', default=DEFAULT_SCENARIOS, help="The scenarios, like 'intersection', 'line:5' or 'grid:4'.")
+    run_parser.add_argument('--strategies', nargs='+', default=list(STRATEGIES), choices=list(STRATEGIES), metavar='STRATEGY', help=f'The strategies, among {", ".join(STRATEGIES)}.')
+    run_parser.add_argument('--seeds', nargs='+', type=int, default=[1, 2, 3], help='The seeds of the cases.')
+    run_parser.add_argument('--steps', type=int, default=1800, help='The number of simulation steps of each case.')
+    run_parser.add_argument('--repeats', type=int, default=1, help='The number of times each case is measured.')
+    run_parser.add_argument('--timeout', type=float, default=None, help='The maximum duration of a case, in seconds.')
+    run_parser.add_argument('--netconvert-cache', action='store_true', help='Copy the networks from the netconvert cache when possible.')
+
+    compare_parser = commands.add_parser('compare', help='Compare results with a baseline.')
+    compare_parser.add_argument('baseline', help='The JSON file of the baseline results.')
+    compare_parser.add_argument('current', help='The JSON file of the results to compare.')
+    compare_parser.add_argument('--alpha', type=float, default=0.05, help='The significance level of the test.')
+    compare_parser.add_argument('--threshold', type=float, default=0.05, help='The minimal relative change of a regression.')
+    compare_parser.add_argument('--all', action='store_true', help='Print all comparisons, not only the regressions.')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        benchmark = Benchmark(scenarios=args.scenarios, strategies=args.strategies, seeds=args.seeds, steps=args.steps,
+                              repeats=args.repeats, timeout=args.timeout, netconvert_cache=args.netconvert_cache)
+        results = benchmark.run()
+        Benchmark.save(results, args.output)
+        failures = [case for case in results['cases'] if case['error'] is not None]
+        for case in failures:
+            print(f"{case['scenario']} {case['strategy']} seed={case['seed']} failed :\n{case['error']}", file=sys.stderr)
+        return 0
+
+    comparison = compare_results(Benchmark.load(args.baseline), Benchmark.load(args.current), alpha=args.alpha, threshold=args.threshold)
+    regressions = comparison[comparison['regression']]
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        if args.all:
+            print(comparison.to_string(index=False))
+        if len(regressions) > 0:
+            print(f'{len(regressions)} regression(s) found :')
+            print(regressions.to_string(index=False))
+        else:
+            print('No regression found.')
+    return 1 if len(regressions) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import tempfile
+import traceback
+import multiprocessing
+from importlib.metadata import version, PackageNotFoundError
+
+import numpy as np
+
+from sumo_experiments.benchmarks.scenarios import STRATEGIES, DEFAULT_SCENARIOS, parse_scenario
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class Benchmark:
+    """
+    Measure the performances of the preset networks with the strategies of sumo_experiments.strategies.
+    A case is a scenario (a preset network and its size), a strategy and a seed. Each case runs in a new process, started
+    with the 'spawn' method, so it has its own libsumo instance and its peak memory is not shared with other cases.
+    Cases run one after the other, so they don't compete for the CPU. For each case, the benchmark measures :
+    - build_s : The time to build the network (infrastructures, flows, detectors, netconvert).
+    - strategy_build_s : The time to build the strategy.
+    - steps : The number of simulation steps.
+    - run_s : The time of the simulation loop of the TraciWrapper.
+    - steps_per_s : The number of simulation steps per second.
+    - sumo_s : The time spent in traci.simulationStep.
+    - python_s : The time of the simulation loop spent outside traci.simulationStep.
+    - python_share : The share of python_s in run_s.
+    - peak_rss_mb : The peak resident memory of the process, in MB.
+    - calls_per_step : The number of TraCI calls per simulation step.
+    The netconvert cache is disabled by default, so build_s includes the netconvert run.
+    """
+
+    def __init__(self, scenarios=None, strategies=None, seeds=(1, 2, 3), steps=1800, repeats=1, timeout=None, netconvert_cache=False):
+        """
+        Init of class
+        :param scenarios: The scenarios to measure, as described in parse_scenario. Default is DEFAULT_SCENARIOS.
+        :type scenarios: list
+        :param strategies: The strategies to measure, keys of STRATEGIES. Default is all strategies.
+        :type strategies: list
+        :param seeds: The seeds of the cases. Each scenario and strategy is measured once per seed and per repeat.
+        :type seeds: list
+        :param steps: The number of simulation steps of each case.
+        :type steps: int
+        :param repeats: The number of times each case is measured.
+        :type repeats: int
+        :param timeout: The maximum duration of a case, in seconds. If None, no timeout.
+        :type timeout: float
+        :param netconvert_cache: If True, the networks are copied from the netconvert cache when possible.
+        :type netconvert_cache: bool
+        """
+        self.scenarios = list(scenarios) if scenarios else list(DEFAULT_SCENARIOS)
+        self.strategies = list(strategies) if strategies else list(STRATEGIES)
+        for scenario in self.scenarios:
+            parse_scenario(scenario)
+        for strategy in self.strategies:
+            if strategy not in STRATEGIES:
+                raise ValueError(f"Unknown strategy '{strategy}', must be one of {list(STRATEGIES)}")
+        self.seeds = list(seeds)
+        self.steps = steps
+        self.repeats = repeats
+        self.timeout = timeout
+        self.netconvert_cache = netconvert_cache
+        self.context = multiprocessing.get_context('spawn')
+
+    def cases(self):
+        """
+        Return the cases of the benchmark.
+        :return: The scenario, strategy, seed and repeat of each case
+        :rtype: list
+        """
+        return [{'scenario': scenario, 'strategy': strategy, 'seed': seed, 'repeat': repeat}
+                for scenario in self.scenarios for strategy in self.strategies
+                for seed in self.seeds for repeat in range(self.repeats)]
+
+    def run(self, log=print):
+        """
+        Run all the cases of the benchmark.
+        :param log: The function called with a progress message after each case. None for no message.
+        :type log: function
+        :return: The results of the benchmark, with 'metadata' and 'cases' keys
+        :rtype: dict
+        """
+        cases = self.cases()
+        results = []
+        for i, case in enumerate(cases):
+            result = dict(case, metrics=None, error=None)
+            result['metrics'], result['error'] = self._run_in_process(case)
+            results.append(result)
+            if log is not None:
+                status = 'ok' if result['error'] is None else 'FAILED'
+                log(f"[{i + 1}/{len(cases)}] {case['scenario']} {case['strategy']} seed={case['seed']} repeat={case['repeat']} : {status}")
+        return {'metadata': self.metadata(), 'cases': results}
+
+    def metadata(self):
+        """
+        Return the description of the environment of the benchmark.
+        :return: The versions, platform and parameters of the benchmark
+        :rtype: dict
+        """
+        try:
+            package_version = version('sumo-experiments')
+        except PackageNotFoundError:
+            package_version = None
+        return {
+            'sumo_experiments': package_version,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'steps': self.steps,
+            'seeds': self.seeds,
+            'repeats': self.repeats,
+            'netconvert_cache': self.netconvert_cache,
+        }
+
+    @staticmethod
+    def save(results, path):
+        """
+        Save the results of a benchmark in a JSON file.
+        :param results: The results returned by run
+        :type results: dict
+        :param path: The path of the file
+        :type path: str
+        """
+        with open(path, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    @staticmethod
+    def load(path):
+        """
+        Load the results of a benchmark from a JSON file.
+        :param path: The path of the file
+        :type path: str
+        :return: The results
+        :rtype: dict
+        """
+        with open(path) as file:
+            return json.load(file)
+
+    def _run_in_process(self, case):
+        """
+        Run a case in a new process, and return its (metrics, error) couple.
+        """
+        directory = tempfile.mkdtemp(prefix='sumo_experiments_benchmark_')
+        receiver, sender = self.context.Pipe(duplex=False)
+        process = self.context.Process(target=_run_case, args=(case, self.steps, self.netconvert_cache, directory, sender), daemon=True)
+        process.start()
+        sender.close()
+        try:
+            if receiver.poll(self.timeout):
+                try:
+                    return receiver.recv()
+                except EOFError:
+                    pass
+                process.join()
+                return None, f"Worker process exited with code {process.exitcode}"
+            return None, f"Timeout after {self.timeout} seconds"
+        finally:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.kill()
+                process.join()
+            receiver.close()
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def _peak_rss_mb():
+    """
+    Return the peak resident memory of the process, in MB.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, and in kilobytes on Linux
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_case(case, steps, netconvert_cache, directory, connection):
+    """
+    Run one case of a benchmark in the current process, from the directory, and send the (metrics, error) couple
+    through the connection.
+    """
+    try:
+        from sumo_experiments.components import NETCONVERT_CACHE
+        from sumo_experiments.traci_util import TraciWrapper, Profiler, TraciCallCounter
+        from sumo_experiments.benchmarks.scenarios import build_network, build_strategy
+
+        os.chdir(directory)
+        NETCONVERT_CACHE.enabled = NETCONVERT_CACHE.enabled and netconvert_cache
+        random.seed(case['seed'])
+        np.random.seed(case['seed'])
+        start = time.perf_counter()
+        network = build_network(case['scenario'])
+        build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        strategy = build_strategy(case['strategy'], network)
+        strategy_build_s = time.perf_counter() - start
+
+        profiler = Profiler()
+        call_counter = TraciCallCounter()
+        wrapper = TraciWrapper(max_simulation_duration=steps, profiler=profiler, call_counter=call_counter)
+        wrapper.add_behavioural_function(strategy.run_all_agents)
+        run_times = []
+
+        def timed_function(traci):
+            run_start = time.perf_counter()
+            data = wrapper.final_function(traci)
+            run_times.append(time.perf_counter() - run_start)
+            return data
+
+        data = network.run(timed_function, seed=case['seed'])
+        if data is None or not run_times:
+            connection.send((None, 'The simulation failed'))
+            return
+        run_s = run_times[0]
+        nb_steps = call_counter.nb_steps
+        sumo_s = profiler.stats['simulationStep'][1] / 1e9 if 'simulationStep' in profiler.stats else 0.0
+        nb_calls = sum(calls for calls, _ in call_counter.calls.values())
+        connection.send(({
+            'build_s': build_s,
+            'strategy_build_s': strategy_build_s,
+            'steps': nb_steps,
+            'run_s': run_s,
+            'steps_per_s': nb_steps / run_s if run_s > 0 else None,
+            'sumo_s': sumo_s,
+            'python_s': run_s - sumo_s,
+            'python_share': (run_s - sumo_s) / run_s if run_s > 0 else None,
+            'peak_rss_mb': _peak_rss_mb(),
+            'calls_per_step': nb_calls / nb_steps if nb_steps else None,
+        }, None))
+    except Exception:
+        connection.send((None, traceback.format_exc()))
+    finally:
+        connection.close()
@@ -0,0 +1,153 @@
+import math
+
+import pandas as pd
+
+
+METRICS = {
+    'build_s': 'lower',
+    'strategy_build_s': 'lower',
+    'steps_per_s': 'higher',
+    'sumo_s': 'lower',
+    'python_s': 'lower',
+    'peak_rss_mb': 'lower',
+    'calls_per_step': 'lower',
+}
+
+
+def compare_results(baseline, current, alpha=0.05, threshold=0.05, metrics=None):
+    """
+    Compare the results of a benchmark with the results of a baseline, for each scenario, strategy and metric.
+    The samples of a scenario and a strategy are the values of the metric for all seeds and repeats. A metric is a
+    regression if it is worse than the baseline by more than threshold (relative change of the means), and if the
+    difference is significant for a one-sided Welch's t-test at level alpha. When both samples have no variance (like the
+    number of TraCI calls, which only depends on the seed), the difference is significant if it is not null.
+    :param baseline: The results of the baseline, as returned by Benchmark.run
+    :type baseline: dict
+    :param current: The results to compare with the baseline
+    :type current: dict
+    :param alpha: The significance level of the test
+    :type alpha: float
+    :param threshold: The minimal relative change of a regression
+    :type threshold: float
+    :param metrics: The metrics to compare, with 'lower' or 'higher' for the better direction. Default is METRICS.
+    :type metrics: dict
+    :return: The scenario, strategy, metric, means, relative change, p-value and regression flag of each comparison
+    :rtype: pandas.DataFrame
+    """
+    metrics = METRICS if metrics is None else metrics
+    baseline_samples = _samples(baseline)
+    current_samples = _samples(current)
+    rows = []
+    for key in baseline_samples:
+        if key not in current_samples:
+            continue
+        scenario, strategy = key
+        for metric, direction in metrics.items():
+            before = baseline_samples[key].get(metric, [])
+            after = current_samples[key].get(metric, [])
+            if not before or not after:
+                continue
+            before_mean = sum(before) / len(before)
+            after_mean = sum(after) / len(after)
+            change = (after_mean - before_mean) / abs(before_mean) if before_mean != 0 else (0.0 if after_mean == 0 else math.inf)
+            worse_change = change if direction == 'lower' else -change
+            p_value = welch_test(after, before) if direction == 'lower' else welch_test(before, after)
+            rows.append({
+                'scenario': scenario,
+                'strategy': strategy,
+                'metric': metric,
+                'baseline': before_mean,
+                'current': after_mean,
+                'change': change,
+                'p_value': p_value,
+                'regression': bool(worse_change > threshold and p_value < alpha)
+            })
+    return pd.DataFrame(rows, columns=['scenario', 'strategy', 'metric', 'baseline', 'current', 'change', 'p_value', 'regression'])
+
+
+def welch_test(a, b):
+    """
+    Return the p-value of the one-sided Welch's t-test of the hypothesis mean(a) > mean(b).
+    :param a: The first sample
+    :type a: list
+    :param b: The second sample
+    :type b: list
+    :return: The p-value
+    :rtype: float
+    """
+    n_a, n_b = len(a), len(b)
+    mean_a, mean_b = sum(a) / n_a, sum(b) / n_b
+    var_a = sum((x - mean_a) ** 2 for x in a) / (n_a - 1) if n_a > 1 else 0.0
+    var_b = sum((x - mean_b) ** 2 for x in b) / (n_b - 1) if n_b > 1 else 0.0
+    se2 = var_a / n_a + var_b / n_b
+    if se2 == 0:
+        if n_a > 1 and n_b > 1 or mean_a == mean_b:
+            return 0.0 if mean_a > mean_b else 1.0
+        # One sample has a single value : there is no estimate of the variance
+        return 1.0
+    t = (mean_a - mean_b) / math.sqrt(se2)
+    dof_denominator = 0.0
+    if n_a > 1:
+        dof_denominator += (var_a / n_a) ** 2 / (n_a - 1)
+    if n_b > 1:
+        dof_denominator += (var_b / n_b) ** 2 / (n_b - 1)
+    dof = se2 ** 2 / dof_denominator
+    return _student_sf(t, dof)
+
+
+def _student_sf(t, dof):
+    """
+    Return P(T > t) for a Student's t distribution with dof degrees of freedom.
+    """
+    tail = 0.5 * _incomplete_beta(dof / 2, 0.5, dof / (dof + t * t))
+    return tail if t > 0 else 1 - tail
+
+
+def _incomplete_beta(a, b, x):
+    """
+    Return the regularized incomplete beta function I_x(a, b), with its continued fraction.
+    """
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x))
+    if x > (a + 1) / (a + b + 2):
+        return 1 - _incomplete_beta(b, a, 1 - x)
+    # Lentz's algorithm
+    tiny = 1e-300
+    c, d = 1.0, 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, 300):
+        numerator = m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m))
+        d = 1 + numerator * d
+        d = 1 / (d if abs(d) > tiny else tiny)
+        c = 1 + numerator / c
+        c = c if abs(c) > tiny else tiny
+        result *= d * c
+        numerator = -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))
+        d = 1 + numerator * d
+        d = 1 / (d if abs(d) > tiny else tiny)
+        c = 1 + numerator / c
+        c = c if abs(c) > tiny else tiny
+        delta = d * c
+        result *= delta
+        if abs(delta - 1) < 1e-12:
+            break
+    return front * result / a
+
+
+def _samples(results):
+    """
+    Return the values of each metric for each scenario and strategy of the successful cases of a benchmark.
+    """
+    samples = {}
+    for case in results['cases']:
+        if case.get('error') is not None or case.get('metrics') is None:
+            continue
+        metrics = samples.setdefault((case['scenario'], case['strategy']), {})
+        for metric, value in case['metrics'].items():
+            if value is not None:
+                metrics.setdefault(metric, []).append(value)
+    return samples
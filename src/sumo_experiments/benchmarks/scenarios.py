@@ -0,0 +1,93 @@
+import importlib
+
+
+def _fixed_time_parameters(network):
+    """
+    Return the parameters of the FixedTimeStrategy : 30 seconds for each phase of each intersection.
+    """
+    return {'phase_times': {tl_id: [30] * len(network.TLS_DETECTORS[tl_id]) for tl_id in network.TLS_DETECTORS}}
+
+
+SCENARIOS = {
+    'intersection': ('IntersectionNetwork', {}),
+    'line': ('LineNetwork', {'nb_intersections': 3}),
+    'grid': ('GridNetwork', {'width': 3, 'height': 3}),
+    'bologna': ('BolognaNetwork', {'intensity': 1}),
+    'lille': ('LilleNetwork', {'intensity': 1}),
+}
+
+STRATEGIES = {
+    'fixedtime': ('FixedTimeStrategy', _fixed_time_parameters),
+    'maxpressure': ('MaxPressureStrategy', {}),
+    'sotl': ('SotlStrategy', {}),
+    'actuated': ('ActuatedStrategy', {}),
+    'lqf': ('LongestQueueFirstStrategy', {}),
+    'acolight': ('AcolightStrategy', {}),
+    'analyticplus': ('AnalyticPlusStrategy', {}),
+    'scoot': ('ScootScatsStrategy', {}),
+    'intellilight': ('IntellilightStrategy', {}),
+    'dqn': ('DQNStrategy', {}),
+    'maddpg': ('MADDPGStrategy', {}),
+    'transformer_dqn': ('TransformerDQNStrategy', {}),
+}
+
+DEFAULT_SCENARIOS = ['intersection', 'line:3', 'grid:3', 'grid:5', 'bologna']
+
+
+def parse_scenario(scenario):
+    """
+    Return the network class name and parameters of a scenario.
+    A scenario is the name of a preset network, optionally followed by a size : 'line:5' is a line of 5 intersections,
+    'grid:4' is a 4x4 grid.
+    :param scenario: The scenario
+    :type scenario: str
+    :return: The name of the network class and its parameters
+    :rtype: tuple
+    """
+    name, _, size = scenario.partition(':')
+    if name not in SCENARIOS:
+        raise ValueError(f"Unknown scenario '{name}', must be one of {list(SCENARIOS)}")
+    class_name, parameters = SCENARIOS[name]
+    parameters = dict(parameters)
+    if size:
+        if name == 'grid':
+            parameters['width'] = parameters['height'] = int(size)
+        elif name == 'line':
+            parameters['nb_intersections'] = int(size)
+        else:
+            raise ValueError(f"The scenario '{name}' has no size")
+    return class_name, parameters
+
+
+def build_network(scenario, **kwargs):
+    """
+    Build the network of a scenario.
+    :param scenario: The scenario, as described in parse_scenario
+    :type scenario: str
+    :return: The network
+    :rtype: Network
+    """
+    class_name, parameters = parse_scenario(scenario)
+    parameters.update(kwargs)
+    preset_networks = importlib.import_module('sumo_experiments.preset_networks')
+    return getattr(preset_networks, class_name)(**parameters)
+
+
+def build_strategy(strategy, network, **kwargs):
+    """
+    Build a strategy for a network.
+    :param strategy: The name of the strategy, a key of STRATEGIES
+    :type strategy: str
+    :param network: The network controlled by the strategy
+    :type network: Network
+    :return: The strategy
+    :rtype: Strategy
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy '{strategy}', must be one of {list(STRATEGIES)}")
+    class_name, parameters = STRATEGIES[strategy]
+    # The parameters can depend on the network
+    parameters = parameters(network) if callable(parameters) else dict(parameters)
+    parameters.update(kwargs)
+    strategies = importlib.import_module('sumo_experiments.strategies')
+    return getattr(strategies, class_name)(network, **parameters)
@@ -1,3 +1,4 @@
+from .netconvert_cache import NetconvertCache, NETCONVERT_CACHE
 from .infrastructures import InfrastructureBuilder
 from .flows import FlowBuilder
 from .detectors import DetectorBuilder
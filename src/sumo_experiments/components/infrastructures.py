@@ -1,5 +1,6 @@
 import xml.etree.ElementTree as ET
 import os
+from sumo_experiments.components.netconvert_cache import NETCONVERT_CACHE
 
 class InfrastructureBuilder:
     """
@@ -22,11 +23,15 @@ class InfrastructureBuilder:
         self.connections = []
         self.tlprograms = {}
 
-    def build(self, filenames, no_warning=True):
+    def build(self, filenames, no_warning=True, use_cache=True):
         """
         Generate the XML configuration files with all infrastructures.
         :param filenames: The dictionnary with all filenames for configuration.
         :type filenames: dict
+        :param no_warning: If True, netconvert is run with --no-warnings
+        :type no_warning: bool
+        :param use_cache: If True, the network file is copied from the netconvert cache when the same infrastructures were already built.
+        :type use_cache: bool
         """
         self.build_nodes(filenames['nodes'])
         self.build_edges(filenames['edges'])
@@ -35,10 +40,13 @@ class InfrastructureBuilder:
         self.build_traffic_light_programs(filenames['trafic_light_programs'])
 
         # Crée le réseau à partir des éléments construits précédemment
-        cmd = f'netconvert -n {filenames["nodes"]} -e {filenames["edges"]} -x {filenames["connections"]} -i {filenames["trafic_light_programs"]} -t {filenames["types"]} -o {filenames["network"]}'
-        if no_warning:
-            cmd += ' --no-warnings'
-        os.system(cmd)
+        if use_cache:
+            NETCONVERT_CACHE.build(filenames, no_warnings=no_warning)
+        else:
+            cmd = f'netconvert -n {filenames["nodes"]} -e {filenames["edges"]} -x {filenames["connections"]} -i {filenames["trafic_light_programs"]} -t {filenames["types"]} -o {filenames["network"]}'
+            if no_warning:
+                cmd += ' --no-warnings'
+            os.system(cmd)
 
     def add_node(self, id, x, y, type='', tl_program=''):
         """
@@ -0,0 +1,175 @@
+import os
+import shutil
+import hashlib
+import subprocess
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class NetconvertCache:
+    """
+    On-disk cache of the networks built by netconvert.
+    The key of a network is a hash of the netconvert input files (nodes, edges, connections, traffic light programs and
+    edge types), of the netconvert options and of the netconvert version. When a network with the same key was already
+    built, its .net.xml file is copied from the cache instead of running netconvert again.
+    When the total size of the cache is over max_size, the least recently used networks are removed.
+    Writers and eviction are serialized with a lock file, so the cache can be shared by concurrent processes.
+    The cache directory can be set with the SUMO_EXPERIMENTS_CACHE environment variable, and the cache can be disabled
+    by setting SUMO_EXPERIMENTS_NO_CACHE to 1.
+    """
+
+    INPUTS = ['nodes', 'edges', 'connections', 'trafic_light_programs', 'types']
+    OPTIONS = {'nodes': '-n', 'edges': '-e', 'connections': '-x', 'trafic_light_programs': '-i', 'types': '-t'}
+
+    def __init__(self, directory=None, max_size=512 * 1024 * 1024):
+        """
+        Init of class
+        :param directory: The directory of the cache. Default is $SUMO_EXPERIMENTS_CACHE/netconvert, or ~/.cache/sumo_experiments/netconvert.
+        :type directory: str
+        :param max_size: The maximum size of the cache, in bytes.
+        :type max_size: int
+        """
+        if directory is None:
+            root = os.environ.get('SUMO_EXPERIMENTS_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'sumo_experiments'))
+            directory = os.path.join(root, 'netconvert')
+        self.directory = directory
+        self.max_size = max_size
+        self.enabled = os.environ.get('SUMO_EXPERIMENTS_NO_CACHE', '0') != '1'
+        self._version = None
+
+    @staticmethod
+    def netconvert_binary():
+        """
+        Return the path of the netconvert binary, from SUMO_HOME if it is set.
+        :return: The path of netconvert
+        :rtype: str
+        """
+        sumo_home = os.environ.get('SUMO_HOME')
+        if sumo_home is not None and os.path.isfile(os.path.join(sumo_home, 'bin', 'netconvert')):
+            return os.path.join(sumo_home, 'bin', 'netconvert')
+        return 'netconvert'
+
+    def version(self):
+        """
+        Return the version of netconvert. The version is read once per process.
+        :return: The first line of netconvert --version
+        :rtype: str
+        """
+        if self._version is None:
+            try:
+                output = subprocess.run([self.netconvert_binary(), '--version'], capture_output=True, text=True).stdout
+                self._version = output.splitlines()[0] if output else ''
+            except OSError:
+                self._version = ''
+        return self._version
+
+    def key(self, filenames, options):
+        """
+        Return the key of a network in the cache.
+        :param filenames: The dictionnary with all filenames for configuration.
+        :type filenames: dict
+        :param options: The netconvert options, other than the files
+        :type options: list
+        :return: The hash of the inputs, options and netconvert version
+        :rtype: str
+        """
+        digest = hashlib.sha256()
+        digest.update(self.version().encode())
+        digest.update(' '.join(options).encode())
+        for name in self.INPUTS:
+            digest.update(name.encode())
+            with open(filenames[name], 'rb') as file:
+                digest.update(hashlib.sha256(file.read()).digest())
+        return digest.hexdigest()
+
+    def build(self, filenames, no_warnings=True):
+        """
+        Build the network file filenames['network'] with netconvert, or copy it from the cache.
+        :param filenames: The dictionnary with all filenames for configuration.
+        :type filenames: dict
+        :param no_warnings: If True, netconvert is run with --no-warnings
+        :type no_warnings: bool
+        """
+        options = ['--no-warnings'] if no_warnings else []
+        if not self.enabled:
+            self._run_netconvert(filenames, options)
+            return
+        key = self.key(filenames, options)
+        cached_file = os.path.join(self.directory, f'{key}.net.xml')
+        try:
+            shutil.copyfile(cached_file, filenames['network'])
+        except FileNotFoundError:
+            pass
+        else:
+            # The modification time is the last use time of the network, for the LRU eviction
+            try:
+                os.utime(cached_file)
+            except FileNotFoundError:
+                pass
+            return
+        if not self._run_netconvert(filenames, options) or not os.path.isfile(filenames['network']):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock():
+            tmp_file = f'{cached_file}.{os.getpid()}.tmp'
+            shutil.copyfile(filenames['network'], tmp_file)
+            os.replace(tmp_file, cached_file)
+            self._evict()
+
+    def clear(self):
+        """
+        Remove all the networks of the cache.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        with self._lock():
+            for file in os.listdir(self.directory):
+                if file.endswith('.net.xml'):
+                    os.remove(os.path.join(self.directory, file))
+
+    def _run_netconvert(self, filenames, options):
+        """
+        Run netconvert on the input files, and return True if it succeeded.
+        """
+        cmd = [self.netconvert_binary()]
+        for name in self.INPUTS:
+            cmd += [self.OPTIONS[name], filenames[name]]
+        cmd += ['-o', filenames['network']] + options
+        return subprocess.run(cmd).returncode == 0
+
+    def _evict(self):
+        """
+        Remove the least recently used networks until the size of the cache is under max_size. The lock must be held.
+        """
+        entries = []
+        for file in os.listdir(self.directory):
+            if file.endswith('.net.xml'):
+                stat = os.stat(os.path.join(self.directory, file))
+                entries.append((stat.st_mtime, stat.st_size, file))
+        total_size = sum(entry[1] for entry in entries)
+        for _, size, file in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            os.remove(os.path.join(self.directory, file))
+            total_size -= size
+
+    @contextmanager
+    def _lock(self):
+        """
+        Hold the lock file of the cache.
+        """
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+NETCONVERT_CACHE = NetconvertCache()
@@ -1,4 +1,10 @@
 from .network import Network
+from .working_directory import WorkingDirectory
+from .reachability_index import ReachabilityIndex
+from .net_model import NetModel
+from .warm_start import StateCache, WarmStart, STATE_CACHE
+from .session import SimulationSession
+from .tls_topology import TLSTopology
 from .artificial_preset_network import ArtificialNetwork
 from .intersection_network import IntersectionNetwork
 from .line_network import LineNetwork
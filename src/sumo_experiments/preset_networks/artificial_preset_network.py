@@ -1,7 +1,7 @@
 import os
 import sys
 
-from sumo_experiments.preset_networks import Network
+from sumo_experiments.preset_networks import Network, WorkingDirectory
 import libsumo as traci
 import traceback
 
@@ -10,27 +10,30 @@ class ArtificialNetwork(Network):
     Abstract class for artificial preset networks.
     """
 
-    def __init__(self, name):
+    def __init__(self, name, working_directory=None):
         """
         Generates file names for all SUMO config files.
         :param name: name of the simulation, used to name the different simulation files
         :type name: str
+        :param working_directory: The directory where the simulation files are written. Can be a path, a WorkingDirectory, or None for a new temporary directory.
+        :type working_directory: str or WorkingDirectory
         """
         super().__init__()
+        self.working_directory = WorkingDirectory.of(working_directory)
         self.file_names = {
-            'nodes': f'{name}.nod.xml',
-            'edges': f'{name}.edg.xml',
-            'types': f'{name}.typ.xml',
-            'connections': f'{name}.con.xml',
-            'trafic_light_programs': f'{name}.ttl.xml',
-            'routes': f'{name}.rou.xml',
-            'network': f'{name}.net.xml',
-            'detectors': f'{name}.det.xml',
-            'detectors_out': 'detectors.out',
-            'additionnals': f'{name}.add.xml'
+            'nodes': self.working_directory.path_of(f'{name}.nod.xml'),
+            'edges': self.working_directory.path_of(f'{name}.edg.xml'),
+            'types': self.working_directory.path_of(f'{name}.typ.xml'),
+            'connections': self.working_directory.path_of(f'{name}.con.xml'),
+            'trafic_light_programs': self.working_directory.path_of(f'{name}.ttl.xml'),
+            'routes': self.working_directory.path_of(f'{name}.rou.xml'),
+            'network': self.working_directory.path_of(f'{name}.net.xml'),
+            'detectors': self.working_directory.path_of(f'{name}.det.xml'),
+            'detectors_out': self.working_directory.path_of('detectors.out'),
+            'additionnals': self.working_directory.path_of(f'{name}.add.xml')
         }
 
-    def run(self, traci_function, gui=False, seed=None, no_warnings=True, nb_threads=1, time_to_teleport=150):
+    def run(self, traci_function, gui=False, seed=None, no_warnings=True, nb_threads=1, time_to_teleport=150, warm_start=None, session=None):
         """
         Run the simulation.
         :param traci_function: The function using TraCi package and that can control infrastructures.
@@ -45,15 +48,23 @@ class ArtificialNetwork(Network):
         :type nb_threads: int
         :param time_to_teleport: The time for a vehicle to teleport when the network is blocked
         :type time_to_teleport: int
+        :param warm_start: If set, the traci function starts from the state of the network at the end of the warm-up of the WarmStart, loaded from its cache when the same simulation was already warmed up.
+        :type warm_start: WarmStart
+        :param session: If set, the simulation is run in the SUMO instance of the session, loaded with traci.load instead of being started and closed.
+        :type session: SimulationSession
         """
         try:
             args = self.build_arguments(seed, no_warnings, nb_threads, time_to_teleport)
-            if gui:
-                traci.start(["sumo-gui"] + args.split() + ['--waiting-time-memory', '1000000'])
-            else:
-                traci.start(["sumo"] + args.split() + ['--waiting-time-memory', '1000000'])
-            res = traci_function(traci)
-            traci.close()
+            cmd = ["sumo-gui" if gui else "sumo"] + args.split() + ['--waiting-time-memory', '1000000']
+            if warm_start is not None:
+                cmd += warm_start.sumo_options()
+            self._start_simulation(traci, cmd, session)
+            try:
+                if warm_start is not None:
+                    warm_start.apply(traci, cmd)
+                res = traci_function(traci)
+            finally:
+                self._close_simulation(traci, session)
         except Exception as err:
             print("Error during simulation :", sys.exc_info()[0])
             print("OS error: {0}".format(err))
@@ -84,9 +95,7 @@ class ArtificialNetwork(Network):
         """
         Clean all simulation files.
         """
-        for file in self.file_names.values():
-            if os.path.exists(file):
-                os.remove(file)
+        self.working_directory.cleanup()
 
     def detector2tlid(self):
         mapping = {}
@@ -7,7 +7,7 @@ from copy import deepcopy
 import random
 import libsumo as traci
 
-from sumo_experiments.preset_networks import Network
+from sumo_experiments.preset_networks import Network, WorkingDirectory, NetModel
 
 
 class BolognaNetwork(Network):
@@ -17,20 +17,23 @@ class BolognaNetwork(Network):
 
     THIS_FILE_PATH = os.path.abspath(os.path.dirname(__file__))
 
-    def __init__(self, intensity, generation_duration=3600):
+    def __init__(self, intensity, generation_duration=3600, working_directory=None):
         """
         Init of class
         :param intensity: The multiplier of the number of generated vehicles.
         :type intensity: float
+        :param working_directory: The directory where the simulation files are written. Can be a path, a WorkingDirectory, or None for a new temporary directory.
+        :type working_directory: str or WorkingDirectory
         """
-        self.exp_name = random.randint(0, 100000)
-        self.FULL_LINE_COMMAND = f"sumo -c {self.THIS_FILE_PATH}/bologna/acosta/run_{self.exp_name}.sumocfg"
-        self.FULL_LINE_COMMAND_GUI = f"sumo-gui -c {self.THIS_FILE_PATH}/bologna/acosta/run_{self.exp_name}.sumocfg"
+        self.working_directory = WorkingDirectory.of(working_directory)
         self.NET_FILE = os.path.join(self.THIS_FILE_PATH, 'bologna/acosta/acosta_buslanes.net.xml')
+        self.NET_MODEL_FILE = os.path.join(self.THIS_FILE_PATH, 'bologna/acosta/acosta_buslanes.netmodel.pkl')
         self.FLOW_FILE = os.path.join(self.THIS_FILE_PATH, 'bologna/acosta/acosta.rou.xml')
-        self.NEW_FLOW_FILE = os.path.join(self.THIS_FILE_PATH, f'bologna/acosta/acosta_{self.exp_name}.rou.xml')
+        self.NEW_FLOW_FILE = self.working_directory.path_of('acosta.rou.xml')
         self.CONFIG_FILE = os.path.join(self.THIS_FILE_PATH, f"bologna/acosta/run.sumocfg")
-        self.NEW_CONFIG_FILE = os.path.join(self.THIS_FILE_PATH, f"bologna/acosta/run_{self.exp_name}.sumocfg")
+        self.NEW_CONFIG_FILE = self.working_directory.path_of('run.sumocfg')
+        self.FULL_LINE_COMMAND = f"sumo -c {self.NEW_CONFIG_FILE}"
+        self.FULL_LINE_COMMAND_GUI = f"sumo-gui -c {self.NEW_CONFIG_FILE}"
         self.generate_config_file()
         self.generate_flows(intensity, generation_duration)
         self.TLS_DETECTORS = {
@@ -46,7 +49,7 @@ class BolognaNetwork(Network):
         self.detector_period = 600  # seconds — aggregation window for interval-based TraCI queries
 
 
-    def run(self, traci_function, gui=False, seed=None, no_warnings=True, nb_threads=1, time_to_teleport=150):
+    def run(self, traci_function, gui=False, seed=None, no_warnings=True, nb_threads=1, time_to_teleport=150, warm_start=None, session=None):
         """
         Run the network.
         :param traci_function: The function using TraCi package and that can control infrastructures.
@@ -61,6 +64,10 @@ class BolognaNetwork(Network):
         :type nb_threads: int
         :param time_to_teleport: The time for a vehicle to teleport when the network is blocked
         :type time_to_teleport: int
+        :param warm_start: If set, the traci function starts from the state of the network at the end of the warm-up of the WarmStart, loaded from its cache when the same simulation was already warmed up.
+        :type warm_start: WarmStart
+        :param session: If set, the simulation is run in the SUMO instance of the session, loaded with traci.load instead of being started and closed.
+        :type session: SimulationSession
         """
         #try:
         if seed is not None:
@@ -73,12 +80,19 @@ class BolognaNetwork(Network):
             no_warnings_text = '--no-warnings '
         if gui:
             #traci.start((self.FULL_LINE_COMMAND_GUI + f' --time-to-teleport {time_to_teleport} ' + threads_text + seed_text + no_warnings_text).split())
-            traci.start((self.FULL_LINE_COMMAND_GUI + f' --time-to-teleport {time_to_teleport} ' + seed_text + no_warnings_text).split())
+            cmd = (self.FULL_LINE_COMMAND_GUI + f' --time-to-teleport {time_to_teleport} ' + seed_text + no_warnings_text).split()
         else:
             #traci.start((self.FULL_LINE_COMMAND + f' --time-to-teleport {time_to_teleport} ' + threads_text + seed_text + no_warnings_text).split())
-            traci.start((self.FULL_LINE_COMMAND + f' --time-to-teleport {time_to_teleport} ' + seed_text + no_warnings_text).split())
-        res = traci_function(traci)
-        traci.close()
+            cmd = (self.FULL_LINE_COMMAND + f' --time-to-teleport {time_to_teleport} ' + seed_text + no_warnings_text).split()
+        if warm_start is not None:
+            cmd += warm_start.sumo_options()
+        self._start_simulation(traci, cmd, session)
+        try:
+            if warm_start is not None:
+                warm_start.apply(traci, cmd)
+            res = traci_function(traci)
+        finally:
+            self._close_simulation(traci, session)
         # except Exception as err:
         #     print("Error during simulation :", sys.exc_info()[0])
         #     print("OS error: {0}".format(err))
@@ -91,30 +105,13 @@ class BolognaNetwork(Network):
         """
         Delete all the files generated by the instance.
         """
-        if os.path.isfile(self.NEW_CONFIG_FILE):
-            os.remove(self.NEW_CONFIG_FILE)
-        if os.path.isfile(self.NEW_FLOW_FILE):
-            os.remove(self.NEW_FLOW_FILE)
+        self.working_directory.cleanup()
 
     def generate_config_file(self):
         """
-        Create a new config file for the bologna network.
+        Create a new config file for the bologna network, in the working directory.
         """
-        if os.path.isfile(self.NEW_CONFIG_FILE):
-            os.remove(self.NEW_CONFIG_FILE)
-        with open(self.CONFIG_FILE, 'r') as config_file:
-            with open(self.NEW_CONFIG_FILE, 'a') as new_config_file:
-                line = config_file.readline()
-                while line != '':
-                    if line != '\n' and line.split()[0] == '<route-files':
-                        first_part = line.split('.')[0]
-                        second_part = line.split('.')[1:]
-                        first_part = ['"'.join(first_part.split('"')[:-1] + [f"acosta_{self.exp_name}"])]
-                        new_line = '.'.join(first_part + second_part)
-                        new_config_file.write(new_line)
-                    else:
-                        new_config_file.write(line)
-                    line = config_file.readline()
+        self.working_directory.copy_config(self.CONFIG_FILE, 'run.sumocfg', route_file=self.NEW_FLOW_FILE)
 
 
     def generate_infrastructures(self):
@@ -124,27 +121,26 @@ class BolognaNetwork(Network):
         :rtype: InfrastructureBuilder
         """
         infra = InfrastructureBuilder()
-        tree = ET.parse(self.NET_FILE)
-        nodes = [e for e in tree.iter('junction')]
-        for node in nodes:
-            infra.add_node(id=node.get('id'),
-                           x=float(node.get('x')),
-                           y=float(node.get('y')),
-                           type=node.get('type'))
-        edges = [e for e in tree.iter('edge')]
-        for edge in edges:
+        model = NetModel.load(self.NET_FILE, self.NET_MODEL_FILE)
+        for node_id, node_type, (x, y) in zip(model.junction_ids, model.junction_types, model.junction_xy):
+            infra.add_node(id=node_id,
+                           x=float(x),
+                           y=float(y),
+                           type=node_type)
+        for i in range(model.nb_declared_edges):
+            edge = model.edge_element(i)
             if not edge.get('id')[0] == ':':
                 infra.add_edge(id=edge.get('id'),
                                from_node=edge.get('from'),
                                to_node=edge.get('to'),
                                edge_type='default')
-        connections = [e for e in tree.iter('connection')]
-        for conn in connections:
-            if conn.get('from')[0] != ':' and conn.get('to')[0] != ':':
-                infra.add_connection(from_edge=conn.get('from'),
-                                     to_edge=conn.get('to'),
-                                     from_lane=int(conn.get('fromLane')),
-                                     to_lane=int(conn.get('toLane')))
+        for from_edge, to_edge, from_lane, to_lane in zip(model.connection_from, model.connection_to, model.connection_from_lane, model.connection_to_lane):
+            from_edge, to_edge = model.edge_ids[from_edge], model.edge_ids[to_edge]
+            if from_edge[0] != ':' and to_edge[0] != ':':
+                infra.add_connection(from_edge=from_edge,
+                                     to_edge=to_edge,
+                                     from_lane=int(from_lane),
+                                     to_lane=int(to_lane))
         return infra
 
     def generate_flows(self, coeff, generation_duration):
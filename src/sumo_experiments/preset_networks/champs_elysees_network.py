@@ -7,7 +7,7 @@ from sumo_experiments.components import FlowBuilder, DetectorBuilder
 import networkx as nx
 import libsumo as traci
 
-from sumo_experiments.preset_networks import Network
+from sumo_experiments.preset_networks import Network, WorkingDirectory, NetModel
 
 
 class ChampsElyseesNetwork(Network):
@@ -61,7 +61,7 @@ class ChampsElyseesNetwork(Network):
 
 
 
-    def __init__(self, intensity=1, starting_time=0, ending_time=24, seed=42, train_duration=None):
+    def __init__(self, intensity=1, starting_time=0, ending_time=24, seed=42, train_duration=None, working_directory=None):
         """
         Init of class
         :param intensity: The intensity of the normal flow. A coefficient to multiply the number of vehicle for each flow.
@@ -70,19 +70,21 @@ class ChampsElyseesNetwork(Network):
         :type starting_time: int
         :param ending_time: The hour of the day at which the flow ends. Must be between 1 and 24, and greater than starting time.
         :type ending_time: int
+        :param working_directory: The directory where the simulation files are written. Can be a path, a WorkingDirectory, or None for a new temporary directory.
+        :type working_directory: str or WorkingDirectory
         """
-        self.exp_name = random.randint(0, 100000)
-        #self.exp_name = 1
+        self.working_directory = WorkingDirectory.of(working_directory)
         self.CONFIG_FILE = os.path.join(self.THIS_FILE_PATH, f"champs_elysees/run.sumocfg")
-        self.NEW_CONFIG_FILE = os.path.join(self.THIS_FILE_PATH, f"champs_elysees/run_{self.exp_name}.sumocfg")
-        self.FULL_LINE_COMMAND = f"sumo -c {self.THIS_FILE_PATH}/champs_elysees/run_{self.exp_name}.sumocfg"
-        self.FULL_LINE_COMMAND_GUI = f"sumo-gui -c {self.THIS_FILE_PATH}/champs_elysees/run_{self.exp_name}.sumocfg"
+        self.NEW_CONFIG_FILE = self.working_directory.path_of('run.sumocfg')
+        self.FULL_LINE_COMMAND = f"sumo -c {self.NEW_CONFIG_FILE}"
+        self.FULL_LINE_COMMAND_GUI = f"sumo-gui -c {self.NEW_CONFIG_FILE}"
         self.NET_FILE = os.path.join(self.THIS_FILE_PATH, 'champs_elysees/champs_elysees.net.xml')
+        self.NET_MODEL = NetModel.load(self.NET_FILE, os.path.join(self.THIS_FILE_PATH, 'champs_elysees/champs_elysees.netmodel.pkl'))
         self.ENTRIES_FILE = os.path.join(self.THIS_FILE_PATH, 'champs_elysees/liste_entrees.txt')
         self.EXITS_FILE = os.path.join(self.THIS_FILE_PATH, 'champs_elysees/liste_sorties.txt')
         self.FORBID_EXITS_FILE = os.path.join(self.THIS_FILE_PATH, 'champs_elysees/exit_forbidden.txt')
         self.FORBID_STARTING_EDGES_FILE = os.path.join(self.THIS_FILE_PATH, 'champs_elysees/starting_edges_forbidden.txt')
-        self.FLOW_FILE = f'{self.THIS_FILE_PATH}/champs_elysees/champs_elysees_{self.exp_name}.rou.xml'
+        self.FLOW_FILE = self.working_directory.path_of('champs_elysees.rou.xml')
         self.TL_JUNCTIONS = self.get_tl_junctions()
         self.EDGES_TO_TL = self.get_edges_to_tl()
         self.EDGES_FROM_TL = self.get_edges_from_tl()
@@ -101,7 +103,7 @@ class ChampsElyseesNetwork(Network):
         }
 
 
-    def run(self, traci_function, simulation_duration=None, gui=False, seed=None, no_warnings=True, nb_threads=1, time_to_teleport=150):
+    def run(self, traci_function, simulation_duration=None, gui=False, seed=None, no_warnings=True, nb_threads=1, time_to_teleport=150, warm_start=None, session=None):
         """
         Run the network.
         :param traci_function: The function using TraCi package and that can control infrastructures.
@@ -116,6 +118,10 @@ class ChampsElyseesNetwork(Network):
         :type nb_threads: int
         :param time_to_teleport: The time for a vehicle to teleport when the network is blocked
         :type time_to_teleport: int
+        :param warm_start: If set, the traci function starts from the state of the network at the end of the warm-up of the WarmStart, loaded from its cache when the same simulation was already warmed up.
+        :type warm_start: WarmStart
+        :param session: If set, the simulation is run in the SUMO instance of the session, loaded with traci.load instead of being started and closed.
+        :type session: SimulationSession
         """
         try:
             if seed is not None:
@@ -127,11 +133,18 @@ class ChampsElyseesNetwork(Network):
             if no_warnings:
                 no_warnings_text = '--no-warnings '
             if gui:
-                traci.start((self.FULL_LINE_COMMAND_GUI + f' --time-to-teleport {time_to_teleport} ' + threads_text + seed_text + no_warnings_text).split())
+                cmd = (self.FULL_LINE_COMMAND_GUI + f' --time-to-teleport {time_to_teleport} ' + threads_text + seed_text + no_warnings_text).split()
             else:
-                traci.start((self.FULL_LINE_COMMAND + f' --time-to-teleport {time_to_teleport} ' + threads_text + seed_text + no_warnings_text).split())
-            res = traci_function(traci)
-            traci.close()
+                cmd = (self.FULL_LINE_COMMAND + f' --time-to-teleport {time_to_teleport} ' + threads_text + seed_text + no_warnings_text).split()
+            if warm_start is not None:
+                cmd += warm_start.sumo_options()
+            self._start_simulation(traci, cmd, session)
+            try:
+                if warm_start is not None:
+                    warm_start.apply(traci, cmd)
+                res = traci_function(traci)
+            finally:
+                self._close_simulation(traci, session)
         except Exception as err:
             print("Error during simulation :", sys.exc_info()[0])
             print("OS error: {0}".format(err))
@@ -170,33 +183,16 @@ class ChampsElyseesNetwork(Network):
 
     def generate_config_file(self):
         """
-        Create a new config file for the bologna network.
+        Create a new config file for the champs elysees network, in the working directory.
         """
-        if os.path.isfile(self.NEW_CONFIG_FILE):
-            os.remove(self.NEW_CONFIG_FILE)
-        with open(self.CONFIG_FILE, 'r') as config_file:
-            with open(self.NEW_CONFIG_FILE, 'a') as new_config_file:
-                line = config_file.readline()
-                while line != '':
-                    if line != '\n' and line.split()[0] == '<route-files':
-                        first_part = line.split('.')[0]
-                        second_part = line.split('.')[1:]
-                        first_part = ['"'.join(first_part.split('"')[:-1] + [f"champs_elysees_{self.exp_name}"])]
-                        new_line = '.'.join(first_part + second_part)
-                        new_config_file.write(new_line)
-                    else:
-                        new_config_file.write(line)
-                    line = config_file.readline()
+        self.working_directory.copy_config(self.CONFIG_FILE, 'run.sumocfg', route_file=self.FLOW_FILE)
 
 
     def clean_files(self):
         """
         Delete all the files generated by the instance.
         """
-        if os.path.isfile(self.NEW_CONFIG_FILE):
-            os.remove(self.NEW_CONFIG_FILE)
-        if os.path.isfile(self.FLOW_FILE):
-            os.remove(self.FLOW_FILE)
+        self.working_directory.cleanup()
 
 
     def get_tl_junctions(self):
@@ -205,13 +201,7 @@ class ChampsElyseesNetwork(Network):
         :return: The list of all junctions managed by a traffic light
         :rtype: list
         """
-        tree = ET.parse(self.NET_FILE)
-        junctions = tree.iter('junction')
-        traffic_lights = []
-        for junction in junctions:
-            if junction.get('type') == 'traffic_light':
-                traffic_lights.append(junction)
-        return traffic_lights
+        return self.NET_MODEL.traffic_light_junctions()
 
     def get_edges_to_tl(self):
         """
@@ -219,14 +209,11 @@ class ChampsElyseesNetwork(Network):
         :return: The edges ending into each traffic light node
         :rtype: dict
         """
-        tree = ET.parse(self.NET_FILE)
-        edges = tree.iter('edge')
         tl_to_edges = {}
         for junction in self.TL_JUNCTIONS:
             tl_to_edges[junction.get('id')] = []
-        for edge in edges:
-            if edge.get('to') in tl_to_edges:
-                tl_to_edges[edge.get('to')].append(edge)
+        for edge in self.NET_MODEL.edges_to_junctions(tl_to_edges):
+            tl_to_edges[edge.get('to')].append(edge)
         return tl_to_edges
 
     def get_edges_from_tl(self):
@@ -235,14 +222,11 @@ class ChampsElyseesNetwork(Network):
         :return: The edges strating from each traffic light node
         :rtype: dict
         """
-        tree = ET.parse(self.NET_FILE)
-        edges = tree.iter('edge')
         tl_to_edges = {}
         for junction in self.TL_JUNCTIONS:
             tl_to_edges[junction.get('id')] = []
-        for edge in edges:
-            if edge.get('from') in tl_to_edges:
-                tl_to_edges[edge.get('from')].append(edge)
+        for edge in self.NET_MODEL.edges_from_junctions(tl_to_edges):
+            tl_to_edges[edge.get('from')].append(edge)
         return tl_to_edges
 
 
@@ -258,13 +242,7 @@ class ChampsElyseesNetwork(Network):
             while id != "":
                 nodes_id.append(id)
                 id = f.readline()[:-1]
-        tree = ET.parse(self.NET_FILE)
-        edges = tree.iter('edge')
-        entries_id = []
-        for edge in edges:
-            if edge.get('from') in nodes_id:
-                entries_id.append(edge)
-        return entries_id
+        return self.NET_MODEL.edges_from_junctions(nodes_id)
 
     def get_exits(self):
         """
@@ -278,13 +256,7 @@ class ChampsElyseesNetwork(Network):
             while id != "":
                 nodes_id.append(id)
                 id = f.readline()[:-1]
-        tree = ET.parse(self.NET_FILE)
-        edges = tree.iter('edge')
-        exits_id = []
-        for edge in edges:
-            if edge.get('to') in nodes_id:
-                exits_id.append(edge)
-        return exits_id
+        return self.NET_MODEL.edges_to_junctions(nodes_id)
 
     def get_forbidden_exits(self):
         """
@@ -320,15 +292,7 @@ class ChampsElyseesNetwork(Network):
         :return: The graph representation of the network
         :rtype: networkx.Graph
         """
-        G = nx.DiGraph()
-        tree = ET.parse(self.NET_FILE)
-        edges = tree.iter('edge')
-        for edge in edges:
-            G.add_node(edge.get('id'))
-        connections = tree.iter('connection')
-        for connection in connections:
-            G.add_edge(connection.get('from'), connection.get('to'))
-        return G
+        return self.NET_MODEL.graph()
 
 
     def generate_detectors(self):
@@ -1,5 +1,4 @@
 import os
-import random
 import numpy as np
 from sumo_experiments.components import InfrastructureBuilder, FlowBuilder, DetectorBuilder
 import libsumo as traci
@@ -39,6 +38,7 @@ class GridNetwork(ArtificialNetwork):
                  saturation_detectors_length=20,
                  random_saturation_position=False,
                  default_saturation_position=0,
+                 working_directory=None,
                  ):
         """
         Init of class
@@ -78,8 +78,10 @@ class GridNetwork(ArtificialNetwork):
         :type random_saturation_position: bool
         :param default_saturation_position: Starting pos of the detectors (in meters from the upstream intersection)
         :type default_saturation_position: int
+        :param working_directory: The directory where the simulation files are written. Can be a path, a WorkingDirectory, or None for a new temporary directory.
+        :type working_directory: str or WorkingDirectory
         """
-        super().__init__(f'grid_network_{random.randint(1, 1000000)}')
+        super().__init__('grid_network', working_directory)
         self.edges_length = {}
         self.random = False
         if width < 2 or height < 2:
@@ -112,9 +114,6 @@ class GridNetwork(ArtificialNetwork):
         infrastructures.build(self.file_names)
         flows.build(self.file_names)
         detectors.build(self.file_names)
-        # Using netconvert to create the network
-        cmd = f'$SUMO_HOME/bin/netconvert -n {self.file_names["nodes"]} -e {self.file_names["edges"]} -x {self.file_names["connections"]} -i {self.file_names["trafic_light_programs"]} -t {self.file_names["types"]} -o {self.file_names["network"]} --no-warnings'
-        os.system(cmd)
 
 
     ### Network ###
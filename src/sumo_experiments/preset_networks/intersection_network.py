@@ -1,5 +1,4 @@
 import os
-import random
 from sumo_experiments.components import InfrastructureBuilder, FlowBuilder, DetectorBuilder
 
 from sumo_experiments.preset_networks import ArtificialNetwork
@@ -32,7 +31,8 @@ class IntersectionNetwork(ArtificialNetwork):
                  load_vector=None,
                  coeff_matrix=None,
                  boolean_detectors_length=20,
-                 saturation_detectors_length=20):
+                 saturation_detectors_length=20,
+                 working_directory=None):
         """
         Init of class.
         :param lane_length: The length of all edges (in meters)
@@ -61,8 +61,10 @@ class IntersectionNetwork(ArtificialNetwork):
         :type boolean_detectors_length: int
         :param saturation_detectors_length: The scope size of the saturation detectors (in meters)
         :type saturation_detectors_length: int
+        :param working_directory: The directory where the simulation files are written. Can be a path, a WorkingDirectory, or None for a new temporary directory.
+        :type working_directory: str or WorkingDirectory
         """
-        super().__init__(f'intersection_network_{random.randint(1, 1000000)}')
+        super().__init__('intersection_network', working_directory)
         # Create infrastructures
         infrastructures = self.generate_infrastructures(lane_length, max_speed)
         # Create flows
@@ -84,9 +86,6 @@ class IntersectionNetwork(ArtificialNetwork):
         infrastructures.build(self.file_names)
         flows.build(self.file_names)
         detectors.build(self.file_names)
-        # Using netconvert to create the network
-        cmd = f'$SUMO_HOME/bin/netconvert -n {self.file_names["nodes"]} -e {self.file_names["edges"]} -x {self.file_names["connections"]} -i {self.file_names["trafic_light_programs"]} -t {self.file_names["types"]} -o {self.file_names["network"]} --no-warnings'
-        os.system(cmd)
 
 
 
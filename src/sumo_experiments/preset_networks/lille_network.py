@@ -6,7 +6,7 @@ from sumo_experiments.components import FlowBuilder, DetectorBuilder
 import networkx as nx
 import libsumo as traci
 
-from sumo_experiments.preset_networks import Network
+from sumo_experiments.preset_networks import Network, WorkingDirectory, ReachabilityIndex, NetModel
 
 
 class LilleNetwork(Network):
@@ -100,7 +100,7 @@ class LilleNetwork(Network):
 
 
 
-    def __init__(self, intensity=1, starting_time=0, ending_time=24, seed=42):
+    def __init__(self, intensity=1, starting_time=0, ending_time=24, seed=42, working_directory=None):
         """
         Init of class
         :param intensity: The intensity of the normal flow. A coefficient to multiply the number of vehicle for each flow.
@@ -109,22 +109,28 @@ class LilleNetwork(Network):
         :type starting_time: int
         :param ending_time: The hour of the day at which the flow ends. Must be between 1 and 24, and greater than starting time.
         :type ending_time: int
+        :param working_directory: The directory where the simulation files are written. Can be a path, a WorkingDirectory, or None for a new temporary directory.
+        :type working_directory: str or WorkingDirectory
         """
-        self.exp_name = random.randint(0, 100000)
+        self.working_directory = WorkingDirectory.of(working_directory)
         self.CONFIG_FILE = os.path.join(self.THIS_FILE_PATH, f"lille/run.sumocfg")
-        self.NEW_CONFIG_FILE = os.path.join(self.THIS_FILE_PATH, f"lille/run_{self.exp_name}.sumocfg")
-        self.FULL_LINE_COMMAND = f"sumo -c {self.THIS_FILE_PATH}/lille/run_{self.exp_name}.sumocfg"
-        self.FULL_LINE_COMMAND_GUI = f"sumo-gui -c {self.THIS_FILE_PATH}/lille/run_{self.exp_name}.sumocfg"
+        self.NEW_CONFIG_FILE = self.working_directory.path_of('run.sumocfg')
+        self.FULL_LINE_COMMAND = f"sumo -c {self.NEW_CONFIG_FILE}"
+        self.FULL_LINE_COMMAND_GUI = f"sumo-gui -c {self.NEW_CONFIG_FILE}"
         self.NET_FILE = os.path.join(self.THIS_FILE_PATH, 'lille/lille.net.xml')
+        self.NET_MODEL = NetModel.load(self.NET_FILE, os.path.join(self.THIS_FILE_PATH, 'lille/lille.netmodel.pkl'))
         self.ENTRIES_FILE = os.path.join(self.THIS_FILE_PATH, 'lille/liste_entrees.txt')
         self.EXITS_FILE = os.path.join(self.THIS_FILE_PATH, 'lille/liste_sorties.txt')
         self.FORBID_EXITS_FILE = os.path.join(self.THIS_FILE_PATH, 'lille/exit_forbidden.txt')
         self.FORBID_STARTING_EDGES_FILE = os.path.join(self.THIS_FILE_PATH, 'lille/starting_edges_forbidden.txt')
-        self.FLOW_FILE = f'{self.THIS_FILE_PATH}/lille/lille_{self.exp_name}.rou.xml'
+        self.REACHABILITY_FILE = os.path.join(self.THIS_FILE_PATH, 'lille/lille.reachability.pkl')
+        self.FLOW_FILE = self.working_directory.path_of('lille.rou.xml')
+        self.DETECTORS_FILE = self.working_directory.path_of('lille_detectors.add.xml')
         self.TL_JUNCTIONS = self.get_tl_junctions()
         self.EDGES_TO_TL = self.get_edges_to_tl()
         self.EDGES_FROM_TL = self.get_edges_from_tl()
         self.GRAPH = self.net_to_graph()
+        self.REACHABILITY = ReachabilityIndex(self.GRAPH, self.REACHABILITY_FILE, self.NET_FILE)
         self.flows = FlowBuilder()
         self.flows.add_v_type(id='car0')
         self.generate_flows(intensity * self.AD_HOC_COEFFICIENT_FOR_FLOWS, starting_time, ending_time, seed)
@@ -282,7 +288,7 @@ class LilleNetwork(Network):
         }
 
 
-    def run(self, traci_function, simulation_duration=None, gui=False, seed=None, no_warnings=True, nb_threads=1, time_to_teleport=150):
+    def run(self, traci_function, simulation_duration=None, gui=False, seed=None, no_warnings=True, nb_threads=1, time_to_teleport=150, warm_start=None, session=None):
         """
         Run the network.
         :param traci_function: The function using TraCi package and that can control infrastructures.
@@ -297,6 +303,10 @@ class LilleNetwork(Network):
         :type nb_threads: int
         :param time_to_teleport: The time for a vehicle to teleport when the network is blocked
         :type time_to_teleport: int
+        :param warm_start: If set, the traci function starts from the state of the network at the end of the warm-up of the WarmStart, loaded from its cache when the same simulation was already warmed up.
+        :type warm_start: WarmStart
+        :param session: If set, the simulation is run in the SUMO instance of the session, loaded with traci.load instead of being started and closed.
+        :type session: SimulationSession
         """
         try:
             if seed is not None:
@@ -308,11 +318,18 @@ class LilleNetwork(Network):
             if no_warnings:
                 no_warnings_text = '--no-warnings '
             if gui:
-                traci.start((self.FULL_LINE_COMMAND_GUI + f' --time-to-teleport {time_to_teleport} ' + threads_text + seed_text + no_warnings_text).split())
+                cmd = (self.FULL_LINE_COMMAND_GUI + f' --time-to-teleport {time_to_teleport} ' + threads_text + seed_text + no_warnings_text).split()
             else:
-                traci.start((self.FULL_LINE_COMMAND + f' --time-to-teleport {time_to_teleport} ' + threads_text + seed_text + no_warnings_text).split())
-            res = traci_function(traci)
-            traci.close()
+                cmd = (self.FULL_LINE_COMMAND + f' --time-to-teleport {time_to_teleport} ' + threads_text + seed_text + no_warnings_text).split()
+            if warm_start is not None:
+                cmd += warm_start.sumo_options()
+            self._start_simulation(traci, cmd, session)
+            try:
+                if warm_start is not None:
+                    warm_start.apply(traci, cmd)
+                res = traci_function(traci)
+            finally:
+                self._close_simulation(traci, session)
         except Exception as err:
             print("Error during simulation :", sys.exc_info()[0])
             print("OS error: {0}".format(err))
@@ -335,10 +352,27 @@ class LilleNetwork(Network):
         :rtype: FlowBuilder
         """
         random_generator = random.Random(seed)
-        forbid_exits = self.get_forbidden_exits()
-        forbid_start_edges = self.get_forbidden_starts()
-        tree = ET.parse(self.NET_FILE)
-        edges = [e.get('id') for e in tree.iter('edge')]
+        # The entries of the outgoing flows are drawn from their own generator, so the exits of the incoming flows are
+        # drawn from random_generator in the same sequence as when the entries were drawn from the global generator
+        exit_random_generator = random.Random(None if seed is None else f'{seed}:exits')
+        forbid_exits = set(self.get_forbidden_exits())
+        forbid_start_edges = set(self.get_forbidden_starts())
+        edges = self.NET_MODEL.declared_edge_ids()
+        # Valid exits of each entry and valid entries of each exit, so a drawn route is checked in constant time
+        valid_exits = {}
+        for entries in self.ENTRIES_EACH_FLOW.values():
+            for entry in entries:
+                if entry not in valid_exits:
+                    valid_exits[entry] = {exit for exit in edges if exit[0] != ':' and exit not in forbid_exits and self.REACHABILITY.has_path(entry, exit)}
+                    if not valid_exits[entry]:
+                        raise ValueError(f"No exit can be reached from entry {entry}.")
+        valid_entries = {}
+        for exits in self.EXITS_EACH_FLOW.values():
+            for exit in exits:
+                if exit not in valid_entries:
+                    valid_entries[exit] = {entry for entry in edges if entry[0] != ':' and entry not in forbid_start_edges and self.REACHABILITY.has_path(entry, exit)}
+                    if not valid_entries[exit]:
+                        raise ValueError(f"Exit {exit} can't be reached from any entry.")
         hours = [3600 * i for i in range(ending_time + 1 - starting_time)]
         cpt = 0
         for time in range(len(self.PROPORTIONS_TO_TIME[starting_time:ending_time])):
@@ -347,82 +381,61 @@ class LilleNetwork(Network):
             # From outside to Lille
             for flow in self.FLOWS_ENTRIES:
                 for entry in self.ENTRIES_EACH_FLOW[flow]:
-                    c = 0
-                    while c < self.NB_ROUTES_EACH_FLOW:
+                    for _ in range(self.NB_ROUTES_EACH_FLOW):
                         exit = random_generator.choices(edges)[0]
-                        if exit[0] != ':' and nx.has_path(self.GRAPH, entry, exit) and exit not in forbid_exits:
-                            freq = int((self.FLOWS_ENTRIES[flow] * self.PROPORTIONS_TO_TIME[current_time] * self.ENTRIES_EACH_FLOW[flow][entry]) // self.NB_ROUTES_EACH_FLOW)
-                            freq *= intensity
-                            total_ratio += freq
-                            if freq == 0:
-                                freq = 1
-                            self.flows.add_flow(id=f"{cpt}",
-                                                begin=hours[time],
-                                                end=hours[time+1],
-                                                from_edge=entry,
-                                                to_edge=exit,
-                                                frequency=freq,
-                                                v_type='car0',
-                                                distribution='binomial')
-                            c += 1
-                            cpt += 1
+                        while exit not in valid_exits[entry]:
+                            exit = random_generator.choices(edges)[0]
+                        freq = int((self.FLOWS_ENTRIES[flow] * self.PROPORTIONS_TO_TIME[current_time] * self.ENTRIES_EACH_FLOW[flow][entry]) // self.NB_ROUTES_EACH_FLOW)
+                        freq *= intensity
+                        total_ratio += freq
+                        if freq == 0:
+                            freq = 1
+                        self.flows.add_flow(id=f"{cpt}",
+                                            begin=hours[time],
+                                            end=hours[time+1],
+                                            from_edge=entry,
+                                            to_edge=exit,
+                                            frequency=freq,
+                                            v_type='car0',
+                                            distribution='binomial')
+                        cpt += 1
             # From Lille to outside
             for flow in self.FLOWS_EXITS:
                 for exit in self.EXITS_EACH_FLOW[flow]:
-                    c = 0
-                    while c < self.NB_ROUTES_EACH_FLOW:
-                        entry = random.choices(edges)[0]
-                        while str(entry) in forbid_start_edges:
-                            entry = random.choices(edges)[0]
-                        if entry[0] != ':' and nx.has_path(self.GRAPH, entry, exit):
-                            freq = int((self.FLOWS_EXITS[flow] * self.PROPORTIONS_TO_TIME[time] * self.EXITS_EACH_FLOW[flow][exit]) // self.NB_ROUTES_EACH_FLOW)
-                            freq *= intensity
-                            total_ratio += freq
-                            if freq == 0:
-                                freq = 1
-                            self.flows.add_flow(id=f"{cpt}",
-                                                begin=hours[time],
-                                                end=hours[time+1],
-                                                from_edge=entry,
-                                                to_edge=exit,
-                                                frequency=freq,
-                                                v_type='car0',
-                                                distribution='binomial')
-                            c += 1
-                            cpt += 1
+                    for _ in range(self.NB_ROUTES_EACH_FLOW):
+                        entry = exit_random_generator.choices(edges)[0]
+                        while entry not in valid_entries[exit]:
+                            entry = exit_random_generator.choices(edges)[0]
+                        freq = int((self.FLOWS_EXITS[flow] * self.PROPORTIONS_TO_TIME[time] * self.EXITS_EACH_FLOW[flow][exit]) // self.NB_ROUTES_EACH_FLOW)
+                        freq *= intensity
+                        total_ratio += freq
+                        if freq == 0:
+                            freq = 1
+                        self.flows.add_flow(id=f"{cpt}",
+                                            begin=hours[time],
+                                            end=hours[time+1],
+                                            from_edge=entry,
+                                            to_edge=exit,
+                                            frequency=freq,
+                                            v_type='car0',
+                                            distribution='binomial')
+                        cpt += 1
         self.flows.build({'routes': self.FLOW_FILE})
         return self.flows
 
 
     def generate_config_file(self):
         """
-        Create a new config file for the bologna network.
+        Create a new config file for the lille network, in the working directory.
         """
-        if os.path.isfile(self.NEW_CONFIG_FILE):
-            os.remove(self.NEW_CONFIG_FILE)
-        with open(self.CONFIG_FILE, 'r') as config_file:
-            with open(self.NEW_CONFIG_FILE, 'a') as new_config_file:
-                line = config_file.readline()
-                while line != '':
-                    if line != '\n' and line.split()[0] == '<route-files':
-                        first_part = line.split('.')[0]
-                        second_part = line.split('.')[1:]
-                        first_part = ['"'.join(first_part.split('"')[:-1] + [f"lille_{self.exp_name}"])]
-                        new_line = '.'.join(first_part + second_part)
-                        new_config_file.write(new_line)
-                    else:
-                        new_config_file.write(line)
-                    line = config_file.readline()
+        self.working_directory.copy_config(self.CONFIG_FILE, 'run.sumocfg', route_file=self.FLOW_FILE, additional_files=[self.DETECTORS_FILE])
 
 
     def clean_files(self):
         """
         Delete all the files generated by the instance.
         """
-        if os.path.isfile(self.NEW_CONFIG_FILE):
-            os.remove(self.NEW_CONFIG_FILE)
-        if os.path.isfile(self.FLOW_FILE):
-            os.remove(self.FLOW_FILE)
+        self.working_directory.cleanup()
 
 
 
@@ -436,13 +449,12 @@ class LilleNetwork(Network):
         :return: The flows
         :rtype: FlowBuilder
         """
-        tree = ET.parse(self.NET_FILE)
-        edges = [e.get('id') for e in tree.iter('edge')]
+        edges = self.NET_MODEL.declared_edge_ids()
         c = 0
         forbid_exits = self.get_forbidden_exits()
         while c < n:
             couple = random.choices(edges, k=2)
-            if nx.has_path(self.GRAPH, couple[0], couple[1]) and couple[0][0] != ':' and couple[1][0] != ':' and couple[1] not in forbid_exits:
+            if couple[0][0] != ':' and couple[1][0] != ':' and couple[1] not in forbid_exits and self.REACHABILITY.has_path(couple[0], couple[1]):
                 self.flows.add_flow(id=f"{couple[0]}-{couple[1]}",
                                     end=3600,
                                     from_edge=couple[0],
@@ -460,13 +472,7 @@ class LilleNetwork(Network):
         :return: The list of all junctions managed by a traffic light
         :rtype: list
         """
-        tree = ET.parse(self.NET_FILE)
-        junctions = tree.iter('junction')
-        traffic_lights = []
-        for junction in junctions:
-            if junction.get('type') == 'traffic_light':
-                traffic_lights.append(junction)
-        return traffic_lights
+        return self.NET_MODEL.traffic_light_junctions()
 
     def get_edges_to_tl(self):
         """
@@ -474,14 +480,11 @@ class LilleNetwork(Network):
         :return: The edges ending into each traffic light node
         :rtype: dict
         """
-        tree = ET.parse(self.NET_FILE)
-        edges = tree.iter('edge')
         tl_to_edges = {}
         for junction in self.TL_JUNCTIONS:
             tl_to_edges[junction.get('id')] = []
-        for edge in edges:
-            if edge.get('to') in tl_to_edges:
-                tl_to_edges[edge.get('to')].append(edge)
+        for edge in self.NET_MODEL.edges_to_junctions(tl_to_edges):
+            tl_to_edges[edge.get('to')].append(edge)
         return tl_to_edges
 
     def get_edges_from_tl(self):
@@ -490,14 +493,11 @@ class LilleNetwork(Network):
         :return: The edges strating from each traffic light node
         :rtype: dict
         """
-        tree = ET.parse(self.NET_FILE)
-        edges = tree.iter('edge')
         tl_to_edges = {}
         for junction in self.TL_JUNCTIONS:
             tl_to_edges[junction.get('id')] = []
-        for edge in edges:
-            if edge.get('from') in tl_to_edges:
-                tl_to_edges[edge.get('from')].append(edge)
+        for edge in self.NET_MODEL.edges_from_junctions(tl_to_edges):
+            tl_to_edges[edge.get('from')].append(edge)
         return tl_to_edges
 
 
@@ -513,13 +513,7 @@ class LilleNetwork(Network):
             while id != "":
                 nodes_id.append(id)
                 id = f.readline()[:-1]
-        tree = ET.parse(self.NET_FILE)
-        edges = tree.iter('edge')
-        entries_id = []
-        for edge in edges:
-            if edge.get('from') in nodes_id:
-                entries_id.append(edge)
-        return entries_id
+        return self.NET_MODEL.edges_from_junctions(nodes_id)
 
     def get_exits(self):
         """
@@ -533,13 +527,7 @@ class LilleNetwork(Network):
             while id != "":
                 nodes_id.append(id)
                 id = f.readline()[:-1]
-        tree = ET.parse(self.NET_FILE)
-        edges = tree.iter('edge')
-        exits_id = []
-        for edge in edges:
-            if edge.get('to') in nodes_id:
-                exits_id.append(edge)
-        return exits_id
+        return self.NET_MODEL.edges_to_junctions(nodes_id)
 
     def get_forbidden_exits(self):
         """
@@ -575,15 +563,7 @@ class LilleNetwork(Network):
         :return: The graph representation of the network
         :rtype: networkx.Graph
         """
-        G = nx.DiGraph()
-        tree = ET.parse(self.NET_FILE)
-        edges = tree.iter('edge')
-        for edge in edges:
-            G.add_node(edge.get('id'))
-        connections = tree.iter('connection')
-        for connection in connections:
-            G.add_edge(connection.get('from'), connection.get('to'))
-        return G
+        return self.NET_MODEL.graph()
 
 
     def generate_detectors(self):
@@ -3115,7 +3095,7 @@ class LilleNetwork(Network):
 
 
 
-        det.build({'detectors': os.path.join(self.THIS_FILE_PATH,'lille/lille_detectors.add.xml')})
+        det.build({'detectors': self.DETECTORS_FILE})
         return det
 
     DETECTORS_JoinedS_1 = {
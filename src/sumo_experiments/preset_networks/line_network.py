@@ -1,5 +1,4 @@
 import os
-import random
 import numpy as np
 from sumo_experiments.components import InfrastructureBuilder, FlowBuilder, DetectorBuilder
 import libsumo as traci
@@ -41,7 +40,8 @@ class LineNetwork(ArtificialNetwork):
                  coeff_matrix=None,
                  boolean_detectors_length=20,
                  saturation_detectors_length=20,
-                 saturation_detectors_position=0
+                 saturation_detectors_position=0,
+                 working_directory=None
                  ):
         """
         Init of class.
@@ -79,8 +79,10 @@ class LineNetwork(ArtificialNetwork):
         :type boolean_detectors_length: int
         :param saturation_detectors_length: The scope size of the saturation detectors (in meters)
         :type saturation_detectors_length: int
+        :param working_directory: The directory where the simulation files are written. Can be a path, a WorkingDirectory, or None for a new temporary directory.
+        :type working_directory: str or WorkingDirectory
         """
-        super().__init__(f'line_network_{random.randint(1, 1000000)}')
+        super().__init__('line_network', working_directory)
         if nb_intersections < 2:
             raise ValueError('nb_intersections must be 2 or more.')
         if nb_lanes_main < 1:
@@ -111,9 +113,6 @@ class LineNetwork(ArtificialNetwork):
         infrastructures.build(self.file_names)
         flows.build(self.file_names)
         detectors.build(self.file_names)
-        # Using netconvert to create the network
-        cmd = f'$SUMO_HOME/bin/netconvert -n {self.file_names["nodes"]} -e {self.file_names["edges"]} -x {self.file_names["connections"]} -i {self.file_names["trafic_light_programs"]} -t {self.file_names["types"]} -o {self.file_names["network"]} --no-warnings'
-        os.system(cmd)
 
 
 
@@ -0,0 +1,297 @@
+import os
+import pickle
+import hashlib
+import numpy as np
+import networkx as nx
+import xml.etree.ElementTree as ET
+
+
+class NetModel:
+    """
+    Compact model of a SUMO network file, read in one streaming pass.
+    Junctions, edges and connections are stored in arrays, in the order of the file :
+    - Junctions : ids, types and coordinates (NaN when the junction has no coordinates).
+    - Edges : ids and indexes of the from and to junctions (-1 when the edge has no such junction, like internal edges).
+    The first nb_declared_edges edges are the ones declared in the file.
+    - Connections : indexes of the from and to edges, lanes, and index of the controlling traffic light (-1 if none).
+    The connections are also stored as an adjacency between edges in CSR format (successors_indptr, successors).
+    The model can be pickled in a cache file. The cache is used if the network file has the same size and modification
+    time, or the same content hash. Models loaded in a process are kept in memory and shared.
+    """
+
+    VERSION = 1
+
+    _MODELS = {}
+
+    def __init__(self, net_file):
+        """
+        Init of class. Reads the network file.
+        :param net_file: The path of the SUMO network file
+        :type net_file: str
+        """
+        self.net_file = os.path.abspath(net_file)
+        junction_ids, junction_types, junction_xy = [], [], []
+        edge_ids, edge_ends = [], []
+        connections = []
+        tl_ids = []
+        tl_positions = {}
+        context = ET.iterparse(self.net_file, events=('start', 'end'))
+        _, root = next(context)
+        depth = 1
+        for event, element in context:
+            if event == 'start':
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            tag = element.tag
+            if tag == 'junction':
+                junction_ids.append(element.get('id'))
+                junction_types.append(element.get('type'))
+                x, y = element.get('x'), element.get('y')
+                junction_xy.append((float(x), float(y)) if x is not None and y is not None else (np.nan, np.nan))
+            elif tag == 'edge':
+                edge_ids.append(element.get('id'))
+                edge_ends.append((element.get('from'), element.get('to')))
+            elif tag == 'connection':
+                tl_id = element.get('tl')
+                if tl_id is not None and tl_id not in tl_positions:
+                    tl_positions[tl_id] = len(tl_ids)
+                    tl_ids.append(tl_id)
+                connections.append((element.get('from'), element.get('to'), element.get('fromLane'), element.get('toLane'), tl_positions.get(tl_id, -1)))
+            root.clear()
+        # Edges only referenced by connections are added after the nb_declared_edges edges of the file
+        self.nb_declared_edges = len(edge_ids)
+        edge_positions = {edge_id: i for i, edge_id in enumerate(edge_ids)}
+        for connection in connections:
+            for edge_id in connection[:2]:
+                if edge_id not in edge_positions:
+                    edge_positions[edge_id] = len(edge_ids)
+                    edge_ids.append(edge_id)
+                    edge_ends.append((None, None))
+        self.junction_ids = junction_ids
+        self.junction_types = junction_types
+        self.junction_xy = np.array(junction_xy, dtype=np.float64).reshape(-1, 2)
+        junction_positions = {junction_id: i for i, junction_id in enumerate(junction_ids)}
+        self.edge_ids = edge_ids
+        self.edge_from = np.array([junction_positions.get(ends[0], -1) for ends in edge_ends], dtype=np.int32)
+        self.edge_to = np.array([junction_positions.get(ends[1], -1) for ends in edge_ends], dtype=np.int32)
+        self.tl_ids = tl_ids
+        self._positions = edge_positions
+        self.connection_from = np.array([edge_positions[connection[0]] for connection in connections], dtype=np.int32)
+        self.connection_to = np.array([edge_positions[connection[1]] for connection in connections], dtype=np.int32)
+        self.connection_from_lane = np.array([int(connection[2]) if connection[2] is not None else -1 for connection in connections], dtype=np.int32)
+        self.connection_to_lane = np.array([int(connection[3]) if connection[3] is not None else -1 for connection in connections], dtype=np.int32)
+        self.connection_tl = np.array([connection[4] for connection in connections], dtype=np.int32)
+        self._build_successors()
+
+    @classmethod
+    def load(cls, net_file, cache_file=None):
+        """
+        Return the model of a network file, from memory, from the cache file or by reading the network file.
+        :param net_file: The path of the SUMO network file
+        :type net_file: str
+        :param cache_file: The file where the model is pickled. If None, the model is only kept in memory.
+        :type cache_file: str
+        :return: The model of the network
+        :rtype: NetModel
+        """
+        net_file = os.path.abspath(net_file)
+        stat = os.stat(net_file)
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        model = cls._MODELS.get(net_file)
+        if model is not None and model.stamp == stamp:
+            return model
+        model = cls._load_cache(cache_file, net_file, stamp)
+        if model is None:
+            model = cls(net_file)
+            model.stamp = stamp
+            model.content_hash = cls._hash(net_file)
+            model._save_cache(cache_file)
+        cls._MODELS[net_file] = model
+        return model
+
+    def edge_index(self, edge_id):
+        """
+        Return the index of an edge in the edge arrays.
+        :param edge_id: The id of the edge
+        :type edge_id: str
+        :return: The index of the edge
+        :rtype: int
+        """
+        if getattr(self, '_positions', None) is None:
+            self._positions = {edge_id: i for i, edge_id in enumerate(self.edge_ids)}
+        return self._positions[edge_id]
+
+    def graph(self):
+        """
+        Return the graph of the network where edges are the nodes, and connections are the links.
+        :return: The graph representation of the network
+        :rtype: networkx.DiGraph
+        """
+        graph = nx.DiGraph()
+        graph.add_nodes_from(self.edge_ids)
+        graph.add_edges_from(zip([self.edge_ids[i] for i in self.connection_from], [self.edge_ids[i] for i in self.connection_to]))
+        return graph
+
+    def declared_edge_ids(self):
+        """
+        Return the ids of the edges declared in the file, internal edges included.
+        :return: The ids of the edges
+        :rtype: list
+        """
+        return self.edge_ids[:self.nb_declared_edges]
+
+    def traffic_light_junctions(self):
+        """
+        Return the junctions of type 'traffic_light'.
+        :return: The junctions, as XML elements
+        :rtype: list
+        """
+        return [self.junction_element(i) for i, junction_type in enumerate(self.junction_types) if junction_type == 'traffic_light']
+
+    def edges_from_junctions(self, junction_ids):
+        """
+        Return the declared edges starting from some junctions.
+        :param junction_ids: The ids of the junctions
+        :type junction_ids: iterable
+        :return: The edges, as XML elements, in the order of the file
+        :rtype: list
+        """
+        junction_ids = set(junction_ids)
+        junctions = [i for i, junction_id in enumerate(self.junction_ids) if junction_id in junction_ids]
+        return [self.edge_element(i) for i in np.flatnonzero(np.isin(self.edge_from[:self.nb_declared_edges], junctions))]
+
+    def edges_to_junctions(self, junction_ids):
+        """
+        Return the declared edges ending in some junctions.
+        :param junction_ids: The ids of the junctions
+        :type junction_ids: iterable
+        :return: The edges, as XML elements, in the order of the file
+        :rtype: list
+        """
+        junction_ids = set(junction_ids)
+        junctions = [i for i, junction_id in enumerate(self.junction_ids) if junction_id in junction_ids]
+        return [self.edge_element(i) for i in np.flatnonzero(np.isin(self.edge_to[:self.nb_declared_edges], junctions))]
+
+    def junction_coordinates(self):
+        """
+        Return the coordinates of the junctions that have coordinates.
+        :return: The (x, y) coordinates of each junction
+        :rtype: dict
+        """
+        return {junction_id: (float(xy[0]), float(xy[1])) for junction_id, xy in zip(self.junction_ids, self.junction_xy) if not np.isnan(xy[0])}
+
+    def edge_endpoints(self):
+        """
+        Return the from and to junctions of the edges that have both.
+        :return: The (from, to) junctions of each edge
+        :rtype: dict
+        """
+        return {self.edge_ids[i]: (self.junction_ids[self.edge_from[i]], self.junction_ids[self.edge_to[i]])
+                for i in np.flatnonzero((self.edge_from >= 0) & (self.edge_to >= 0))}
+
+    def controlled_links(self):
+        """
+        Return the connections controlled by each traffic light.
+        :return: The list of (from edge, to edge) couples of each traffic light
+        :rtype: dict
+        """
+        links = {tl_id: [] for tl_id in self.tl_ids}
+        for i in np.flatnonzero(self.connection_tl >= 0):
+            links[self.tl_ids[self.connection_tl[i]]].append((self.edge_ids[self.connection_from[i]], self.edge_ids[self.connection_to[i]]))
+        return links
+
+    def junction_element(self, index):
+        """
+        Return a junction as an XML element, with its id, type and coordinates.
+        :param index: The index of the junction
+        :type index: int
+        :return: The junction
+        :rtype: xml.etree.ElementTree.Element
+        """
+        attributes = {'id': self.junction_ids[index]}
+        if self.junction_types[index] is not None:
+            attributes['type'] = self.junction_types[index]
+        if not np.isnan(self.junction_xy[index, 0]):
+            attributes['x'] = repr(float(self.junction_xy[index, 0]))
+            attributes['y'] = repr(float(self.junction_xy[index, 1]))
+        return ET.Element('junction', attributes)
+
+    def edge_element(self, index):
+        """
+        Return an edge as an XML element, with its id and its from and to junctions.
+        :param index: The index of the edge
+        :type index: int
+        :return: The edge
+        :rtype: xml.etree.ElementTree.Element
+        """
+        attributes = {'id': self.edge_ids[index]}
+        if self.edge_from[index] >= 0:
+            attributes['from'] = self.junction_ids[self.edge_from[index]]
+        if self.edge_to[index] >= 0:
+            attributes['to'] = self.junction_ids[self.edge_to[index]]
+        return ET.Element('edge', attributes)
+
+    def _build_successors(self):
+        """
+        Build the CSR adjacency between edges from the connections, without duplicates.
+        """
+        pairs = np.unique(np.stack([self.connection_from, self.connection_to], axis=1), axis=0) if len(self.connection_from) else np.zeros((0, 2), dtype=np.int32)
+        counts = np.bincount(pairs[:, 0], minlength=len(self.edge_ids))
+        self.successors_indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.successors = pairs[:, 1].astype(np.int32)
+
+    @classmethod
+    def _load_cache(cls, cache_file, net_file, stamp):
+        """
+        Load the model from the cache file, or return None if there is no valid cache.
+        """
+        if cache_file is None or not os.path.isfile(cache_file):
+            return None
+        try:
+            with open(cache_file, 'rb') as file:
+                model = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        if not isinstance(model, cls) or getattr(model, 'version', None) != cls.VERSION or model.net_file != net_file:
+            return None
+        if model.stamp != stamp:
+            if model.content_hash != cls._hash(net_file):
+                return None
+            model.stamp = stamp
+            model._save_cache(cache_file)
+        return model
+
+    def _save_cache(self, cache_file):
+        """
+        Pickle the model in the cache file. Nothing is saved if the directory is read-only.
+        """
+        if cache_file is None:
+            return
+        self.version = self.VERSION
+        tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_file, 'wb') as file:
+                pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_positions', None)
+        return state
+
+    @staticmethod
+    def _hash(net_file):
+        """
+        Return the SHA-256 of a file.
+        """
+        digest = hashlib.sha256()
+        with open(net_file, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
 
+from sumo_experiments.traci_util.subscriptions import SubscriptionCollector
+
 
 class Network(ABC):
     """
@@ -7,7 +9,7 @@ class Network(ABC):
     """
 
     @abstractmethod
-    def run(self, traci_function, gui=False, seed=None, no_warnings=True, nb_threads=1, time_to_teleport=150):
+    def run(self, traci_function, gui=False, seed=None, no_warnings=True, nb_threads=1, time_to_teleport=150, warm_start=None, session=None):
         """
         Launch an SUMO simulation with the network configuration.
         First build the configuration files and then launch SUMO.
@@ -26,6 +28,10 @@ class Network(ABC):
         :type nb_threads: int
         :param time_to_teleport: The time for a vehicle to teleport when the network is blocked
         :type time_to_teleport: int
+        :param warm_start: If set, the traci function starts from the state of the network at the end of the warm-up of the WarmStart, loaded from its cache when the same simulation was already warmed up.
+        :type warm_start: WarmStart
+        :param session: If set, the simulation is run in the SUMO instance of the session, loaded with traci.load instead of being started and closed.
+        :type session: SimulationSession
         """
         pass
 
@@ -34,3 +40,33 @@ class Network(ABC):
         """
         Clean all simulation files.
         """
+
+    def _start_simulation(self, traci, cmd, session=None):
+        """
+        Start SUMO, or load the simulation in the SUMO instance of the session. The collector of a previous simulation
+        is detached, so the users of this simulation get a new SubscriptionCollector.
+        :param traci: The traci module
+        :type traci: module
+        :param cmd: The SUMO command line, with the binary
+        :type cmd: list
+        :param session: The session running the simulation, or None
+        :type session: SimulationSession
+        """
+        SubscriptionCollector.detach(traci)
+        if session is not None:
+            session.start(traci, cmd)
+        else:
+            traci.start(cmd)
+
+    def _close_simulation(self, traci, session=None):
+        """
+        Close SUMO, unless it is kept alive by the session, and detach the SubscriptionCollector of the simulation.
+        Must be called even if the simulation failed.
+        :param traci: The traci module
+        :type traci: module
+        :param session: The session running the simulation, or None
+        :type session: SimulationSession
+        """
+        SubscriptionCollector.detach(traci)
+        if session is None:
+            traci.close()
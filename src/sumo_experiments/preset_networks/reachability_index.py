@@ -0,0 +1,109 @@
+import os
+import pickle
+import hashlib
+import networkx as nx
+
+
+class ReachabilityIndex:
+    """
+    Answer nx.has_path queries on a directed graph in constant time.
+    The graph is reduced to its strongly connected components, and for each component the set of reachable components is
+    stored as a bitset in a bytes object, the bit of the component c being the bit c % 8 of the byte c // 8. A node
+    reaches another one if the bit of the component of the target is set in the bitset of the component of the source,
+    which is read from one byte. As with nx.has_path, a node always reaches itself.
+    The index can be saved in a cache file, next to the file the graph was built from. The cache is used only if this file
+    and the nodes of the graph didn't change.
+    """
+
+    VERSION = 2
+
+    def __init__(self, graph, cache_file=None, source_file=None):
+        """
+        Init of class
+        :param graph: The directed graph
+        :type graph: networkx.DiGraph
+        :param cache_file: The file where the index is saved. If None, the index is not saved.
+        :type cache_file: str
+        :param source_file: The file the graph was built from. The cache is invalidated when it changes.
+        :type source_file: str
+        """
+        self.nodes = list(graph.nodes)
+        self.cache_file = cache_file
+        self.key = self._key(source_file)
+        if not self._load():
+            self._build(graph)
+            self._save()
+        self.positions = {node: i for i, node in enumerate(self.nodes)}
+
+    def has_path(self, source, target):
+        """
+        Return True if there is a path from source to target.
+        :param source: The source node
+        :type source: str
+        :param target: The target node
+        :type target: str
+        :return: True if target is reachable from source
+        :rtype: bool
+        """
+        component = self.components[self.positions[target]]
+        return (self.reach[self.components[self.positions[source]]][component >> 3] >> (component & 7)) & 1 == 1
+
+    def _key(self, source_file):
+        """
+        Return the key identifying the graph, from the source file and the nodes.
+        """
+        digest = hashlib.sha256()
+        digest.update(str(self.VERSION).encode())
+        if source_file is not None and os.path.isfile(source_file):
+            stat = os.stat(source_file)
+            digest.update(f'{os.path.abspath(source_file)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+        digest.update('\n'.join(map(str, self.nodes)).encode())
+        return digest.hexdigest()
+
+    def _build(self, graph):
+        """
+        Compute the components of the nodes and the reachable components of each component.
+        """
+        condensation = nx.condensation(graph)
+        mapping = condensation.graph['mapping']
+        self.components = [mapping[node] for node in self.nodes]
+        nb_components = condensation.number_of_nodes()
+        reach = [0] * nb_components
+        for component in reversed(list(nx.topological_sort(condensation))):
+            bits = 1 << component
+            for successor in condensation.successors(component):
+                bits |= reach[successor]
+            reach[component] = bits
+        self.reach = [bits.to_bytes((nb_components + 7) // 8, 'little') for bits in reach]
+
+    def _load(self):
+        """
+        Load the index from the cache file, and return True if it matches the graph.
+        """
+        if self.cache_file is None or not os.path.isfile(self.cache_file):
+            return False
+        try:
+            with open(self.cache_file, 'rb') as file:
+                cache = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return False
+        if cache.get('key') != self.key:
+            return False
+        self.components = cache['components']
+        self.reach = cache['reach']
+        return True
+
+    def _save(self):
+        """
+        Save the index in the cache file. Nothing is saved if the directory is read-only.
+        """
+        if self.cache_file is None:
+            return
+        tmp_file = f'{self.cache_file}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_file, 'wb') as file:
+                pickle.dump({'key': self.key, 'components': self.components, 'reach': self.reach}, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
@@ -0,0 +1,128 @@
+import os
+import hashlib
+import xml.etree.ElementTree as ET
+
+
+class SimulationSession:
+    """
+    SUMO simulation kept alive between the runs of the networks.
+    The first run starts SUMO with traci.start, and the next runs switch to their seed, route files and additional
+    files with traci.load, instead of starting and closing SUMO for each run. SUMO is closed by the close method, or at
+    the end of a with statement. A run with another binary (sumo-gui instead of sumo) starts SUMO again.
+    The session also holds the network-level caches of the simulation (edges, detectors...), computed once with TraCI
+    and shared by the runs. The caches are kept as long as the network file and the additional files of the runs are
+    the same, and cleared when they change. They are read with SimulationSession.get(traci).cached(name, function).
+    """
+
+    ATTRIBUTE = '_sumo_experiments_session'
+    NET_OPTIONS = {'-n', '--net-file'}
+    ADDITIONAL_OPTIONS = {'-a', '--additional-files'}
+    CONFIG_OPTIONS = {'-c', '--configuration-file'}
+
+    def __init__(self):
+        """
+        Init of class
+        """
+        self.traci = None
+        self.binary = None
+        self.topology_key = None
+        self.caches = {}
+        self.file_hashes = {}
+        self.nb_starts = 0
+        self.nb_loads = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    @classmethod
+    def get(cls, traci):
+        """
+        Return the session of a simulation, or None if the simulation was not started by a session.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        :return: The session of the simulation
+        :rtype: SimulationSession
+        """
+        return getattr(traci, cls.ATTRIBUTE, None)
+
+    def start(self, traci, cmd):
+        """
+        Start a run of the session : SUMO is started the first time, and the simulation is loaded the next times.
+        :param traci: The traci module
+        :type traci: module
+        :param cmd: The SUMO command line, with the binary
+        :type cmd: list
+        """
+        if self.traci is traci and self.binary == cmd[0]:
+            traci.load(cmd[1:])
+            self.nb_loads += 1
+        else:
+            self.close()
+            traci.start(cmd)
+            self.nb_starts += 1
+            self.traci = traci
+            self.binary = cmd[0]
+            setattr(traci, self.ATTRIBUTE, self)
+        topology_key = self._topology_key(cmd)
+        if topology_key != self.topology_key:
+            self.caches = {}
+            self.topology_key = topology_key
+
+    def cached(self, name, function):
+        """
+        Return a value of the network-level cache, computed by the function the first time it is asked.
+        The value must only depend on the network file and on the additional files, and must not be modified.
+        :param name: The name of the value
+        :type name: str
+        :param function: The function computing the value, called without argument
+        :type function: function
+        :return: The value
+        """
+        if name not in self.caches:
+            self.caches[name] = function()
+        return self.caches[name]
+
+    def close(self):
+        """
+        Close SUMO and clear the caches.
+        """
+        if self.traci is not None:
+            self.traci.close()
+            setattr(self.traci, self.ATTRIBUTE, None)
+        self.traci = None
+        self.binary = None
+        self.topology_key = None
+        self.caches = {}
+
+    def _topology_key(self, cmd):
+        """
+        Return the hashes of the network file and of the additional files of a command line.
+        """
+        files = []
+        options = iter(cmd[1:])
+        for option in options:
+            if option in self.NET_OPTIONS or option in self.ADDITIONAL_OPTIONS:
+                files += next(options, '').split(',')
+            elif option in self.CONFIG_OPTIONS:
+                config_file = next(options, '')
+                directory = os.path.dirname(os.path.abspath(config_file))
+                for element in ET.parse(config_file).getroot().iter('input'):
+                    for input_option in element:
+                        if input_option.tag in ('net-file', 'additional-files') and input_option.get('value'):
+                            files += [os.path.join(directory, file) for file in input_option.get('value').split(',')]
+        return tuple(self._file_hash(file) for file in files)
+
+    def _file_hash(self, file):
+        """
+        Return the hash of the content of a file, computed again only if the file was modified.
+        """
+        stat = os.stat(file)
+        signature = (os.path.abspath(file), stat.st_size, stat.st_mtime_ns)
+        if signature not in self.file_hashes:
+            with open(file, 'rb') as f:
+                self.file_hashes[signature] = hashlib.sha256(f.read()).hexdigest()
+        return self.file_hashes[signature]
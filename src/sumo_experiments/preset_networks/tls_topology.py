@@ -0,0 +1,223 @@
+import numpy as np
+
+
+class TLSTopology:
+    """
+    Compiled, immutable index of the traffic lights of a network and of their detectors, built once from
+    network.TLS_DETECTORS and network.TL_IDS, and read by the strategies instead of the nested dicts.
+    Traffic lights and detectors get integer ids : tl_ids[i] is the traffic light i, and detectors[j] the detector j.
+    Each (traffic light, phase) is a row, the rows of the traffic light i being phase_offsets[i] to
+    phase_offsets[i + 1] in the order of TLS_DETECTORS. For each type of detector ('boolean', 'saturation',
+    'numerical', 'exit'), the detectors of the rows are stored as CSR arrays : the detectors of the row r are
+    indices[type][indptr[type][r]:indptr[type][r + 1]].
+    For each phase, the detectors of the green lanes (green), of the other phases (others) and of the red lanes (red,
+    the detectors of the other phases that are not in the phase) are precomputed as NumPy arrays of detector ids, as
+    well as the next phase and the cycle of phases starting from each phase.
+    The topology of a network is returned by TLSTopology.of(network), and built again only if TLS_DETECTORS or TL_IDS
+    are replaced. The arrays are read-only and must not be modified.
+    """
+
+    ATTRIBUTE = '_sumo_experiments_tls_topology'
+    TYPES = ('boolean', 'saturation', 'numerical', 'exit')
+
+    def __init__(self, tls_detectors, tl_ids=None):
+        """
+        Init of class
+        :param tls_detectors: The detectors of each phase of each intersection, as network.TLS_DETECTORS
+        :type tls_detectors: dict
+        :param tl_ids: The ids of the traffic lights, as network.TL_IDS. The traffic lights of tls_detectors that are not in tl_ids are added after them.
+        :type tl_ids: list
+        """
+        self.tls_detectors = tls_detectors
+        self.source_tl_ids = tl_ids
+        tl_ids = list(tl_ids) if tl_ids is not None else []
+        self.tl_ids = tuple(tl_ids + [tl_id for tl_id in tls_detectors if tl_id not in set(tl_ids)])
+        self.tl_index = {tl_id: i for i, tl_id in enumerate(self.tl_ids)}
+        self.phases = {tl_id: tuple(tls_detectors.get(tl_id, {})) for tl_id in self.tl_ids}
+        self.phase_offsets = self._read_only(np.cumsum([0] + [len(self.phases[tl_id]) for tl_id in self.tl_ids]))
+        self.rows = {tl_id: {phase: int(self.phase_offsets[i]) + position for position, phase in enumerate(self.phases[tl_id])}
+                     for i, tl_id in enumerate(self.tl_ids)}
+        detectors = {}
+        for tl_id in self.tl_ids:
+            for phase in self.phases[tl_id]:
+                for detector_type in self.TYPES:
+                    for detector in tls_detectors[tl_id][phase].get(detector_type, []):
+                        detectors.setdefault(detector, len(detectors))
+        self.detectors = tuple(detectors)
+        self.detector_index = detectors
+        self.indptr = {}
+        self.indices = {}
+        for detector_type in self.TYPES:
+            indptr = [0]
+            indices = []
+            for tl_id in self.tl_ids:
+                for phase in self.phases[tl_id]:
+                    indices += [detectors[detector] for detector in tls_detectors[tl_id][phase].get(detector_type, [])]
+                    indptr.append(len(indices))
+            self.indptr[detector_type] = self._read_only(np.array(indptr, dtype=np.int64))
+            self.indices[detector_type] = self._read_only(np.array(indices, dtype=np.int64))
+        self._build_phase_tables()
+
+    @classmethod
+    def of(cls, network):
+        """
+        Return the topology of a network, built the first time it is asked and kept on the network.
+        :param network: The network
+        :type network: src.sumo_experiments.Network
+        :return: The topology of the network
+        :rtype: TLSTopology
+        """
+        topology = getattr(network, cls.ATTRIBUTE, None)
+        if topology is None or topology.tls_detectors is not network.TLS_DETECTORS or topology.source_tl_ids is not network.TL_IDS:
+            topology = cls(network.TLS_DETECTORS, network.TL_IDS)
+            setattr(network, cls.ATTRIBUTE, topology)
+        return topology
+
+    def green(self, tl_id, phase, detector_type):
+        """
+        Return the detectors of a type of the green lanes of a phase, empty if the phase has no detectors (yellow phase).
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :param phase: The phase
+        :type phase: int
+        :param detector_type: The type of the detectors ('boolean', 'saturation', 'numerical' or 'exit')
+        :type detector_type: str
+        :return: The ids of the detectors
+        :rtype: numpy.ndarray
+        """
+        return self._green[detector_type][tl_id].get(phase, self._empty)
+
+    def others(self, tl_id, phase, detector_type):
+        """
+        Return the detectors of a type of all the phases but one, without duplicates. If the phase has no detectors
+        (yellow phase), the detectors of all the phases are returned.
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :param phase: The phase
+        :type phase: int
+        :param detector_type: The type of the detectors ('boolean', 'saturation', 'numerical' or 'exit')
+        :type detector_type: str
+        :return: The ids of the detectors
+        :rtype: numpy.ndarray
+        """
+        return self._others[detector_type][tl_id].get(phase, self._all[detector_type][tl_id])
+
+    def red(self, tl_id, phase, detector_type):
+        """
+        Return the detectors of a type of the red lanes of a phase : the detectors of the other phases that are not
+        detectors of the phase. Empty if the phase has no detectors (yellow phase).
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :param phase: The phase
+        :type phase: int
+        :param detector_type: The type of the detectors ('boolean', 'saturation', 'numerical' or 'exit')
+        :type detector_type: str
+        :return: The ids of the detectors
+        :rtype: numpy.ndarray
+        """
+        return self._red[detector_type][tl_id].get(phase, self._empty)
+
+    def tl_detectors(self, tl_id, detector_type):
+        """
+        Return the detectors of a type of all the phases of a traffic light, without duplicates, in the order of
+        TLS_DETECTORS.
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :param detector_type: The type of the detectors ('boolean', 'saturation', 'numerical' or 'exit')
+        :type detector_type: str
+        :return: The ids of the detectors
+        :rtype: numpy.ndarray
+        """
+        return self._all[detector_type][tl_id]
+
+    def tl_detector_names(self, tl_id, detector_type):
+        """
+        Return the names of the detectors of a type of all the phases of a traffic light, as tl_detectors.
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :param detector_type: The type of the detectors ('boolean', 'saturation', 'numerical' or 'exit')
+        :type detector_type: str
+        :return: The names of the detectors
+        :rtype: tuple
+        """
+        return self._all_names[detector_type][tl_id]
+
+    def position(self, tl_id, phase):
+        """
+        Return the position of a phase in the phases of a traffic light, in the order of TLS_DETECTORS.
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :param phase: The phase, with detectors
+        :type phase: int
+        :return: The position of the phase
+        :rtype: int
+        """
+        return self.rows[tl_id][phase] - int(self.phase_offsets[self.tl_index[tl_id]])
+
+    def next_phase(self, tl_id, phase):
+        """
+        Return the phase following a phase in the order of TLS_DETECTORS, the last phase being followed by the first.
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :param phase: The phase, with detectors
+        :type phase: int
+        :return: The next phase
+        :rtype: int
+        """
+        return self._next_phases[tl_id][phase]
+
+    def cycle(self, tl_id, phase):
+        """
+        Return all the phases of a traffic light in the order of TLS_DETECTORS, starting from a phase.
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :param phase: The first phase, with detectors
+        :type phase: int
+        :return: The phases
+        :rtype: tuple
+        """
+        return self._cycles[tl_id][phase]
+
+    def _build_phase_tables(self):
+        """
+        Precompute the detectors of the green lanes, of the other phases and of the red lanes of each phase, and the next
+        phases and the cycles.
+        """
+        self._empty = self._read_only(np.zeros(0, dtype=np.int64))
+        self._green = {detector_type: {} for detector_type in self.TYPES}
+        self._others = {detector_type: {} for detector_type in self.TYPES}
+        self._red = {detector_type: {} for detector_type in self.TYPES}
+        self._all = {detector_type: {} for detector_type in self.TYPES}
+        self._all_names = {detector_type: {} for detector_type in self.TYPES}
+        for detector_type in self.TYPES:
+            indptr = self.indptr[detector_type]
+            indices = self.indices[detector_type]
+            for tl_id in self.tl_ids:
+                green = {phase: indices[indptr[row]:indptr[row + 1]] for phase, row in self.rows[tl_id].items()}
+                self._green[detector_type][tl_id] = green
+                all_detectors = list(dict.fromkeys(detector for phase in self.phases[tl_id] for detector in green[phase].tolist()))
+                self._all[detector_type][tl_id] = self._read_only(np.array(all_detectors, dtype=np.int64))
+                self._all_names[detector_type][tl_id] = tuple(self.detectors[detector] for detector in all_detectors)
+                others = {}
+                red = {}
+                for phase in self.phases[tl_id]:
+                    other_detectors = list(dict.fromkeys(detector for other in self.phases[tl_id] if other != phase for detector in green[other].tolist()))
+                    green_detectors = set(green[phase].tolist())
+                    others[phase] = self._read_only(np.array(other_detectors, dtype=np.int64))
+                    red[phase] = self._read_only(np.array([detector for detector in other_detectors if detector not in green_detectors], dtype=np.int64))
+                self._others[detector_type][tl_id] = others
+                self._red[detector_type][tl_id] = red
+        self._next_phases = {}
+        self._cycles = {}
+        for tl_id in self.tl_ids:
+            phases = self.phases[tl_id]
+            self._next_phases[tl_id] = {phase: phases[(position + 1) % len(phases)] for position, phase in enumerate(phases)}
+            self._cycles[tl_id] = {phase: phases[position:] + phases[:position] for position, phase in enumerate(phases)}
+
+    @staticmethod
+    def _read_only(array):
+        """
+        Make a NumPy array read-only, and return it.
+        """
+        array.setflags(write=False)
+        return array
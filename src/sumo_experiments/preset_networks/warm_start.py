@@ -0,0 +1,251 @@
+import os
+import hashlib
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class StateCache:
+    """
+    On-disk cache of the SUMO simulation states saved at the end of a warm-up (see WarmStart).
+    A state is stored in a gzip XML file named after its key. When the total size of the cache is over max_size, the
+    least recently used states are removed. Writers and eviction are serialized with a lock file, so the cache can be
+    shared by concurrent processes.
+    The cache directory can be set with the SUMO_EXPERIMENTS_CACHE environment variable, and the cache can be disabled
+    by setting SUMO_EXPERIMENTS_NO_CACHE to 1.
+    """
+
+    EXTENSION = '.state.xml.gz'
+
+    def __init__(self, directory=None, max_size=2 * 1024 * 1024 * 1024):
+        """
+        Init of class
+        :param directory: The directory of the cache. Default is $SUMO_EXPERIMENTS_CACHE/states, or ~/.cache/sumo_experiments/states.
+        :type directory: str
+        :param max_size: The maximum size of the cache, in bytes.
+        :type max_size: int
+        """
+        if directory is None:
+            root = os.environ.get('SUMO_EXPERIMENTS_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'sumo_experiments'))
+            directory = os.path.join(root, 'states')
+        self.directory = directory
+        self.max_size = max_size
+        self.enabled = os.environ.get('SUMO_EXPERIMENTS_NO_CACHE', '0') != '1'
+
+    def path_of(self, key):
+        """
+        Return the path of the state file of a key.
+        :param key: The key of the state
+        :type key: str
+        :return: The path of the state file
+        :rtype: str
+        """
+        return os.path.join(self.directory, f'{key}{self.EXTENSION}')
+
+    def get(self, key):
+        """
+        Return the path of the cached state of a key, or None if the state is not in the cache.
+        :param key: The key of the state
+        :type key: str
+        :return: The path of the state file
+        :rtype: str
+        """
+        if not self.enabled:
+            return None
+        path = self.path_of(key)
+        # The modification time is the last use time of the state, for the LRU eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, save_function):
+        """
+        Add the state of a key to the cache.
+        :param key: The key of the state
+        :type key: str
+        :param save_function: The function writing the state in the file given as argument, like traci.simulation.saveState
+        :type save_function: function
+        """
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # SUMO compresses the state when the file name ends with .gz
+        tmp_file = os.path.join(self.directory, f'{key}.{os.getpid()}.tmp{self.EXTENSION}')
+        save_function(tmp_file)
+        if not os.path.isfile(tmp_file):
+            return
+        with self._lock():
+            os.replace(tmp_file, self.path_of(key))
+            self._evict()
+
+    def clear(self):
+        """
+        Remove all the states of the cache.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        with self._lock():
+            for file in os.listdir(self.directory):
+                if file.endswith(self.EXTENSION):
+                    os.remove(os.path.join(self.directory, file))
+
+    def _evict(self):
+        """
+        Remove the least recently used states until the size of the cache is under max_size. The lock must be held.
+        """
+        entries = []
+        for file in os.listdir(self.directory):
+            if file.endswith(self.EXTENSION) and '.tmp' not in file:
+                stat = os.stat(os.path.join(self.directory, file))
+                entries.append((stat.st_mtime, stat.st_size, file))
+        total_size = sum(entry[1] for entry in entries)
+        for _, size, file in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            os.remove(os.path.join(self.directory, file))
+            total_size -= size
+
+    @contextmanager
+    def _lock(self):
+        """
+        Hold the lock file of the cache.
+        """
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+STATE_CACHE = StateCache()
+
+
+class WarmStart:
+    """
+    Start the simulations of a network from a warmed-up state, instead of an empty network.
+    The first time, the network is simulated until warm_up_time under a reference controller (the programs of the
+    network file if reference_function is None), and the state of the simulation is saved in the cache. The next runs
+    with the same inputs load this state and hand the control to the strategy from warm_up_time.
+    The key of a state is a hash of the SUMO version, of the warm-up time, of the name of the reference controller, of
+    the SUMO options (seed, time to teleport...) and of the content of the input files (network, routes and
+    additional files, directly or through a configuration file). So any change of the network or of the flows
+    invalidates the state. Runs with a random seed are warmed up, but their state is not cached.
+    """
+
+    SUMO_OPTIONS = ['--save-state.rng']
+    FILE_OPTIONS = {'-n', '--net-file', '-r', '--route-files', '-a', '--additional-files'}
+    CONFIG_OPTIONS = {'-c', '--configuration-file'}
+    IGNORED_SECTIONS = {'output', 'report', 'gui_only'}
+
+    def __init__(self, warm_up_time=3600, reference_function=None, reference_name=None, cache=None):
+        """
+        Init of class
+        :param warm_up_time: The simulation time (s) at which the control is handed to the strategy.
+        :type warm_up_time: int
+        :param reference_function: The behavioural function controlling the network during the warm-up, called after each simulation step. If None, the traffic lights run the programs of the network file.
+        :type reference_function: function
+        :param reference_name: The name of the reference controller in the key of the states. Default is the qualified name of the reference function. Must be set if the reference function depends on parameters.
+        :type reference_name: str
+        :param cache: The cache of the states. Default is the shared STATE_CACHE.
+        :type cache: StateCache
+        """
+        self.warm_up_time = warm_up_time
+        self.reference_function = reference_function
+        if reference_name is None:
+            reference_name = 'programs' if reference_function is None else getattr(reference_function, '__qualname__', repr(reference_function))
+        self.reference_name = reference_name
+        self.cache = cache if cache is not None else STATE_CACHE
+
+    def sumo_options(self):
+        """
+        Return the options to add to the SUMO command line, so the random generators are saved with the state.
+        :return: The SUMO options
+        :rtype: list
+        """
+        return list(self.SUMO_OPTIONS)
+
+    def key(self, traci, arguments):
+        """
+        Return the key of the warmed-up state of a simulation.
+        :param traci: The traci module, connected to the simulation
+        :type traci: module
+        :param arguments: The SUMO command line, with the binary
+        :type arguments: list
+        :return: The key, or None if the simulation has a random seed
+        :rtype: str
+        """
+        if '--random' in arguments:
+            return None
+        digest = hashlib.sha256()
+        digest.update(str(traci.getVersion()).encode())
+        digest.update(f'{self.warm_up_time} {self.reference_name}'.encode())
+        options = iter(arguments[1:])
+        for option in options:
+            if option in self.FILE_OPTIONS or option in self.CONFIG_OPTIONS:
+                value = next(options, '')
+                digest.update(option.encode())
+                if option in self.CONFIG_OPTIONS:
+                    self._update_config(digest, value)
+                else:
+                    self._update_files(digest, value)
+            else:
+                digest.update(option.encode())
+        return digest.hexdigest()
+
+    def apply(self, traci, arguments):
+        """
+        Bring a simulation that has just started to the warmed-up state, loaded from the cache if possible.
+        :param traci: The traci module, connected to the simulation
+        :type traci: module
+        :param arguments: The SUMO command line the simulation was started with, with the binary
+        :type arguments: list
+        :return: True if the state was loaded from the cache, False if the network was warmed up
+        :rtype: bool
+        """
+        key = self.key(traci, arguments)
+        path = self.cache.get(key) if key is not None else None
+        if path is not None:
+            traci.simulation.loadState(path)
+            return True
+        while traci.simulation.getTime() < self.warm_up_time:
+            traci.simulationStep()
+            if self.reference_function is not None:
+                self.reference_function(traci)
+        if key is not None:
+            self.cache.put(key, traci.simulation.saveState)
+        return False
+
+    def _update_files(self, digest, value, directory=''):
+        """
+        Add the content of a comma separated list of files to a digest.
+        """
+        for file in value.split(','):
+            with open(os.path.join(directory, file), 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+
+    def _update_config(self, digest, config_file):
+        """
+        Add the options of a SUMO configuration file to a digest, with the content of its input files.
+        """
+        directory = os.path.dirname(os.path.abspath(config_file))
+        for section in ET.parse(config_file).getroot():
+            if section.tag in self.IGNORED_SECTIONS:
+                continue
+            for option in section:
+                value = option.get('value')
+                if value is None:
+                    continue
+                digest.update(option.tag.encode())
+                if section.tag == 'input' and (option.tag.endswith('-files') or option.tag.endswith('-file')):
+                    self._update_files(digest, value, directory)
+                else:
+                    digest.update(value.encode())
@@ -0,0 +1,185 @@
+import os
+import shutil
+import tempfile
+import weakref
+import xml.etree.ElementTree as ET
+
+
+class WorkingDirectory:
+    """
+    Directory owning all the files generated by a network (configuration files, routes, detectors outputs...).
+    By default, a new temporary directory is created for each network, so file names never collide between networks
+    running at the same time, and the directory is removed when the network cleans its files or is garbage collected.
+    If a path is given, the generated files are written in this directory and only these files are removed. The file
+    names are the same for all networks of a type, so a directory can't be shared : the directory is locked by a
+    WorkingDirectory until its files are cleaned or it is garbage collected, and a WorkingDirectory belongs to one
+    network.
+    """
+
+    LOCK_FILE = '.sumo_experiments.lock'
+
+    # The directory where the temporary directories are created when no root is given. None for the system temporary
+    # directory. Set by the workers of the ExperimentRunner, so all the files of an experiment are in its directory.
+    ROOT = None
+
+    def __init__(self, path=None, root=None):
+        """
+        Init of class
+        :param path: The directory where the files are written. If None, a new temporary directory is created.
+        :type path: str
+        :param root: The directory where the temporary directory is created, if path is None. Default is WorkingDirectory.ROOT, or the system temporary directory. Can be a tmpfs like /dev/shm.
+        :type root: str
+        """
+        self.temporary = path is None
+        if self.temporary:
+            self.path = tempfile.mkdtemp(prefix='sumo_experiments_', dir=root if root is not None else self.ROOT)
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self.path, ignore_errors=True)
+        else:
+            self.path = os.path.abspath(path)
+            os.makedirs(self.path, exist_ok=True)
+            self._finalizer = None
+            self._unlock = weakref.finalize(self, _remove_lock, self._lock())
+        self.files = []
+        self.owned = False
+
+    @classmethod
+    def of(cls, working_directory):
+        """
+        Return the WorkingDirectory for the working_directory parameter of a network.
+        :param working_directory: A WorkingDirectory, a path or None for a new temporary directory
+        :type working_directory: WorkingDirectory or str
+        :return: The working directory
+        :rtype: WorkingDirectory
+        """
+        if not isinstance(working_directory, cls):
+            working_directory = cls(working_directory)
+        elif working_directory.owned:
+            raise ValueError(f"The working directory {working_directory.path} already belongs to another network.")
+        working_directory.owned = True
+        return working_directory
+
+    def path_of(self, file_name):
+        """
+        Return the path of a file in the directory. The file is removed by the cleanup method.
+        :param file_name: The name of the file
+        :type file_name: str
+        :return: The path of the file
+        :rtype: str
+        """
+        path = os.path.join(self.path, file_name)
+        if path not in self.files:
+            self.files.append(path)
+        return path
+
+    def copy_config(self, config_file, file_name='run.sumocfg', route_file=None, additional_files=None):
+        """
+        Copy a SUMO configuration file in the directory.
+        The network, route and GUI settings files stay in their original directory and are referenced by absolute paths.
+        The additional files are copied in the directory, so the outputs of the detectors they define are written in it,
+        as well as the outputs of the configuration (tripinfos, logs...).
+        :param config_file: The path of the configuration file to copy
+        :type config_file: str
+        :param file_name: The name of the copy
+        :type file_name: str
+        :param route_file: If set, replaces the first route file of the configuration.
+        :type route_file: str
+        :param additional_files: If set, replaces the additional files of the configuration.
+        :type additional_files: list
+        :return: The path of the copy
+        :rtype: str
+        """
+        config_directory = os.path.dirname(os.path.abspath(config_file))
+        tree = ET.parse(config_file)
+        for section in ['input', 'gui_only']:
+            for element in tree.getroot().iter(section):
+                for option in element:
+                    if option.get('value') is None:
+                        continue
+                    files = [os.path.join(config_directory, file) for file in option.get('value').split(',')]
+                    if option.tag == 'route-files' and route_file is not None:
+                        files[0] = route_file
+                    elif option.tag == 'additional-files' and additional_files is not None:
+                        files = list(additional_files)
+                    elif option.tag == 'additional-files':
+                        files = [self._copy(file) for file in files]
+                    option.set('value', ','.join(files))
+        path = self.path_of(file_name)
+        tree.write(path, encoding='UTF-8', xml_declaration=True)
+        return path
+
+    def cleanup(self):
+        """
+        Remove the files generated in the directory, and the directory itself if it is temporary. A directory given by
+        path is unlocked.
+        """
+        if self._finalizer is not None:
+            self._finalizer()
+        else:
+            for path in self.files:
+                if os.path.isfile(path):
+                    os.remove(path)
+            self._unlock()
+        self.files = []
+
+    def _lock(self):
+        """
+        Create the lock file of the directory, holding the id of the process, and return its path. A lock file left by
+        a process that no longer runs is replaced.
+        """
+        lock_file = os.path.join(self.path, self.LOCK_FILE)
+        while True:
+            try:
+                descriptor = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if _lock_owner(lock_file) is not None:
+                    raise ValueError(f"The directory {self.path} is already used by another network, whose files would be overwritten.")
+                try:
+                    os.remove(lock_file)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(descriptor, 'w') as file:
+                file.write(str(os.getpid()))
+            return lock_file
+
+    def _copy(self, file):
+        """
+        Copy a file in the directory, if it exists, and return the path of the copy.
+        """
+        if not os.path.isfile(file):
+            return file
+        path = self.path_of(os.path.basename(file))
+        shutil.copyfile(file, path)
+        return path
+
+
+def _lock_owner(lock_file):
+    """
+    Return the id of the running process holding a lock file, or None if the file doesn't exist or its process no
+    longer runs.
+    """
+    try:
+        with open(lock_file) as file:
+            content = file.read()
+    except FileNotFoundError:
+        return None
+    if not content:
+        # Being written by its owner
+        return -1
+    pid = int(content)
+    if pid != os.getpid():
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return None
+        except PermissionError:
+            pass
+    return pid
+
+
+def _remove_lock(lock_file):
+    """
+    Remove a lock file if it is held by the current process. A process forked from the owner doesn't remove it.
+    """
+    if _lock_owner(lock_file) == os.getpid():
+        os.remove(lock_file)
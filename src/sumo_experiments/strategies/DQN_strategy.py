@@ -88,7 +88,7 @@ class DQNStrategy(IntellilightStrategy):
         return [replay_list[i] for i in idx]
 
     def get_reward(self, tl_id, change_phase=None):
-        pressure = MaxPressureStrategy._compute_pressure(self, self.network.TLS_DETECTORS[tl_id])
+        pressure = MaxPressureStrategy._compute_pressure(self, tl_id)
         base_reward = -np.nanmean(list(pressure.values())) / 2000
         scale = episode_reward_scale(
             self.episode_duration,
@@ -1,4 +1,6 @@
 from .strategy import Strategy
+from .pressure_snapshot import PressureSnapshot
+from .controller_engine import ControllerEngine
 from .acolight_strategy import AcolightStrategy
 from .analyticplus_strategy import AnalyticPlusStrategy
 from .fixedtime_strategy import FixedTimeStrategy
@@ -1,4 +1,8 @@
 from sumo_experiments.strategies import Strategy
+from sumo_experiments.traci_util import DetectorBus
+from sumo_experiments.preset_networks import TLSTopology
+import numpy as np
+import traci.constants as tc
 
 
 class AcolightStrategy(Strategy):
@@ -68,19 +72,22 @@ class AcolightStrategy(Strategy):
         """
         if not self.started:
             self.traci = traci
+            self._mirror_traffic_lights(traci, self.intelligent_intersections)
             self._start_agents()
             return True
         else:
+            self.traffic_lights.update()
             self.zeus_monitor.begin_window("all_agents")
+            self.detector_bus.update()
             for id_tls in self.intelligent_intersections:
-                current_phase = self.traci.trafficlight.getPhase(id_tls)
-                current_state = self.traci.trafficlight.getRedYellowGreenState(id_tls)
+                current_phase = self.traffic_lights.phase(id_tls)
+                current_state = self.traffic_lights.state(id_tls)
                 # If yellow phase
                 if current_phase not in self.network.TLS_DETECTORS[id_tls]:
                     if 'y' in current_state:
                         if self.yellow_time[id_tls] - self.current_yellow_time[id_tls] <= 0:
                             #if current_phase == self.next_phase[id_tls] - 1 or self.next_phase[id_tls] == 0:
-                            self.traci.trafficlight.setPhase(id_tls, self.next_phase[id_tls])
+                            self.traffic_lights.set_phase(id_tls, self.next_phase[id_tls])
                             self.current_cycle[id_tls].append(self.next_phase[id_tls])
                             self.current_yellow_time[id_tls] = 1
                         else:
@@ -121,18 +128,16 @@ class AcolightStrategy(Strategy):
         Switch the traffic light id_tls to the next
         """
         self.nb_switch[id_tls] += 1
-        current_phase = self.traci.trafficlight.getPhase(id_tls)
+        current_phase = self.traffic_lights.phase(id_tls)
         next_phase = self.get_next_phase(id_tls)
         if next_phase == current_phase:
-            index_phase = list(self.network.TLS_DETECTORS[id_tls].keys()).index(self.traci.trafficlight.getPhase(id_tls))
-            double_list = list(self.network.TLS_DETECTORS[id_tls].keys()) * 2
-            next_phase = double_list[index_phase + 1]
+            next_phase = self.topology.next_phase(id_tls, current_phase)
         self.list_phases[id_tls].append(next_phase)
         self.next_phase[id_tls] = next_phase
-        if self.traci.trafficlight.getPhase(id_tls) == self.traci.trafficlight.getPhase(id_tls) - 1:
-            self.traci.trafficlight.setPhase(id_tls, 0)
+        if self.traffic_lights.phase(id_tls) == self.traffic_lights.phase(id_tls) - 1:
+            self.traffic_lights.set_phase(id_tls, 0)
         else:
-            self.traci.trafficlight.setPhase(id_tls, self.traci.trafficlight.getPhase(id_tls) + 1)
+            self.traffic_lights.set_phase(id_tls, self.traffic_lights.phase(id_tls) + 1)
         self.time[id_tls] = 0
         if self.current_phase_duration[id_tls] > 2:
             self.phases_durations[id_tls].append((current_phase, self.current_phase_duration[id_tls]))
@@ -144,11 +149,14 @@ class AcolightStrategy(Strategy):
         Add the current priority phases (the phases with saturated lanes) to the pile.
         """
         if self.supervisor[id_tls]:
-            current_phase = self.traci.trafficlight.getPhase(id_tls)
-            for phase in self.network.TLS_DETECTORS[id_tls]:
-                detectors = self.network.TLS_DETECTORS[id_tls][phase]['saturation']
+            current_phase = self.traffic_lights.phase(id_tls)
+            saturation_detectors = self.topology.tl_detectors(id_tls, 'saturation')
+            speeds = self.detector_bus.values(tc.LAST_STEP_MEAN_SPEED, saturation_detectors)
+            vehicle_numbers = self.detector_bus.values(tc.LAST_STEP_VEHICLE_NUMBER, saturation_detectors)
+            for phase in self.topology.phases[id_tls]:
+                detectors = self.topology.green(id_tls, phase, 'saturation')
                 #if any([any([self.traci.vehicle.isStopped(veh) == True for veh in self.traci.lanearea.getLastStepVehicleIDs(det)]) for det in detectors]) and phase != current_phase:
-                if any([0 < self.traci.lanearea.getLastStepMeanSpeed(det) < 0.5 and self.traci.lanearea.getLastStepVehicleNumber(det) > 0 for det in detectors]) and phase != current_phase:
+                if np.any((0 < speeds[detectors]) & (speeds[detectors] < 0.5) & (vehicle_numbers[detectors] > 0)) and phase != current_phase:
                     if phase not in self.priority_pile[id_tls]:
                         self.priority_pile[id_tls].append(phase)
 
@@ -158,7 +166,7 @@ class AcolightStrategy(Strategy):
         of the controller appear at least one time, and max 1 time for the least represented one.
         """
         counts = []
-        phases = self.network.TLS_DETECTORS[id_tls]
+        phases = self.topology.phases[id_tls]
         for phase in phases:
             counts.append(self.current_cycle[id_tls].count(phase))
         if len(self.current_cycle[id_tls]) > 0:
@@ -178,11 +186,9 @@ class AcolightStrategy(Strategy):
         :return: True if there are blocked vehicles on green lanes, false otherwise
         :rtype: int
         """
-        current_phase = self.traci.trafficlight.getPhase(id_tls)
-        for det in self.network.TLS_DETECTORS[id_tls][current_phase]['boolean']:
-            if self.traci.lanearea.getLastStepMeanSpeed(det) > 0.5:
-                return False
-        return True
+        current_phase = self.traffic_lights.phase(id_tls)
+        detectors = self.topology.green(id_tls, current_phase, 'boolean')
+        return not np.any(self.detector_bus.values(tc.LAST_STEP_MEAN_SPEED, detectors)[detectors] > 0.5)
 
     def red_lane_saturated(self, id_tls):
         """
@@ -192,15 +198,9 @@ class AcolightStrategy(Strategy):
         :return: The next phase saturated if there are saturated red lanes, None otherwise
         :rtype: bool
         """
-        current_phase = self.traci.trafficlight.getPhase(id_tls)
-        detectors = set()
-        for phase in self.network.TLS_DETECTORS[id_tls]:
-            if phase != current_phase:
-                detectors.update(self.network.TLS_DETECTORS[id_tls][phase]['saturation'])
-        for det in detectors:
-            if self.traci.lanearea.getJamLengthVehicle(det) > 0:
-                return True
-        return False
+        current_phase = self.traffic_lights.phase(id_tls)
+        detectors = self.topology.others(id_tls, current_phase, 'saturation')
+        return bool(np.any(self.detector_bus.values(tc.JAM_LENGTH_VEHICLE, detectors)[detectors] > 0))
 
 
     def are_vehicles_passing(self, id_tls):
@@ -211,11 +211,9 @@ class AcolightStrategy(Strategy):
         :return: True if vehicles are still passing the intersection, False otherwise
         :rtype: bool
         """
-        current_phase = self.traci.trafficlight.getPhase(id_tls)
-        for det in self.network.TLS_DETECTORS[id_tls][current_phase]['boolean']:
-            if self.traci.lanearea.getLastStepVehicleNumber(det) > 0:
-                return True
-        return False
+        current_phase = self.traffic_lights.phase(id_tls)
+        detectors = self.topology.green(id_tls, current_phase, 'boolean')
+        return bool(np.any(self.detector_bus.values(tc.LAST_STEP_VEHICLE_NUMBER, detectors)[detectors] > 0))
 
 
     def get_next_phase(self, id_tls):
@@ -231,20 +229,17 @@ class AcolightStrategy(Strategy):
         else:
             if self.is_cycle_complete(id_tls):
                 self.current_cycle[id_tls] = []
-            index_phase = list(self.network.TLS_DETECTORS[id_tls].keys()).index(self.traci.trafficlight.getPhase(id_tls))
-            len_list = len(self.network.TLS_DETECTORS[id_tls])
-            double_list = list(self.network.TLS_DETECTORS[id_tls].keys()) * 2
-            list_phase = [i for i in double_list[index_phase:index_phase + len_list]]
+            list_phase = self.topology.cycle(id_tls, self.traffic_lights.phase(id_tls))
             for phase in list_phase:
                 if phase not in self.current_cycle[id_tls]:
-                    for det in self.network.TLS_DETECTORS[id_tls][phase]['boolean']:
-                        if self.traci.lanearea.getLastStepVehicleNumber(det) > 0:
-                            return phase
-            for phase in self.network.TLS_DETECTORS[id_tls]:
-                for det in self.network.TLS_DETECTORS[id_tls][phase]['boolean']:
-                    if self.traci.lanearea.getLastStepVehicleNumber(det) > 0:
+                    detectors = self.topology.green(id_tls, phase, 'boolean')
+                    if np.any(self.detector_bus.values(tc.LAST_STEP_VEHICLE_NUMBER, detectors)[detectors] > 0):
                         return phase
-        return self.traci.trafficlight.getPhase(id_tls) # Current phase
+            for phase in self.topology.phases[id_tls]:
+                detectors = self.topology.green(id_tls, phase, 'boolean')
+                if np.any(self.detector_bus.values(tc.LAST_STEP_VEHICLE_NUMBER, detectors)[detectors] > 0):
+                    return phase
+        return self.traffic_lights.phase(id_tls) # Current phase
 
 
     def _start_agents(self):
@@ -260,7 +255,9 @@ class AcolightStrategy(Strategy):
                 phase.minDur = 10000
                 nb_phase += 1
             self.nb_phases = nb_phase
-            self.traci.trafficlight.setProgramLogic(tl, tl_logic)
-            self.traci.trafficlight.setPhase(tl, 0)
+            self.traffic_lights.set_program_logic(tl, tl_logic)
+            self.traffic_lights.set_phase(tl, 0)
             self.traci.trafficlight.setPhaseDuration(tl, 10000)
+        self.topology = TLSTopology.of(self.network)
+        self.detector_bus = DetectorBus.shared(self.traci, self.topology, subscribe=False)
         self.started = True
\ No newline at end of file
@@ -1,5 +1,9 @@
 from sumo_experiments.strategies import Strategy
+from sumo_experiments.strategies.controller_engine import ControllerEngine
+from sumo_experiments.traci_util import DetectorBus
+from sumo_experiments.preset_networks import TLSTopology
 import numpy as np
+import traci.constants as tc
 
 
 class ActuatedStrategy(Strategy):
@@ -9,9 +13,12 @@ class ActuatedStrategy(Strategy):
     traffic light phases, then the traffic light is set to a phase that is green for this lane. While detectors detect
     vehicles in lanes where traffic light is green, it remains green until there is no vehicle or the maximum green time
     of the phase is reached.
+    With offload='approximate', the controllers are compiled into SUMO actuated programs (see compile_program), run by
+    SUMO instead of the controllers. These programs are actuated by the induction loops of SUMO, not by the boolean
+    detectors of the network, so they only approximate the controllers.
     """
 
-    def __init__(self, network, max_phases_duration=90, yellow_time=3):
+    def __init__(self, network, max_phases_duration=90, yellow_time=3, offload=False, min_phases_duration=5):
         """
         Init of class.
         :param network: The network to deploy the strategy
@@ -20,8 +27,14 @@ class ActuatedStrategy(Strategy):
         :type max_phases_duration: int or dict
         :param yellow_time: Yellow phases duration for all intersections
         :type yellow_time: int or dict
+        :param offload: If 'approximate', the controllers are replaced by SUMO actuated programs, that approximate them. The switches are then decided by SUMO, and counted in nb_switch from the phases read at each step. False to run the controllers.
+        :type offload: bool or str
+        :param min_phases_duration: Minimum duration of the green phases of the actuated programs, for all intersections. Used only with offload='approximate'.
+        :type min_phases_duration: int or dict
         """
         super().__init__()
+        if offload not in (False, 'approximate'):
+            raise ValueError(f"The offload of the actuated strategy must be False or 'approximate', not {offload!r}.")
         self.network = network
         if type(max_phases_duration) is dict:
             self.max_phases_durations = max_phases_duration
@@ -31,14 +44,63 @@ class ActuatedStrategy(Strategy):
             self.yellow_time = yellow_time
         else:
             self.yellow_time = {identifiant: yellow_time for identifiant in network.TLS_DETECTORS}
-        self.current_phase = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.time = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.current_max_time_index = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.current_yellow_time = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
+        if type(min_phases_duration) is dict:
+            self.min_phases_durations = min_phases_duration
+        else:
+            self.min_phases_durations = {identifiant: min_phases_duration for identifiant in network.TLS_DETECTORS}
+        # The counters of the intersections, indexed like network.TL_IDS, and read as dicts through the properties
+        self.engine = ControllerEngine(network, network.TL_IDS)
+        self._current_phase = self.engine.counter()
+        self._time = self.engine.counter()
+        self._current_max_time_index = self.engine.counter()
+        self._current_yellow_time = self.engine.counter()
         self.started = False
         self.nb_phases = {}
-        self.nb_switch = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.next_phase = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
+        self._nb_switch = self.engine.counter()
+        self._next_phase = self.engine.counter()
+        self.offload = offload
+
+    @property
+    def current_phase(self):
+        """
+        The current phase of each intersection.
+        """
+        return self.engine.view(self._current_phase)
+
+    @property
+    def time(self):
+        """
+        The time spent in the current phase by each intersection.
+        """
+        return self.engine.view(self._time)
+
+    @property
+    def current_max_time_index(self):
+        """
+        The index of the current maximum duration of each intersection.
+        """
+        return self.engine.view(self._current_max_time_index)
+
+    @property
+    def current_yellow_time(self):
+        """
+        The time spent in the current yellow phase by each intersection.
+        """
+        return self.engine.view(self._current_yellow_time)
+
+    @property
+    def nb_switch(self):
+        """
+        The number of switches of each intersection.
+        """
+        return self.engine.view(self._nb_switch)
+
+    @property
+    def next_phase(self):
+        """
+        The phase following the current yellow phase of each intersection.
+        """
+        return self.engine.view(self._next_phase)
 
     def run_all_agents(self, traci):
         """
@@ -47,104 +109,122 @@ class ActuatedStrategy(Strategy):
         :type traci: Traci
         :return: Nothing
         """
-        if not self.started:
+        if not self.started and self.offload:
+            self.traci = traci
+            self._mirror_traffic_lights(traci, self.network.TL_IDS)
+            self.topology = TLSTopology.of(self.network)
+            self._offload_programs(traci, {tl_id: self.compile_program(tl_id) for tl_id in self.network.TL_IDS})
+            self.engine.start(self.traffic_lights)
+            self.started = True
+        elif self.offload:
+            # The switches of the programs, from a green phase to the next phase
+            self.engine.update()
+            switch = (self.engine.rows_of(self._current_phase) >= 0) & (self.engine.phase != self._current_phase)
+            self._nb_switch[switch] += 1
+            self._current_phase = self.engine.phase
+        elif not self.started:
             self.traci = traci
+            self._mirror_traffic_lights(traci, self.network.TL_IDS)
             for tl_id in self.network.TL_IDS:
                 self._start_agent(tl_id)
+            self.topology = TLSTopology.of(self.network)
+            self.detector_bus = DetectorBus.shared(self.traci, self.topology, subscribe=False)
+            self.engine.parameter('max_phases_duration', self.max_phases_durations)
+            self.engine.parameter('yellow_time', self.yellow_time)
+            self.engine.start(self.traffic_lights, self.detector_bus)
             self.started = True
         else:
-            for tl_id in self.network.TL_IDS:
-                red_detectors = self._detectors_red_lanes(tl_id)
-                green_detectors = self._detectors_green_lanes(tl_id)
-                if 'y' in self.traci.trafficlight.getRedYellowGreenState(tl_id):
-                    if self.current_yellow_time[tl_id] >= self.yellow_time[tl_id]:
-                        self.traci.trafficlight.setPhase(tl_id, int(self.next_phase[tl_id]))
-                        self.current_phase[tl_id] = self.next_phase[tl_id]
-                        self.current_yellow_time[tl_id] = 0
-                    else:
-                        self.current_yellow_time[tl_id] += 1
-                else:
-                    red_detection = any([self.traci.lanearea.getLastStepVehicleNumber(det) > 0 for det in red_detectors])
-                    if red_detection:
-                        green_detection = any([self.traci.lanearea.getLastStepVehicleNumber(det) > 0 for det in green_detectors])
-                        if not green_detection:
-                            self.switch_next_phase(tl_id)
-                    elif self.max_phases_durations[tl_id] is not None:
-                        if self.time[tl_id] > self.max_phases_durations[tl_id]:#[self.current_max_time_index[tl_id] % len(self.max_phases_durations)]:
-                            self.switch_next_phase(tl_id)
-                    else:
-                        self.time[tl_id] += 1
-
-
-    def switch_next_phase(self, tl_id):
-        """
-        Switch the traffic light id_tls to the next
-        """
-        self.nb_switch[tl_id] += 1
-        #current_phase = self.traci.trafficlight.getPhase(id_tls)
-        next_phase = self.get_next_phase(tl_id)
-        if next_phase != self.current_phase[tl_id]:
-            self.next_phase[tl_id] = next_phase
-        else:
-            phases_with_exclusion = list(self.network.TLS_DETECTORS[tl_id].keys())
-            phases_with_exclusion.remove(int(self.get_next_phase(tl_id)))
-            self.next_phase[tl_id] = np.random.choice(phases_with_exclusion)
-        if self.traci.trafficlight.getPhase(tl_id) == self.nb_phases[tl_id] - 1:
-            self.traci.trafficlight.setPhase(tl_id, 0)
-        else:
-            self.traci.trafficlight.setPhase(tl_id, int(self.current_phase[tl_id] + 1))
-        self.time[tl_id] = 0
+            self.engine.update()
+            yellow = self.engine.yellow
+            end_yellow = yellow & (self._current_yellow_time >= self.engine.parameters['yellow_time'])
+            self._current_yellow_time[yellow] += 1
+            self._current_yellow_time[end_yellow] = 0
+            phases = self._next_phase.copy()
+            red_detection = self._detection_red_lanes()
+            green_detection = self._detection_green_lanes()
+            self._current_phase[end_yellow] = self._next_phase[end_yellow]
+            max_phases_durations = self.engine.parameters['max_phases_duration']
+            has_max_duration = ~np.isnan(max_phases_durations)
+            switch = ~yellow & red_detection & ~green_detection
+            switch |= ~yellow & ~red_detection & has_max_duration & (self._time > max_phases_durations)
+            self._time[~yellow & ~red_detection & ~has_max_duration] += 1
+            if switch.any():
+                phases[switch] = self.switch_next_phases(switch)[switch]
+            self.engine.set_phases(end_yellow | switch, phases)
+
+
+    def switch_next_phases(self, switch):
+        """
+        Switch the traffic lights of a mask to their next phase
+        :param switch: The traffic lights to switch, indexed like network.TL_IDS
+        :type switch: numpy.ndarray
+        :return: The phase set for each traffic light
+        :rtype: numpy.ndarray
+        """
+        self._nb_switch[switch] += 1
+        next_phases = self.get_next_phases()
+        self._next_phase[switch] = next_phases[switch]
+        for i in np.flatnonzero(switch & (next_phases == self._current_phase)):
+            phases_with_exclusion = list(self.topology.phases[self.engine.tl_ids[i]])
+            phases_with_exclusion.remove(int(next_phases[i]))
+            self._next_phase[i] = np.random.choice(phases_with_exclusion)
+        self._time[switch] = 0
+        return np.where(self.engine.phase == self.engine.nb_phases - 1, 0, self._current_phase + 1)
+
+
+    def get_next_phases(self):
+        """
+        Get the next phase of all the controllers : the first phase with a detection on its green lanes, starting from
+        the current phase, or the current phase if there is no detection.
+        :return: The next phase of each controller, indexed like network.TL_IDS
+        :rtype: numpy.ndarray
+        """
+        detections = self.engine.any(tc.LAST_STEP_VEHICLE_NUMBER, 'green', 'boolean')
+        rows = self.engine.first_rows(detections, self.engine.row)
+        return self.engine.phases_of(rows, self._current_phase)
 
 
-    def get_next_phase(self, tl_id):
+    def _detection_red_lanes(self):
         """
-        Get the next phase for the controller.
-        :param tl_id: The id of the traffic light
-        :type tl_id: str
-        :return: The next phase for the controller
-        :rtype: int
+        Check if vehicles are detected on the red lanes of the phase of each controller.
+        :return: True for the controllers with a detection, indexed like network.TL_IDS
+        :rtype: numpy.ndarray
         """
-        phases = list(self.network.TLS_DETECTORS[tl_id].keys())
-        while phases[0] != self.traci.trafficlight.getPhase(tl_id):
-            phases.append(phases.pop(0))
-        for phase in phases:
-            for det in self.network.TLS_DETECTORS[tl_id][phase]['boolean']:
-                if self.traci.lanearea.getLastStepVehicleNumber(det) > 0:
-                    return phase
-        return self.current_phase[tl_id]
+        detections = self.engine.any(tc.LAST_STEP_VEHICLE_NUMBER, 'red', 'boolean')
+        return self.engine.at(detections, self.engine.rows_of(self._current_phase), False)
 
 
-    def _detectors_red_lanes(self, tl_id):
+    def _detection_green_lanes(self):
         """
-        Return the detectors related to red lanes for a phase.
-        :param tl_id: The id of the TL
-        :type tl_id: str
-        :return: The list of all concerned detectors
-        :rtype: list
+        Check if vehicles are detected on the green lanes of the phase of each controller.
+        :return: True for the controllers with a detection, indexed like network.TL_IDS
+        :rtype: numpy.ndarray
         """
-        detectors = []
-        if self.current_phase[tl_id] in self.network.TLS_DETECTORS[tl_id]:
-            detectors_current_phase = self.network.TLS_DETECTORS[tl_id][self.current_phase[tl_id]]['boolean']
-            for i in self.network.TLS_DETECTORS[tl_id]:
-                if i != self.current_phase[tl_id]:
-                    for det in self.network.TLS_DETECTORS[tl_id][i]['boolean']:
-                        if det not in detectors_current_phase:
-                            detectors.append(det)
-        return detectors
-
+        detections = self.engine.any(tc.LAST_STEP_VEHICLE_NUMBER, 'green', 'boolean')
+        return self.engine.at(detections, self.engine.rows_of(self._current_phase), False)
 
-    def _detectors_green_lanes(self, tl_id):
+    def compile_program(self, tl_id):
         """
-        Return the detectors related to green lanes for a phase.
-        :param tl_id: The id of the TL
+        Compile the controller of an intersection into a SUMO actuated program. Each green phase lasts at least its
+        minimum duration, and is extended by SUMO while vehicles keep coming on its lanes, up to the maximum duration of
+        the phases (+ 2 steps, as in the controller). It is followed by the next phase of the program (the yellow phase)
+        for yellow time + 1 steps, then by the next green phase with vehicles, in the order of the phases. As custom
+        detectors can't be given to a program set with TraCI, SUMO actuates the program with its own induction loops on
+        the lanes of the phases, instead of the boolean detectors of the network.
+        :param tl_id: The id of the traffic light
         :type tl_id: str
-        :return: The list of all concerned detectors
-        :rtype: list
+        :return: The program of the traffic light
+        :rtype: traci.trafficlight.Logic
         """
-        detectors_current_phase = []
-        if self.current_phase[tl_id] in self.network.TLS_DETECTORS[tl_id]:
-            detectors_current_phase = self.network.TLS_DETECTORS[tl_id][self.current_phase[tl_id]]['boolean']
-        return detectors_current_phase
+        max_phases_duration = self.max_phases_durations[tl_id]
+        max_steps = 10000 if max_phases_duration is None else max_phases_duration + 2
+        green_phases = {}
+        for phase in self.topology.phases[tl_id]:
+            next_phases = self.topology.cycle(tl_id, phase)[1:] or (phase,)
+            green_phases[phase] = (self.min_phases_durations[tl_id], max_steps, next_phases)
+        logic = self._native_program(self.traci, tl_id, 3, green_phases, self.yellow_time[tl_id] + 1)
+        self.nb_phases[tl_id] = len(logic.phases)
+        return logic
 
     def _start_agent(self, tl_id):
         """
@@ -152,7 +232,7 @@ class ActuatedStrategy(Strategy):
         :param tl_id: The id of the TL
         :type tl_id: str
         """
-        self.nb_phases[tl_id] = len(self.traci.trafficlight.getAllProgramLogics(tl_id)[0].phases)
+        self.nb_phases[tl_id] = self.traffic_lights.nb_phases(tl_id)
         tl_logic = self.traci.trafficlight.getAllProgramLogics(tl_id)[0]
         phase_index = 0
         for phase in tl_logic.phases:
@@ -160,8 +240,8 @@ class ActuatedStrategy(Strategy):
             phase.maxDur = 10000
             phase.minDur = 10000
             phase_index += 1
-        self.traci.trafficlight.setProgramLogic(tl_id, tl_logic)
-        self.traci.trafficlight.setPhase(tl_id, 0)
+        self.traffic_lights.set_program_logic(tl_id, tl_logic)
+        self.traffic_lights.set_phase(tl_id, 0)
         self.traci.trafficlight.setPhaseDuration(tl_id, 10000)
         self.started = True
 
@@ -8,6 +8,8 @@ import traci.constants as tc
 
 
 from sumo_experiments.strategies import Strategy
+from sumo_experiments.traci_util import DetectorBus
+from sumo_experiments.preset_networks import TLSTopology
 
 DEBUG = False
 
@@ -35,6 +37,7 @@ class AnalyticPlusStrategy(Strategy):
         """
         super().__init__()
         self.started = False
+        self.detector_bus = None
         self.network = network
         if type(min_phase_duration) is dict:
             self.min_phase_durations = min_phase_duration
@@ -72,7 +75,7 @@ class AnalyticPlusStrategy(Strategy):
         Switch the traffic light tls_id to yellow
         """
         num_phases = len(agent.sumo_phases)
-        self.traci.trafficlight.setPhase(agent.ID, (self.traci.trafficlight.getPhase(agent.ID) + 1) % num_phases)
+        self.traffic_lights.set_phase(agent.ID, (self.traffic_lights.phase(agent.ID) + 1) % num_phases)
 
     def run_all_agents(self, traci):
         """
@@ -81,25 +84,28 @@ class AnalyticPlusStrategy(Strategy):
         """
         if not self.started:
             self.traci = traci
+            self._mirror_traffic_lights(traci, self.intelligent_intersections)
             self._start_agents()
             return True
         else:
-            det_data = self.traci.lanearea.getAllSubscriptionResults()
+            self.traffic_lights.update()
+            self.detector_bus.update()
+            det_data = self.detector_bus.collector.lanearea_results
             self.zeus_monitor.begin_window("all_agents")
             for tls_id in self.intelligent_intersections:
                 agent = self.agents[tls_id]
                 agent.update(det_data)
-                current_phase = self.traci.trafficlight.getPhase(tls_id)
-                current_state = self.traci.trafficlight.getRedYellowGreenState(tls_id)
+                current_phase = self.traffic_lights.phase(tls_id)
+                current_state = self.traffic_lights.state(tls_id)
                 # if current_phase not in self.TLS_DETECTORS[tls_id]: # Handle the yellow phases
                 if 'y' in current_state:
                     if self.yellow_time[tls_id] - self.current_yellow_time[tls_id] <= 0:
                         # maybe there is a second yellow phase
                         self.switch_yellow(agent)
-                        assert self.traci.trafficlight.getPhase(tls_id) != current_phase
+                        assert self.traffic_lights.phase(tls_id) != current_phase
                         # print(current_phase, current_state, tls_id, self.next_phase[tls_id])
-                        if not agent.sumo_phases.get(self.traci.trafficlight.getPhase(tls_id), {'isYellow': False})['isYellow']:  # not a yellow phase, switch to next green
-                            self.traci.trafficlight.setPhase(tls_id, self.next_phase[tls_id])
+                        if not agent.sumo_phases.get(self.traffic_lights.phase(tls_id), {'isYellow': False})['isYellow']:  # not a yellow phase, switch to next green
+                            self.traffic_lights.set_phase(tls_id, self.next_phase[tls_id])
                             agent.current_sumo_phase = agent.sumo_phases[self.next_phase[tls_id]]
                             self.current_cycle[tls_id].append(self.next_phase[tls_id])
                         self.current_yellow_time[tls_id] = 0
@@ -131,7 +137,7 @@ class AnalyticPlusStrategy(Strategy):
         """
         agent = self.agents[tls_id]
         self.nb_switch[tls_id] += 1
-        current_phase = self.traci.trafficlight.getPhase(tls_id)
+        current_phase = self.traffic_lights.phase(tls_id)
         time = self.traci.simulation.getTime()
 
         action_id, green_time = agent.choose_action(time)
@@ -143,9 +149,9 @@ class AnalyticPlusStrategy(Strategy):
             agent.update_last_on(agent.sumo_phases[next_phase], agent.sumo_phases[current_phase], time)
             assert not agent.sumo_phases[next_phase]['isYellow']
             # switch to hopefully the next yellow phase
-            # print(self.traci.trafficlight.getRedYellowGreenState(tls_id), tls_id)
+            # print(self.traffic_lights.state(tls_id), tls_id)
             self.switch_yellow(agent)
-            assert agent.sumo_phases[self.traci.trafficlight.getPhase(tls_id)]['isYellow']
+            assert agent.sumo_phases[self.traffic_lights.phase(tls_id)]['isYellow']
             self.time[tls_id] = 0
             if self.current_phase_duration[tls_id] > 2:
                 self.phases_durations[tls_id].append((current_phase, self.current_phase_duration[tls_id]))
@@ -165,24 +171,20 @@ class AnalyticPlusStrategy(Strategy):
                 phase.minDur = 10000
                 nb_phase += 1
             self.nb_phases[tls_id] = nb_phase
-            self.traci.trafficlight.setProgramLogic(tls_id, tl_logic)
-            self.traci.trafficlight.setPhase(tls_id, 0)
+            self.traffic_lights.set_program_logic(tls_id, tl_logic)
+            self.traffic_lights.set_phase(tls_id, 0)
             self.traci.trafficlight.setPhaseDuration(tls_id, 10000)
             self.agents[tls_id].reset(self.traci)
-        # Subscribe to all lane area detectors for batch reading
+            # The agent sets its phase with TraCI
+            self.traffic_lights.invalidate(tls_id)
+        # Subscribe to all lane area detectors for batch reading, through the detector bus of the simulation
         sub_vars = [
             tc.LAST_STEP_VEHICLE_NUMBER,  # current vehicles on detector (queue)
             tc.VAR_INTERVAL_NUMBER,        # vehicles passed in current (partial) interval
             tc.VAR_LAST_INTERVAL_NUMBER,   # vehicles passed in last complete interval
         ]
-        subscribed = set()
-        for tls_id in self.intelligent_intersections:
-            tls_dets = self.network.TLS_DETECTORS[tls_id]
-            for phase_id, det_groups in tls_dets.items():
-                for det in det_groups.get('numerical', []):
-                    if det not in subscribed:
-                        self.traci.lanearea.subscribe(det, sub_vars)
-                        subscribed.add(det)
+        self.detector_bus = DetectorBus.shared(self.traci, TLSTopology.of(self.network), sub_vars)
+        self.detector_bus.update()
         self.started = True
 
 
@@ -0,0 +1,278 @@
+import numpy as np
+
+from sumo_experiments.preset_networks import TLSTopology
+
+
+class ControllerEngine:
+    """
+    Vectorized state of the rule-based controllers of a set of intersections.
+    The counters of the controllers (time in the phase, time in the yellow phase, countdowns...) are NumPy arrays
+    indexed like tl_ids, and the strategies evaluate their rules with masked operations on these arrays for all the
+    intersections at once, instead of a Python loop over the intersections.
+    At each step, update reads the current phases and states of all the traffic lights from the TrafficLightMirror.
+    The values of the detectors are aggregated for all the phases of the TLSTopology of the network at once (sums, any),
+    and read for the current phases with at. The phases with detectors are the rows of the topology : row[i] is the
+    row of the current phase of the traffic light i, or -1 if the phase has no detectors (yellow phase).
+    Only the traffic lights whose phase changes are set, with set_phases.
+    """
+
+    def __init__(self, network, tl_ids):
+        """
+        Init of class
+        :param network: The network of the intersections
+        :type network: src.sumo_experiments.Network
+        :param tl_ids: The ids of the traffic lights controlled by the strategy
+        :type tl_ids: list
+        """
+        self.network = network
+        self.tl_ids = tuple(tl_ids)
+        self.indexes = np.arange(len(self.tl_ids))
+        self.parameters = {}
+        self.traffic_lights = None
+        self.detector_bus = None
+        self.topology = None
+        self.nb_phases = None
+        self.phase_counts = None
+        self.phase = None
+        self.yellow = None
+        self.row = None
+
+    def counter(self, value=0):
+        """
+        Return a new counter of the intersections, as an array indexed like tl_ids.
+        :param value: The initial value of the counter
+        :type value: int
+        :return: The counter
+        :rtype: numpy.ndarray
+        """
+        return np.full(len(self.tl_ids), value, dtype=np.int64)
+
+    def view(self, counter, tl_ids=None, default=0, missing=None):
+        """
+        Return the values of a counter as a dict keyed by the ids of the traffic lights.
+        :param counter: The counter, indexed like self.tl_ids
+        :type counter: numpy.ndarray
+        :param tl_ids: The keys of the dict. Default is self.tl_ids.
+        :type tl_ids: list
+        :param default: The value of the traffic lights that are not controlled by the engine
+        :type default: int
+        :param missing: A value of the counter that is returned as None
+        :type missing: int
+        :return: The value of the counter for each traffic light
+        :rtype: dict
+        """
+        values = {tl_id: (None if counter[i] == missing else int(counter[i])) for i, tl_id in enumerate(self.tl_ids)}
+        if tl_ids is None:
+            return values
+        return {tl_id: values.get(tl_id, default) for tl_id in tl_ids}
+
+    def parameter(self, name, values):
+        """
+        Store a parameter of the intersections as an array indexed like tl_ids, in self.parameters. The None values
+        are stored as NaN.
+        :param name: The name of the parameter
+        :type name: str
+        :param values: The value of the parameter for each intersection
+        :type values: dict
+        :return: The parameter
+        :rtype: numpy.ndarray
+        """
+        self.parameters[name] = np.array([np.nan if values[tl_id] is None else values[tl_id] for tl_id in self.tl_ids], dtype=np.float64)
+        return self.parameters[name]
+
+    def start(self, traffic_lights, detector_bus=None):
+        """
+        Start the engine, once the programs of the traffic lights are set.
+        :param traffic_lights: The mirror of the traffic lights
+        :type traffic_lights: sumo_experiments.traci_util.TrafficLightMirror
+        :param detector_bus: The bus of the detectors, if the strategy reads the detectors
+        :type detector_bus: sumo_experiments.traci_util.DetectorBus
+        """
+        self.traffic_lights = traffic_lights
+        self.detector_bus = detector_bus
+        self.topology = TLSTopology.of(self.network) if detector_bus is None else detector_bus.topology
+        topology = self.topology
+        self.positions = np.array([topology.tl_index[tl_id] for tl_id in self.tl_ids], dtype=np.int64)
+        offsets = topology.phase_offsets
+        self.row_offsets = offsets[:-1]
+        self.nb_rows = np.diff(offsets)
+        self.row_tl = np.repeat(np.arange(len(topology.tl_ids)), self.nb_rows)
+        self.row_position = np.arange(offsets[-1]) - self.row_offsets[self.row_tl]
+        self.row_phase = np.array([phase for tl_id in topology.tl_ids for phase in topology.phases[tl_id]], dtype=np.int64)
+        self.nb_phases = np.array([traffic_lights.nb_phases(tl_id) for tl_id in self.tl_ids], dtype=np.int64)
+        # One more column, for the phase following the last phase
+        width = max([0] + self.nb_phases.tolist() + (self.row_phase + 1).tolist()) + 1
+        self.row_table = np.full((len(self.tl_ids), width), -1, dtype=np.int64)
+        for i, tl_id in enumerate(self.tl_ids):
+            for phase, row in topology.rows[tl_id].items():
+                self.row_table[i, phase] = row
+        self.phase_counts = np.zeros((len(self.tl_ids), width), dtype=np.int64)
+        self.row_sets = {}
+
+    def update(self):
+        """
+        Read the current phases and states of the traffic lights, and the detectors, for the current step.
+        Must be called at each step before evaluating the rules.
+        """
+        self.traffic_lights.update()
+        if self.detector_bus is not None:
+            self.detector_bus.update()
+        self.phase = np.array(self.traffic_lights.phases(self.tl_ids), dtype=np.int64)
+        self.yellow = np.fromiter(('y' in state for state in self.traffic_lights.states(self.tl_ids)), dtype=bool, count=len(self.tl_ids))
+        self.row = self.rows_of(self.phase)
+
+    def rows_of(self, phases):
+        """
+        Return the rows of phases of the intersections.
+        :param phases: The phase of each intersection
+        :type phases: numpy.ndarray
+        :return: The row of each phase, -1 if the phase has no detectors
+        :rtype: numpy.ndarray
+        """
+        phases = np.asarray(phases, dtype=np.int64)
+        valid = (phases >= 0) & (phases < self.row_table.shape[1])
+        rows = np.full(len(self.tl_ids), -1, dtype=np.int64)
+        rows[valid] = self.row_table[self.indexes[valid], phases[valid]]
+        return rows
+
+    def phases_of(self, rows, default=-1):
+        """
+        Return the phases of rows of the intersections.
+        :param rows: The row of each intersection
+        :type rows: numpy.ndarray
+        :param default: The phase of the intersections without row
+        :type default: int or numpy.ndarray
+        :return: The phase of each row
+        :rtype: numpy.ndarray
+        """
+        return self.at(self.row_phase, rows, default)
+
+    def at(self, row_values, rows=None, default=0):
+        """
+        Return values of rows for the intersections.
+        :param row_values: The value of each row of the topology
+        :type row_values: numpy.ndarray
+        :param rows: The row of each intersection. Default is the row of the current phases.
+        :type rows: numpy.ndarray
+        :param default: The value of the intersections without row
+        :return: The value of each intersection
+        :rtype: numpy.ndarray
+        """
+        rows = self.row if rows is None else rows
+        if len(row_values) == 0:
+            return np.broadcast_to(default, rows.shape).copy()
+        return np.where(rows >= 0, row_values[np.maximum(rows, 0)], default)
+
+    def count_phases(self, mask):
+        """
+        Count one more occurence of the current phase of the intersections of a mask.
+        :param mask: The intersections
+        :type mask: numpy.ndarray
+        """
+        self.phase_counts[self.indexes[mask], self.phase[mask]] += 1
+
+    def phases_occurences(self):
+        """
+        Return the number of steps spent in each phase by each intersection, for the phases counted with count_phases.
+        :return: The number of occurences of each phase of each intersection
+        :rtype: dict
+        """
+        if self.phase_counts is None:
+            return {tl_id: {} for tl_id in self.tl_ids}
+        return {tl_id: {int(phase): int(self.phase_counts[i, phase]) for phase in np.flatnonzero(self.phase_counts[i])} for i, tl_id in enumerate(self.tl_ids)}
+
+    def sums(self, variable, kind, detector_type):
+        """
+        Return the sum of a variable of the detectors of each row of the topology.
+        :param variable: The TraCI variable (from traci.constants)
+        :type variable: int
+        :param kind: The detectors of the row : 'green', 'others' or 'red', as TLSTopology.green, others and red
+        :type kind: str
+        :param detector_type: The type of the detectors ('boolean', 'saturation', 'numerical' or 'exit')
+        :type detector_type: str
+        :return: The sum of each row
+        :rtype: numpy.ndarray
+        """
+        rows, detectors, read = self._row_set(kind, detector_type)
+        return np.bincount(rows, weights=self.detector_bus.values(variable, read)[detectors], minlength=len(self.row_phase))
+
+    def any(self, variable, kind, detector_type):
+        """
+        Return True for the rows of the topology with a positive value of a variable for one of their detectors.
+        :param variable: The TraCI variable (from traci.constants)
+        :type variable: int
+        :param kind: The detectors of the row : 'green', 'others' or 'red', as TLSTopology.green, others and red
+        :type kind: str
+        :param detector_type: The type of the detectors ('boolean', 'saturation', 'numerical' or 'exit')
+        :type detector_type: str
+        :return: True for the rows with a positive value
+        :rtype: numpy.ndarray
+        """
+        rows, detectors, read = self._row_set(kind, detector_type)
+        return np.bincount(rows, weights=self.detector_bus.values(variable, read)[detectors] > 0, minlength=len(self.row_phase)) > 0
+
+    def first_rows(self, mask, start_rows=None):
+        """
+        Return the first row of each intersection for which the mask is True, in the order of the phases of the
+        topology, or in the order of the cycle of phases starting from start_rows.
+        :param mask: The mask of the rows of the topology
+        :type mask: numpy.ndarray
+        :param start_rows: The first row of the cycle of each intersection. Default is the first phase.
+        :type start_rows: numpy.ndarray
+        :return: The row of each intersection, -1 if the mask is False for all its rows
+        :rtype: numpy.ndarray
+        """
+        first_rows = self.row_offsets[self.positions]
+        nb_rows = np.maximum(self.nb_rows, 1)
+        start = np.zeros(len(self.nb_rows), dtype=np.int64)
+        if start_rows is not None:
+            start[self.positions] = np.where(start_rows >= 0, start_rows - first_rows, 0)
+        distances = (self.row_position - start[self.row_tl]) % nb_rows[self.row_tl]
+        best = np.full(len(self.nb_rows), len(self.row_phase), dtype=np.int64)
+        np.minimum.at(best, self.row_tl[mask], distances[mask])
+        best = best[self.positions]
+        rows = first_rows + (start[self.positions] + best) % nb_rows[self.positions]
+        return np.where(best < len(self.row_phase), rows, -1)
+
+    def best_rows(self, row_values):
+        """
+        Return the row with the maximum value of each intersection, the first in the order of the phases of the
+        topology if several rows have the maximum value.
+        :param row_values: The value of each row of the topology
+        :type row_values: numpy.ndarray
+        :return: The row of each intersection, -1 if the intersection has no row
+        :rtype: numpy.ndarray
+        """
+        maxima = np.full(len(self.nb_rows), -np.inf)
+        np.maximum.at(maxima, self.row_tl, row_values)
+        return self.first_rows(row_values == maxima[self.row_tl])
+
+    def set_phases(self, mask, phases):
+        """
+        Set the phases of the intersections of a mask, in the order of tl_ids.
+        :param mask: The intersections to set
+        :type mask: numpy.ndarray
+        :param phases: The phase of each intersection
+        :type phases: numpy.ndarray
+        """
+        for i in np.flatnonzero(mask):
+            self.traffic_lights.set_phase(self.tl_ids[i], int(phases[i]))
+
+    def _row_set(self, kind, detector_type):
+        """
+        Return the rows and the detectors of the pairs (row, detector) of a kind of detectors, and the detectors read
+        from the bus, built the first time.
+        """
+        key = (kind, detector_type)
+        if key not in self.row_sets:
+            select = {'green': self.topology.green, 'others': self.topology.others, 'red': self.topology.red}[kind]
+            rows = []
+            detectors = []
+            for tl_id in self.topology.tl_ids:
+                for phase, row in self.topology.rows[tl_id].items():
+                    row_detectors = select(tl_id, phase, detector_type)
+                    rows += [row] * len(row_detectors)
+                    detectors += row_detectors.tolist()
+            detectors = np.array(detectors, dtype=np.int64)
+            self.row_sets[key] = (np.array(rows, dtype=np.int64), detectors, np.unique(detectors))
+        return self.row_sets[key]
@@ -1,5 +1,7 @@
 from sumo_experiments.strategies import Strategy
-
+from sumo_experiments.strategies.controller_engine import ControllerEngine
+from sumo_experiments.preset_networks import TLSTopology
+import numpy as np
 
 
 class FixedTimeStrategy(Strategy):
@@ -7,7 +9,7 @@ class FixedTimeStrategy(Strategy):
     Implement a fixed time agent for all intersections of the Bologna network.
     """
 
-    def __init__(self, network, phase_times=None, yellow_time=3):
+    def __init__(self, network, phase_times=None, yellow_time=3, offload=False):
         """
         Init of class
         :param network: The network to deploy the strategy
@@ -16,6 +18,8 @@ class FixedTimeStrategy(Strategy):
         :type phase_times: dict
         :param yellow_time: Yellow phases duration for all intersections
         :type yellow_time: int or dict
+        :param offload: If True, the controllers are compiled into static SUMO programs (see compile_program), run by SUMO without any TraCI call, and the phases statistics are reconstructed from the programs and the number of steps. The phases read after a step (e.g. by the save_phases option of the TraciWrapper) are then one step behind the Python mode : the controllers set the phase of the next step, while SUMO reports the phase of the step just run, so the phase read after the step k + 1 in this mode is the one read after the step k in the Python mode.
+        :type offload: bool
         """
         super().__init__()
         self.phase_times = phase_times
@@ -25,48 +29,130 @@ class FixedTimeStrategy(Strategy):
         else:
             self.yellow_time = {identifiant: yellow_time for identifiant in network.TLS_DETECTORS}
         self.network = network
-        self.time = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.current_yellow_time = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.nb_switch = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.next_phase = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.current_phase = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
+        # The counters of the intersections, indexed like network.TL_IDS, and read as dicts through the properties
+        self.engine = ControllerEngine(network, network.TL_IDS)
+        self._time = self.engine.counter()
+        self._current_yellow_time = self.engine.counter()
+        self._nb_switch = self.engine.counter()
+        self._next_phase = self.engine.counter()
+        self._current_phase = self.engine.counter()
         self.nb_phases = {}
-        self.phases_occurences = {identifiant: {} for identifiant in network.TLS_DETECTORS}
-        self.phases_durations = {identifiant: [] for identifiant in network.TLS_DETECTORS}
-        self.current_phase_duration = {identifiant: 0 for identifiant in network.TLS_DETECTORS}
+        self._phases_durations = {identifiant: [] for identifiant in network.TLS_DETECTORS}
+        self._current_phase_duration = self.engine.counter()
+        self.offload = offload
+        # The number of calls of run_all_agents, and the cycle of the offloaded programs as (green phase, green steps, yellow steps) for each intersection
+        self.nb_steps = 0
+        self.cycles = {}
+        self.replayed_steps = None
+        self.replayed_occurences = {}
+
+    @property
+    def phases_occurences(self):
+        """
+        The number of steps spent in each green phase by each intersection.
+        """
+        if self.offload:
+            self._replay_programs()
+            return self.replayed_occurences
+        return self.engine.phases_occurences()
+
+    @property
+    def nb_switch(self):
+        """
+        The number of switches of each intersection.
+        """
+        if self.offload:
+            self._replay_programs()
+        return self.engine.view(self._nb_switch)
+
+    @property
+    def phases_durations(self):
+        """
+        The (phase, duration) of each green phase ended by each intersection.
+        """
+        if self.offload:
+            self._replay_programs()
+        return self._phases_durations
+
+    @property
+    def time(self):
+        """
+        The time spent in the current phase by each intersection.
+        """
+        return self.engine.view(self._time)
+
+    @property
+    def current_yellow_time(self):
+        """
+        The time spent in the current yellow phase by each intersection.
+        """
+        return self.engine.view(self._current_yellow_time)
+
+    @property
+    def next_phase(self):
+        """
+        The phase following the current yellow phase of each intersection.
+        """
+        return self.engine.view(self._next_phase)
+
+    @property
+    def current_phase(self):
+        """
+        The current phase of each intersection.
+        """
+        return self.engine.view(self._current_phase)
+
+    @property
+    def current_phase_duration(self):
+        """
+        The duration of the current green phase of each intersection.
+        """
+        return self.engine.view(self._current_phase_duration)
 
     def run_all_agents(self, traci):
         """
         Process agents to make one action each.
         :return: Nothing
         """
-        if not self.started:
+        self.nb_steps += 1
+        if not self.started and self.offload:
             self.traci = traci
+            self.topology = TLSTopology.of(self.network)
+            self._offload_programs(traci, {tl_id: self.compile_program(tl_id) for tl_id in self.network.TL_IDS})
+            self.started = True
+        elif self.offload:
+            return
+        elif not self.started:
+            self.traci = traci
+            self._mirror_traffic_lights(traci, self.network.TL_IDS)
+            self.topology = TLSTopology.of(self.network)
             for tl_id in self.network.TL_IDS:
                 self._start_agents(tl_id)
+            self.engine.parameter('yellow_time', self.yellow_time)
+            self.engine.start(self.traffic_lights)
+            # The time of the phase of each row of the topology
+            self.row_phase_times = np.full(len(self.engine.row_phase), np.inf)
+            for tl_id in self.network.TL_IDS:
+                for phase, row in self.topology.rows[tl_id].items():
+                    self.row_phase_times[row] = self.phase_times[tl_id][self.topology.position(tl_id, phase)]
         else:
+            self.engine.update()
             self.zeus_monitor.begin_window("all_agents")
-            for tl_id in self.network.TL_IDS:
-                current_phase = self.traci.trafficlight.getPhase(tl_id)
-                if 'y' in self.traci.trafficlight.getRedYellowGreenState(tl_id):
-                    if self.current_yellow_time[tl_id] >= self.yellow_time[tl_id]:
-                        self.traci.trafficlight.setPhase(tl_id, self.next_phase[tl_id])
-                        self.current_phase[tl_id] = self.next_phase[tl_id]
-                        self.current_yellow_time[tl_id] = 0
-                    else:
-                        self.current_yellow_time[tl_id] += 1
-                else:
-                    # Counting phase occurences
-                    if current_phase not in self.phases_occurences[tl_id]:
-                        self.phases_occurences[tl_id][current_phase] = 1
-                    else:
-                        self.phases_occurences[tl_id][current_phase] += 1
-                    index_phase = list(self.network.TLS_DETECTORS[tl_id].keys()).index(current_phase)
-                    if self.time[tl_id] > self.phase_times[tl_id][index_phase]:
-                        self.switch_next_phase(tl_id)
-                    else:
-                        self.time[tl_id] += 1
-                    self.current_phase_duration[tl_id] += 1
+            engine = self.engine
+            yellow = engine.yellow
+            end_yellow = yellow & (self._current_yellow_time >= engine.parameters['yellow_time'])
+            self._current_yellow_time[yellow] += 1
+            self._current_yellow_time[end_yellow] = 0
+            phases = self._next_phase.copy()
+            self._current_phase[end_yellow] = self._next_phase[end_yellow]
+            green = ~yellow
+            engine.count_phases(green)
+            switch = green & (self._time > engine.at(self.row_phase_times, default=np.inf))
+            self._time[green & ~switch] += 1
+            if switch.any():
+                phases[switch] = self.switch_next_phases(switch)[switch]
+            self._current_phase_duration[green] += 1
+            engine.set_phases(end_yellow | switch, phases)
             results = self.zeus_monitor.end_window("all_agents")
             self.energy_consumption += self.get_energy_consumption(results)
 
@@ -75,7 +161,7 @@ class FixedTimeStrategy(Strategy):
         """
         Start an agent at the beginning of the simulation.
         """
-        self.nb_phases[tl_id] = len(self.traci.trafficlight.getAllProgramLogics(tl_id)[0].phases)
+        self.nb_phases[tl_id] = self.traffic_lights.nb_phases(tl_id)
         tl_logic = self.traci.trafficlight.getAllProgramLogics(tl_id)[0]
         phase_index = 0
         for phase in tl_logic.phases:
@@ -83,40 +169,94 @@ class FixedTimeStrategy(Strategy):
             phase.maxDur = 10000
             phase.minDur = 10000
             phase_index += 1
-        self.traci.trafficlight.setProgramLogic(tl_id, tl_logic)
-        self.traci.trafficlight.setPhase(tl_id, 0)
+        self.traffic_lights.set_program_logic(tl_id, tl_logic)
+        self.traffic_lights.set_phase(tl_id, 0)
         self.traci.trafficlight.setPhaseDuration(tl_id, 10000)
         self.started = True
 
-    def switch_next_phase(self, tl_id):
+    def switch_next_phases(self, switch):
         """
-        Switch the traffic light id_tls to the next
+        Switch the traffic lights of a mask to their next phase
+        :param switch: The traffic lights to switch, indexed like network.TL_IDS
+        :type switch: numpy.ndarray
+        :return: The phase set for each traffic light
+        :rtype: numpy.ndarray
         """
-        self.nb_switch[tl_id] += 1
-        current_phase = self.traci.trafficlight.getPhase(tl_id)
-        self.next_phase[tl_id] = self.get_next_phase(tl_id)
-        if current_phase == self.nb_phases[tl_id] - 1:
-            self.traci.trafficlight.setPhase(tl_id, 0)
-        else:
-            self.traci.trafficlight.setPhase(tl_id, self.current_phase[tl_id] + 1)
-        self.time[tl_id] = 0
-        self.phases_durations[tl_id].append((current_phase, self.current_phase_duration[tl_id]))
-        self.current_phase_duration[tl_id] = 0
+        self._nb_switch[switch] += 1
+        current_phases = self.engine.phase
+        self._next_phase[switch] = self.get_next_phases()[switch]
+        self._time[switch] = 0
+        for i in np.flatnonzero(switch):
+            self._phases_durations[self.engine.tl_ids[i]].append((int(current_phases[i]), int(self._current_phase_duration[i])))
+        self._current_phase_duration[switch] = 0
+        return np.where(current_phases == self.engine.nb_phases - 1, 0, self._current_phase + 1)
 
 
-    def get_next_phase(self, tl_id):
+    def get_next_phases(self):
+        """
+        Get the next phase of all the controllers : the next phase in the order of the phases, or 0 after the last phase.
+        :return: The next phase of each controller, indexed like network.TL_IDS
+        :rtype: numpy.ndarray
+        """
+        engine = self.engine
+        rows = engine.row
+        last = engine.at(engine.row_position == engine.nb_rows[engine.row_tl] - 1, default=True)
+        return np.where(last, 0, engine.phases_of(np.where(last, -1, rows + 1), 0))
+
+    def compile_program(self, tl_id):
         """
-        Get the next phase for the controller.
+        Compile the controller of an intersection into a static SUMO program, with the timing of the controller : each
+        green phase lasts its phase time + 2 steps, and is followed by the next phase of the program (the yellow phase)
+        for yellow time + 1 steps, then by the next green phase of the intersection. The vehicles see the same phases as
+        with the controller, but the phases read after a step are the ones of the step, while the controller sets the
+        phase of the next step.
         :param tl_id: The id of the traffic light
         :type tl_id: str
-        :return: The next phase for the controller
-        :rtype: int
+        :return: The program of the traffic light
+        :rtype: traci.trafficlight.Logic
         """
-        phases = list(self.network.TLS_DETECTORS[tl_id].keys())
-        current_phase = self.traci.trafficlight.getPhase(tl_id)
-        if current_phase == phases[-1]:
-            return 0
-        else:
-            phases = phases * 2
-            return phases[phases.index(current_phase) + 1]
+        phases = self.topology.phases[tl_id]
+        green_phases = {}
+        cycle = []
+        for position, phase in enumerate(phases):
+            # After the last phase, the controller goes back to the phase 0
+            next_phase = 0 if position == len(phases) - 1 else phases[position + 1]
+            green_steps = self.phase_times[tl_id][position] + 2
+            green_phases[phase] = (green_steps, green_steps, (next_phase,))
+            cycle.append((phase, green_steps, self.yellow_time[tl_id] + 1))
+        logic = self._native_program(self.traci, tl_id, 0, green_phases, self.yellow_time[tl_id] + 1)
+        self.nb_phases[tl_id] = len(logic.phases)
+        # The cycle of the controller starts from the phase 0
+        start = phases.index(0)
+        self.cycles[tl_id] = cycle[start:] + cycle[:start]
+        return logic
 
+    def _replay_programs(self):
+        """
+        Reconstruct the number of switches, the phases durations and the phases occurences of the offloaded programs,
+        as counted by the controllers, from the number of steps they ran. As in the Python mode, the first step starts
+        the controllers, and the phases are counted from the next step. The duration of a phase is counted from the
+        step of the previous switch, where the controller counts one step for the phase it switches to.
+        """
+        if self.replayed_steps == self.nb_steps:
+            return
+        self.replayed_steps = self.nb_steps
+        self._nb_switch[:] = 0
+        self.replayed_occurences = {}
+        for i, tl_id in enumerate(self.network.TL_IDS):
+            self._phases_durations[tl_id] = []
+            occurences = {}
+            steps = self.nb_steps - 1
+            duration = 0
+            position = 0
+            cycle = self.cycles.get(tl_id, [])
+            while cycle and steps > 0:
+                green_phase, green_steps, yellow_steps = cycle[position]
+                occurences[green_phase] = occurences.get(green_phase, 0) + min(steps, green_steps)
+                if steps >= green_steps:
+                    self._nb_switch[i] += 1
+                    self._phases_durations[tl_id].append((green_phase, duration + green_steps - 1))
+                    duration = 1
+                steps -= green_steps + yellow_steps
+                position = (position + 1) % len(cycle)
+            self.replayed_occurences[tl_id] = occurences
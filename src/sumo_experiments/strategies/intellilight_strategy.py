@@ -1,6 +1,9 @@
 # from sumo.tools.emissions.findMinDiffModel import model
 from sumo_experiments.strategies import Strategy
+from sumo_experiments.traci_util import Profiler, DetectorBus
+from sumo_experiments.preset_networks import TLSTopology
 import numpy as np
+import traci.constants as tc
 import torch
 import torch.nn as nn
 import torch.optim as optim
@@ -143,6 +146,9 @@ class IntellilightStrategy(Strategy):
         self.phases_occurences = {identifiant: {} for identifiant in network.TLS_DETECTORS}
         self.phases_durations = {identifiant: [] for identifiant in network.TLS_DETECTORS}
         self.current_phase_duration = {identifiant: 0 for identifiant in network.TLS_DETECTORS}
+        self.topology = None
+        self.detector_bus = None
+        self.max_speeds = {}
 
     def run_all_agents(self, traci):
         """
@@ -153,12 +159,18 @@ class IntellilightStrategy(Strategy):
         """
         if not self.started:
             self.traci = traci
+            self._mirror_traffic_lights(traci, self.intelligent_intersections)
+            self.topology = TLSTopology.of(self.network)
+            self.detector_bus = DetectorBus.shared(traci, self.topology, DetectorBus.VARIABLES + [tc.VAR_INTERVAL_SPEED, tc.LAST_STEP_VEHICLE_ID_LIST])
+            self.detector_bus.update()
             for tl_id in self.intelligent_intersections:
                 self._start_agent(tl_id)
             if self.shared_network:
                 self._init_shared_networks()
             self.started = True
         else:
+            self.traffic_lights.update()
+            self.detector_bus.update()
             self._trained_this_step = set()
             self.zeus_monitor.begin_window("all_agents")
             timestep = self.traci.simulation.getTime()
@@ -182,15 +194,15 @@ class IntellilightStrategy(Strategy):
                 #     self.exploration_prob[tl_id] = self.exploration_prob[tl_id] - (self.exploration_prob[tl_id] * self.cooling_rate[tl_id])
                 #     self.last_state[tl_id] = None
                 #     self.last_action[tl_id] = None
-                if 'y' in self.traci.trafficlight.getRedYellowGreenState(tl_id):
+                if 'y' in self.traffic_lights.state(tl_id):
                     if self.current_yellow_time[tl_id] >= self.yellow_time[tl_id]:
-                        self.traci.trafficlight.setPhase(tl_id, int(self.next_phase[tl_id]))
+                        self.traffic_lights.set_phase(tl_id, int(self.next_phase[tl_id]))
                         self.current_phase[tl_id] = self.next_phase[tl_id]
                         self.current_yellow_time[tl_id] = 0
                     else:
                         self.current_yellow_time[tl_id] += 1
                 else:
-                    current_phase = self.traci.trafficlight.getPhase(tl_id)
+                    current_phase = self.traffic_lights.phase(tl_id)
                     # Counting phase occurences
                     if current_phase not in self.phases_occurences[tl_id]:
                         self.phases_occurences[tl_id][current_phase] = 1
@@ -202,18 +214,19 @@ class IntellilightStrategy(Strategy):
                         self.time[tl_id] += 1
                     self.current_phase_duration[tl_id] += 1
                 if len(self.replay_buffer[tl_id]) >= self.batch_size[tl_id] and (timestep % (self.update_target_frequency[tl_id] * self.period[tl_id]) == 0):
-                    self.train(tl_id)
+                    with Profiler.of(self.traci).span('intellilight:train'):
+                        self.train(tl_id)
             results = self.zeus_monitor.end_window("all_agents")
             self.energy_consumption += self.get_energy_consumption(results)
 
     def get_phase_onehot(self, tl_id):
-        keys = list(self.network.TLS_DETECTORS[tl_id].keys())
+        keys = self.topology.phases[tl_id]
         one_hot = np.zeros(len(keys), dtype=np.bool)
         one_hot[keys.index(self.current_phase[tl_id])] = 1
         return one_hot
 
     def one_hot_to_phase(self, tl_id, one_hot):
-        keys = list(self.network.TLS_DETECTORS[tl_id].keys())
+        keys = self.topology.phases[tl_id]
         return keys[np.argmax(one_hot)]
 
     def switch_next_phase(self, tl_id):
@@ -223,13 +236,12 @@ class IntellilightStrategy(Strategy):
         self.nb_switch[tl_id] += 1
         next_action = self.get_next_action(tl_id)
         if next_action == 1:
-            phases = list(self.network.TLS_DETECTORS[tl_id].keys())
-            self.next_phase[tl_id] = phases[phases.index(self.traci.trafficlight.getPhase(tl_id)) + 1] if phases.index(self.traci.trafficlight.getPhase(tl_id)) + 1 != len(phases) else phases[0]
-            if self.traci.trafficlight.getPhase(tl_id) == self.nb_phases[tl_id] - 1:
-                self.traci.trafficlight.setPhase(tl_id, 0)
+            self.next_phase[tl_id] = self.topology.next_phase(tl_id, self.traffic_lights.phase(tl_id))
+            if self.traffic_lights.phase(tl_id) == self.nb_phases[tl_id] - 1:
+                self.traffic_lights.set_phase(tl_id, 0)
             else:
-                self.traci.trafficlight.setPhase(tl_id, int(self.current_phase[tl_id] + 1))
-            current_phase = self.traci.trafficlight.getPhase(tl_id)
+                self.traffic_lights.set_phase(tl_id, int(self.current_phase[tl_id] + 1))
+            current_phase = self.traffic_lights.phase(tl_id)
             self.phases_durations[tl_id].append((current_phase, self.current_phase_duration[tl_id]))
             self.current_phase_duration[tl_id] = 0
         self.time[tl_id] = 0
@@ -356,7 +368,7 @@ class IntellilightStrategy(Strategy):
 
     def get_state(self, tl_id):
         detectors = self._detectors(tl_id)
-        L = [self.traci.lanearea.getJamLengthVehicle(det) / 10 for det in detectors]
+        L = [self.detector_bus.value(tc.JAM_LENGTH_VEHICLE, det) / 10 for det in detectors]
         W = [x / 20 for x in self.compute_waiting_time(detectors)]
         V = [x / 10 for x in self.compute_number_of_vehicles(tl_id)]
         P = [self.current_phase[tl_id]]
@@ -364,8 +376,8 @@ class IntellilightStrategy(Strategy):
 
     def get_reward(self, tl_id, change_phase=None):
         detectors = self._detectors(tl_id)
-        L = self.c1 * sum([self.traci.lanearea.getJamLengthVehicle(det) for det in detectors])
-        D = self.c2 * sum([1 - (self.traci.lanearea.getIntervalMeanSpeed(det) / self.traci.lane.getMaxSpeed(self.traci.lanearea.getLaneID(det))) for det in detectors])
+        L = self.c1 * sum([self.detector_bus.value(tc.JAM_LENGTH_VEHICLE, det) for det in detectors])
+        D = self.c2 * sum([1 - (self.detector_bus.value(tc.VAR_INTERVAL_SPEED, det) / self._max_speed(det)) for det in detectors])
         W = self.c3 * sum(self.compute_waiting_time(detectors))
         A = self.c4 * (self.DEBUG_REWARD if change_phase is None else change_phase)  # if change_phase is None this should not be in replay buffer
         # Number of vehicles that passed intersection have to be implemented
@@ -375,8 +387,8 @@ class IntellilightStrategy(Strategy):
 
     def get_score(self, tl_id, change_phase=None):
         detectors = self._detectors(tl_id)
-        L = self.c1 * sum([self.traci.lanearea.getJamLengthVehicle(det) for det in detectors])
-        D = self.c2 * sum([1 - (self.traci.lanearea.getIntervalMeanSpeed(det) / self.traci.lane.getMaxSpeed(self.traci.lanearea.getLaneID(det))) for det in detectors])
+        L = self.c1 * sum([self.detector_bus.value(tc.JAM_LENGTH_VEHICLE, det) for det in detectors])
+        D = self.c2 * sum([1 - (self.detector_bus.value(tc.VAR_INTERVAL_SPEED, det) / self._max_speed(det)) for det in detectors])
         W = self.c3 * sum(self.compute_waiting_time(detectors))
         # Number of vehicles that passed intersection have to be implemented
         # Travel time of vehicles that passed the intersection have to be implemented
@@ -389,27 +401,26 @@ class IntellilightStrategy(Strategy):
         waiting_times = []
         for det in detectors:
             waiting_time = 0
-            veh_ids = self.traci.lanearea.getLastStepVehicleIDs(det)
+            veh_ids = self.detector_bus.value(tc.LAST_STEP_VEHICLE_ID_LIST, det)
             for veh_id in veh_ids:
                 waiting_time += self.traci.vehicle.getAccumulatedWaitingTime(veh_id)
             waiting_times.append(waiting_time)
         return waiting_times
 
     def compute_number_of_vehicles(self, tl_id):
-        detectors = []
-        for phase in self.network.TLS_DETECTORS[tl_id]:
-            for det in self.network.TLS_DETECTORS[tl_id][phase]['numerical']:
-                if det not in detectors:
-                    detectors.append(det)
-        return list(self.traci.lanearea.getLastStepVehicleNumber(det) for det in detectors)
+        detectors = self.topology.tl_detector_names(tl_id, 'numerical')
+        return list(self.detector_bus.value(tc.LAST_STEP_VEHICLE_NUMBER, det) for det in detectors)
 
     def _detectors(self, tl_id):
-        detectors = []
-        for phase in self.network.TLS_DETECTORS[tl_id]:
-            for det in self.network.TLS_DETECTORS[tl_id][phase]['numerical']:
-                if det not in detectors:
-                    detectors.append(det)
-        return detectors
+        return self.topology.tl_detector_names(tl_id, 'numerical')
+
+    def _max_speed(self, detector):
+        """
+        Return the maximum speed of the lane of a detector, read once with TraCI.
+        """
+        if detector not in self.max_speeds:
+            self.max_speeds[detector] = self.traci.lane.getMaxSpeed(self.traci.lanearea.getLaneID(detector))
+        return self.max_speeds[detector]
 
     def _start_agent(self, tl_id):
         """
@@ -417,7 +428,7 @@ class IntellilightStrategy(Strategy):
         :param tl_id: The id of the TL
         :type tl_id: str
         """
-        self.nb_phases[tl_id] = len(self.traci.trafficlight.getAllProgramLogics(tl_id)[0].phases)
+        self.nb_phases[tl_id] = self.traffic_lights.nb_phases(tl_id)
         tl_logic = self.traci.trafficlight.getAllProgramLogics(tl_id)[0]
         phase_index = 0
         for phase in tl_logic.phases:
@@ -425,8 +436,8 @@ class IntellilightStrategy(Strategy):
             phase.maxDur = 10000
             phase.minDur = 10000
             phase_index += 1
-        self.traci.trafficlight.setProgramLogic(tl_id, tl_logic)
-        self.traci.trafficlight.setPhase(tl_id, 0)
+        self.traffic_lights.set_program_logic(tl_id, tl_logic)
+        self.traffic_lights.set_phase(tl_id, 0)
         self.traci.trafficlight.setPhaseDuration(tl_id, 10000)
         self.started = True
 
@@ -1,5 +1,9 @@
 from sumo_experiments.strategies import Strategy
+from sumo_experiments.strategies.controller_engine import ControllerEngine
+from sumo_experiments.traci_util import DetectorBus
+from sumo_experiments.preset_networks import TLSTopology
 import numpy as np
+import traci.constants as tc
 
 
 class LongestQueueFirstStrategy(Strategy):
@@ -27,19 +31,63 @@ class LongestQueueFirstStrategy(Strategy):
             self.yellow_time = yellow_time
         else:
             self.yellow_time = {identifiant: yellow_time for identifiant in network.TLS_DETECTORS}
-        self.current_phase = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.time = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.current_max_time_index = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.current_yellow_time = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
+        # The counters of the intersections, indexed like network.TL_IDS, and read as dicts through the properties
+        self.engine = ControllerEngine(network, network.TL_IDS)
+        self._current_phase = self.engine.counter()
+        self._time = self.engine.counter()
+        self._current_max_time_index = self.engine.counter()
+        self._current_yellow_time = self.engine.counter()
         self.started = False
         self.nb_phases = {}
-        self.nb_switch = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.next_phase = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
+        self._nb_switch = self.engine.counter()
+        self._next_phase = self.engine.counter()
         if type(period) is dict:
             self.period = period
         else:
             self.period = {identifiant: period for identifiant in network.TLS_DETECTORS}
 
+    @property
+    def current_phase(self):
+        """
+        The current phase of each intersection.
+        """
+        return self.engine.view(self._current_phase)
+
+    @property
+    def time(self):
+        """
+        The time spent in the current phase by each intersection.
+        """
+        return self.engine.view(self._time)
+
+    @property
+    def current_max_time_index(self):
+        """
+        The index of the current maximum duration of each intersection.
+        """
+        return self.engine.view(self._current_max_time_index)
+
+    @property
+    def current_yellow_time(self):
+        """
+        The time spent in the current yellow phase by each intersection.
+        """
+        return self.engine.view(self._current_yellow_time)
+
+    @property
+    def nb_switch(self):
+        """
+        The number of switches of each intersection.
+        """
+        return self.engine.view(self._nb_switch)
+
+    @property
+    def next_phase(self):
+        """
+        The phase following the current yellow phase of each intersection.
+        """
+        return self.engine.view(self._next_phase)
+
     def run_all_agents(self, traci):
         """
         Process agents to make one action each.
@@ -49,61 +97,57 @@ class LongestQueueFirstStrategy(Strategy):
         """
         if not self.started:
             self.traci = traci
+            self._mirror_traffic_lights(traci, self.network.TL_IDS)
             for tl_id in self.network.TL_IDS:
                 self._start_agent(tl_id)
+            self.topology = TLSTopology.of(self.network)
+            self.detector_bus = DetectorBus.shared(self.traci, self.topology, subscribe=False)
+            self.engine.parameter('yellow_time', self.yellow_time)
+            self.engine.parameter('period', self.period)
+            self.engine.start(self.traffic_lights, self.detector_bus)
             self.started = True
         else:
-            for tl_id in self.network.TL_IDS:
-                if 'y' in self.traci.trafficlight.getRedYellowGreenState(tl_id):
-                    if self.current_yellow_time[tl_id] >= self.yellow_time[tl_id]:
-                        self.traci.trafficlight.setPhase(tl_id, int(self.next_phase[tl_id]))
-                        self.current_phase[tl_id] = self.next_phase[tl_id]
-                        self.current_yellow_time[tl_id] = 0
-                    else:
-                        self.current_yellow_time[tl_id] += 1
-                else:
-                    if self.time[tl_id] > self.period[tl_id]:
-                        self.switch_next_phase(tl_id)
-                    else:
-                        self.time[tl_id] += 1
-
-
-    def switch_next_phase(self, tl_id):
-        """
-        Switch the traffic light id_tls to the next
-        """
-        self.nb_switch[tl_id] += 1
-        #current_phase = self.traci.trafficlight.getPhase(id_tls)
-        next_phase = self.get_next_phase(tl_id)
-        if next_phase != self.current_phase[tl_id]:
-            self.next_phase[tl_id] = next_phase
-        else:
-            phases_with_exclusion = list(self.network.TLS_DETECTORS[tl_id].keys())
-            phases_with_exclusion.remove(int(self.get_next_phase(tl_id)))
-            self.next_phase[tl_id] = np.random.choice(phases_with_exclusion)
-        if self.traci.trafficlight.getPhase(tl_id) == self.nb_phases[tl_id] - 1:
-            self.traci.trafficlight.setPhase(tl_id, 0)
-        else:
-            self.traci.trafficlight.setPhase(tl_id, int(self.current_phase[tl_id] + 1))
-        self.time[tl_id] = 0
+            self.engine.update()
+            yellow = self.engine.yellow
+            end_yellow = yellow & (self._current_yellow_time >= self.engine.parameters['yellow_time'])
+            self._current_yellow_time[yellow] += 1
+            self._current_yellow_time[end_yellow] = 0
+            phases = self._next_phase.copy()
+            self._current_phase[end_yellow] = self._next_phase[end_yellow]
+            switch = ~yellow & (self._time > self.engine.parameters['period'])
+            self._time[~yellow & ~switch] += 1
+            if switch.any():
+                phases[switch] = self.switch_next_phases(switch)[switch]
+            self.engine.set_phases(end_yellow | switch, phases)
 
 
-    def get_next_phase(self, tl_id):
+    def switch_next_phases(self, switch):
         """
-        Get the next phase for the controller.
-        :param tl_id: The id of the traffic light
-        :type tl_id: str
-        :return: The next phase for the controller
-        :rtype: int
+        Switch the traffic lights of a mask to their next phase
+        :param switch: The traffic lights to switch, indexed like network.TL_IDS
+        :type switch: numpy.ndarray
+        :return: The phase set for each traffic light
+        :rtype: numpy.ndarray
+        """
+        self._nb_switch[switch] += 1
+        next_phases = self.get_next_phases()
+        self._next_phase[switch] = next_phases[switch]
+        for i in np.flatnonzero(switch & (next_phases == self._current_phase)):
+            phases_with_exclusion = list(self.topology.phases[self.engine.tl_ids[i]])
+            phases_with_exclusion.remove(int(next_phases[i]))
+            self._next_phase[i] = np.random.choice(phases_with_exclusion)
+        self._time[switch] = 0
+        return np.where(self.engine.phase == self.engine.nb_phases - 1, 0, self._current_phase + 1)
+
+
+    def get_next_phases(self):
+        """
+        Get the next phase of all the controllers : the phase with the longest queue.
+        :return: The next phase of each controller, indexed like network.TL_IDS
+        :rtype: numpy.ndarray
         """
-        phases = list(self.network.TLS_DETECTORS[tl_id].keys())
-        queue_lengths = {}
-        for phase in phases:
-            queue_lengths[phase] = 0
-            for det in self.network.TLS_DETECTORS[tl_id][phase]['numerical']:
-                queue_lengths[phase] += self.traci.lanearea.getJamLengthVehicle(det)
-        longest_queue = sorted(queue_lengths, key=queue_lengths.get, reverse=True)[0]
-        return longest_queue
+        queue_lengths = self.engine.sums(tc.JAM_LENGTH_VEHICLE, 'green', 'numerical')
+        return self.engine.phases_of(self.engine.best_rows(queue_lengths))
 
 
 
@@ -113,7 +157,7 @@ class LongestQueueFirstStrategy(Strategy):
         :param tl_id: The id of the TL
         :type tl_id: str
         """
-        self.nb_phases[tl_id] = len(self.traci.trafficlight.getAllProgramLogics(tl_id)[0].phases)
+        self.nb_phases[tl_id] = self.traffic_lights.nb_phases(tl_id)
         tl_logic = self.traci.trafficlight.getAllProgramLogics(tl_id)[0]
         phase_index = 0
         for phase in tl_logic.phases:
@@ -121,7 +165,7 @@ class LongestQueueFirstStrategy(Strategy):
             phase.maxDur = 10000
             phase.minDur = 10000
             phase_index += 1
-        self.traci.trafficlight.setProgramLogic(tl_id, tl_logic)
-        self.traci.trafficlight.setPhase(tl_id, 0)
+        self.traffic_lights.set_program_logic(tl_id, tl_logic)
+        self.traffic_lights.set_phase(tl_id, 0)
         self.traci.trafficlight.setPhaseDuration(tl_id, 10000)
         self.started = True
\ No newline at end of file
@@ -1,5 +1,8 @@
 #from sumo.tools.emissions.findMinDiffModel import model
 from . import Strategy
+from sumo_experiments.traci_util import Profiler, DetectorBus
+from sumo_experiments.preset_networks import TLSTopology
+import traci.constants as tc
 import numpy as np
 import torch
 import torch.nn as nn
@@ -101,6 +104,9 @@ class MADDPGStrategy(IntellilightStrategy):
         self.current_max_time_index = {tl_id: 0 for tl_id in self.network.TLS_DETECTORS}
         self.current_yellow_time = {tl_id: 0 for tl_id in self.network.TLS_DETECTORS}
         self.started = False
+        self.topology = None
+        self.detector_bus = None
+        self.max_speeds = {}
         self.nb_phases = {}
         self.nb_switch = {tl_id: 0 for tl_id in self.network.TLS_DETECTORS}
         self.next_phase = {tl_id: 0 for tl_id in self.network.TLS_DETECTORS}
@@ -204,6 +210,10 @@ class MADDPGStrategy(IntellilightStrategy):
         """
         if not self.started:
             self.traci = traci
+            self._mirror_traffic_lights(traci, self.intelligent_intersections)
+            self.topology = TLSTopology.of(self.network)
+            self.detector_bus = DetectorBus.shared(traci, self.topology, DetectorBus.VARIABLES + [tc.VAR_INTERVAL_SPEED, tc.LAST_STEP_VEHICLE_ID_LIST])
+            self.detector_bus.update()
             for tl_id in self.intelligent_intersections:
                 self._start_agent(tl_id)
 
@@ -234,6 +244,8 @@ class MADDPGStrategy(IntellilightStrategy):
 
             self.time_step = 1
         else:
+            self.traffic_lights.update()
+            self.detector_bus.update()
             self.zeus_monitor.begin_window("all_agents")
             if self.traci.simulation.getTime() % self.episode_duration == 0:
                 if self._mean_score_i < self.mean_scores.size:
@@ -252,15 +264,15 @@ class MADDPGStrategy(IntellilightStrategy):
                     self._debug_fig.savefig(f'strategy_debug_{self.__name__}.png')
             for tl_id in self.intelligent_intersections:
                 # assert self.time_step == self.traci.simulation.getTime(), print(self.time_step, self.traci.simulation.getTime())
-                if 'y' in self.traci.trafficlight.getRedYellowGreenState(tl_id):
+                if 'y' in self.traffic_lights.state(tl_id):
                     if self.current_yellow_time[tl_id] >= self.yellow_time[tl_id]:
-                        self.traci.trafficlight.setPhase(tl_id, int(self.next_phase[tl_id]))
+                        self.traffic_lights.set_phase(tl_id, int(self.next_phase[tl_id]))
                         self.current_phase[tl_id] = self.next_phase[tl_id]
                         self.current_yellow_time[tl_id] = 0
                     else:
                         self.current_yellow_time[tl_id] += 1
                 else:
-                    current_phase = self.traci.trafficlight.getPhase(tl_id)
+                    current_phase = self.traffic_lights.phase(tl_id)
                     # Counting phase occurences
                     if current_phase not in self.phases_occurences[tl_id]:
                         self.phases_occurences[tl_id][current_phase] = 1
@@ -271,7 +283,8 @@ class MADDPGStrategy(IntellilightStrategy):
             if self.time_step % self.period == 0:
                 self.switch_next_phase()
             if (len(self.replay_buffer) >= self.samples_before_update) and (self.time_step % self.steps_per_update == 0):
-                self.train()
+                with Profiler.of(self.traci).span('maddpg:update'):
+                    self.train()
             self.time_step += 1
             results = self.zeus_monitor.end_window("all_agents")
             self.energy_consumption += self.get_energy_consumption(results)
@@ -283,20 +296,20 @@ class MADDPGStrategy(IntellilightStrategy):
         """
         next_phases = self.get_next_phases()
         for tl_id in self.intelligent_intersections:
-            current_phase = self.traci.trafficlight.getPhase(tl_id)
+            current_phase = self.traffic_lights.phase(tl_id)
             if next_phases[tl_id] != self.current_phase[tl_id]:
                 self.nb_switch[tl_id] += 1
                 self.next_phase[tl_id] = next_phases[tl_id]
-                if self.traci.trafficlight.getPhase(tl_id) == self.nb_phases[tl_id] - 1:
-                    self.traci.trafficlight.setPhase(tl_id, 0)
+                if self.traffic_lights.phase(tl_id) == self.nb_phases[tl_id] - 1:
+                    self.traffic_lights.set_phase(tl_id, 0)
                 else:
-                    self.traci.trafficlight.setPhase(tl_id, int(self.current_phase[tl_id] + 1))
+                    self.traffic_lights.set_phase(tl_id, int(self.current_phase[tl_id] + 1))
             self.time[tl_id] = 0
             self.phases_durations[tl_id].append((current_phase, self.current_phase_duration[tl_id]))
             self.current_phase_duration[tl_id] = 0
 
     def ohe_state(self, tl_id):
-        phases = list(self.network.TLS_DETECTORS[tl_id].keys())
+        phases = self.topology.phases[tl_id]
         num_phases = len(phases)
         idx = phases.index(self.current_phase[tl_id])
         one_hot = np.zeros(num_phases, dtype=np.bool_)
@@ -305,7 +318,7 @@ class MADDPGStrategy(IntellilightStrategy):
     
     def get_state(self, tl_id):
         detectors = self._detectors(tl_id)
-        L = [self.traci.lanearea.getJamLengthVehicle(det) / 10 for det in detectors]
+        L = [self.detector_bus.value(tc.JAM_LENGTH_VEHICLE, det) / 10 for det in detectors]
         W = [x / 20 for x in self.compute_waiting_time(detectors)]
         V = [x / 10 for x in self.compute_number_of_vehicles(tl_id)]
         P = self.ohe_state(tl_id).tolist()
@@ -397,7 +410,7 @@ class MADDPGStrategy(IntellilightStrategy):
         self.maddpg.prep_rollouts(device=self.rollout_device)
 
     def get_reward(self, tl_id, change_phase=None):
-        pressure = MaxPressureStrategy._compute_pressure(self, self.network.TLS_DETECTORS[tl_id])
+        pressure = MaxPressureStrategy._compute_pressure(self, tl_id)
         base_reward = -np.nanmean(list(pressure.values())) / 2000
         scale = episode_reward_scale(
             self.episode_duration,
@@ -410,14 +423,14 @@ class MADDPGStrategy(IntellilightStrategy):
         """Create recurrent MADDPG agents while keeping base strategy behavior."""
         #from src.sumo_experiments.strategies import maddpg_strategy as maddpg_module
 
-        self.nb_phases[tl_id] = len(self.traci.trafficlight.getAllProgramLogics(tl_id)[0].phases)
+        self.nb_phases[tl_id] = self.traffic_lights.nb_phases(tl_id)
         tl_logic = self.traci.trafficlight.getAllProgramLogics(tl_id)[0]
         for phase in tl_logic.phases:
             phase.duration = 10000
             phase.maxDur = 10000
             phase.minDur = 10000
-        self.traci.trafficlight.setProgramLogic(tl_id, tl_logic)
-        self.traci.trafficlight.setPhase(tl_id, 0)
+        self.traffic_lights.set_program_logic(tl_id, tl_logic)
+        self.traffic_lights.set_phase(tl_id, 0)
         self.traci.trafficlight.setPhaseDuration(tl_id, 10000)
 
         input_dims = {tls_id: len(self.get_state(tls_id)) for tls_id in self.intelligent_intersections}
@@ -1,5 +1,7 @@
 from sumo_experiments.strategies import Strategy
-import operator
+from sumo_experiments.strategies.pressure_snapshot import PressureSnapshot
+from sumo_experiments.strategies.controller_engine import ControllerEngine
+import numpy as np
 
 class MaxPressureStrategy(Strategy):
     """
@@ -29,18 +31,57 @@ class MaxPressureStrategy(Strategy):
         else:
             self.yellow_time = {identifiant: yellow_time for identifiant in network.TLS_DETECTORS}
         self.network = network
-        self.countdowns = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.to_switch = {identifiant: None for identifiant in self.network.TLS_DETECTORS}
-        self.current_yellow_time = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.phases_occurences = {identifiant: {} for identifiant in network.TLS_DETECTORS}
-        self.phases_durations = {identifiant: [] for identifiant in network.TLS_DETECTORS}
-        self.current_phase_duration = {identifiant: 0 for identifiant in network.TLS_DETECTORS}
 
         if intelligent_intersections is None:
             self.intelligent_intersections = network.TL_IDS
         else:
             self.intelligent_intersections = intelligent_intersections
 
+        # The counters of the intersections, indexed like self.intelligent_intersections, and read as dicts through the
+        # properties. The phase to switch to is -1 when there is none.
+        self.engine = ControllerEngine(network, self.intelligent_intersections)
+        self._countdowns = self.engine.counter()
+        self._to_switch = self.engine.counter(-1)
+        self._current_yellow_time = self.engine.counter()
+        self.phases_durations = {identifiant: [] for identifiant in network.TLS_DETECTORS}
+        self._current_phase_duration = self.engine.counter()
+        self.pressure_rows = None
+
+    @property
+    def phases_occurences(self):
+        """
+        The number of steps spent in each green phase by each intersection.
+        """
+        return self.engine.phases_occurences()
+
+    @property
+    def countdowns(self):
+        """
+        The countdown of each intersection.
+        """
+        return self.engine.view(self._countdowns, self.network.TLS_DETECTORS)
+
+    @property
+    def to_switch(self):
+        """
+        The phase each intersection switches to after its yellow phase, or None.
+        """
+        return self.engine.view(self._to_switch, self.network.TLS_DETECTORS, default=None, missing=-1)
+
+    @property
+    def current_yellow_time(self):
+        """
+        The time spent in the current yellow phase by each intersection.
+        """
+        return self.engine.view(self._current_yellow_time, self.network.TLS_DETECTORS)
+
+    @property
+    def current_phase_duration(self):
+        """
+        The duration of the current green phase of each intersection.
+        """
+        return self.engine.view(self._current_phase_duration, self.network.TLS_DETECTORS)
+
     def run_all_agents(self, traci):
         """
         Process agents to make one action each.
@@ -48,89 +89,74 @@ class MaxPressureStrategy(Strategy):
         """
         if not self.started:
             self.traci = traci
+            self._mirror_traffic_lights(traci, self.intelligent_intersections)
             self._start_agents()
             return True
         else:
+            self.engine.update()
             self.zeus_monitor.begin_window("all_agents")
-            for id_tls in self.intelligent_intersections:
-                current_phase = self.traci.trafficlight.getPhase(id_tls)
-                current_state = self.traci.trafficlight.getRedYellowGreenState(id_tls)
-                if 'y' in current_state:
-                    if self.current_yellow_time[id_tls] >= self.yellow_time[id_tls]:
-                        if current_phase + 1 != len(self.traci.trafficlight.getAllProgramLogics(id_tls)[0].phases) and current_phase + 1 not in self.network.TLS_DETECTORS[id_tls].keys():
-                            self.traci.trafficlight.setPhase(id_tls, current_phase + 1)
-                        else:
-                            self.traci.trafficlight.setPhase(id_tls, int(self.to_switch[id_tls]))
-                            self.to_switch[id_tls] = None
-                        self.current_yellow_time[id_tls] = 0
-                    else:
-                        self.current_yellow_time[id_tls] += 1
-                else:
-                    # Counting phase occurences
-                    if current_phase not in self.phases_occurences[id_tls]:
-                        self.phases_occurences[id_tls][current_phase] = 1
-                    else:
-                        self.phases_occurences[id_tls][current_phase] += 1
-                    # Individual behaviour
-                    # if current_phase in self.network.TLS_DETECTORS[id_tls] and self.to_switch[id_tls] is not None:
-                    #     self.traci.trafficlight.setPhase(id_tls, self.to_switch[id_tls])
-                    #     self.to_switch[id_tls] = None
-                    #     self.countdowns[id_tls] = 0
-                    #     print("ici " + str(id_tls))
-                    if self.countdowns[id_tls] >= self.period_times[id_tls]:
-                        if current_phase in self.network.TLS_DETECTORS[id_tls]:
-                            pressures = self._compute_pressure(self.network.TLS_DETECTORS[id_tls])
-                            phase_max_pressure = max(pressures.items(), key=operator.itemgetter(1))[0]
-                            if phase_max_pressure != current_phase:
-                                self.phases_durations[id_tls].append((current_phase, self.current_phase_duration[id_tls]))
-                                self.current_phase_duration[id_tls] = 0
-                                self.to_switch[id_tls] = phase_max_pressure
-                                self.traci.trafficlight.setPhase(id_tls, current_phase + 1)
-                                self.countdowns[id_tls] = 0
-                            else:
-                                self.countdowns[id_tls] = 1
-                                self.current_phase_duration[id_tls] += 1
-                        else:
-                            self.countdowns[id_tls] += 1
-                            self.current_phase_duration[id_tls] += 1
-                    else:
-                        self.countdowns[id_tls] += 1
-                        self.current_phase_duration[id_tls] += 1
+            engine = self.engine
+            phases = engine.phase
+            yellow = engine.yellow
+            end_yellow = yellow & (self._current_yellow_time >= engine.parameters['yellow_time'])
+            self._current_yellow_time[yellow] += 1
+            self._current_yellow_time[end_yellow] = 0
+            # The yellow phases followed by another phase without detectors go on to this phase
+            following_yellow = (phases + 1 != engine.nb_phases) & (engine.rows_of(phases + 1) < 0)
+            next_phases = np.where(following_yellow, phases + 1, self._to_switch)
+            self._to_switch[end_yellow & ~following_yellow] = -1
+            # Individual behaviour
+            green = ~yellow
+            engine.count_phases(green)
+            decide = green & (self._countdowns >= engine.parameters['period']) & (engine.row >= 0)
+            switch = np.zeros(len(phases), dtype=bool)
+            if decide.any():
+                phases_max_pressure = engine.phases_of(engine.best_rows(self._compute_pressures()))
+                switch = decide & (phases_max_pressure != phases)
+                for i in np.flatnonzero(switch):
+                    self.phases_durations[engine.tl_ids[i]].append((int(phases[i]), int(self._current_phase_duration[i])))
+                self._to_switch[switch] = phases_max_pressure[switch]
+                self._countdowns[decide & ~switch] = 1
+            self._countdowns[green & ~decide] += 1
+            self._current_phase_duration[green & ~switch] += 1
+            self._countdowns[switch] = 0
+            self._current_phase_duration[switch] = 0
+            engine.set_phases(end_yellow | switch, np.where(yellow, next_phases, phases + 1))
             results = self.zeus_monitor.end_window("all_agents")
             self.energy_consumption += self.get_energy_consumption(results)
 
 
-    def _compute_pressure(self, detectors):
+    def _compute_pressure(self, id_tls):
         """
         Compute the pressure for a phase. The pressure is computed in vehicles.
-        :param detectors: The list of detectors of the intersection.
-        :type detectors: dict
+        The detectors of all intersections are read once per step, and shared by all intersections.
+        :param id_tls: The id of the intersection.
+        :type id_tls: str
         :return: The pressures of all phases.
         :rtype: dict
         """
-        pressures = {}
-        for phase in detectors:
-            pressure = 0
-            routes = {}
-            nb_vehicles = 0
-            for detector in detectors[phase]['numerical']:
-                pressure += self.traci.lanearea.getLastStepOccupancy(detector) * self.traci.lanearea.getLastStepVehicleNumber(detector)
-                vehicles = self.traci.lanearea.getLastStepVehicleIDs(detector)
-                for vehicle in vehicles:
-                    direction = self.traci.vehicle.getRoute(vehicle)[0]
-                    if direction in routes:
-                        routes[direction] += 1
-                    else:
-                        routes[direction] = 1
-                    nb_vehicles += 1
-            for key in routes:
-                routes[key] = routes[key] / nb_vehicles
-            for detector in detectors[phase]['exit']:
-                edge = self.traci.lanearea.getLaneID(detector).split('_')[0]
-                k = routes[edge] if edge in routes else 0
-                pressure -= self.traci.lanearea.getLastStepOccupancy(detector) * self.traci.lanearea.getLastStepVehicleNumber(detector) * k
-            pressures[phase] = pressure
-        return pressures
+        snapshot = getattr(self, 'pressure_snapshot', None)
+        if snapshot is None or snapshot.traci is not self.traci:
+            snapshot = PressureSnapshot(self.traci, self.network.TLS_DETECTORS)
+            self.pressure_snapshot = snapshot
+        return snapshot.get_pressures(id_tls)
+
+    def _compute_pressures(self):
+        """
+        Compute the pressures of all phases, for each row of the topology of the network. The pressure is computed in
+        vehicles.
+        :return: The pressures of all phases.
+        :rtype: numpy.ndarray
+        """
+        snapshot = getattr(self, 'pressure_snapshot', None)
+        if snapshot is None or snapshot.traci is not self.traci:
+            snapshot = PressureSnapshot(self.traci, self.network.TLS_DETECTORS)
+            self.pressure_snapshot = snapshot
+        if self.pressure_rows is None or self.pressure_rows[0] is not snapshot:
+            # The rows of the snapshot, in the order of the rows of the topology
+            rows = [i for tl_id in self.engine.topology.tl_ids for phase, i in snapshot.phases.get(tl_id, [])]
+            self.pressure_rows = (snapshot, np.array(rows, dtype=np.int64))
+        return snapshot.get_all_pressures()[self.pressure_rows[1]]
 
     def _start_agents(self):
         """
@@ -145,7 +171,10 @@ class MaxPressureStrategy(Strategy):
                 phase.maxDur = 1000000
                 phase.minDur = 1000000
                 nb_phase += 1
-            self.traci.trafficlight.setProgramLogic(tl, tl_logic)
-            self.traci.trafficlight.setPhase(tl, 0)
+            self.traffic_lights.set_program_logic(tl, tl_logic)
+            self.traffic_lights.set_phase(tl, 0)
             self.traci.trafficlight.setPhaseDuration(tl, 100000)
+        self.engine.parameter('period', self.period_times)
+        self.engine.parameter('yellow_time', self.yellow_time)
+        self.engine.start(self.traffic_lights)
         self.started = True
\ No newline at end of file
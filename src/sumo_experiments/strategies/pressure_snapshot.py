@@ -0,0 +1,141 @@
+import numpy as np
+import traci.constants as tc
+
+from sumo_experiments.traci_util import SubscriptionCollector
+from sumo_experiments.preset_networks import SimulationSession
+
+
+class PressureSnapshot:
+    """
+    Compute the max pressure of all the phases of all intersections of a network, from one snapshot of the detectors
+    per simulation step.
+    The occupancy, the number of vehicles and the ids of the vehicles of all detectors of network.TLS_DETECTORS are
+    subscribed through the shared SubscriptionCollector, so they are fetched with one TraCI call per step. The origin
+    of each vehicle (the first edge of its route) is asked once, and kept until the vehicle arrives.
+    The phases of all intersections are the rows of two incidence matrices between phases and detectors, one for the
+    numerical detectors and one for the exit detectors, and the pressures of all phases are computed with NumPy
+    operations on these matrices.
+    """
+
+    VARIABLES = [tc.LAST_STEP_OCCUPANCY, tc.LAST_STEP_VEHICLE_NUMBER, tc.LAST_STEP_VEHICLE_ID_LIST]
+
+    def __init__(self, traci, tls_detectors):
+        """
+        Init of class
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        :param tls_detectors: The detectors of each phase of each intersection, as network.TLS_DETECTORS
+        :type tls_detectors: dict
+        """
+        self.traci = traci
+        self.detectors = []
+        positions = {}
+        rows = []
+        for tl_id in tls_detectors:
+            for phase in tls_detectors[tl_id]:
+                rows.append((tl_id, phase))
+                for detector in tls_detectors[tl_id][phase]['numerical'] + tls_detectors[tl_id][phase]['exit']:
+                    if detector not in positions:
+                        positions[detector] = len(self.detectors)
+                        self.detectors.append(detector)
+        self.phases = {}
+        for i, (tl_id, phase) in enumerate(rows):
+            self.phases.setdefault(tl_id, []).append((phase, i))
+        # Incidence matrices, counting a detector as many times as it is listed for the phase
+        self.numerical = np.zeros((len(rows), len(self.detectors)))
+        self.exit = np.zeros((len(rows), len(self.detectors)))
+        for i, (tl_id, phase) in enumerate(rows):
+            for detector in tls_detectors[tl_id][phase]['numerical']:
+                self.numerical[i, positions[detector]] += 1
+            for detector in tls_detectors[tl_id][phase]['exit']:
+                self.exit[i, positions[detector]] += 1
+        self.numerical_detectors = np.flatnonzero(self.numerical.any(axis=0))
+        # Each exit detector is associated with its edge. The last column stands for all the other edges.
+        self.exit_edges = {}
+        self.exit_columns = np.zeros(len(self.detectors), dtype=np.int64)
+        session = SimulationSession.get(traci)
+        if session is not None:
+            get_lane = session.cached('lanearea_lanes', lambda: {detector: traci.lanearea.getLaneID(detector) for detector in traci.lanearea.getIDList()}).__getitem__
+        else:
+            get_lane = self.traci.lanearea.getLaneID
+        for d in np.flatnonzero(self.exit.any(axis=0)):
+            edge = get_lane(self.detectors[d]).split('_')[0]
+            self.exit_columns[d] = self.exit_edges.setdefault(edge, len(self.exit_edges))
+        self.exit_columns[~self.exit.any(axis=0)] = len(self.exit_edges)
+        self.origins = {}
+        self.collector = None
+        self.time = None
+        self.pressures = None
+
+    def update(self):
+        """
+        Update the snapshot of the detectors, and forget the origins of the vehicles that arrived since the last update.
+        Calling it twice in the same step does nothing.
+        """
+        collector = SubscriptionCollector.shared(self.traci)
+        if collector is not self.collector:
+            collector.subscribe_laneareas(self.detectors, self.VARIABLES)
+            self.collector = collector
+            self.time = None
+        collector.update()
+        time = self.traci.simulation.getTime()
+        if time == self.time:
+            return
+        if getattr(self.traci, '_sumo_experiments_episode_reset', False):
+            self.origins = {}
+        elif self.time is not None and abs(time - self.time - collector.step_length) <= collector.step_length / 2:
+            for vehicle in self.traci.simulation.getArrivedIDList():
+                self.origins.pop(vehicle, None)
+        else:
+            # Some arrivals were not seen
+            running_vehicles = set(self.traci.vehicle.getIDList())
+            self.origins = {vehicle: origin for vehicle, origin in self.origins.items() if vehicle in running_vehicles}
+        self.time = time
+        self.pressures = None
+
+    def get_pressures(self, tl_id):
+        """
+        Return the pressure of each phase of an intersection for the current step. The pressure is computed in vehicles.
+        :param tl_id: The id of the intersection
+        :type tl_id: str
+        :return: The pressures of all phases of the intersection
+        :rtype: dict
+        """
+        pressures = self.get_all_pressures()
+        return {phase: float(pressures[i]) for phase, i in self.phases[tl_id]}
+
+    def get_all_pressures(self):
+        """
+        Return the pressures of all phases of all intersections for the current step, in the order of network.TLS_DETECTORS.
+        The pressure of the phase of an intersection is at the index given by self.phases.
+        :return: The pressures of all phases
+        :rtype: numpy.ndarray
+        """
+        self.update()
+        if self.pressures is None:
+            self.pressures = self._compute_pressures()
+        return self.pressures
+
+    def _compute_pressures(self):
+        """
+        Compute the pressures of all phases of all intersections from the snapshot.
+        """
+        results = self.collector.lanearea_results
+        weights = np.array([results[detector][tc.LAST_STEP_OCCUPANCY] * results[detector][tc.LAST_STEP_VEHICLE_NUMBER] for detector in self.detectors])
+        # Number of vehicles of each numerical detector, by origin edge
+        nb_vehicles = np.zeros(len(self.detectors))
+        origins = np.zeros((len(self.detectors), len(self.exit_edges) + 1))
+        other_edges = len(self.exit_edges)
+        for d in self.numerical_detectors:
+            vehicles = results[self.detectors[d]][tc.LAST_STEP_VEHICLE_ID_LIST]
+            nb_vehicles[d] = len(vehicles)
+            for vehicle in vehicles:
+                origin = self.origins.get(vehicle)
+                if origin is None:
+                    origin = self.traci.vehicle.getRoute(vehicle)[0]
+                    self.origins[vehicle] = origin
+                origins[d, self.exit_edges.get(origin, other_edges)] += 1
+        # Share of the vehicles of each phase coming from each exit edge
+        phase_vehicles = self.numerical @ nb_vehicles
+        shares = np.divide(self.numerical @ origins, phase_vehicles[:, None], out=np.zeros((len(phase_vehicles), other_edges + 1)), where=phase_vehicles[:, None] > 0)
+        return self.numerical @ weights - (self.exit * weights * shares[:, self.exit_columns]).sum(axis=1)
@@ -1,5 +1,7 @@
 from .rl_util import *
 from . import Strategy
+from sumo_experiments.traci_util import Profiler, DetectorBus
+from sumo_experiments.preset_networks import TLSTopology
 import copy
 import numpy as np
 import math
@@ -34,6 +36,7 @@ class ScootScatsStrategy(Strategy):
     ):
         super().__init__()
         self.started = False
+        self.detector_bus = None
         self.network = network
 
         if intelligent_intersections is None:
@@ -193,12 +196,9 @@ class ScootScatsStrategy(Strategy):
     def _subscribe_detectors(self):
         import traci.constants as tc
 
-        for det in sorted(self._all_numerical_detectors):
-            try:
-                self.traci.lanearea.subscribe(det, [tc.LAST_STEP_VEHICLE_NUMBER])
-            except Exception:
-                # Some detector IDs may be invalid for a given scenario; skip safely.
-                continue
+        # Some detector IDs may be invalid for a given scenario, the bus skips them.
+        self.detector_bus = DetectorBus.shared(self.traci, TLSTopology.of(self.network), [tc.LAST_STEP_VEHICLE_NUMBER])
+        self.detector_bus.update()
 
     def _start_agents(self):
         for tl_id in self.intelligent_intersections:
@@ -244,7 +244,8 @@ class ScootScatsStrategy(Strategy):
     def _measure_queues_and_ds(self):
         import traci.constants as tc
 
-        det_data = self.traci.lanearea.getAllSubscriptionResults()
+        self.detector_bus.update()
+        det_data = self.detector_bus.collector.lanearea_results
         queue_lengths = {}
         degree_of_sat = {}
 
@@ -454,7 +455,7 @@ class ScootScatsStrategy(Strategy):
 
         cycle_duration = int(sum(phase_durations))
         if cycle_duration <= 0:
-            self.traci.trafficlight.setPhase(tl_id, 0)
+            self.traffic_lights.set_phase(tl_id, 0)
             return
 
         shift = int(shift_seconds) % cycle_duration
@@ -469,7 +470,7 @@ class ScootScatsStrategy(Strategy):
                 break
             cumulative += duration
 
-        self.traci.trafficlight.setPhase(tl_id, int(target_phase_idx))
+        self.traffic_lights.set_phase(tl_id, int(target_phase_idx))
         self.traci.trafficlight.setPhaseDuration(tl_id, max(1, int(remaining)))
 
     def _apply_tl_programme(self, greentimes, offsets):
@@ -495,7 +496,7 @@ class ScootScatsStrategy(Strategy):
                 currentPhaseIndex=0,
                 phases=phases,
             )
-            self.traci.trafficlight.setProgramLogic(tl_id, logic)
+            self.traffic_lights.set_program_logic(tl_id, logic)
             self._apply_phase_offset(tl_id, greens, offsets[tl_id])
 
     def _get_sim_time(self):
@@ -506,15 +507,17 @@ class ScootScatsStrategy(Strategy):
     def run_all_agents(self, traci):
         if not self.started:
             self.traci = traci
+            self._mirror_traffic_lights(traci, self.intelligent_intersections)
             self._start_agents()
             return True
 
         else:
+            self.traffic_lights.update()
             self.zeus_monitor.begin_window('all_agents')
             # Phase occurrence and duration tracking (same as FixedTimeStrategy)
             for tl_id in self.intelligent_intersections:
-                current_phase = self.traci.trafficlight.getPhase(tl_id)
-                current_state = self.traci.trafficlight.getRedYellowGreenState(tl_id)
+                current_phase = self.traffic_lights.phase(tl_id)
+                current_state = self.traffic_lights.state(tl_id)
 
                 # Track phase duration
                 if 'y' not in current_state.lower():
@@ -552,29 +555,30 @@ class ScootScatsStrategy(Strategy):
                 ):
                     self.measurement_data['last_cycle_update'] = self.measurement_data['control_counter']
 
-                    queue_lengths, degree_of_sat = self._measure_queues_and_ds()
-                    cycle_interval = int(self.params['cycle_update_interval'])
-
-                    if (
-                        self.measurement_data['update_counter'] % cycle_interval == 0
-                        and self.measurement_data['update_counter'] != 0
-                    ):
-                        self.optimize_cycle_length(degree_of_sat)
-
-                    if self.measurement_data['update_counter'] != 0:
-                        self.optimize_green_phases(queue_lengths, degree_of_sat)
-
-                    if (
-                        self.measurement_data['update_counter'] % cycle_interval == 0
-                        and self.measurement_data['update_counter'] != 0
-                    ):
-                        self.optimize_offsets(queue_lengths)
-
-                    self.measurement_data['update_counter'] += 1
-                    self._apply_tl_programme(
-                        self.measurement_data['greentimes'],
-                        self.measurement_data['offsets'],
-                    )
+                    with Profiler.of(self.traci).span('scoot:optimize'):
+                        queue_lengths, degree_of_sat = self._measure_queues_and_ds()
+                        cycle_interval = int(self.params['cycle_update_interval'])
+
+                        if (
+                            self.measurement_data['update_counter'] % cycle_interval == 0
+                            and self.measurement_data['update_counter'] != 0
+                        ):
+                            self.optimize_cycle_length(degree_of_sat)
+
+                        if self.measurement_data['update_counter'] != 0:
+                            self.optimize_green_phases(queue_lengths, degree_of_sat)
+
+                        if (
+                            self.measurement_data['update_counter'] % cycle_interval == 0
+                            and self.measurement_data['update_counter'] != 0
+                        ):
+                            self.optimize_offsets(queue_lengths)
+
+                        self.measurement_data['update_counter'] += 1
+                        self._apply_tl_programme(
+                            self.measurement_data['greentimes'],
+                            self.measurement_data['offsets'],
+                        )
 
                     current_time = self._get_sim_time()
                     self.measurement_data['history_greentimes'].append([
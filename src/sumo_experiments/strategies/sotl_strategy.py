@@ -1,4 +1,9 @@
 from sumo_experiments.strategies import Strategy
+from sumo_experiments.strategies.controller_engine import ControllerEngine
+from sumo_experiments.traci_util import DetectorBus
+from sumo_experiments.preset_networks import TLSTopology
+import numpy as np
+import traci.constants as tc
 
 
 class SotlStrategy(Strategy):
@@ -25,9 +30,6 @@ class SotlStrategy(Strategy):
         super().__init__()
         self.started = False
         self.network = network
-        self.countdowns = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.time = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
-        self.current_yellow_time = {identifiant: 0 for identifiant in self.network.TLS_DETECTORS}
         if type(threshold_switch) is dict:
             self.thresholds_switch = threshold_switch
         else:
@@ -50,9 +52,48 @@ class SotlStrategy(Strategy):
         else:
             self.intelligent_intersections = intelligent_intersections
 
-        self.phases_occurences = {identifiant: {} for identifiant in network.TLS_DETECTORS}
+        # The counters of the intersections, indexed like self.intelligent_intersections, and read as dicts through the properties
+        self.engine = ControllerEngine(network, self.intelligent_intersections)
+        self._countdowns = self.engine.counter()
+        self._time = self.engine.counter()
+        self._current_yellow_time = self.engine.counter()
         self.phases_durations = {identifiant: [] for identifiant in network.TLS_DETECTORS}
-        self.current_phase_duration = {identifiant: 0 for identifiant in network.TLS_DETECTORS}
+        self._current_phase_duration = self.engine.counter()
+
+    @property
+    def phases_occurences(self):
+        """
+        The number of steps spent in each phase with detectors by each intersection.
+        """
+        return self.engine.phases_occurences()
+
+    @property
+    def countdowns(self):
+        """
+        The countdown of each intersection.
+        """
+        return self.engine.view(self._countdowns, self.network.TLS_DETECTORS)
+
+    @property
+    def time(self):
+        """
+        The time spent in the current phase by each intersection.
+        """
+        return self.engine.view(self._time, self.network.TLS_DETECTORS)
+
+    @property
+    def current_yellow_time(self):
+        """
+        The time spent in the current yellow phase by each intersection.
+        """
+        return self.engine.view(self._current_yellow_time, self.network.TLS_DETECTORS)
+
+    @property
+    def current_phase_duration(self):
+        """
+        The duration of the current green phase of each intersection.
+        """
+        return self.engine.view(self._current_phase_duration, self.network.TLS_DETECTORS)
 
     def run_all_agents(self, traci):
         """
@@ -61,50 +102,37 @@ class SotlStrategy(Strategy):
         """
         if not self.started:
             self.traci = traci
+            self._mirror_traffic_lights(traci, self.intelligent_intersections)
             self._start_agents()
             return True
         else:
+            self.engine.update()
             self.zeus_monitor.begin_window("all_agents")
-            for id_tls in self.intelligent_intersections:
-                sum_vehicles = self.compute_vehicles_red_lanes(id_tls)
-                current_phase = self.traci.trafficlight.getPhase(id_tls)
-                current_state = self.traci.trafficlight.getRedYellowGreenState(id_tls)
-                if 'y' in current_state:
-                    if self.current_yellow_time[id_tls] >= self.yellow_time[id_tls]:
-                        if current_phase + 1 != len(self.traci.trafficlight.getAllProgramLogics(id_tls)[0].phases):
-                            self.traci.trafficlight.setPhase(id_tls, current_phase + 1)
-                        else:
-                            self.traci.trafficlight.setPhase(id_tls, 0)
-                        self.current_yellow_time[id_tls] = 0
-                    else:
-                        self.current_yellow_time[id_tls] += 1
-                elif current_phase in self.network.TLS_DETECTORS[id_tls]:
-                    # Counting phase occurences
-                    if current_phase not in self.phases_occurences[id_tls]:
-                        self.phases_occurences[id_tls][current_phase] = 1
-                    else:
-                        self.phases_occurences[id_tls][current_phase] += 1
-                    # Individual behaviour
-                    if self.time[id_tls] >= self.min_phase_durations[id_tls]:
-                        if self.countdowns[id_tls] >= self.thresholds_switch[id_tls]:
-                            if not self.are_vehicles_passing(id_tls) or self.time[id_tls] >= self.thresholds_force[id_tls]:
-                                self.traci.trafficlight.setPhase(id_tls, current_phase + 1)
-                                self.countdowns[id_tls] = 0
-                                self.time[id_tls] = 0
-                                self.phases_durations[id_tls].append((current_phase, self.current_phase_duration[id_tls]))
-                                self.current_phase_duration[id_tls] = 0
-                            else:
-                                self.countdowns[id_tls] += sum_vehicles
-                                self.time[id_tls] += 1
-                                self.current_phase_duration[id_tls] += 1
-                        else:
-                            self.countdowns[id_tls] += sum_vehicles
-                            self.time[id_tls] += 1
-                            self.current_phase_duration[id_tls] += 1
-                    else:
-                        self.countdowns[id_tls] += sum_vehicles
-                        self.time[id_tls] += 1
-                        self.current_phase_duration[id_tls] += 1
+            engine = self.engine
+            parameters = engine.parameters
+            phases = engine.phase
+            yellow = engine.yellow
+            end_yellow = yellow & (self._current_yellow_time >= parameters['yellow_time'])
+            self._current_yellow_time[yellow] += 1
+            self._current_yellow_time[end_yellow] = 0
+            next_phases = np.where(phases + 1 != engine.nb_phases, phases + 1, 0)
+            # Individual behaviour of the intersections in a phase with detectors
+            green = ~yellow & (engine.row >= 0)
+            engine.count_phases(green)
+            sum_vehicles = engine.at(engine.sums(tc.LAST_STEP_VEHICLE_NUMBER, 'others', 'numerical')).astype(np.int64)
+            vehicles_passing = engine.at(engine.any(tc.LAST_STEP_VEHICLE_NUMBER, 'green', 'boolean'), default=False)
+            switch = green & (self._time >= parameters['min_phase_duration']) & (self._countdowns >= parameters['threshold_switch'])
+            switch &= ~vehicles_passing | (self._time >= parameters['threshold_force'])
+            for i in np.flatnonzero(switch):
+                self.phases_durations[engine.tl_ids[i]].append((int(phases[i]), int(self._current_phase_duration[i])))
+            stay = green & ~switch
+            self._countdowns[stay] += sum_vehicles[stay]
+            self._time[stay] += 1
+            self._current_phase_duration[stay] += 1
+            self._countdowns[switch] = 0
+            self._time[switch] = 0
+            self._current_phase_duration[switch] = 0
+            engine.set_phases(end_yellow | switch, np.where(yellow, next_phases, phases + 1))
             results = self.zeus_monitor.end_window("all_agents")
             self.energy_consumption += self.get_energy_consumption(results)
 
@@ -116,15 +144,9 @@ class SotlStrategy(Strategy):
         :return: The number of vehicles approaching the traffic light on the red lanes
         :rtype: int
         """
-        current_phase = self.traci.trafficlight.getPhase(id_tls)
-        detectors = set()
-        for phase in self.network.TLS_DETECTORS[id_tls]:
-            if phase != current_phase:
-                detectors.update(self.network.TLS_DETECTORS[id_tls][phase]['numerical'])
-        sum = 0
-        for detector in detectors:
-            sum += self.traci.lanearea.getLastStepVehicleNumber(detector)
-        return sum
+        current_phase = self.traffic_lights.phase(id_tls)
+        detectors = self.topology.others(id_tls, current_phase, 'numerical')
+        return int(self.detector_bus.values(tc.LAST_STEP_VEHICLE_NUMBER)[detectors].sum())
 
     def are_vehicles_passing(self, id_tls):
         """
@@ -134,11 +156,9 @@ class SotlStrategy(Strategy):
         :return: True if vehicles are still passing the intersection, False otherwise
         :rtype: bool
         """
-        current_phase = self.traci.trafficlight.getPhase(id_tls)
-        for det in self.network.TLS_DETECTORS[id_tls][current_phase]['boolean']:
-            if self.traci.lanearea.getLastStepVehicleNumber(det) > 0:
-                return True
-        return False
+        current_phase = self.traffic_lights.phase(id_tls)
+        detectors = self.topology.green(id_tls, current_phase, 'boolean')
+        return bool(np.any(self.detector_bus.values(tc.LAST_STEP_VEHICLE_NUMBER)[detectors] > 0))
 
     def _start_agents(self):
         """
@@ -153,8 +173,15 @@ class SotlStrategy(Strategy):
                     phase.maxDur = 10000
                     phase.minDur = 10000
                 nb_phase += 1
-            self.traci.trafficlight.setProgramLogic(tl, tl_logic)
-            self.traci.trafficlight.setPhase(tl, 0)
+            self.traffic_lights.set_program_logic(tl, tl_logic)
+            self.traffic_lights.set_phase(tl, 0)
             self.traci.trafficlight.setPhaseDuration(tl, 10000)
+        self.topology = TLSTopology.of(self.network)
+        self.detector_bus = DetectorBus.shared(self.traci, self.topology, subscribe=False)
+        self.engine.parameter('threshold_switch', self.thresholds_switch)
+        self.engine.parameter('threshold_force', self.thresholds_force)
+        self.engine.parameter('min_phase_duration', self.min_phase_durations)
+        self.engine.parameter('yellow_time', self.yellow_time)
+        self.engine.start(self.traffic_lights, self.detector_bus)
         self.started = True
 
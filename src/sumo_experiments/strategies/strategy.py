@@ -4,6 +4,7 @@ from abc import ABC, abstractmethod
 from itertools import count
 from threading import Lock
 from zeus.monitor import ZeusMonitor
+from sumo_experiments.traci_util import TrafficLightMirror, SubscriptionCollector
 
 # Fix zeus v0.15.0 bug: AppleSiliconMeasurement defines zero_all_fields but
 # the ABC expects zeroAllFields (camelCase). Monkey-patch it so instantiation works.
@@ -97,6 +98,7 @@ class Strategy(ABC):
         else:
             self.zeus_monitor = MultiprocessSafeZeusMonitor(raw_monitor, self.zeus_monitor_id)
         self.energy_consumption = 0
+        self.traffic_lights = None
 
     @classmethod
     def _next_zeus_monitor_id(cls):
@@ -120,6 +122,78 @@ class Strategy(ABC):
 
         return monitor
 
+    def _mirror_traffic_lights(self, traci, trafficlights):
+        """
+        Start reading the traffic lights through the TrafficLightMirror of the simulation, instead of querying
+        traci.trafficlight at each step. The phases and the programs of the traffic lights must then be set with
+        self.traffic_lights.set_phase and set_program_logic, and self.traffic_lights.update() must be called at each step
+        before reading them.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        :param trafficlights: The ids of the traffic lights controlled by the strategy
+        :type trafficlights: list
+        :return: The mirror of the traffic lights
+        :rtype: TrafficLightMirror
+        """
+        self.traffic_lights = TrafficLightMirror.shared(traci, trafficlights)
+        return self.traffic_lights
+
+    def _offload_programs(self, traci, programs):
+        """
+        Install programs run natively by SUMO on traffic lights, and start them from their first phase. The traffic
+        lights are then controlled by SUMO without any TraCI call. If the traffic lights are read through the
+        TrafficLightMirror of the simulation, the programs are set through it.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        :param programs: The program of each traffic light
+        :type programs: dict
+        """
+        collector = SubscriptionCollector.get_shared(traci)
+        mirror = collector.trafficlight_mirror if collector is not None else None
+        for tl_id, logic in programs.items():
+            if mirror is not None and tl_id in mirror.logics:
+                mirror.set_program_logic(tl_id, logic)
+                mirror.set_phase(tl_id, 0)
+            else:
+                traci.trafficlight.setProgramLogic(tl_id, logic)
+                traci.trafficlight.setPhase(tl_id, 0)
+
+    def _native_program(self, traci, tl_id, program_type, green_phases, yellow_steps):
+        """
+        Build a program run natively by SUMO from the first program of a traffic light, for a controller that switches
+        from each green phase to the next phase of the program (the yellow phase, or the phase 0 after the last phase),
+        and after yellow_steps steps to one of its next green phases. The other phases of the program are kept.
+        The phase 0 starts with its minimum duration.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :param program_type: The type of the program (0 for static, 3 for actuated)
+        :type program_type: int
+        :param green_phases: The minimum and maximum number of steps and the next green phases of each green phase, as {phase: (min_steps, max_steps, next_phases)}
+        :type green_phases: dict
+        :param yellow_steps: The number of steps of the yellow phases
+        :type yellow_steps: int
+        :return: The program of the traffic light
+        :rtype: traci.trafficlight.Logic
+        """
+        logic = traci.trafficlight.getAllProgramLogics(tl_id)[0]
+        step_length = traci.simulation.getDeltaT()
+        phases = [traci.trafficlight.Phase(phase.duration, phase.state, phase.minDur, phase.maxDur) for phase in logic.phases]
+        yellow_phases = {}
+        for green_phase, (min_steps, max_steps, next_phases) in green_phases.items():
+            yellow_phase = 0 if green_phase == len(phases) - 1 else green_phase + 1
+            if 'y' in phases[green_phase].state or 'y' not in phases[yellow_phase].state \
+                    or any(next_phase not in green_phases for next_phase in next_phases) \
+                    or yellow_phases.setdefault(yellow_phase, tuple(next_phases)) != tuple(next_phases):
+                raise ValueError(f"The phases of the traffic light '{tl_id}' can't be compiled into a SUMO program.")
+            state = phases[green_phase].state
+            phases[green_phase] = traci.trafficlight.Phase(min_steps * step_length, state, min_steps * step_length, max_steps * step_length, (yellow_phase,))
+            state = phases[yellow_phase].state
+            phases[yellow_phase] = traci.trafficlight.Phase(yellow_steps * step_length, state, yellow_steps * step_length, yellow_steps * step_length, tuple(next_phases))
+        # SUMO keeps the type of an existing program, so the program is added with its own id
+        return traci.trafficlight.Logic(f'{logic.programID}_native', program_type, 0, phases, {})
+
     @abstractmethod
     def run_all_agents(self, traci):
         """
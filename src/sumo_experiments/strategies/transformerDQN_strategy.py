@@ -1,5 +1,6 @@
 from .DQN_strategy import DQNStrategy
 from .rl_networks import *
+from sumo_experiments.preset_networks import NetModel
 
 class TransformerDQNStrategy(DQNStrategy):
     """
@@ -96,24 +97,10 @@ class TransformerDQNStrategy(DQNStrategy):
 
         coords = {}
         adjacency = np.zeros((n, n), dtype=np.int64)
-        root = ET.parse(network_path).getroot()
-
-        junction_coords = {}
-        for junction in root.findall("junction"):
-            junction_id = junction.attrib.get("id")
-            if not junction_id:
-                continue
-            if "x" not in junction.attrib or "y" not in junction.attrib:
-                continue
-            junction_coords[junction_id] = (float(junction.attrib["x"]), float(junction.attrib["y"]))
-
-        edge_endpoints = {}
-        for edge in root.findall("edge"):
-            edge_id = edge.attrib.get("id")
-            src = edge.attrib.get("from")
-            dst = edge.attrib.get("to")
-            if edge_id and src and dst:
-                edge_endpoints[edge_id] = (src, dst)
+        # The model is shared with the network when it already read the same file
+        model = NetModel.load(network_path)
+        junction_coords = model.junction_coordinates()
+        edge_endpoints = model.edge_endpoints()
 
         # Build TLS -> controlled junctions map from connection tl attributes.
         tls_to_junctions = {tl_id: set() for tl_id in self.tls_ids}
@@ -121,21 +108,19 @@ class TransformerDQNStrategy(DQNStrategy):
             if tl_id in junction_coords:
                 tls_to_junctions[tl_id].add(tl_id)
 
-        for connection in root.findall("connection"):
-            tl_id = connection.attrib.get("tl")
+        for tl_id, links in model.controlled_links().items():
             if tl_id not in tls_to_junctions:
                 continue
-            from_edge = connection.attrib.get("from")
-            to_edge = connection.attrib.get("to")
-            for edge_id in (from_edge, to_edge):
-                endpoints = edge_endpoints.get(edge_id)
-                if endpoints is None:
-                    continue
-                src, dst = endpoints
-                if src in junction_coords:
-                    tls_to_junctions[tl_id].add(src)
-                if dst in junction_coords:
-                    tls_to_junctions[tl_id].add(dst)
+            for from_edge, to_edge in links:
+                for edge_id in (from_edge, to_edge):
+                    endpoints = edge_endpoints.get(edge_id)
+                    if endpoints is None:
+                        continue
+                    src, dst = endpoints
+                    if src in junction_coords:
+                        tls_to_junctions[tl_id].add(src)
+                    if dst in junction_coords:
+                        tls_to_junctions[tl_id].add(dst)
 
         missing_coords = []
         for tl_id in self.tls_ids:
@@ -251,15 +236,15 @@ class TransformerDQNStrategy(DQNStrategy):
         self._joint_cache_actions = actions
 
     def _start_agent(self, tl_id):
-        self.nb_phases[tl_id] = len(self.traci.trafficlight.getAllProgramLogics(tl_id)[0].phases)
+        self.nb_phases[tl_id] = self.traffic_lights.nb_phases(tl_id)
         tl_logic = self.traci.trafficlight.getAllProgramLogics(tl_id)[0]
         for phase in tl_logic.phases:
             phase.duration = 10000
             phase.maxDur = 10000
             phase.minDur = 10000
 
-        self.traci.trafficlight.setProgramLogic(tl_id, tl_logic)
-        self.traci.trafficlight.setPhase(tl_id, 0)
+        self.traffic_lights.set_program_logic(tl_id, tl_logic)
+        self.traffic_lights.set_phase(tl_id, 0)
         self.traci.trafficlight.setPhaseDuration(tl_id, 10000)
         self.started = True
 
@@ -0,0 +1,3 @@
+from .model import SurrogateModel
+from .traci_api import SurrogateTraci
+from .simulation import SurrogateSimulation
@@ -0,0 +1,203 @@
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import networkx as nx
+
+
+class SurrogateModel:
+    """
+    Description of an artificial network for the surrogate simulation, read from the files built by the
+    InfrastructureBuilder (network file, after netconvert), the FlowBuilder (routes file) and the DetectorBuilder
+    (detectors file) of the network. The network must be created, but not run yet, as the files are removed at the end
+    of a run.
+    Everything is stored in arrays indexed by integers, in the order of the files :
+    - Lanes : ids, edges, lengths and max speeds.
+    - Edges : ids, from and to junctions, and lanes.
+    - Links : the connections between lanes, with their traffic light and link index (-1 if not controlled).
+    - Traffic lights : ids, and the durations and states of the phases of their program.
+    - Detectors : ids, lanes, and start and end positions on the lane.
+    - Routes : the sequence of edges of each flow, computed as the fastest path in the network.
+    - Flows : the route, vehicle type, begin and end times, and rate (vehicles per hour) or probability (per second).
+    """
+
+    def __init__(self, net_file, routes_file, detectors_file):
+        """
+        Init of class
+        :param net_file: The path of the SUMO network file
+        :type net_file: str
+        :param routes_file: The path of the routes file
+        :type routes_file: str
+        :param detectors_file: The path of the detectors file
+        :type detectors_file: str
+        """
+        self._read_network(net_file)
+        self._read_detectors(detectors_file)
+        self._read_routes(routes_file)
+
+    @classmethod
+    def from_network(cls, network):
+        """
+        Build the model of an artificial preset network, from the files it has built.
+        :param network: The network
+        :type network: ArtificialNetwork
+        :return: The model of the network
+        :rtype: SurrogateModel
+        """
+        return cls(network.file_names['network'], network.file_names['routes'], network.file_names['detectors'])
+
+    def _read_network(self, net_file):
+        """
+        Read the lanes, edges, links and traffic lights of the network file.
+        """
+        root = ET.parse(net_file).getroot()
+        self.edge_ids, self.edge_from, self.edge_to, self.edge_lanes = [], [], [], []
+        self.lane_ids, self.lane_edge, self.lane_length, self.lane_speed = [], [], [], []
+        for edge in root.iter('edge'):
+            if edge.get('function') == 'internal':
+                continue
+            edge_index = len(self.edge_ids)
+            self.edge_ids.append(edge.get('id'))
+            self.edge_from.append(edge.get('from'))
+            self.edge_to.append(edge.get('to'))
+            lanes = []
+            for lane in edge.iter('lane'):
+                lanes.append(len(self.lane_ids))
+                self.lane_ids.append(lane.get('id'))
+                self.lane_edge.append(edge_index)
+                self.lane_length.append(float(lane.get('length')))
+                self.lane_speed.append(float(lane.get('speed')))
+            self.edge_lanes.append(lanes)
+        self.edge_index = {edge_id: i for i, edge_id in enumerate(self.edge_ids)}
+        self.lane_index = {lane_id: i for i, lane_id in enumerate(self.lane_ids)}
+        self.lane_edge = np.array(self.lane_edge, dtype=np.int32)
+        self.lane_length = np.array(self.lane_length, dtype=np.float64)
+        self.lane_speed = np.array(self.lane_speed, dtype=np.float64)
+
+        self.tl_ids, self.tl_programs = [], []
+        for tl_logic in root.iter('tlLogic'):
+            self.tl_ids.append(tl_logic.get('id'))
+            self.tl_programs.append((tl_logic.get('programID'), [(float(phase.get('duration')), phase.get('state')) for phase in tl_logic.iter('phase')]))
+        self.tl_index = {tl_id: i for i, tl_id in enumerate(self.tl_ids)}
+
+        self.link_from, self.link_to, self.link_tl, self.link_index = [], [], [], []
+        for connection in root.iter('connection'):
+            if connection.get('from') not in self.edge_index or connection.get('to') not in self.edge_index:
+                continue
+            self.link_from.append(self.lane_index[f"{connection.get('from')}_{connection.get('fromLane')}"])
+            self.link_to.append(self.lane_index[f"{connection.get('to')}_{connection.get('toLane')}"])
+            tl_id = connection.get('tl')
+            self.link_tl.append(self.tl_index[tl_id] if tl_id is not None else -1)
+            self.link_index.append(int(connection.get('linkIndex')) if tl_id is not None else -1)
+        self.link_from = np.array(self.link_from, dtype=np.int32)
+        self.link_to = np.array(self.link_to, dtype=np.int32)
+        self.link_tl = np.array(self.link_tl, dtype=np.int32)
+        self.link_index = np.array(self.link_index, dtype=np.int32)
+        # The links of each traffic light, in the order of the link indexes (the order of the characters of the states)
+        self.tl_links = []
+        for tl in range(len(self.tl_ids)):
+            links = np.flatnonzero(self.link_tl == tl)
+            self.tl_links.append(links[np.argsort(self.link_index[links])])
+        # The link from a lane to an edge, -1 if the lane has no connection to the edge
+        self.lane_edge_link = np.full((len(self.lane_ids), len(self.edge_ids)), -1, dtype=np.int32)
+        self.lane_edge_link[self.link_from, self.lane_edge[self.link_to]] = np.arange(len(self.link_from), dtype=np.int32)
+
+    def _read_detectors(self, detectors_file):
+        """
+        Read the lane area detectors of the detectors file.
+        """
+        root = ET.parse(detectors_file).getroot()
+        self.detector_ids, self.detector_lane, self.detector_start, self.detector_end = [], [], [], []
+        for detector in root.iter('laneAreaDetector'):
+            lane = self.lane_index[detector.get('lane')]
+            length = self.lane_length[lane]
+            start, end = float(detector.get('pos', 0)), float(detector.get('endPos', length))
+            # Negative positions are counted from the end of the lane, and friendlyPos clips the positions to the lane
+            start = start + length if start < 0 else start
+            end = end + length if end < 0 else end
+            self.detector_ids.append(detector.get('id'))
+            self.detector_lane.append(lane)
+            self.detector_start.append(min(max(start, 0.0), length))
+            self.detector_end.append(min(max(end, 0.0), length))
+        self.detector_index = {detector_id: i for i, detector_id in enumerate(self.detector_ids)}
+        self.detector_lane = np.array(self.detector_lane, dtype=np.int32)
+        self.detector_start = np.array(self.detector_start, dtype=np.float64)
+        self.detector_end = np.array(self.detector_end, dtype=np.float64)
+
+    def _read_routes(self, routes_file):
+        """
+        Read the vehicle types, routes and flows of the routes file, and compute the edges of each flow.
+        """
+        root = ET.parse(routes_file).getroot()
+        self.v_types = {}
+        for v_type in root.iter('vType'):
+            self.v_types[v_type.get('id')] = {
+                'accel': float(v_type.get('accel', 2.6)),
+                'length': float(v_type.get('length', 5.0)),
+                'min_gap': float(v_type.get('minGap', 2.5)),
+                'max_speed': float(v_type.get('maxSpeed', 55.56)),
+                'depart_speed': self._number(v_type.get('departSpeed'), 0.0),
+            }
+        declared_routes = {route.get('id'): route.get('edges').split() for route in root.iter('route')}
+        graph = nx.DiGraph()
+        for link in range(len(self.link_from)):
+            from_edge, to_edge = self.lane_edge[self.link_from[link]], self.lane_edge[self.link_to[link]]
+            lane = self.edge_lanes[from_edge][0]
+            graph.add_edge(from_edge, to_edge, weight=self.lane_length[lane] / self.lane_speed[lane])
+
+        self.routes, route_positions = [], {}
+        self.flow_ids, self.flow_route, self.flow_type, self.flow_begin, self.flow_end = [], [], [], [], []
+        self.flow_rate, self.flow_probability = [], []
+        for flow in root.iter('flow'):
+            if flow.get('route') is not None:
+                edges = self._path(graph, declared_routes[flow.get('route')])
+            else:
+                edges = self._path(graph, [flow.get('from'), flow.get('to')])
+            key = tuple(edges)
+            if key not in route_positions:
+                route_positions[key] = len(self.routes)
+                self.routes.append(key)
+            self.flow_ids.append(flow.get('id'))
+            self.flow_route.append(route_positions[key])
+            self.flow_type.append(flow.get('type'))
+            self.flow_begin.append(float(flow.get('begin', 0)))
+            self.flow_end.append(float(flow.get('end', np.inf)))
+            self.flow_rate.append(float(flow.get('vehsPerHour', 0)))
+            self.flow_probability.append(float(flow.get('probability', 0)))
+        self.flow_route = np.array(self.flow_route, dtype=np.int32)
+        self.flow_begin = np.array(self.flow_begin, dtype=np.float64)
+        self.flow_end = np.array(self.flow_end, dtype=np.float64)
+        self.flow_rate = np.array(self.flow_rate, dtype=np.float64)
+        self.flow_probability = np.array(self.flow_probability, dtype=np.float64)
+        # The edges of each route, padded with -1
+        max_length = max((len(route) for route in self.routes), default=0)
+        self.route_edges = np.full((len(self.routes), max_length + 1), -1, dtype=np.int32)
+        for i, route in enumerate(self.routes):
+            self.route_edges[i, :len(route)] = route
+        # The lanes a vehicle can use on each edge of its route : the lanes connected to the next edge of the route
+        max_lanes = max((len(lanes) for lanes in self.edge_lanes), default=0)
+        self.route_lanes = np.full((len(self.routes), max_length, max_lanes), -1, dtype=np.int32)
+        for i, route in enumerate(self.routes):
+            for step, edge in enumerate(route):
+                lanes = self.edge_lanes[edge]
+                if step + 1 < len(route):
+                    lanes = [lane for lane in lanes if self.lane_edge_link[lane, route[step + 1]] >= 0] or lanes
+                self.route_lanes[i, step, :len(lanes)] = lanes
+
+    def _path(self, graph, edges):
+        """
+        Return the indexes of the edges of a route, completed with the fastest paths between its consecutive edges.
+        """
+        path = [self.edge_index[edges[0]]]
+        for edge in edges[1:]:
+            path += nx.shortest_path(graph, path[-1], self.edge_index[edge], weight='weight')[1:]
+        return path
+
+    @staticmethod
+    def _number(value, default):
+        """
+        Return the value of an attribute as a float, or the default value if it is missing or not a number (like 'max').
+        """
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return default
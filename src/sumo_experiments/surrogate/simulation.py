@@ -0,0 +1,447 @@
+import numpy as np
+
+from sumo_experiments.surrogate.model import SurrogateModel
+from sumo_experiments.surrogate.traci_api import SurrogateTraci
+
+
+class SurrogateSimulation:
+    """
+    Fast approximate simulation of an artificial network, for the pre-training of the learning strategies. Several
+    instances of the network (environments) are simulated together : the vehicles of all environments are stored in the
+    same arrays, and each step moves all of them with a few NumPy operations.
+    The model is a queue model with car following on each lane :
+    - Vehicles accelerate up to the speed limit, and keep a minimum gap with the vehicle in front of them.
+    - The first vehicle of a lane crosses the intersection if its link is green ('G' or 'g') and if the next lane has
+    room for it. A lane lets one vehicle cross every headway seconds, so its capacity is 3600 / headway vehicles per hour.
+    - Vehicles follow the fastest route between the edges of their flow, and change lanes when entering an edge.
+    - Flows insert vehicles with the rate or probability of the routes file.
+    - Like in SUMO, a vehicle blocked at the end of a lane for time_to_teleport seconds is teleported to the next edge
+    of its route with room for it, or leaves the network if there is none.
+    Each environment has a SurrogateTraci, available with env(i), that implements the subset of the TraCI API used by
+    the strategies and the TraciWrapper. The results are close to SUMO's, not identical : the surrogate is meant to
+    pre-train agents that are then fine-tuned with SUMO.
+    """
+
+    def __init__(self, network, nb_envs=1, seed=None, step_length=1.0, headway=2.0, time_to_teleport=150, capacity=1024):
+        """
+        Init of class
+        :param network: The network to simulate, created but not run, or its SurrogateModel
+        :type network: ArtificialNetwork or SurrogateModel
+        :param nb_envs: The number of environments simulated together
+        :type nb_envs: int
+        :param seed: The seed of the random insertions of vehicles
+        :type seed: int
+        :param step_length: The duration of a simulation step (s)
+        :type step_length: float
+        :param headway: The minimum time between two vehicles leaving a lane (s)
+        :type headway: float
+        :param time_to_teleport: The time for a blocked vehicle to teleport. Negative to disable teleports.
+        :type time_to_teleport: float
+        :param capacity: The initial number of vehicles of the arrays, doubled when needed
+        :type capacity: int
+        """
+        self.model = network if isinstance(network, SurrogateModel) else SurrogateModel.from_network(network)
+        self.network = None if isinstance(network, SurrogateModel) else network
+        self.nb_envs = nb_envs
+        self.step_length = step_length
+        self.headway = headway
+        self.time_to_teleport = time_to_teleport
+        self.rng = np.random.default_rng(seed)
+        model = self.model
+        self.nb_lanes = len(model.lane_ids)
+        self.nb_flows = len(model.flow_ids)
+        types = [model.v_types[v_type] for v_type in model.flow_type]
+        self.flow_length = np.array([v_type['length'] for v_type in types])
+        self.flow_min_gap = np.array([v_type['min_gap'] for v_type in types])
+        self.flow_accel = np.array([v_type['accel'] for v_type in types])
+        self.flow_max_speed = np.array([v_type['max_speed'] for v_type in types])
+        self.flow_depart_speed = np.array([v_type['depart_speed'] for v_type in types])
+        self.max_vehicle_length = self.flow_length.max() if self.nb_flows else 0.0
+        # Positions are sorted with a single key : lane * position_scale + position
+        self.position_scale = model.lane_length.max() + self.max_vehicle_length + 1.0
+        self.time = 0.0
+        self.nb_steps = 0
+        self._capacity = 0
+        self._allocate(capacity)
+        self.vehicle_slots = [{} for _ in range(nb_envs)]
+        self.departed = [[] for _ in range(nb_envs)]
+        self.arrived = [[] for _ in range(nb_envs)]
+        self.pending = np.zeros((nb_envs, self.nb_flows), dtype=np.int64)
+        self.scheduled = np.zeros((nb_envs, self.nb_flows), dtype=np.int64)
+        self.flow_counts = np.zeros((nb_envs, self.nb_flows), dtype=np.int64)
+        self.scale = np.ones(nb_envs)
+        self.lane_next_departure = np.zeros((nb_envs, self.nb_lanes))
+        self.phase = np.zeros((nb_envs, len(model.tl_ids)), dtype=np.int64)
+        self.next_switch = np.zeros((nb_envs, len(model.tl_ids)))
+        self.programs = [[None] * len(model.tl_ids) for _ in range(nb_envs)]
+        self.link_open = np.zeros((nb_envs, len(model.link_from)), dtype=bool)
+        self.link_open[:, model.link_tl < 0] = True
+        self.reset()
+        self.tracis = [SurrogateTraci(self, env) for env in range(nb_envs)]
+        self._step_requests = set()
+
+    def env(self, env):
+        """
+        Return the TraCI interface of an environment.
+        :param env: The index of the environment
+        :type env: int
+        :return: The TraCI interface
+        :rtype: SurrogateTraci
+        """
+        return self.tracis[env]
+
+    def reset(self, envs=None):
+        """
+        Remove all vehicles and restore the traffic light programs of some environments. The time is not changed.
+        :param envs: The indexes of the environments to reset. If None, all environments.
+        :type envs: list
+        """
+        if envs is None:
+            envs = range(self.nb_envs)
+        for env in envs:
+            for vehicle in list(self.vehicle_slots[env]):
+                self.remove_vehicle(env, vehicle)
+            self.pending[env] = 0
+            self.lane_next_departure[env] = 0.0
+            self.departed[env] = []
+            self.arrived[env] = []
+            for tl, (program_id, phases) in enumerate(self.model.tl_programs):
+                self.set_program(env, tl, program_id, phases, 0)
+        self._snapshot_time = None
+
+    def step(self):
+        """
+        Simulate one step of all environments.
+        """
+        time = self.time
+        for env in range(self.nb_envs):
+            self.departed[env] = []
+            self.arrived[env] = []
+        self._switch_phases(time)
+        self._move(time)
+        if self.time_to_teleport >= 0:
+            self._teleport()
+        self._insert(time)
+        self.time = time + self.step_length
+        self.nb_steps += 1
+        self._snapshot_time = None
+        self._step_requests.clear()
+
+    def request_step(self, env):
+        """
+        Simulate one step when all environments have requested it. Called by the simulationStep function of the TraCI
+        interfaces, so that each environment can be driven by its own loop.
+        :param env: The index of the environment requesting a step
+        :type env: int
+        """
+        self._step_requests.add(env)
+        if len(self._step_requests) == self.nb_envs:
+            self.step()
+
+    def run(self, traci_function):
+        """
+        Run a TraCI function (like TraciWrapper.final_function) with the TraCI interface of the first environment, like
+        the run function of the networks.
+        :param traci_function: The function using the TraCI interface
+        :type traci_function: function
+        :return: The result of the function
+        """
+        if self.nb_envs != 1:
+            raise ValueError('run can only be used with one environment, use env(i) to drive several environments.')
+        return traci_function(self.env(0))
+
+    ### Traffic lights ###
+
+    def set_program(self, env, tl, program_id, phases, phase_index):
+        """
+        Set the program of a traffic light and start one of its phases.
+        :param env: The index of the environment
+        :type env: int
+        :param tl: The index of the traffic light
+        :type tl: int
+        :param program_id: The id of the program
+        :type program_id: str
+        :param phases: The (duration, state) couple of each phase
+        :type phases: list
+        :param phase_index: The index of the phase to start
+        :type phase_index: int
+        """
+        link_indexes = self.model.link_index[self.model.tl_links[tl]]
+        greens = [np.array([character in 'Gg' for character in state], dtype=bool)[link_indexes] for _, state in phases]
+        self.programs[env][tl] = (program_id, list(phases), greens)
+        self.set_phase(env, tl, phase_index, phases[phase_index][0])
+
+    def set_phase(self, env, tl, phase_index, duration=None):
+        """
+        Start a phase of a traffic light.
+        :param env: The index of the environment
+        :type env: int
+        :param tl: The index of the traffic light
+        :type tl: int
+        :param phase_index: The index of the phase
+        :type phase_index: int
+        :param duration: The duration of the phase. If None, the duration of the program.
+        :type duration: float
+        """
+        _, phases, greens = self.programs[env][tl]
+        self.phase[env, tl] = phase_index
+        self.next_switch[env, tl] = self.time + (phases[phase_index][0] if duration is None else duration)
+        self.link_open[env, self.model.tl_links[tl]] = greens[phase_index]
+
+    def _switch_phases(self, time):
+        """
+        Start the next phase of the traffic lights whose phase is over.
+        """
+        for env, tl in zip(*np.nonzero(self.next_switch <= time)):
+            phases = self.programs[env][tl][1]
+            self.set_phase(env, tl, (self.phase[env, tl] + 1) % len(phases))
+
+    ### Vehicles ###
+
+    def _allocate(self, capacity):
+        """
+        Grow the vehicle arrays to a capacity.
+        """
+        old = self._capacity
+        arrays = {
+            'v_env': (np.int64, 0), 'v_lane': (np.int64, -1), 'v_flow': (np.int64, 0), 'v_route': (np.int64, 0),
+            'v_step': (np.int64, 0), 'v_pos': (np.float64, 0.0), 'v_speed': (np.float64, 0.0),
+            'v_waiting': (np.float64, 0.0), 'v_accumulated_waiting': (np.float64, 0.0), 'v_depart': (np.float64, 0.0),
+        }
+        for name, (dtype, fill) in arrays.items():
+            array = np.full(capacity, fill, dtype=dtype)
+            if old:
+                array[:old] = getattr(self, name)
+            setattr(self, name, array)
+        self.v_ids = (self.v_ids if old else []) + [None] * (capacity - old)
+        self.free_slots = (self.free_slots if old else []) + list(range(capacity - 1, old - 1, -1))
+        self._capacity = capacity
+
+    def remove_vehicle(self, env, vehicle):
+        """
+        Remove a vehicle from an environment.
+        :param env: The index of the environment
+        :type env: int
+        :param vehicle: The id of the vehicle
+        :type vehicle: str
+        """
+        slot = self.vehicle_slots[env].pop(vehicle)
+        self.v_lane[slot] = -1
+        self.v_ids[slot] = None
+        self.free_slots.append(slot)
+        self._snapshot_time = None
+
+    def _lane_rears(self):
+        """
+        Return the position of the back of the last vehicle of each lane of each environment (inf if the lane is empty).
+        """
+        rears = np.full((self.nb_envs, self.nb_lanes), np.inf)
+        active = np.flatnonzero(self.v_lane >= 0)
+        np.minimum.at(rears, (self.v_env[active], self.v_lane[active]), self.v_pos[active] - self.flow_length[self.v_flow[active]])
+        return rears
+
+    def _best_lanes(self, envs, candidates, rears):
+        """
+        Return the lane with the most room among candidate lanes (padded with -1), and its room.
+        """
+        room = np.where(candidates >= 0, rears[envs[:, None], np.maximum(candidates, 0)], -np.inf)
+        best = np.argmax(room, axis=1)
+        rows = np.arange(len(envs))
+        return candidates[rows, best], room[rows, best]
+
+    def _move(self, time):
+        """
+        Move the vehicles of all environments, and make them cross the intersections or leave the network.
+        """
+        model = self.model
+        dt = self.step_length
+        active = np.flatnonzero(self.v_lane >= 0)
+        if len(active) == 0:
+            return
+        rears = self._lane_rears()
+        lane_keys = self.v_env[active] * self.nb_lanes + self.v_lane[active]
+        # Vehicles sorted by lane, from the front to the back of the lane
+        active = active[np.lexsort((-self.v_pos[active], lane_keys))]
+        env, lane, flow = self.v_env[active], self.v_lane[active], self.v_flow[active]
+        pos, speed = self.v_pos[active], self.v_speed[active]
+        route, step = self.v_route[active], self.v_step[active]
+        lane_keys = env * self.nb_lanes + lane
+        lane_length = model.lane_length[lane]
+        first = np.ones(len(active), dtype=bool)
+        first[1:] = lane_keys[1:] != lane_keys[:-1]
+
+        # Followers keep a minimum gap with the back of their leader
+        gap = np.full(len(active), np.inf)
+        gap[1:] = pos[:-1] - self.flow_length[flow[:-1]] - self.flow_min_gap[flow[1:]] - pos[1:]
+        # The first vehicle of a lane stops at the end of the lane, unless it can leave it
+        leaders = np.flatnonzero(first)
+        next_edge = model.route_edges[route[leaders], step[leaders] + 1]
+        at_end = next_edge < 0
+        link = np.where(at_end, -1, model.lane_edge_link[lane[leaders], np.maximum(next_edge, 0)])
+        target, room = self._best_lanes(env[leaders], model.route_lanes[route[leaders], np.minimum(step[leaders] + 1, model.route_lanes.shape[1] - 1)], rears)
+        passable = (~at_end & (link >= 0) & self.link_open[env[leaders], np.maximum(link, 0)]
+                    & (self.lane_next_departure[env[leaders], lane[leaders]] <= time)
+                    & (room >= self.flow_length[flow[leaders]] + self.flow_min_gap[flow[leaders]]))
+        gap[leaders] = np.where(at_end | passable, np.inf, lane_length[leaders] - pos[leaders])
+
+        max_speed = np.minimum(self.flow_max_speed[flow], model.lane_speed[lane])
+        new_speed = np.minimum(np.minimum(max_speed, speed + self.flow_accel[flow] * dt), np.maximum(gap, 0.0) / dt)
+        new_pos = pos + new_speed * dt
+        beyond = new_pos[leaders] >= lane_length[leaders]
+        crossing = leaders[beyond & passable]
+        arriving = leaders[beyond & at_end]
+
+        # One vehicle at most enters a lane at each step
+        crossing_target = target[beyond & passable]
+        _, kept = np.unique(env[crossing] * self.nb_lanes + crossing_target, return_index=True)
+        blocked = np.setdiff1d(np.arange(len(crossing)), kept)
+        new_pos[crossing[blocked]] = lane_length[crossing[blocked]]
+        new_speed[crossing[blocked]] = (lane_length[crossing[blocked]] - pos[crossing[blocked]]) / dt
+        crossing, crossing_target = crossing[kept], crossing_target[kept]
+        self.lane_next_departure[env[crossing], lane[crossing]] = time + self.headway
+        target_room = rears[env[crossing], crossing_target] - self.flow_min_gap[flow[crossing]]
+        new_pos[crossing] = np.clip(new_pos[crossing] - lane_length[crossing], 0.0, target_room)
+        lane[crossing] = crossing_target
+        step[crossing] += 1
+
+        halted = new_speed < 0.1
+        self.v_waiting[active] = np.where(halted, self.v_waiting[active] + dt, 0.0)
+        self.v_accumulated_waiting[active] += halted * dt
+        self.v_pos[active] = new_pos
+        self.v_speed[active] = new_speed
+        self.v_lane[active] = lane
+        self.v_step[active] = step
+        for slot in active[arriving]:
+            env_index = self.v_env[slot]
+            vehicle = self.v_ids[slot]
+            self.arrived[env_index].append(vehicle)
+            self.remove_vehicle(env_index, vehicle)
+
+    def _teleport(self):
+        """
+        Teleport the vehicles waiting for time_to_teleport seconds at the end of a lane, to the next edge of their route
+        with room for them. The vehicles with no such edge leave the network.
+        """
+        model = self.model
+        blocked = np.flatnonzero((self.v_lane >= 0) & (self.v_waiting >= self.time_to_teleport)
+                                 & (self.v_pos >= model.lane_length[np.maximum(self.v_lane, 0)]))
+        if len(blocked) == 0:
+            return
+        rears = self._lane_rears()
+        for slot in blocked.tolist():
+            env, route, flow = self.v_env[slot], self.v_route[slot], self.v_flow[slot]
+            needed = self.flow_length[flow] + self.flow_min_gap[flow]
+            for step in range(self.v_step[slot] + 1, len(model.routes[route])):
+                lanes = [lane for lane in model.route_lanes[route, step] if lane >= 0 and rears[env, lane] >= needed]
+                if lanes:
+                    lane = max(lanes, key=lambda lane: rears[env, lane])
+                    self.v_lane[slot] = lane
+                    self.v_step[slot] = step
+                    self.v_pos[slot] = self.flow_length[flow]
+                    self.v_speed[slot] = 0.0
+                    self.v_waiting[slot] = 0.0
+                    rears[env, lane] = 0.0
+                    break
+            else:
+                vehicle = self.v_ids[slot]
+                self.arrived[env].append(vehicle)
+                self.remove_vehicle(env, vehicle)
+
+    def _insert(self, time):
+        """
+        Generate the vehicles of the flows, and insert them on the first lane of their route when it has room.
+        """
+        model = self.model
+        if self.nb_flows == 0:
+            return
+        running = (model.flow_begin <= time) & (time < model.flow_end)
+        scale = self.scale[:, None]
+        drawn = (self.rng.random((self.nb_envs, self.nb_flows)) < model.flow_probability * scale) & running
+        expected = np.where(running & (model.flow_rate > 0), np.floor((time - model.flow_begin) * model.flow_rate * scale / 3600) + 1, 0)
+        due = np.maximum(expected.astype(np.int64) - self.scheduled, 0)
+        self.scheduled += due
+        self.pending += drawn + due
+
+        envs, flows = np.nonzero(self.pending)
+        if len(envs) == 0:
+            return
+        routes = model.flow_route[flows]
+        lanes, room = self._best_lanes(envs, model.route_lanes[routes, 0], self._lane_rears())
+        possible = room >= self.flow_length[flows] + self.flow_min_gap[flows]
+        envs, flows, lanes = envs[possible], flows[possible], lanes[possible]
+        _, kept = np.unique(envs * self.nb_lanes + lanes, return_index=True)
+        envs, flows, lanes = envs[kept], flows[kept], lanes[kept]
+        while len(self.free_slots) < len(envs):
+            self._allocate(self._capacity * 2)
+        slots = np.array([self.free_slots.pop() for _ in range(len(envs))], dtype=np.int64)
+        self.v_env[slots] = envs
+        self.v_lane[slots] = lanes
+        self.v_flow[slots] = flows
+        self.v_route[slots] = model.flow_route[flows]
+        self.v_step[slots] = 0
+        self.v_pos[slots] = self.flow_length[flows]
+        self.v_speed[slots] = np.minimum(self.flow_depart_speed[flows], np.minimum(self.flow_max_speed[flows], model.lane_speed[lanes]))
+        self.v_waiting[slots] = 0.0
+        self.v_accumulated_waiting[slots] = 0.0
+        self.v_depart[slots] = time
+        for slot, env, flow in zip(slots.tolist(), envs.tolist(), flows.tolist()):
+            vehicle = f'{model.flow_ids[flow]}.{self.flow_counts[env, flow]}'
+            self.flow_counts[env, flow] += 1
+            self.v_ids[slot] = vehicle
+            self.vehicle_slots[env][vehicle] = slot
+            self.departed[env].append(vehicle)
+        self.pending[envs, flows] -= 1
+
+    def expected_number(self, env):
+        """
+        Return the number of vehicles running or waiting to be inserted in an environment, plus the number of flows
+        that are not over, like traci.simulation.getMinExpectedNumber.
+        :param env: The index of the environment
+        :type env: int
+        :return: The number of vehicles
+        :rtype: int
+        """
+        return len(self.vehicle_slots[env]) + int(self.pending[env].sum()) + int(np.sum(self.model.flow_end > self.time))
+
+    ### Detectors ###
+
+    def snapshot(self):
+        """
+        Index the positions of the vehicles of the current step, to count the vehicles of all detectors and lanes.
+        The vehicles are sorted by lane and position, and cumulative sums give the number of vehicles, of halting
+        vehicles (speed under 5 km/h, like the jams of SUMO) and the sum of the speeds and lengths of any range.
+        """
+        if self._snapshot_time == self.time:
+            return
+        model = self.model
+        active = np.flatnonzero(self.v_lane >= 0)
+        keys = (self.v_env[active] * self.nb_lanes + self.v_lane[active]) * self.position_scale + self.v_pos[active]
+        order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[order]
+        self.sorted_slots = active[order]
+        speeds = self.v_speed[self.sorted_slots]
+        self.cumulated_halting = np.concatenate([[0], np.cumsum(speeds < 5 / 3.6)])
+        self.cumulated_speed = np.concatenate([[0.0], np.cumsum(speeds)])
+        self.cumulated_length = np.concatenate([[0.0], np.cumsum(self.flow_length[self.v_flow[self.sorted_slots]])])
+        envs = np.arange(self.nb_envs)[:, None]
+        # A vehicle is on a detector if a part of it is on the detector : its front is after the start and its back is
+        # before the end of the detector
+        detector_keys = (envs * self.nb_lanes + model.detector_lane) * self.position_scale
+        self.detector_low = np.searchsorted(self.sorted_keys, detector_keys + model.detector_start, side='right')
+        self.detector_high = np.searchsorted(self.sorted_keys, detector_keys + np.minimum(model.detector_end + self.max_vehicle_length, model.lane_length[model.detector_lane]), side='right')
+        lane_keys = (envs * self.nb_lanes + np.arange(self.nb_lanes)) * self.position_scale
+        self.lane_low = np.searchsorted(self.sorted_keys, lane_keys, side='left')
+        self.lane_high = np.searchsorted(self.sorted_keys, lane_keys + self.position_scale, side='left')
+        self._snapshot_time = self.time
+
+    def range_vehicles(self, low, high):
+        """
+        Return the ids of the vehicles of a range of the snapshot.
+        :param low: The start of the range
+        :type low: int
+        :param high: The end of the range
+        :type high: int
+        :return: The ids of the vehicles
+        :rtype: tuple
+        """
+        return tuple(self.v_ids[slot] for slot in self.sorted_slots[low:high])
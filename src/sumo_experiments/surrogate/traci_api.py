@@ -0,0 +1,479 @@
+import numpy as np
+import traci.constants as tc
+from traci import trafficlight as traci_trafficlight
+from traci.exceptions import TraCIException
+
+
+class _Domain:
+    """
+    Domain of the TraCI interface of an environment of a SurrogateSimulation, with the variable subscriptions.
+    The VARIABLES dict maps the TraCI variables that can be subscribed to the functions returning them.
+    """
+
+    VARIABLES = {}
+
+    def __init__(self, simulation, env):
+        """
+        Init of class
+        :param simulation: The surrogate simulation
+        :type simulation: SurrogateSimulation
+        :param env: The index of the environment
+        :type env: int
+        """
+        self._simulation = simulation
+        self._env = env
+        self._subscriptions = {}
+
+    def subscribe(self, object_id, variables=None, begin=None, end=None):
+        """
+        Subscribe variables of an object. The subscription replaces the previous one.
+        """
+        unknown = [variable for variable in variables or [] if variable not in self.VARIABLES]
+        if unknown:
+            raise TraCIException(f'The variables {unknown} of {type(self).__name__} are not supported by the surrogate simulation.')
+        self._check(object_id)
+        self._subscriptions[object_id] = list(variables or [])
+
+    def unsubscribe(self, object_id):
+        """
+        Remove the subscription of an object.
+        """
+        self._subscriptions.pop(object_id, None)
+
+    def getSubscriptionResults(self, object_id):
+        """
+        Return the values of the subscribed variables of an object.
+        """
+        return {variable: getattr(self, self.VARIABLES[variable])(object_id) for variable in self._subscriptions.get(object_id, [])}
+
+    def getAllSubscriptionResults(self):
+        """
+        Return the values of the subscribed variables of all subscribed objects.
+        """
+        return {object_id: self.getSubscriptionResults(object_id) for object_id in self._subscriptions}
+
+    def _check(self, object_id):
+        """
+        Raise a TraCIException if the object doesn't exist.
+        """
+
+
+class _SimulationDomain(_Domain):
+    """
+    The simulation domain.
+    """
+
+    def getTime(self):
+        return self._simulation.time
+
+    def getCurrentTime(self):
+        return int(round(self._simulation.time * 1000))
+
+    def getDeltaT(self):
+        return self._simulation.step_length
+
+    def getMinExpectedNumber(self):
+        return self._simulation.expected_number(self._env)
+
+    def getDepartedIDList(self):
+        return tuple(self._simulation.departed[self._env])
+
+    def getDepartedNumber(self):
+        return len(self._simulation.departed[self._env])
+
+    def getArrivedIDList(self):
+        return tuple(self._simulation.arrived[self._env])
+
+    def getArrivedNumber(self):
+        return len(self._simulation.arrived[self._env])
+
+    def clearPending(self, routeID=''):
+        self._simulation.pending[self._env] = 0
+
+    def getScale(self):
+        return float(self._simulation.scale[self._env])
+
+    def setScale(self, value):
+        self._simulation.scale[self._env] = value
+
+
+class _VehicleDomain(_Domain):
+    """
+    The vehicle domain. SUMO removes the subscription of a vehicle when it leaves the simulation.
+    """
+
+    VARIABLES = {
+        tc.VAR_SPEED: 'getSpeed',
+        tc.VAR_ROAD_ID: 'getRoadID',
+        tc.VAR_LANE_ID: 'getLaneID',
+        tc.VAR_LANEPOSITION: 'getLanePosition',
+        tc.VAR_WAITING_TIME: 'getWaitingTime',
+        tc.VAR_ACCUMULATED_WAITING_TIME: 'getAccumulatedWaitingTime',
+        tc.VAR_CO2EMISSION: 'getCO2Emission',
+    }
+
+    def getAllSubscriptionResults(self):
+        slots = self._simulation.vehicle_slots[self._env]
+        for vehicle in [vehicle for vehicle in self._subscriptions if vehicle not in slots]:
+            del self._subscriptions[vehicle]
+        return super().getAllSubscriptionResults()
+
+    def _slot(self, vehicle):
+        slot = self._simulation.vehicle_slots[self._env].get(vehicle)
+        if slot is None:
+            raise TraCIException(f"Vehicle '{vehicle}' is not known.")
+        return slot
+
+    def _check(self, vehicle):
+        self._slot(vehicle)
+
+    def getIDList(self):
+        return tuple(self._simulation.vehicle_slots[self._env])
+
+    def getIDCount(self):
+        return len(self._simulation.vehicle_slots[self._env])
+
+    def getRoute(self, vehicle):
+        model = self._simulation.model
+        return tuple(model.edge_ids[edge] for edge in model.routes[self._simulation.v_route[self._slot(vehicle)]])
+
+    def getRouteIndex(self, vehicle):
+        return int(self._simulation.v_step[self._slot(vehicle)])
+
+    def getRoadID(self, vehicle):
+        simulation = self._simulation
+        return simulation.model.edge_ids[simulation.model.lane_edge[simulation.v_lane[self._slot(vehicle)]]]
+
+    def getLaneID(self, vehicle):
+        return self._simulation.model.lane_ids[self._simulation.v_lane[self._slot(vehicle)]]
+
+    def getLanePosition(self, vehicle):
+        return float(self._simulation.v_pos[self._slot(vehicle)])
+
+    def getSpeed(self, vehicle):
+        return float(self._simulation.v_speed[self._slot(vehicle)])
+
+    def getWaitingTime(self, vehicle):
+        return float(self._simulation.v_waiting[self._slot(vehicle)])
+
+    def getAccumulatedWaitingTime(self, vehicle):
+        return float(self._simulation.v_accumulated_waiting[self._slot(vehicle)])
+
+    def getTypeID(self, vehicle):
+        return self._simulation.model.flow_type[self._simulation.v_flow[self._slot(vehicle)]]
+
+    def getCO2Emission(self, vehicle):
+        # Emissions are not modelled
+        self._slot(vehicle)
+        return 0.0
+
+    def isStopped(self, vehicle):
+        self._slot(vehicle)
+        return False
+
+    def remove(self, vehicle, reason=tc.REMOVE_VAPORIZED):
+        self._slot(vehicle)
+        self._simulation.remove_vehicle(self._env, vehicle)
+        self._subscriptions.pop(vehicle, None)
+
+
+class _LaneDomain(_Domain):
+    """
+    The lane domain.
+    """
+
+    VARIABLES = {
+        tc.LAST_STEP_VEHICLE_NUMBER: 'getLastStepVehicleNumber',
+        tc.LAST_STEP_VEHICLE_ID_LIST: 'getLastStepVehicleIDs',
+        tc.LAST_STEP_VEHICLE_HALTING_NUMBER: 'getLastStepHaltingNumber',
+        tc.LAST_STEP_MEAN_SPEED: 'getLastStepMeanSpeed',
+    }
+
+    def _lane(self, lane_id):
+        lane = self._simulation.model.lane_index.get(lane_id)
+        if lane is None:
+            raise TraCIException(f"Lane '{lane_id}' is not known.")
+        return lane
+
+    def _check(self, lane_id):
+        self._lane(lane_id)
+
+    def _range(self, lane_id):
+        simulation = self._simulation
+        simulation.snapshot()
+        lane = self._lane(lane_id)
+        return simulation.lane_low[self._env, lane], simulation.lane_high[self._env, lane]
+
+    def getIDList(self):
+        return tuple(self._simulation.model.lane_ids)
+
+    def getEdgeID(self, lane_id):
+        model = self._simulation.model
+        return model.edge_ids[model.lane_edge[self._lane(lane_id)]]
+
+    def getLength(self, lane_id):
+        return float(self._simulation.model.lane_length[self._lane(lane_id)])
+
+    def getMaxSpeed(self, lane_id):
+        return float(self._simulation.model.lane_speed[self._lane(lane_id)])
+
+    def getLastStepVehicleNumber(self, lane_id):
+        low, high = self._range(lane_id)
+        return int(high - low)
+
+    def getLastStepVehicleIDs(self, lane_id):
+        return self._simulation.range_vehicles(*self._range(lane_id))
+
+    def getLastStepHaltingNumber(self, lane_id):
+        low, high = self._range(lane_id)
+        return int(self._simulation.cumulated_halting[high] - self._simulation.cumulated_halting[low])
+
+    def getLastStepMeanSpeed(self, lane_id):
+        low, high = self._range(lane_id)
+        if high == low:
+            return self.getMaxSpeed(lane_id)
+        return float((self._simulation.cumulated_speed[high] - self._simulation.cumulated_speed[low]) / (high - low))
+
+
+class _EdgeDomain(_Domain):
+    """
+    The edge domain.
+    """
+
+    VARIABLES = {
+        tc.LAST_STEP_VEHICLE_NUMBER: 'getLastStepVehicleNumber',
+        tc.LAST_STEP_VEHICLE_ID_LIST: 'getLastStepVehicleIDs',
+    }
+
+    def _edge(self, edge_id):
+        edge = self._simulation.model.edge_index.get(edge_id)
+        if edge is None:
+            raise TraCIException(f"Edge '{edge_id}' is not known.")
+        return edge
+
+    def _check(self, edge_id):
+        self._edge(edge_id)
+
+    def getIDList(self):
+        return tuple(self._simulation.model.edge_ids)
+
+    def getFromJunction(self, edge_id):
+        return self._simulation.model.edge_from[self._edge(edge_id)]
+
+    def getToJunction(self, edge_id):
+        return self._simulation.model.edge_to[self._edge(edge_id)]
+
+    def getLaneNumber(self, edge_id):
+        return len(self._simulation.model.edge_lanes[self._edge(edge_id)])
+
+    def getLastStepVehicleIDs(self, edge_id):
+        simulation = self._simulation
+        simulation.snapshot()
+        vehicles = ()
+        for lane in simulation.model.edge_lanes[self._edge(edge_id)]:
+            vehicles += simulation.range_vehicles(simulation.lane_low[self._env, lane], simulation.lane_high[self._env, lane])
+        return vehicles
+
+    def getLastStepVehicleNumber(self, edge_id):
+        simulation = self._simulation
+        simulation.snapshot()
+        lanes = simulation.model.edge_lanes[self._edge(edge_id)]
+        return int(np.sum(simulation.lane_high[self._env, lanes] - simulation.lane_low[self._env, lanes]))
+
+
+class _LaneAreaDomain(_Domain):
+    """
+    The lane area detector domain. The interval values are the values of the last step.
+    """
+
+    VARIABLES = {
+        tc.LAST_STEP_VEHICLE_NUMBER: 'getLastStepVehicleNumber',
+        tc.LAST_STEP_VEHICLE_ID_LIST: 'getLastStepVehicleIDs',
+        tc.LAST_STEP_OCCUPANCY: 'getLastStepOccupancy',
+        tc.LAST_STEP_MEAN_SPEED: 'getLastStepMeanSpeed',
+        tc.LAST_STEP_VEHICLE_HALTING_NUMBER: 'getLastStepHaltingNumber',
+        tc.JAM_LENGTH_VEHICLE: 'getJamLengthVehicle',
+    }
+
+    def _detector(self, detector_id):
+        detector = self._simulation.model.detector_index.get(detector_id)
+        if detector is None:
+            raise TraCIException(f"Lane area detector '{detector_id}' is not known.")
+        return detector
+
+    def _check(self, detector_id):
+        self._detector(detector_id)
+
+    def _range(self, detector_id):
+        simulation = self._simulation
+        simulation.snapshot()
+        detector = self._detector(detector_id)
+        return simulation.detector_low[self._env, detector], simulation.detector_high[self._env, detector]
+
+    def getIDList(self):
+        return tuple(self._simulation.model.detector_ids)
+
+    def getLaneID(self, detector_id):
+        model = self._simulation.model
+        return model.lane_ids[model.detector_lane[self._detector(detector_id)]]
+
+    def getPosition(self, detector_id):
+        return float(self._simulation.model.detector_start[self._detector(detector_id)])
+
+    def getLength(self, detector_id):
+        model = self._simulation.model
+        detector = self._detector(detector_id)
+        return float(model.detector_end[detector] - model.detector_start[detector])
+
+    def getLastStepVehicleNumber(self, detector_id):
+        low, high = self._range(detector_id)
+        return int(high - low)
+
+    def getLastStepVehicleIDs(self, detector_id):
+        return self._simulation.range_vehicles(*self._range(detector_id))
+
+    def getLastStepHaltingNumber(self, detector_id):
+        low, high = self._range(detector_id)
+        return int(self._simulation.cumulated_halting[high] - self._simulation.cumulated_halting[low])
+
+    def getJamLengthVehicle(self, detector_id):
+        return self.getLastStepHaltingNumber(detector_id)
+
+    def getJamLengthMeters(self, detector_id):
+        low, high = self._range(detector_id)
+        lengths = self._simulation.cumulated_length
+        halting = self.getLastStepHaltingNumber(detector_id)
+        return float((lengths[high] - lengths[low]) * halting / (high - low)) if high > low else 0.0
+
+    def getLastStepOccupancy(self, detector_id):
+        low, high = self._range(detector_id)
+        length = self.getLength(detector_id)
+        occupied = self._simulation.cumulated_length[high] - self._simulation.cumulated_length[low]
+        return float(min(100.0, 100.0 * occupied / length)) if length > 0 else 0.0
+
+    def getLastStepMeanSpeed(self, detector_id):
+        low, high = self._range(detector_id)
+        if high == low:
+            return -1.0
+        return float((self._simulation.cumulated_speed[high] - self._simulation.cumulated_speed[low]) / (high - low))
+
+    def getIntervalMeanSpeed(self, detector_id):
+        return self.getLastStepMeanSpeed(detector_id)
+
+    def getIntervalVehicleNumber(self, detector_id):
+        return self.getLastStepVehicleNumber(detector_id)
+
+    def getIntervalOccupancy(self, detector_id):
+        return self.getLastStepOccupancy(detector_id)
+
+
+class _TrafficLightDomain(_Domain):
+    """
+    The traffic light domain. The programs are static : phases follow each other with their durations.
+    """
+
+    Logic = traci_trafficlight.Logic
+    Phase = traci_trafficlight.Phase
+
+    VARIABLES = {
+        tc.TL_RED_YELLOW_GREEN_STATE: 'getRedYellowGreenState',
+        tc.TL_CURRENT_PHASE: 'getPhase',
+        tc.TL_CURRENT_PROGRAM: 'getProgram',
+        tc.TL_NEXT_SWITCH: 'getNextSwitch',
+    }
+
+    def _tl(self, tl_id):
+        tl = self._simulation.model.tl_index.get(tl_id)
+        if tl is None:
+            raise TraCIException(f"Traffic light '{tl_id}' is not known.")
+        return tl
+
+    def _check(self, tl_id):
+        self._tl(tl_id)
+
+    def getIDList(self):
+        return tuple(self._simulation.model.tl_ids)
+
+    def getPhase(self, tl_id):
+        return int(self._simulation.phase[self._env, self._tl(tl_id)])
+
+    def setPhase(self, tl_id, index):
+        tl = self._tl(tl_id)
+        phases = self._simulation.programs[self._env][tl][1]
+        if not 0 <= index < len(phases):
+            raise TraCIException(f"The phase index {index} is not in the allowed range [0,{len(phases) - 1}].")
+        self._simulation.set_phase(self._env, tl, index)
+
+    def getPhaseDuration(self, tl_id):
+        tl = self._tl(tl_id)
+        return float(self._simulation.programs[self._env][tl][1][self._simulation.phase[self._env, tl]][0])
+
+    def setPhaseDuration(self, tl_id, duration):
+        tl = self._tl(tl_id)
+        self._simulation.set_phase(self._env, tl, self._simulation.phase[self._env, tl], duration)
+
+    def getNextSwitch(self, tl_id):
+        return float(self._simulation.next_switch[self._env, self._tl(tl_id)])
+
+    def getRedYellowGreenState(self, tl_id):
+        tl = self._tl(tl_id)
+        return self._simulation.programs[self._env][tl][1][self._simulation.phase[self._env, tl]][1]
+
+    def getProgram(self, tl_id):
+        return self._simulation.programs[self._env][self._tl(tl_id)][0]
+
+    def getAllProgramLogics(self, tl_id):
+        tl = self._tl(tl_id)
+        program_id, phases, _ = self._simulation.programs[self._env][tl]
+        return (self.Logic(program_id, 0, int(self._simulation.phase[self._env, tl]),
+                           [self.Phase(duration, state, duration, duration) for duration, state in phases]),)
+
+    def setProgramLogic(self, tl_id, logic):
+        tl = self._tl(tl_id)
+        phases = [(float(phase.duration), phase.state) for phase in logic.phases]
+        self._simulation.set_program(self._env, tl, logic.programID, phases, logic.currentPhaseIndex)
+
+    def getControlledLinks(self, tl_id):
+        model = self._simulation.model
+        return [[(model.lane_ids[model.link_from[link]], model.lane_ids[model.link_to[link]], '')]
+                for link in model.tl_links[self._tl(tl_id)]]
+
+    def getControlledLanes(self, tl_id):
+        model = self._simulation.model
+        return tuple(model.lane_ids[model.link_from[link]] for link in model.tl_links[self._tl(tl_id)])
+
+
+class SurrogateTraci:
+    """
+    TraCI interface of an environment of a SurrogateSimulation. It replaces the traci (or libsumo) module for the
+    strategies and the TraciWrapper, with the simulation, vehicle, lane, edge, lanearea and trafficlight domains.
+    The functions of SUMO not implemented by the surrogate raise an AttributeError.
+    """
+
+    def __init__(self, simulation, env):
+        """
+        Init of class
+        :param simulation: The surrogate simulation
+        :type simulation: SurrogateSimulation
+        :param env: The index of the environment
+        :type env: int
+        """
+        self.surrogate = simulation
+        self.env = env
+        self.simulation = _SimulationDomain(simulation, env)
+        self.vehicle = _VehicleDomain(simulation, env)
+        self.lane = _LaneDomain(simulation, env)
+        self.edge = _EdgeDomain(simulation, env)
+        self.lanearea = _LaneAreaDomain(simulation, env)
+        self.trafficlight = _TrafficLightDomain(simulation, env)
+
+    def simulationStep(self, step=0.0):
+        """
+        Request a simulation step. The step is simulated when all environments of the simulation have requested it.
+        """
+        self.surrogate.request_step(self.env)
+
+    def close(self):
+        """
+        Nothing to close : the function exists for the compatibility with traci.
+        """
@@ -1,2 +1,12 @@
+from .subscriptions import SubscriptionCollector
+from .detector_bus import DetectorBus
+from .traffic_light_mirror import TrafficLightMirror
+from .data_store import ColumnarDataStore
+from .vehicle_tracker import VehicleTracker
+from .edge_flow_counter import EdgeFlowCounter
+from .sinks import MetricsSink, ChunkedFileSink
+from .profiler import Profiler
+from .call_counter import TraciCallCounter
+from .trace import TraceRecorder, TraceReplayer
 from .traci_functions import *
 from .traci_wrapper import TraciWrapper
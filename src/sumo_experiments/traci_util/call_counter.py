@@ -0,0 +1,196 @@
+from time import perf_counter_ns
+
+import pandas as pd
+
+from sumo_experiments.traci_util.profiler import _NullSpan
+
+
+class _Caller:
+    """
+    Context manager attributing the TraCI calls made inside it to a caller.
+    """
+
+    __slots__ = ('counter', 'name', 'previous')
+
+    def __init__(self, counter, name):
+        self.counter = counter
+        self.name = name
+
+    def __enter__(self):
+        self.previous = self.counter.current
+        self.counter.current = self.name
+        return self
+
+    def __exit__(self, *exc):
+        self.counter.current = self.previous
+        return False
+
+
+class _TracedDomain:
+    """
+    Proxy of a TraCI domain (traci.vehicle, traci.lanearea...), counting the calls to its functions.
+    """
+
+    def __init__(self, domain, name, counter):
+        object.__setattr__(self, '_domain', domain)
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_counter', counter)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._domain, name)
+        if not callable(attribute) or name.startswith('_'):
+            return attribute
+        traced = self._counter._trace(attribute, f'{self._name}.{name}' if self._name else name)
+        # Cached in the proxy, so __getattr__ is only called once per function
+        object.__setattr__(self, name, traced)
+        return traced
+
+    def __setattr__(self, name, value):
+        setattr(self._domain, name, value)
+
+
+class _TracedModule(_TracedDomain):
+    """
+    Proxy of the traci or libsumo module, counting the calls to the functions of the module and of its domains.
+    The other attributes are read from and written in the module, so the attributes set on the proxy are shared with
+    the users of the module.
+    """
+
+    DOMAINS = {'busstop', 'calibrator', 'chargingstation', 'edge', 'gui', 'inductionloop', 'junction', 'lane',
+               'lanearea', 'meandata', 'multientryexit', 'overheadwire', 'parkingarea', 'person', 'poi', 'polygon',
+               'rerouter', 'route', 'routeprobe', 'simulation', 'trafficlight', 'variablespeedsign', 'vehicle',
+               'vehicletype'}
+
+    def __getattr__(self, name):
+        if name in self.DOMAINS:
+            domain = _TracedDomain(getattr(self._domain, name), name, self._counter)
+            object.__setattr__(self, name, domain)
+            return domain
+        return super().__getattr__(name)
+
+
+class TraciCallCounter:
+    """
+    Count the TraCI calls made during a simulation, by function and by caller, with their cumulative time.
+    The traci or libsumo module is replaced by a proxy returned by instrument(traci), which counts the calls made
+    through it. The calls are attributed to the current caller, set with the caller(name) context manager. The
+    TraciWrapper instruments the module it receives when a counter is given to it, and attributes the calls to its stats
+    functions ('stats:<name>'), its behavioural functions ('behaviour:<name>'), or to itself ('wrapper'). The proxy is
+    passed to these functions, so the calls made later by a strategy through its stored traci are attributed too.
+    The number of simulation steps is the number of calls to simulationStep, and is used for the calls per step.
+    """
+
+    def __init__(self):
+        """
+        Init of class
+        """
+        self.current = 'wrapper'
+        self.calls = {}
+        self.nb_steps = 0
+
+    def instrument(self, traci):
+        """
+        Return a proxy of the traci or libsumo module counting the calls made through it.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        :return: The proxy
+        :rtype: Traci
+        """
+        if isinstance(traci, _TracedModule):
+            return traci
+        return _TracedModule(traci, '', self)
+
+    def wrap(self, traci_function):
+        """
+        Return a function calling traci_function with an instrumented traci, to give to Network.run.
+        :param traci_function: The function using TraCi package and that can control infrastructures.
+        :type traci_function: function
+        :return: The instrumented function
+        :rtype: function
+        """
+        def instrumented_function(traci):
+            return traci_function(self.instrument(traci))
+        return instrumented_function
+
+    def caller(self, name):
+        """
+        Return a context manager attributing the calls made inside it to a caller.
+        :param name: The name of the caller
+        :type name: str
+        :return: The context manager
+        :rtype: contextmanager
+        """
+        return _Caller(self, name)
+
+    def report(self, top=None):
+        """
+        Return the calls made by each caller to each function, sorted by number of calls.
+        :param top: If set, only the top callers/functions are returned.
+        :type top: int
+        :return: The caller, function, number of calls, calls per step, total time (s) and mean time (µs) of each couple
+        :rtype: pandas.DataFrame
+        """
+        rows = [{'caller': caller, 'function': function, 'calls': calls, 'calls_per_step': calls / max(self.nb_steps, 1),
+                 'total_s': duration / 1e9, 'mean_us': duration / calls / 1e3}
+                for (caller, function), (calls, duration) in self.calls.items()]
+        table = pd.DataFrame(rows, columns=['caller', 'function', 'calls', 'calls_per_step', 'total_s', 'mean_us'])
+        table = table.sort_values(['calls', 'total_s'], ascending=False, ignore_index=True)
+        return table.head(top) if top is not None else table
+
+    def report_by_caller(self):
+        """
+        Return the calls made by each caller, all functions included, sorted by number of calls.
+        :return: The caller, number of calls, calls per step and total time (s) of each caller
+        :rtype: pandas.DataFrame
+        """
+        table = self.report().groupby('caller', as_index=False)[['calls', 'calls_per_step', 'total_s']].sum()
+        return table.sort_values(['calls', 'total_s'], ascending=False, ignore_index=True)
+
+    def reset(self):
+        """
+        Remove all the counted calls.
+        """
+        self.calls = {}
+        self.nb_steps = 0
+
+    def _trace(self, function, name):
+        """
+        Return a function counting the calls to a TraCI function.
+        """
+        counter = self
+        is_step = name == 'simulationStep'
+
+        def traced(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                duration = perf_counter_ns() - start
+                key = (counter.current, name)
+                stats = counter.calls.get(key)
+                if stats is None:
+                    counter.calls[key] = [1, duration]
+                else:
+                    stats[0] += 1
+                    stats[1] += duration
+                if is_step:
+                    counter.nb_steps += 1
+        traced.__name__ = getattr(function, '__name__', name)
+        return traced
+
+
+class _NullCallCounter(TraciCallCounter):
+    """
+    Disabled counter, which doesn't instrument the module.
+    """
+
+    _CALLER = _NullSpan()
+
+    def instrument(self, traci):
+        return traci
+
+    def caller(self, name):
+        return self._CALLER
+
+
+NULL_CALL_COUNTER = _NullCallCounter()
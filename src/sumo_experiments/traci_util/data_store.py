@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+
+class ColumnarDataStore:
+    """
+    Store the data collected during a simulation in typed NumPy columns, one row per collection step.
+    Columns are preallocated for a given number of rows and grow by chunks when this number is reached.
+    Integer values are stored in int64 columns, real values in float64 columns, booleans in bool columns and other
+    values in object columns.
+    A column is converted to a wider type when a value doesn't fit in it. When a key is missing in a row, its value is NaN.
+    """
+
+    def __init__(self, capacity=None, chunk_size=4096):
+        """
+        Init of class
+        :param capacity: The number of rows to preallocate. If None, the columns are allocated by chunks.
+        :type capacity: int
+        :param chunk_size: The number of rows added to the columns each time they are full.
+        :type chunk_size: int
+        """
+        self.chunk_size = chunk_size
+        self.capacity = capacity if capacity else chunk_size
+        self.columns = {}
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def __contains__(self, key):
+        return key in self.columns
+
+    def __getitem__(self, key):
+        return self.columns[key][:self.length]
+
+    def keys(self):
+        """
+        Return the names of the columns.
+        :return: The names of the columns
+        :rtype: list
+        """
+        return list(self.columns)
+
+    def append(self, row):
+        """
+        Add a row to the store.
+        :param row: The values of the row, with the name of the column as key.
+        :type row: dict
+        """
+        if self.length == self.capacity:
+            self._grow(self.capacity + self.chunk_size)
+        index = self.length
+        for key, value in row.items():
+            column = self.columns.get(key)
+            if column is None:
+                column = self._new_column(key, value)
+            elif not self._fits(column.dtype, value):
+                column = self._convert(key, self._dtype_of(value))
+            column[index] = value
+        if len(row) < len(self.columns):
+            for key in self.columns:
+                if key not in row:
+                    self._set_missing(key, index)
+        self.length += 1
+
+    def to_dataframe(self, start=0):
+        """
+        Return the stored rows as a DataFrame. The columns of the DataFrame are views on the columns of the store,
+        without copy.
+        :param start: The index of the first row to return.
+        :type start: int
+        :return: The stored data
+        :rtype: pandas.DataFrame
+        """
+        return pd.DataFrame({key: column[start:self.length] for key, column in self.columns.items()}, copy=False)
+
+    def clear(self):
+        """
+        Remove all rows from the store, keeping the columns and their allocated memory.
+        Views returned by to_dataframe before the call must not be used after it.
+        """
+        self.length = 0
+
+    @staticmethod
+    def _dtype_of(value):
+        """
+        Return the NumPy type of the column that can store a value.
+        """
+        if isinstance(value, (bool, np.bool_)):
+            return np.dtype(bool)
+        if isinstance(value, (int, np.integer)):
+            return np.dtype(np.int64)
+        if isinstance(value, (float, np.floating)):
+            return np.dtype(np.float64)
+        return np.dtype(object)
+
+    @staticmethod
+    def _fits(dtype, value):
+        """
+        Return True if a value can be stored in a column of type dtype without loss.
+        """
+        if dtype.kind == 'O':
+            return True
+        if isinstance(value, (bool, np.bool_)):
+            return dtype.kind == 'b'
+        if dtype.kind == 'b':
+            return False
+        if dtype.kind == 'i':
+            return isinstance(value, (int, np.integer))
+        return isinstance(value, (int, float, np.integer, np.floating))
+
+    def _new_column(self, key, value):
+        """
+        Create a column for a new key. The previous rows are filled with NaN.
+        """
+        dtype = self._dtype_of(value)
+        if self.length > 0 and dtype.kind in 'ib':
+            dtype = np.dtype(np.float64) if dtype.kind == 'i' else np.dtype(object)
+        column = np.empty(self.capacity, dtype=dtype)
+        if self.length > 0:
+            column[:self.length] = np.nan
+        self.columns[key] = column
+        return column
+
+    def _convert(self, key, dtype):
+        """
+        Convert a column to a type that can store both its values and values of type dtype.
+        """
+        column = self.columns[key]
+        if 'O' in (column.dtype.kind, dtype.kind) or 'b' in (column.dtype.kind, dtype.kind):
+            new_dtype = np.dtype(object)
+        else:
+            new_dtype = np.dtype(np.float64)
+        new_column = np.empty(self.capacity, dtype=new_dtype)
+        new_column[:self.length] = column[:self.length]
+        self.columns[key] = new_column
+        return new_column
+
+    def _set_missing(self, key, index):
+        """
+        Set the value of a column to NaN for a row.
+        """
+        column = self.columns[key]
+        if column.dtype.kind in 'ib':
+            column = self._convert(key, np.dtype(np.float64))
+        column[index] = np.nan
+
+    def _grow(self, capacity):
+        """
+        Reallocate all columns with a bigger capacity.
+        """
+        for key, column in self.columns.items():
+            new_column = np.empty(capacity, dtype=column.dtype)
+            new_column[:self.length] = column[:self.length]
+            self.columns[key] = new_column
+        self.capacity = capacity
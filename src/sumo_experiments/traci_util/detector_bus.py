@@ -0,0 +1,173 @@
+import numpy as np
+import traci.constants as tc
+
+from sumo_experiments.traci_util.subscriptions import SubscriptionCollector
+
+
+class DetectorBus:
+    """
+    Values of the lane area detectors of the intersections of a network, read with one TraCI call per step.
+    All the detectors of the TLSTopology of the network are subscribed through the shared SubscriptionCollector, and
+    the strategies read their values from the bus instead of calling traci.lanearea for each detector. The bus is
+    shared by all the users of the simulation (DetectorBus.shared), so the detectors are fetched once per step,
+    whatever the number of strategies or stats functions reading them.
+    The detectors are indexed by their ids in the topology. For each variable, values returns the NumPy array of the
+    values of all detectors for the current step, built once per step, so the values of the detectors of a phase are
+    read with values(variable)[topology.green(tl_id, phase, type)].
+    The detectors of the topology that don't exist in the simulation are not subscribed, and their values are 0.
+    The bus belongs to the collector of one simulation. A bus kept by a user after the end of its simulation looks for
+    its detectors again when it is updated in the next simulation.
+    The variables that are not subscribed are read by values with the getters of traci.lanearea, only for the detectors
+    and at the steps where they are read. With libsumo, it is faster for the users that read few variables of some
+    detectors with values only, as SUMO computes the subscriptions of all the detectors at each step.
+    """
+
+    VARIABLES = [tc.LAST_STEP_VEHICLE_NUMBER, tc.LAST_STEP_MEAN_SPEED, tc.JAM_LENGTH_VEHICLE, tc.LAST_STEP_OCCUPANCY]
+    GETTERS = {
+        tc.LAST_STEP_VEHICLE_NUMBER: 'getLastStepVehicleNumber',
+        tc.LAST_STEP_MEAN_SPEED: 'getLastStepMeanSpeed',
+        tc.JAM_LENGTH_VEHICLE: 'getJamLengthVehicle',
+        tc.LAST_STEP_OCCUPANCY: 'getLastStepOccupancy',
+    }
+
+    def __init__(self, traci, topology):
+        """
+        Init of class
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        :param topology: The topology of the network
+        :type topology: sumo_experiments.preset_networks.TLSTopology
+        """
+        self.traci = traci
+        self.topology = topology
+        self._find_detectors()
+        self.variables = []
+        self.collector = None
+        self.time = None
+        self.arrays = {}
+        self.read = {}
+
+    @classmethod
+    def shared(cls, traci, topology, variables=None, subscribe=True):
+        """
+        Return the bus of the simulation for a topology, and create it if it doesn't exist. The bus belongs to the
+        shared SubscriptionCollector of the simulation. The variables are added to the bus.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        :param topology: The topology of the network, as TLSTopology.of(network)
+        :type topology: sumo_experiments.preset_networks.TLSTopology
+        :param variables: The TraCI variables (from traci.constants) read by the user of the bus. Default is DetectorBus.VARIABLES.
+        :type variables: list
+        :param subscribe: If False, no variable is subscribed for the user, who must read the detectors with values only.
+        :type subscribe: bool
+        :return: The bus of the simulation
+        :rtype: DetectorBus
+        """
+        collector = SubscriptionCollector.shared(traci)
+        bus = collector.detector_bus
+        if bus is None or bus.topology is not topology:
+            bus = cls(traci, topology)
+            collector.detector_bus = bus
+        if subscribe:
+            bus.add_variables(cls.VARIABLES if variables is None else variables)
+        return bus
+
+    def add_variables(self, variables):
+        """
+        Add variables to the subscription of all the detectors of the bus.
+        :param variables: The TraCI variables (from traci.constants)
+        :type variables: list
+        """
+        new_variables = [variable for variable in variables if variable not in self.variables]
+        if new_variables:
+            self.variables += new_variables
+            if self.collector is not None:
+                self.collector.subscribe_laneareas(self.detectors, self.variables)
+                self.time = None
+
+    def update(self):
+        """
+        Fetch the values of the detectors for the current step. Calling it twice in the same step does nothing.
+        Must be called before reading the values, after each simulation step.
+        """
+        collector = SubscriptionCollector.shared(self.traci)
+        if collector is not self.collector:
+            if self.collector is not None or collector.detector_bus is not self:
+                # The bus was built for another simulation
+                self._find_detectors()
+            if self.variables:
+                collector.subscribe_laneareas(self.detectors, self.variables)
+            if collector.detector_bus is None:
+                collector.detector_bus = self
+            self.collector = collector
+            self.time = None
+        collector.update()
+        time = self.traci.simulation.getTime()
+        if time != self.time:
+            self.time = time
+            self.arrays = {}
+            self.read = {}
+
+    def values(self, variable, detectors=None):
+        """
+        Return the values of a variable for all the detectors, indexed by the ids of the detectors in the topology.
+        :param variable: The TraCI variable (from traci.constants)
+        :type variable: int
+        :param detectors: The ids of the detectors to read, if the variable is not subscribed. The values of the other detectors are not read, and may be 0. Default is all the detectors.
+        :type detectors: numpy.ndarray
+        :return: The values of the detectors
+        :rtype: numpy.ndarray
+        """
+        if variable not in self.variables:
+            return self._query(variable, detectors)
+        array = self.arrays.get(variable)
+        if array is None:
+            results = self.collector.lanearea_results
+            array = np.fromiter((results[detector][variable] for detector in self.detectors), dtype=np.float64, count=len(self.detectors))
+            if not self.complete:
+                values = array
+                array = np.zeros(len(self.topology.detectors), dtype=np.float64)
+                array[self.positions] = values
+            self.arrays[variable] = array
+        return array
+
+    def value(self, variable, detector):
+        """
+        Return the value of a variable for one detector.
+        :param variable: The TraCI variable (from traci.constants)
+        :type variable: int
+        :param detector: The name of the detector
+        :type detector: str
+        :return: The value of the detector
+        """
+        return self.collector.lanearea_results[detector][variable]
+
+    def _find_detectors(self):
+        """
+        Find the detectors of the topology that exist in the simulation.
+        """
+        topology = self.topology
+        existing_detectors = set(self.traci.lanearea.getIDList())
+        self.detectors = [detector for detector in topology.detectors if detector in existing_detectors]
+        self.complete = len(self.detectors) == len(topology.detectors)
+        self.positions = np.array([topology.detector_index[detector] for detector in self.detectors], dtype=np.int64)
+        self.existing = np.zeros(len(topology.detectors), dtype=bool)
+        self.existing[self.positions] = True
+
+    def _query(self, variable, detectors=None):
+        """
+        Read a variable of the detectors with the getters of traci.lanearea, for the detectors not read yet at this step.
+        """
+        array = self.arrays.get(variable)
+        if array is None:
+            array = np.zeros(len(self.topology.detectors), dtype=np.float64)
+            self.arrays[variable] = array
+            self.read[variable] = ~self.existing
+        read = self.read[variable]
+        missing = np.flatnonzero(~read) if detectors is None else detectors[~read[detectors]]
+        if len(missing):
+            getter = getattr(self.traci.lanearea, self.GETTERS[variable])
+            names = self.topology.detectors
+            array[missing] = [getter(names[detector]) for detector in missing.tolist()]
+            read[missing] = True
+        return array
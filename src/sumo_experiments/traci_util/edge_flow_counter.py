@@ -0,0 +1,154 @@
+import hashlib
+import numpy as np
+import pandas as pd
+import traci.constants as tc
+
+from sumo_experiments.traci_util.subscriptions import SubscriptionCollector
+from sumo_experiments.preset_networks.session import SimulationSession
+
+
+class EdgeFlowCounter:
+    """
+    Count the vehicles flowing on each edge of a simulation.
+    The vehicles on all edges are subscribed through the shared SubscriptionCollector, and only the vehicles that
+    entered an edge since the previous step are processed. Three modes are available :
+    - 'exact' : The number of distinct vehicles seen on each edge. Vehicle ids are interned to integers, and each edge
+    has a bitmap of the vehicles already counted.
+    - 'entries' : The number of entries on each edge. A vehicle entering the same edge twice is counted twice.
+    - 'approximate' : The number of distinct vehicles seen on each edge, estimated with one HyperLogLog sketch per edge.
+    The memory used doesn't depend on the number of vehicles, and the relative error is about 1.04 / sqrt(2 ** precision).
+    """
+
+    MODES = ['exact', 'entries', 'approximate']
+
+    def __init__(self, traci, mode='exact', precision=10):
+        """
+        Init of class. The flows of all edges of the simulation are counted.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        :param mode: The counting mode ('exact', 'entries' or 'approximate')
+        :type mode: str
+        :param precision: The number of bits of the hash used to select the register of the HyperLogLog sketches, between 4 and 16. Used only in 'approximate' mode.
+        :type precision: int
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown edge flow mode '{mode}', must be one of {self.MODES}")
+        if not 4 <= precision <= 16:
+            raise ValueError("The precision must be between 4 and 16")
+        self.traci = traci
+        self.mode = mode
+        self.precision = precision
+        session = SimulationSession.get(traci)
+        if session is not None:
+            self.edges, self.from_junctions, self.to_junctions = session.cached('edge_junctions', lambda: self._read_edges(traci))
+        else:
+            self.edges, self.from_junctions, self.to_junctions = self._read_edges(traci)
+        self.previous_vehicles = [()] * len(self.edges)
+        self.counts = np.zeros(len(self.edges), dtype=np.int64)
+        self.vehicle_ids = {}
+        self.bitmaps = [bytearray() for _ in self.edges] if mode == 'exact' else None
+        self.registers = np.zeros((len(self.edges), 1 << precision), dtype=np.uint8) if mode == 'approximate' else None
+        self.collector = None
+        self.episode = 0
+
+    @staticmethod
+    def _read_edges(traci):
+        """
+        Return the ids of the edges of the simulation, and the ids of their from and to junctions.
+        """
+        edges, from_junctions, to_junctions = [], [], []
+        for edge in traci.edge.getIDList():
+            edges.append(edge)
+            from_junctions.append(traci.edge.getFromJunction(edge).split('#')[0])
+            to_junctions.append(traci.edge.getToJunction(edge).split('#')[0])
+        return edges, from_junctions, to_junctions
+
+    def update(self):
+        """
+        Count the vehicles that entered each edge since the previous update. Must be called after each simulation step.
+        """
+        collector = SubscriptionCollector.shared(self.traci)
+        if collector is not self.collector:
+            collector.subscribe_edges(self.edges, [tc.LAST_STEP_VEHICLE_ID_LIST])
+            self.collector = collector
+        collector.update()
+        edge_results = collector.edge_results
+        for i, edge in enumerate(self.edges):
+            vehicles = edge_results[edge][tc.LAST_STEP_VEHICLE_ID_LIST]
+            previous_vehicles = self.previous_vehicles[i]
+            if vehicles == previous_vehicles:
+                continue
+            self.previous_vehicles[i] = vehicles
+            if previous_vehicles:
+                previous_vehicles = set(previous_vehicles)
+                entered = [vehicle for vehicle in vehicles if vehicle not in previous_vehicles]
+            else:
+                entered = vehicles
+            if entered:
+                self._count(i, entered)
+
+    def new_episode(self):
+        """
+        Start a new episode, after the state of the simulation was loaded with traci.simulation.loadState. The vehicles
+        of the new episode are counted as new vehicles, even if their ids were already used.
+        """
+        self.episode += 1
+        self.previous_vehicles = [()] * len(self.edges)
+
+    def get_flows(self):
+        """
+        Return the flow of each edge.
+        :return: The flows, with the from_junction, to_junction, edge and flow columns
+        :rtype: pandas.DataFrame
+        """
+        if self.mode == 'approximate':
+            flows = np.rint(self._estimate()).astype(np.int64)
+        else:
+            flows = self.counts.copy()
+        return pd.DataFrame({
+            'from_junction': self.from_junctions,
+            'to_junction': self.to_junctions,
+            'edge': self.edges,
+            'flow': flows
+        })
+
+    def _count(self, edge_index, vehicles):
+        """
+        Count the vehicles that entered an edge.
+        """
+        if self.episode and self.mode != 'entries':
+            vehicles = [f'{vehicle}@{self.episode}' for vehicle in vehicles]
+        if self.mode == 'entries':
+            self.counts[edge_index] += len(vehicles)
+        elif self.mode == 'exact':
+            bitmap = self.bitmaps[edge_index]
+            for vehicle in vehicles:
+                number = self.vehicle_ids.setdefault(vehicle, len(self.vehicle_ids))
+                byte, bit = number >> 3, 1 << (number & 7)
+                if byte >= len(bitmap):
+                    bitmap.extend(bytes(byte + 1 - len(bitmap)))
+                if not bitmap[byte] & bit:
+                    bitmap[byte] |= bit
+                    self.counts[edge_index] += 1
+        else:
+            registers = self.registers[edge_index]
+            width = 64 - self.precision
+            for vehicle in vehicles:
+                value = int.from_bytes(hashlib.blake2b(vehicle.encode(), digest_size=8).digest(), 'big')
+                register = value >> width
+                rank = width - (value & ((1 << width) - 1)).bit_length() + 1
+                if rank > registers[register]:
+                    registers[register] = rank
+
+    def _estimate(self):
+        """
+        Return the HyperLogLog estimate of the number of distinct vehicles of each edge.
+        """
+        m = 1 << self.precision
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimates = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)), axis=1)
+        # Linear counting for small cardinalities
+        zeros = np.count_nonzero(self.registers == 0, axis=1)
+        small = (estimates <= 2.5 * m) & (zeros > 0)
+        estimates[small] = m * np.log(m / zeros[small])
+        return estimates
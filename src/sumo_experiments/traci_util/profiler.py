@@ -0,0 +1,197 @@
+import os
+import json
+import threading
+from time import perf_counter_ns
+
+import pandas as pd
+
+
+class _Span:
+    """
+    Context manager measuring the wall-clock time of a span of code.
+    """
+
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, self.start, perf_counter_ns())
+        return False
+
+
+class _NullSpan:
+    """
+    Context manager doing nothing, used when profiling is disabled.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Profiler:
+    """
+    Measure the wall-clock time spent in the components of a simulation, by named spans.
+    The TraciWrapper measures the simulation steps, the stats functions, the behavioural functions and its own
+    bookkeeping when a profiler is given to it. While the simulation runs, the profiler is attached to the simulation, so
+    strategies can add their own spans with Profiler.of(traci).span('name'). When no profiler is attached, Profiler.of
+    returns a disabled profiler whose spans do nothing.
+    The spans are aggregated by name in a timing table. If trace is True, each span is also kept as a Chrome trace event,
+    and the trace can be written in a JSON file readable by chrome://tracing or Perfetto. Spans can be nested : the time
+    of a span includes the time of the spans it contains.
+    """
+
+    ATTRIBUTE = '_sumo_experiments_profiler'
+
+    def __init__(self, trace=False, trace_file=None):
+        """
+        Init of class
+        :param trace: If True, keep each span as a trace event, in addition to the timing table.
+        :type trace: bool
+        :param trace_file: If set, the trace is written in this file at the end of each simulation. Implies trace.
+        :type trace_file: str
+        """
+        self.enabled = True
+        self.trace = trace or trace_file is not None
+        self.trace_file = trace_file
+        self.stats = {}
+        self.events = []
+        self.origin = perf_counter_ns()
+
+    @classmethod
+    def of(cls, traci):
+        """
+        Return the profiler attached to the simulation, or a disabled profiler if there is none.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        :return: The profiler of the simulation
+        :rtype: Profiler
+        """
+        profiler = getattr(traci, cls.ATTRIBUTE, None)
+        return profiler if profiler is not None else NULL_PROFILER
+
+    def attach(self, traci):
+        """
+        Attach the profiler to the simulation.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        """
+        setattr(traci, self.ATTRIBUTE, self)
+
+    def detach(self, traci):
+        """
+        Detach the profiler from the simulation, and write the trace if trace_file is set.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        """
+        if getattr(traci, self.ATTRIBUTE, None) is self:
+            setattr(traci, self.ATTRIBUTE, None)
+        if self.trace_file is not None:
+            self.write_chrome_trace(self.trace_file)
+
+    def span(self, name):
+        """
+        Return a context manager measuring the time of a span.
+        :param name: The name of the span
+        :type name: str
+        :return: The context manager
+        :rtype: contextmanager
+        """
+        return _Span(self, name)
+
+    def add(self, name, start, end):
+        """
+        Add a span measured by the caller.
+        :param name: The name of the span
+        :type name: str
+        :param start: The start of the span, from time.perf_counter_ns
+        :type start: int
+        :param end: The end of the span, from time.perf_counter_ns
+        :type end: int
+        """
+        duration = end - start
+        stats = self.stats.get(name)
+        if stats is None:
+            self.stats[name] = [1, duration, duration, duration]
+        else:
+            stats[0] += 1
+            stats[1] += duration
+            if duration < stats[2]:
+                stats[2] = duration
+            if duration > stats[3]:
+                stats[3] = duration
+        if self.trace:
+            self.events.append((name, start, duration, threading.get_ident()))
+
+    def summary(self):
+        """
+        Return the timing table of the spans, sorted by total time.
+        :return: The number of calls, total time (s), mean, min and max time (ms) and share of the total time of all spans of each component
+        :rtype: pandas.DataFrame
+        """
+        rows = [{'component': name, 'calls': stats[0], 'total_s': stats[1] / 1e9, 'mean_ms': stats[1] / stats[0] / 1e6,
+                 'min_ms': stats[2] / 1e6, 'max_ms': stats[3] / 1e6} for name, stats in self.stats.items()]
+        table = pd.DataFrame(rows, columns=['component', 'calls', 'total_s', 'mean_ms', 'min_ms', 'max_ms'])
+        total = table['total_s'].sum()
+        table['share'] = table['total_s'] / total if total > 0 else 0.0
+        return table.sort_values('total_s', ascending=False, ignore_index=True)
+
+    def chrome_trace(self):
+        """
+        Return the trace in the Chrome trace event format.
+        :return: The trace, with one complete event by span
+        :rtype: dict
+        """
+        pid = os.getpid()
+        events = [{'name': name, 'cat': name.split(':')[0], 'ph': 'X', 'ts': (start - self.origin) / 1e3,
+                   'dur': duration / 1e3, 'pid': pid, 'tid': tid} for name, start, duration, tid in self.events]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        """
+        Write the trace in a JSON file, in the Chrome trace event format.
+        :param path: The path of the file
+        :type path: str
+        """
+        with open(path, 'w') as file:
+            json.dump(self.chrome_trace(), file)
+
+    def reset(self):
+        """
+        Remove all the measured spans.
+        """
+        self.stats = {}
+        self.events = []
+        self.origin = perf_counter_ns()
+
+
+class _NullProfiler(Profiler):
+    """
+    Disabled profiler, whose spans do nothing.
+    """
+
+    _SPAN = _NullSpan()
+
+    def __init__(self):
+        super().__init__()
+        self.enabled = False
+
+    def span(self, name):
+        return self._SPAN
+
+    def add(self, name, start, end):
+        pass
+
+
+NULL_PROFILER = _NullProfiler()
@@ -0,0 +1,152 @@
+import os
+import glob
+import importlib.util
+import pandas as pd
+from abc import ABC, abstractmethod
+
+
+class MetricsSink(ABC):
+    """
+    Abstract class for sinks receiving the data collected by a TraciWrapper while the simulation runs.
+    The wrapper sends its rows to the sink every chunk_rows rows, and drops them from memory.
+    The data are written in named tables : 'data' for the stats of the simulation, 'phases' for the phases of the
+    traffic lights and 'edge_flows' for the number of vehicles on each edge.
+    """
+
+    def __init__(self, chunk_rows=1000):
+        """
+        Init of class
+        :param chunk_rows: The number of rows collected by the wrapper before sending them to the sink.
+        :type chunk_rows: int
+        """
+        self.chunk_rows = chunk_rows
+
+    @abstractmethod
+    def write(self, table, dataframe):
+        """
+        Append rows to a table.
+        :param table: The name of the table
+        :type table: str
+        :param dataframe: The rows to append
+        :type dataframe: pandas.DataFrame
+        """
+        pass
+
+    @abstractmethod
+    def read_chunks(self, table):
+        """
+        Iterate over the chunks of a table, in the order they were written. Each chunk is loaded only when reached.
+        :param table: The name of the table
+        :type table: str
+        :return: The chunks of the table
+        :rtype: generator
+        """
+        pass
+
+    def read(self, table):
+        """
+        Return all the rows of a table.
+        :param table: The name of the table
+        :type table: str
+        :return: The rows of the table
+        :rtype: pandas.DataFrame
+        """
+        chunks = list(self.read_chunks(table))
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks, ignore_index=True)
+
+    def reset(self, table):
+        """
+        Remove all the rows of a table. Called by the wrapper before a simulation.
+        :param table: The name of the table
+        :type table: str
+        """
+        pass
+
+
+class ChunkedFileSink(MetricsSink):
+    """
+    Sink writing each chunk of a table in its own file, in the directory {directory}/{table}/.
+    Files are never modified once written, so the tables can be read while the simulation runs.
+    The chunks are written in Parquet or Arrow IPC format if pyarrow is installed, in CSV otherwise.
+    """
+
+    EXTENSIONS = {'parquet': 'parquet', 'arrow': 'arrow', 'csv': 'csv'}
+
+    def __init__(self, directory, file_format='parquet', chunk_rows=1000):
+        """
+        Init of class
+        :param directory: The directory where the tables are written
+        :type directory: str
+        :param file_format: The format of the files. Can be 'parquet', 'arrow' or 'csv'. 'parquet' and 'arrow' fall back to 'csv' if pyarrow is not installed.
+        :type file_format: str
+        :param chunk_rows: The number of rows collected by the wrapper before sending them to the sink.
+        :type chunk_rows: int
+        """
+        super().__init__(chunk_rows)
+        if file_format not in self.EXTENSIONS:
+            raise ValueError(f"file_format must be one of {list(self.EXTENSIONS)}.")
+        if file_format != 'csv' and importlib.util.find_spec('pyarrow') is None:
+            file_format = 'csv'
+        self.directory = directory
+        self.file_format = file_format
+        self.nb_chunks = {}
+
+    def write(self, table, dataframe):
+        """
+        Write rows in a new chunk file of a table.
+        :param table: The name of the table
+        :type table: str
+        :param dataframe: The rows to append
+        :type dataframe: pandas.DataFrame
+        """
+        table_directory = os.path.join(self.directory, table)
+        os.makedirs(table_directory, exist_ok=True)
+        if table not in self.nb_chunks:
+            self.nb_chunks[table] = len(self._chunk_files(table))
+        path = os.path.join(table_directory, f'part-{self.nb_chunks[table]:06d}.{self.EXTENSIONS[self.file_format]}')
+        # Written under a temporary name, so readers never see a partial chunk
+        tmp_path = path + '.tmp'
+        dataframe = dataframe.reset_index(drop=True)
+        if self.file_format == 'parquet':
+            dataframe.to_parquet(tmp_path, index=False)
+        elif self.file_format == 'arrow':
+            dataframe.to_feather(tmp_path)
+        else:
+            dataframe.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        self.nb_chunks[table] += 1
+
+    def read_chunks(self, table):
+        """
+        Iterate over the chunks of a table, in the order they were written. Each chunk is loaded only when reached.
+        :param table: The name of the table
+        :type table: str
+        :return: The chunks of the table
+        :rtype: generator
+        """
+        for path in self._chunk_files(table):
+            if path.endswith('.parquet'):
+                yield pd.read_parquet(path)
+            elif path.endswith('.arrow'):
+                yield pd.read_feather(path)
+            else:
+                yield pd.read_csv(path)
+
+    def reset(self, table):
+        """
+        Remove all the chunk files of a table.
+        :param table: The name of the table
+        :type table: str
+        """
+        for path in self._chunk_files(table):
+            os.remove(path)
+        self.nb_chunks[table] = 0
+
+    def _chunk_files(self, table):
+        """
+        Return the chunk files of a table, sorted in writing order.
+        """
+        return sorted(path for path in glob.glob(os.path.join(self.directory, table, 'part-*'))
+                      if not path.endswith('.tmp'))
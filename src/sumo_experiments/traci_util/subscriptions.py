@@ -0,0 +1,211 @@
+class SubscriptionCollector:
+    """
+    Collect simulation data with TraCI variable subscriptions instead of one TraCI call per object and per step.
+    Traffic lights, edges and lane area detectors are subscribed once. Vehicles are subscribed when they appear in
+    traci.simulation.getDepartedIDList(), and SUMO drops their subscription when they arrive.
+    After each simulation step, the update method fetches the values of each domain with one getAllSubscriptionResults
+    call, and the results are then read from the vehicle_results, trafficlight_results, edge_results and
+    lanearea_results dicts.
+
+    A subscription to an object replaces the previous one, so all the users of a simulation (TraciWrapper, stats
+    functions) must share the same collector, returned by SubscriptionCollector.shared(traci).
+    The collector, with its DetectorBus, TrafficLightMirror and VehicleMetrics, belongs to one simulation : the networks
+    detach it with SubscriptionCollector.detach(traci) when they start and close SUMO, so the next simulation gets a new
+    collector.
+    """
+
+    ATTRIBUTE = '_sumo_experiments_subscriptions'
+
+    def __init__(self, traci):
+        """
+        Init of class
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        """
+        self.traci = traci
+        self.step_length = traci.simulation.getDeltaT()
+        self.vehicle_variables = []
+        self.trafficlight_variables = []
+        self.edge_variables = []
+        self.lanearea_variables = []
+        self.trafficlights = []
+        self.edges = []
+        self.laneareas = []
+        self.vehicle_results = {}
+        self.trafficlight_results = {}
+        self.edge_results = {}
+        self.lanearea_results = {}
+        self.last_update = None
+        self.nb_updates = 0
+        # The DetectorBus reading the lane area detectors of the intersections through the collector
+        self.detector_bus = None
+        # The TrafficLightMirror reading the traffic lights through the collector
+        self.trafficlight_mirror = None
+        # The VehicleMetrics shared by the stats functions of traci_functions
+        self.vehicle_metrics = None
+
+    @classmethod
+    def shared(cls, traci):
+        """
+        Return the collector attached to the simulation, and create it if it doesn't exist.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        :return: The collector of the simulation
+        :rtype: SubscriptionCollector
+        """
+        collector = getattr(traci, cls.ATTRIBUTE, None)
+        if collector is None:
+            collector = cls(traci)
+            setattr(traci, cls.ATTRIBUTE, collector)
+        return collector
+
+    @classmethod
+    def get_shared(cls, traci):
+        """
+        Return the collector attached to the simulation, or None if there is no collector.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        :return: The collector of the simulation
+        :rtype: SubscriptionCollector
+        """
+        return getattr(traci, cls.ATTRIBUTE, None)
+
+    @classmethod
+    def detach(cls, traci):
+        """
+        Detach the collector from the simulation, without removing its subscriptions. Must be called when the
+        simulation is started, loaded or closed, as the subscriptions, the detectors and the traffic lights of the
+        collector don't belong to the next simulation.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        """
+        if getattr(traci, cls.ATTRIBUTE, None) is not None:
+            setattr(traci, cls.ATTRIBUTE, None)
+
+    def subscribe_vehicle_variables(self, variables):
+        """
+        Add variables to the subscription of all vehicles. Vehicles already running are subscribed again at the next
+        update.
+        :param variables: The TraCI variables (from traci.constants) to subscribe for each running vehicle.
+        :type variables: list
+        """
+        new_variables = [var for var in variables if var not in self.vehicle_variables]
+        if new_variables:
+            self.vehicle_variables += new_variables
+            self.last_update = None
+
+    def subscribe_trafficlights(self, trafficlights, variables):
+        """
+        Subscribe traffic lights. The variables are added to the ones already subscribed for all traffic lights.
+        :param trafficlights: The ids of the traffic lights to subscribe.
+        :type trafficlights: list
+        :param variables: The TraCI variables (from traci.constants) to subscribe for each traffic light.
+        :type variables: list
+        """
+        self.trafficlight_variables += [var for var in variables if var not in self.trafficlight_variables]
+        known_trafficlights = set(self.trafficlights)
+        self.trafficlights += [tl_id for tl_id in trafficlights if tl_id not in known_trafficlights]
+        for tl_id in self.trafficlights:
+            self.traci.trafficlight.subscribe(tl_id, self.trafficlight_variables)
+        self.last_update = None
+
+    def subscribe_edges(self, edges, variables):
+        """
+        Subscribe edges. The variables are added to the ones already subscribed for all edges.
+        :param edges: The ids of the edges to subscribe.
+        :type edges: list
+        :param variables: The TraCI variables (from traci.constants) to subscribe for each edge.
+        :type variables: list
+        """
+        self.edge_variables += [var for var in variables if var not in self.edge_variables]
+        known_edges = set(self.edges)
+        self.edges += [edge for edge in edges if edge not in known_edges]
+        for edge in self.edges:
+            self.traci.edge.subscribe(edge, self.edge_variables)
+        self.last_update = None
+
+    def subscribe_laneareas(self, detectors, variables):
+        """
+        Subscribe lane area detectors. The variables are added to the ones already subscribed for all detectors.
+        :param detectors: The ids of the lane area detectors to subscribe.
+        :type detectors: list
+        :param variables: The TraCI variables (from traci.constants) to subscribe for each detector.
+        :type variables: list
+        """
+        new_variables = [var for var in variables if var not in self.lanearea_variables]
+        self.lanearea_variables += new_variables
+        known_detectors = set(self.laneareas)
+        new_detectors = [detector for detector in detectors if detector not in known_detectors]
+        self.laneareas += new_detectors
+        for detector in (self.laneareas if new_variables else new_detectors):
+            self.traci.lanearea.subscribe(detector, self.lanearea_variables)
+        self.last_update = None
+
+    def update(self):
+        """
+        Subscribe the vehicles inserted during the last step and fetch all subscription results.
+        Must be called after traci.simulationStep(). Calling it twice in the same step does nothing.
+        If some steps were not seen by the collector, all running vehicles are subscribed again.
+        """
+        time = self.traci.simulation.getTime()
+        if time == self.last_update:
+            return
+        if self.vehicle_variables:
+            if self.last_update is None or abs(time - self.last_update - self.step_length) > self.step_length / 2:
+                new_vehicles = self.traci.vehicle.getIDList()
+            else:
+                new_vehicles = self.traci.simulation.getDepartedIDList()
+            for vehicle in new_vehicles:
+                self.traci.vehicle.subscribe(vehicle, self.vehicle_variables)
+            self.vehicle_results = self.traci.vehicle.getAllSubscriptionResults()
+        if self.trafficlights:
+            self.trafficlight_results = self.traci.trafficlight.getAllSubscriptionResults()
+        if self.edges:
+            self.edge_results = self.traci.edge.getAllSubscriptionResults()
+        if self.laneareas:
+            self.lanearea_results = self.traci.lanearea.getAllSubscriptionResults()
+        self.last_update = time
+        self.nb_updates += 1
+
+    def release_vehicles(self):
+        """
+        Unsubscribe all running vehicles. Must be called before removing vehicles with traci.vehicle.remove, as SUMO
+        fails at the next step if a removed vehicle is still subscribed.
+        """
+        self.update()
+        for vehicle in self.vehicle_results:
+            self.traci.vehicle.unsubscribe(vehicle)
+        self.vehicle_results = {}
+
+    def reload(self):
+        """
+        Subscribe again the traffic lights, edges and lane area detectors after the state of the simulation was loaded
+        with traci.simulation.loadState, which drops all the subscriptions. The vehicles of the loaded state are
+        subscribed at the next update.
+        """
+        for tl_id in self.trafficlights:
+            self.traci.trafficlight.subscribe(tl_id, self.trafficlight_variables)
+        for edge in self.edges:
+            self.traci.edge.subscribe(edge, self.edge_variables)
+        for detector in self.laneareas:
+            self.traci.lanearea.subscribe(detector, self.lanearea_variables)
+        self.vehicle_results = {}
+        self.last_update = None
+
+    def stop(self):
+        """
+        Remove all the subscriptions made by the collector, and detach it from the simulation.
+        """
+        self.release_vehicles()
+        for tl_id in self.trafficlights:
+            self.traci.trafficlight.unsubscribe(tl_id)
+        for edge in self.edges:
+            self.traci.edge.unsubscribe(edge)
+        for detector in self.laneareas:
+            self.traci.lanearea.unsubscribe(detector)
+        self.trafficlight_results = {}
+        self.edge_results = {}
+        self.lanearea_results = {}
+        self.last_update = None
+        if getattr(self.traci, self.ATTRIBUTE, None) is self:
+            setattr(self.traci, self.ATTRIBUTE, None)
@@ -0,0 +1,357 @@
+import copy
+import gzip
+import pickle
+import time
+import importlib
+from types import SimpleNamespace
+
+from sumo_experiments.traci_util.call_counter import _TracedModule
+from sumo_experiments.traci_util.subscriptions import SubscriptionCollector
+
+
+TRACE_VERSION = 1
+
+RESET_ATTRIBUTE = '_sumo_experiments_episode_reset'
+
+
+def _is_read(name):
+    """
+    Return True if a TraCI function only reads the simulation.
+    """
+    function = name.rsplit('.', 1)[-1]
+    return function.startswith('get') or function.startswith('has') or function.startswith('is')
+
+
+def _plain(value):
+    """
+    Return a copy of a TraCI value made of Python builtins, that can be pickled. The objects of the TraCI API (like the
+    libsumo TraCILogic and TraCIPhase) are converted to SimpleNamespace with the same attributes.
+    """
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return type(value)(_plain(item) for item in value)
+    if isinstance(value, dict):
+        return {_plain(key): _plain(item) for key, item in value.items()}
+    attributes = {}
+    for name in dir(value):
+        if name.startswith('_') or name == 'this' or name == 'thisown':
+            continue
+        attribute = getattr(value, name)
+        if not callable(attribute):
+            attributes[name] = _plain(attribute)
+    return SimpleNamespace(**attributes)
+
+
+def _frozen(value):
+    """
+    Return a hashable version of the arguments of a call.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_frozen(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _frozen(item)) for key, item in value.items()))
+    if isinstance(value, SimpleNamespace):
+        return tuple(sorted((key, _frozen(item)) for key, item in vars(value).items()))
+    return value
+
+
+def _mutable(value):
+    """
+    Return True if a value contains objects the strategies can modify, so it must be copied each time it is replayed.
+    """
+    if isinstance(value, SimpleNamespace):
+        return True
+    if isinstance(value, (list, tuple)):
+        return any(_mutable(item) for item in value)
+    return False
+
+
+class _RecordingDomain:
+    """
+    Proxy of a TraCI domain, recording the calls to its functions.
+    """
+
+    def __init__(self, domain, name, recorder):
+        object.__setattr__(self, '_domain', domain)
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_recorder', recorder)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._domain, name)
+        if not callable(attribute) or isinstance(attribute, type) or name.startswith('_'):
+            return attribute
+        recorded = self._recorder._record_function(attribute, f'{self._name}.{name}' if self._name else name)
+        object.__setattr__(self, name, recorded)
+        return recorded
+
+    def __setattr__(self, name, value):
+        setattr(self._domain, name, value)
+
+
+class _RecordingModule(_RecordingDomain):
+    """
+    Proxy of the traci or libsumo module, recording the calls to the functions of the module and of its domains.
+    The proxy has its own SubscriptionCollector, so the subscriptions of the recorded function are made through the
+    proxy and recorded. The collector of the simulation is updated by the TraciWrapper outside the frames.
+    """
+
+    def __getattr__(self, name):
+        if name in _TracedModule.DOMAINS:
+            domain = _RecordingDomain(getattr(self._domain, name), name, self._recorder)
+            object.__setattr__(self, name, domain)
+            return domain
+        if name == SubscriptionCollector.ATTRIBUTE:
+            raise AttributeError(name)
+        return super().__getattr__(name)
+
+    def __setattr__(self, name, value):
+        if name == SubscriptionCollector.ATTRIBUTE:
+            object.__setattr__(self, name, value)
+        else:
+            super().__setattr__(name, value)
+
+
+class TraceRecorder:
+    """
+    Record the TraCI calls of a behavioural function (like the run_all_agents method of a strategy) in a trace file.
+    The function returned by wrap(function) calls the function with a proxy of traci, which records each call. Each call
+    of the function is a frame of the trace, with the simulation time, the values returned by the reads (the functions
+    starting with get, has or is) and the writes (all other functions) with their arguments. Strategies keep the proxy
+    they receive at their first call, so all their calls are recorded. The recorded function must not subscribe the
+    objects subscribed by the stats functions (like the running vehicles), as a subscription replaces the previous one.
+    The trace is a gzip file of pickled frames, written while the simulation runs. It can be replayed without SUMO by a
+    TraceReplayer.
+    """
+
+    def __init__(self, path):
+        """
+        Init of class
+        :param path: The path of the trace file
+        :type path: str
+        """
+        self.path = path
+        self.file = None
+        self.keys = {}
+        self.new_keys = {}
+        self.frame = None
+        self.nb_frames = 0
+        self.proxy = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def wrap(self, function):
+        """
+        Return a behavioural function recording the calls of a function, one frame per call.
+        :param function: The behavioural function, called with traci
+        :type function: function
+        :return: The recording function
+        :rtype: function
+        """
+        def recording_function(traci):
+            self._start_frame(traci)
+            try:
+                return function(self.proxy)
+            finally:
+                self._end_frame()
+        return recording_function
+
+    def close(self):
+        """
+        Write the last frame and close the trace file.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _start_frame(self, traci):
+        """
+        Start a new frame, at the current simulation time.
+        """
+        if self.file is None:
+            self.file = gzip.open(self.path, 'wb')
+            module = getattr(traci, '__name__', 'libsumo').split('.')[0]
+            pickle.dump({'version': TRACE_VERSION, 'module': module}, self.file, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.proxy is None or object.__getattribute__(self.proxy, '_domain') is not traci:
+            self.proxy = _RecordingModule(traci, '', self)
+        self.frame = {'time': traci.simulation.getTime(), 'reset': bool(getattr(traci, RESET_ATTRIBUTE, False)), 'reads': {}, 'writes': []}
+
+    def _end_frame(self):
+        """
+        Write the current frame in the trace file.
+        """
+        self.frame['keys'] = self.new_keys
+        pickle.dump(self.frame, self.file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.new_keys = {}
+        self.frame = None
+        self.nb_frames += 1
+
+    def _record_function(self, function, name):
+        """
+        Return a function recording the calls to a TraCI function.
+        """
+        recorder = self
+        is_read = _is_read(name)
+
+        def recorded(*args, **kwargs):
+            result = function(*args, **kwargs)
+            frame = recorder.frame
+            if frame is not None:
+                if kwargs:
+                    args = args + (kwargs,)
+                if is_read:
+                    key = (name, _frozen(args))
+                    key_id = recorder.keys.get(key)
+                    if key_id is None:
+                        key_id = len(recorder.keys)
+                        recorder.keys[key] = key_id
+                        recorder.new_keys[key_id] = key
+                    frame['reads'].setdefault(key_id, []).append(_plain(result))
+                else:
+                    frame['writes'].append((name, _plain(args)))
+            return result
+        recorded.__name__ = getattr(function, '__name__', name)
+        return recorded
+
+
+class _ReplayDomain:
+    """
+    Domain of the replay traci, serving the recorded values of the reads and recording the writes.
+    """
+
+    def __init__(self, name, replayer):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_replayer', replayer)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name[0].isupper():
+            # The classes of the domain, like trafficlight.Logic, from the module used for the recording
+            module = self._replayer.module
+            return getattr(getattr(module, self._name) if self._name else module, name)
+        qualified_name = f'{self._name}.{name}' if self._name else name
+        replayer = self._replayer
+        if _is_read(qualified_name):
+            def function(*args, **kwargs):
+                return replayer._read(qualified_name, args + (kwargs,) if kwargs else args)
+        else:
+            def function(*args, **kwargs):
+                replayer._write(qualified_name, args + (kwargs,) if kwargs else args)
+        function.__name__ = name
+        object.__setattr__(self, name, function)
+        return function
+
+
+class _ReplayModule(_ReplayDomain):
+    """
+    Replacement of the traci module serving a trace.
+    """
+
+    def __getattr__(self, name):
+        if name in _TracedModule.DOMAINS:
+            domain = _ReplayDomain(name, self._replayer)
+            object.__setattr__(self, name, domain)
+            return domain
+        return super().__getattr__(name)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+
+
+class TraceReplayer:
+    """
+    Replay a trace recorded by a TraceRecorder, without SUMO.
+    The behavioural function is called once per frame with a replacement of traci. The reads return the values recorded
+    for the same function and arguments in the frame, in the order they were recorded (the last value is repeated if
+    the function reads more than recorded). A read that was not recorded in the frame raises a LookupError, as the
+    function doesn't behave as when it was recorded. The writes don't change anything : they are recorded and compared
+    with the writes of the trace, so a change in the decisions of a strategy is detected.
+    """
+
+    def __init__(self, path):
+        """
+        Init of class. The frames are read from the trace file.
+        :param path: The path of the trace file
+        :type path: str
+        """
+        self.path = path
+        self.frames = []
+        self.keys = {}
+        with gzip.open(path, 'rb') as file:
+            header = pickle.load(file)
+            if header.get('version') != TRACE_VERSION:
+                raise ValueError(f"Unsupported trace version {header.get('version')}")
+            self.module = importlib.import_module(header['module'])
+            while True:
+                try:
+                    frame = pickle.load(file)
+                except EOFError:
+                    break
+                for key_id, key in frame.pop('keys').items():
+                    self.keys[key] = key_id
+                self.frames.append(frame)
+        self.traci = _ReplayModule('', self)
+        self.frame = None
+        self.positions = {}
+        self.writes = []
+
+    def __len__(self):
+        return len(self.frames)
+
+    def replay(self, function, max_mismatches=10):
+        """
+        Call a behavioural function for each frame of the trace.
+        :param function: The behavioural function, called with the replay traci
+        :type function: function
+        :param max_mismatches: The maximum number of frames with different writes kept in the result
+        :type max_mismatches: int
+        :return: The number of frames, the duration of the replay (s), the number of frames per second, the number of frames with different writes and the first of these frames (index, time, recorded writes and replayed writes).
+        :rtype: dict
+        """
+        mismatches = []
+        nb_mismatches = 0
+        start = time.perf_counter()
+        for index, frame in enumerate(self.frames):
+            self.frame = frame
+            self.positions = {}
+            self.writes = []
+            setattr(self.traci, RESET_ATTRIBUTE, frame['reset'])
+            function(self.traci)
+            if self.writes != frame['writes']:
+                nb_mismatches += 1
+                if len(mismatches) < max_mismatches:
+                    mismatches.append({'frame': index, 'time': frame['time'], 'recorded': frame['writes'], 'replayed': self.writes})
+        duration = time.perf_counter() - start
+        self.frame = None
+        return {
+            'frames': len(self.frames),
+            'duration_s': duration,
+            'frames_per_s': len(self.frames) / duration if duration > 0 else None,
+            'nb_mismatches': nb_mismatches,
+            'mismatches': mismatches
+        }
+
+    def _read(self, name, args):
+        """
+        Return the recorded value of a read in the current frame.
+        """
+        key_id = self.keys.get((name, _frozen(args)))
+        values = self.frame['reads'].get(key_id) if key_id is not None and self.frame is not None else None
+        if not values:
+            raise LookupError(f"{name}{tuple(args)} was not recorded at time {self.frame['time'] if self.frame else None}")
+        position = self.positions.get(key_id, 0)
+        self.positions[key_id] = position + 1
+        value = values[min(position, len(values) - 1)]
+        return copy.deepcopy(value) if _mutable(value) else value
+
+    def _write(self, name, args):
+        """
+        Record a write of the current frame.
+        """
+        self.writes.append((name, _plain(args)))
@@ -1,4 +1,139 @@
 import numpy as np
+import traci.constants as tc
+from itertools import chain
+from operator import itemgetter
+
+from sumo_experiments.traci_util import SubscriptionCollector
+
+
+class VehicleMetrics:
+    """
+    Fused stats function collecting several variables of all running vehicles in one subscription pass.
+    The values of all vehicles are read from the subscription results into a NumPy array, and the mean, sum, max,
+    min and standard deviation of each metric are computed with vectorized operations.
+    An instance can be added to a TraciWrapper as a stats function. The results are cached for the current simulation
+    step, so several views on the same instance only collect data once per step.
+    The vehicles being teleported stay subscribed but are not running : their values are INVALID_DOUBLE_VALUE, and
+    they are left out of the statistics, as they are not in traci.vehicle.getIDList().
+    The get_*_data functions share the instance of the simulation, returned by VehicleMetrics.shared(traci).
+    """
+
+    VARIABLES = {
+        'speed': tc.VAR_SPEED,
+        'acceleration': tc.VAR_ACCELERATION,
+        'waiting_time': tc.VAR_SPEED,
+        'co2_emissions': tc.VAR_CO2EMISSION,
+        'co_emissions': tc.VAR_COEMISSION,
+        'nox_emissions': tc.VAR_NOXEMISSION,
+        'fuel_consumption': tc.VAR_FUELCONSUMPTION,
+    }
+
+    def __init__(self, metrics=None):
+        """
+        Init of class
+        :param metrics: The metrics to collect, among the keys of VehicleMetrics.VARIABLES. If None, all metrics are collected.
+        :type metrics: list
+        """
+        self.metrics = []
+        self.variables = []
+        self.results = {}
+        self.collector = None
+        self.last_update = None
+        self.add_metrics(list(self.VARIABLES) if metrics is None else metrics)
+
+    @classmethod
+    def shared(cls, traci):
+        """
+        Return the instance of the simulation, and create it without metrics if it doesn't exist. The instance belongs
+        to the shared SubscriptionCollector of the simulation, so it is not reused by the next simulation.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        :return: The instance of the simulation
+        :rtype: VehicleMetrics
+        """
+        collector = SubscriptionCollector.shared(traci)
+        if collector.vehicle_metrics is None:
+            collector.vehicle_metrics = cls(metrics=[])
+        return collector.vehicle_metrics
+
+    def add_metrics(self, metrics):
+        """
+        Add metrics to collect. The new metrics are collected from the next call.
+        :param metrics: The metrics to add, among the keys of VehicleMetrics.VARIABLES.
+        :type metrics: list
+        """
+        for metric in metrics:
+            if metric not in self.VARIABLES:
+                raise ValueError(f"Unknown vehicle metric '{metric}'. Must be one of {list(self.VARIABLES)}.")
+            if metric not in self.metrics:
+                self.metrics.append(metric)
+                if self.VARIABLES[metric] not in self.variables:
+                    self.variables.append(self.VARIABLES[metric])
+        self.last_update = None
+
+    def __call__(self, traci):
+        """
+        Return the statistics of all metrics for all running vehicles on the network.
+        :return: A dictionary with the mean, sum, max, min and standard deviation of each metric
+        :rtype: dict
+        """
+        collector = SubscriptionCollector.shared(traci)
+        if collector is not self.collector:
+            self.collector = collector
+            self.last_update = None
+        collector.subscribe_vehicle_variables(self.variables)
+        collector.update()
+        if self.last_update != collector.nb_updates:
+            self.results = self._compute(collector.vehicle_results)
+            self.last_update = collector.nb_updates
+        return self.results
+
+    def get(self, traci, metric):
+        """
+        Return the statistics of one metric for all running vehicles on the network.
+        :param metric: The metric, among the keys of VehicleMetrics.VARIABLES.
+        :type metric: str
+        :return: A dictionary with the mean, sum, max, min and standard deviation of the metric
+        :rtype: dict
+        """
+        if metric not in self.metrics:
+            self.add_metrics([metric])
+        results = self(traci)
+        return {f'{stat}_{metric}': results[f'{stat}_{metric}'] for stat in ['mean', 'sum', 'max', 'min', 'std_dev']}
+
+    def _compute(self, vehicle_results):
+        """
+        Compute the statistics of all metrics from the subscription results of the vehicles.
+        """
+        nb_vehicles = len(vehicle_results)
+        res = {}
+        if nb_vehicles == 0:
+            for metric in self.metrics:
+                for stat in ['mean', 'sum', 'max', 'min', 'std_dev']:
+                    res[f'{stat}_{metric}'] = np.nan
+            return res
+        getter = itemgetter(*self.variables)
+        if len(self.variables) == 1:
+            values = np.fromiter(map(getter, vehicle_results.values()), dtype=np.float64, count=nb_vehicles)
+        else:
+            values = np.fromiter(chain.from_iterable(map(getter, vehicle_results.values())), dtype=np.float64, count=nb_vehicles * len(self.variables))
+        values = values.reshape(nb_vehicles, len(self.variables)).T
+        # Vehicles being teleported
+        running = ~np.any(values == tc.INVALID_DOUBLE_VALUE, axis=0)
+        if not np.all(running):
+            if not np.any(running):
+                return self._compute({})
+            values = values[:, running]
+        for metric in self.metrics:
+            column = values[self.variables.index(self.VARIABLES[metric])]
+            if metric == 'waiting_time':
+                column = (column < 0.05).astype(np.int64)
+            res[f'mean_{metric}'] = np.mean(column)
+            res[f'sum_{metric}'] = np.sum(column)
+            res[f'max_{metric}'] = np.max(column)
+            res[f'min_{metric}'] = np.min(column)
+            res[f'std_dev_{metric}'] = np.std(column)
+        return res
 
 
 def get_nb_vehicles(traci):
@@ -20,18 +155,7 @@ def get_acceleration_data(traci):
     :return: A dictionary with acceleration values
     :rtype: dict
     """
-    accels = []
-    vehicles = traci.vehicle.getIDList()
-    for vehicle in vehicles:
-        accels.append(traci.vehicle.getAcceleration(vehicle))
-    res = {
-        'mean_acceleration': np.mean(accels) if len(accels) > 0 else np.nan,
-        'sum_acceleration': np.sum(accels) if len(accels) > 0 else np.nan,
-        'max_acceleration': np.max(accels) if len(accels) > 0 else np.nan,
-        'min_acceleration': np.min(accels) if len(accels) > 0 else np.nan,
-        'std_dev_acceleration': np.std(accels) if len(accels) > 0 else np.nan
-    }
-    return res
+    return VehicleMetrics.shared(traci).get(traci, 'acceleration')
 
 
 def get_speed_data(traci):
@@ -40,18 +164,7 @@ def get_speed_data(traci):
     :return: A dictionary with speed values
     :rtype: dict
     """
-    speeds = []
-    vehicles = traci.vehicle.getIDList()
-    for vehicle in vehicles:
-        speeds.append(traci.vehicle.getSpeed(vehicle))
-    res = {
-        'mean_speed': np.mean(speeds) if len(speeds) > 0 else np.nan,
-        'sum_speed': np.sum(speeds) if len(speeds) > 0 else np.nan,
-        'max_speed': np.max(speeds) if len(speeds) > 0 else np.nan,
-        'min_speed': np.min(speeds) if len(speeds) > 0 else np.nan,
-        'std_dev_speed': np.std(speeds) if len(speeds) > 0 else np.nan
-    }
-    return res
+    return VehicleMetrics.shared(traci).get(traci, 'speed')
 
 def get_waiting_time_data(traci):
     """
@@ -59,18 +172,7 @@ def get_waiting_time_data(traci):
     :return: A dictionary with speed values
     :rtype: dict
     """
-    wt = []
-    vehicles = traci.vehicle.getIDList()
-    for vehicle in vehicles:
-        wt.append(1 if traci.vehicle.getSpeed(vehicle) < 0.05 else 0)
-    res = {
-        'mean_waiting_time': np.mean(wt) if len(wt) > 0 else np.nan,
-        'sum_waiting_time': np.sum(wt) if len(wt) > 0 else np.nan,
-        'max_waiting_time': np.max(wt) if len(wt) > 0 else np.nan,
-        'min_waiting_time': np.min(wt) if len(wt) > 0 else np.nan,
-        'std_dev_waiting_time': np.std(wt) if len(wt) > 0 else np.nan
-    }
-    return res
+    return VehicleMetrics.shared(traci).get(traci, 'waiting_time')
 
 
 def get_co2_emissions_data(traci):
@@ -79,18 +181,7 @@ def get_co2_emissions_data(traci):
     :return: A dictionary with CO2 values
     :rtype: dict
     """
-    emissions = []
-    vehicles = traci.vehicle.getIDList()
-    for vehicle in vehicles:
-        emissions.append(traci.vehicle.getCO2Emission(vehicle))
-    res = {
-        'mean_co2_emissions': np.mean(emissions) if len(emissions) > 0 else np.nan,
-        'sum_co2_emissions': np.sum(emissions) if len(emissions) > 0 else np.nan,
-        'max_co2_emissions': np.max(emissions) if len(emissions) > 0 else np.nan,
-        'min_co2_emissions': np.min(emissions) if len(emissions) > 0 else np.nan,
-        'std_dev_co2_emissions': np.std(emissions) if len(emissions) > 0 else np.nan
-    }
-    return res
+    return VehicleMetrics.shared(traci).get(traci, 'co2_emissions')
 
 
 def get_co_emissions_data(traci):
@@ -99,18 +190,7 @@ def get_co_emissions_data(traci):
     :return: A dictionary with CO values
     :rtype: dict
     """
-    emissions = []
-    vehicles = traci.vehicle.getIDList()
-    for vehicle in vehicles:
-        emissions.append(traci.vehicle.getCOEmission(vehicle))
-    res = {
-        'mean_co_emissions': np.mean(emissions) if len(emissions) > 0 else np.nan,
-        'sum_co_emissions': np.sum(emissions) if len(emissions) > 0 else np.nan,
-        'max_co_emissions': np.max(emissions) if len(emissions) > 0 else np.nan,
-        'min_co_emissions': np.min(emissions) if len(emissions) > 0 else np.nan,
-        'std_dev_co_emissions': np.std(emissions) if len(emissions) > 0 else np.nan
-    }
-    return res
+    return VehicleMetrics.shared(traci).get(traci, 'co_emissions')
 
 
 def get_nox_emissions_data(traci):
@@ -119,18 +199,7 @@ def get_nox_emissions_data(traci):
     :return: A dictionary with NOx values
     :rtype: dict
     """
-    emissions = []
-    vehicles = traci.vehicle.getIDList()
-    for vehicle in vehicles:
-        emissions.append(traci.vehicle.getNOxEmission(vehicle))
-    res = {
-        'mean_nox_emissions': np.mean(emissions) if len(emissions) > 0 else np.nan,
-        'sum_nox_emissions': np.sum(emissions) if len(emissions) > 0 else np.nan,
-        'max_nox_emissions': np.max(emissions) if len(emissions) > 0 else np.nan,
-        'min_nox_emissions': np.min(emissions) if len(emissions) > 0 else np.nan,
-        'std_dev_nox_emissions': np.std(emissions) if len(emissions) > 0 else np.nan
-    }
-    return res
+    return VehicleMetrics.shared(traci).get(traci, 'nox_emissions')
 
 
 def get_fuel_consumption_data(traci):
@@ -139,18 +208,7 @@ def get_fuel_consumption_data(traci):
     :return: A dictionary with speed values
     :rtype: dict
     """
-    fuel_consumption = []
-    vehicles = traci.vehicle.getIDList()
-    for vehicle in vehicles:
-        fuel_consumption.append(traci.vehicle.getFuelConsumption(vehicle))
-    res = {
-        'mean_fuel_consumption': np.mean(fuel_consumption) if len(fuel_consumption) > 0 else np.nan,
-        'sum_fuel_consumption': np.sum(fuel_consumption) if len(fuel_consumption) > 0 else np.nan,
-        'max_fuel_consumption': np.max(fuel_consumption) if len(fuel_consumption) > 0 else np.nan,
-        'min_fuel_consumption': np.min(fuel_consumption) if len(fuel_consumption) > 0 else np.nan,
-        'std_dev_fuel_consumption': np.std(fuel_consumption) if len(fuel_consumption) > 0 else np.nan
-    }
-    return res
+    return VehicleMetrics.shared(traci).get(traci, 'fuel_consumption')
 
 def get_traffic_light_data(traci):
     """
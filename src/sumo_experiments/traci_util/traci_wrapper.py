@@ -1,10 +1,17 @@
+import os
+import tempfile
 import pandas as pd
 import numpy as np
 import networkx as nx
 import xml.etree.ElementTree as ET
 import matplotlib.pyplot as plt
+import traci.constants as tc
 from tqdm import tqdm
 
+from sumo_experiments.traci_util import SubscriptionCollector, ColumnarDataStore, VehicleTracker, EdgeFlowCounter
+from sumo_experiments.traci_util.profiler import NULL_PROFILER
+from sumo_experiments.traci_util.call_counter import NULL_CALL_COUNTER
+
 class TraciWrapper:
     """
     Wrap TraCi functions to make only one
@@ -21,7 +28,12 @@ class TraciWrapper:
     in terms of simulation time and visualization.
     """
 
-    def __init__(self, max_simulation_duration=None, data_frequency=1, graph_representation=False, print_timestep=500, vehicle_deletion_timesteps=[], scale_factors=None, save_phases=False, phases_file='phases.csv', track_edge_flows=True):
+    RESET_MODES = ['remove', 'state']
+
+    # The domains whose subscriptions are restored after a state is loaded. The vehicles of the loaded state are new.
+    RESTORED_DOMAINS = ['trafficlight', 'edge', 'lane', 'lanearea', 'inductionloop', 'multientryexit', 'junction']
+
+    def __init__(self, max_simulation_duration=None, data_frequency=1, graph_representation=False, print_timestep=500, vehicle_deletion_timesteps=[], scale_factors=None, reset_mode='remove', reset_state=None, save_phases=False, phases_file='phases.csv', track_edge_flows=True, edge_flow_mode='exact', flows_file='edge_flows.csv', graph_file='lille_graph_adjacency.txt', use_subscriptions=False, sink=None, profiler=None, call_counter=None):
         """
         Init of class
         Two conditions can trigger the end of the simulation : the maximum simulation duration is reached or there are no vehicles to run.
@@ -35,18 +47,34 @@ class TraciWrapper:
         :type print_timestep: int
         :param vehicle_deletion_timesteps: A list of timesteps at which the TraciWrapper will delete all the vehicles in simulation.
         :type vehicle_deletion_timesteps: list
+        :param reset_mode: How the vehicles are deleted at the vehicle deletion timesteps. 'remove' removes the running and pending vehicles one by one, and the simulation goes on from the current time. 'state' loads the reset state with one traci.simulation.loadState call : the simulation goes back to the time of the state, with its vehicles, flows, traffic lights and detectors, so each episode starts from the same state. The traffic lights keep their programs and phases, and the subscriptions of the detectors, edges and traffic lights are made again after the state is loaded. As the simulation time goes back, this mode is meant for the strategies starting a new episode at each deletion timestep, like the reinforcement learning strategies : the strategies keeping absolute times, like AnalyticPlus, must use the 'remove' mode.
+        :type reset_mode: str
+        :param reset_state: The state file loaded in 'state' reset mode. If None, the state of the simulation when the final function starts is saved in a temporary file and used.
+        :type reset_state: str
         :param save_phases: If True, collect the current phase of each traffic light intersection at each simulation step
         :type save_phases: bool
-        :param phases_file: Name of the file to store the current phase of each traffic light. Used only if save_phases is set to True.
+        :param phases_file: Name of the file to store the current phase of each traffic light. Used only if save_phases is set to True. A relative path is resolved in the current directory. The paths of the files written by the last run are listed in output_files.
         :type phases_file: str
-        :param track_edge_flows: If True, collect the set of distinct vehicle IDs seen on each edge during the whole simulation. Adds one TraCI call per edge per step, so disable it on large networks if not needed.
+        :param track_edge_flows: If True, count the vehicles flowing on each edge during the whole simulation. The vehicles on edges are subscribed, and only the vehicles entering an edge are processed.
         :type track_edge_flows: bool
-        :param flows_file: Name of the file to store the per-edge flow counts. Used only if track_edge_flows is set to True.
+        :param edge_flow_mode: How vehicles are counted on edges : 'exact' for the number of distinct vehicles, 'entries' for the number of entries (a vehicle entering an edge twice is counted twice), 'approximate' for an estimate of the number of distinct vehicles with a memory independent of the number of vehicles. See EdgeFlowCounter.
+        :type edge_flow_mode: str
+        :param flows_file: Name of the CSV file to store the flow of each edge, with the from_junction, to_junction, edge and flow columns. Used only if track_edge_flows is set to True.
         :type flows_file: str
+        :param graph_file: Name of the file to store the adjacency list of the network. Used only if graph_representation is set to True.
+        :type graph_file: str
+        :param use_subscriptions: If True, the CO2 emissions of vehicles, the states of traffic lights and the vehicles on edges are collected with TraCI subscriptions, with one bulk call per domain and per step instead of one call per object. The returned data are the same.
+        :type use_subscriptions: bool
+        :param sink: If set, the collected data are sent to the sink every sink.chunk_rows rows and dropped from memory, instead of being kept in memory until the end of the simulation. The phases of the traffic lights and the flows of the edges are written in the same sink, in the 'phases' and 'edge_flows' tables, instead of phases_file and flows_file.
+        :type sink: MetricsSink
+        :param profiler: If set, the time spent in each simulation step, stats function, behavioural function and bookkeeping of the wrapper is measured by the profiler, as well as the spans added by the strategies. Use profiler.summary() for the timing table, and profiler.write_chrome_trace() for the trace.
+        :type profiler: Profiler
+        :param call_counter: If set, the TraCI calls made during the simulation are counted by the counter, and attributed to the stats functions, the behavioural functions (including the later calls of the strategies) or the wrapper itself. Use call_counter.report() for the calls per function and per caller.
+        :type call_counter: TraciCallCounter
         """
         self.stats_functions = []
         self.behavioural_functions = []
-        self.data = {'simulation_step': []}
+        self.data = ColumnarDataStore()
         self.simulation_duration = max_simulation_duration
         self.data_frequency = data_frequency
         self.graph_representation = graph_representation
@@ -55,10 +83,25 @@ class TraciWrapper:
         if scale_factors is not None:
             assert len(scale_factors) == len(vehicle_deletion_timesteps), "Length of scale_factors must be equal to length of vehicle_deletion_timesteps"
         self.scale_factors = scale_factors
+        if reset_mode not in self.RESET_MODES:
+            raise ValueError(f"Unknown reset mode '{reset_mode}', must be one of {self.RESET_MODES}")
+        self.reset_mode = reset_mode
+        self.reset_state = reset_state
         self.tl_phases = {}
         self.save_phases = save_phases
         self.phases_file = phases_file
         self.track_edge_flows = bool(track_edge_flows)
+        if edge_flow_mode not in EdgeFlowCounter.MODES:
+            raise ValueError(f"Unknown edge flow mode '{edge_flow_mode}', must be one of {EdgeFlowCounter.MODES}")
+        self.edge_flow_mode = edge_flow_mode
+        self.flows_file = flows_file
+        self.graph_file = graph_file
+        # The paths of the files written by the last run, by parameter name
+        self.output_files = {}
+        self.use_subscriptions = use_subscriptions
+        self.sink = sink
+        self.profiler = profiler
+        self.call_counter = call_counter
 
     def add_stats_function(self, function):
         """
@@ -141,51 +184,66 @@ class TraciWrapper:
     def final_function(self, traci):
         """
         The final function combine all functions added to the wrapper to make only one.
+        If a sink is set, the returned data are read back from the sink.
         :return: dict
         """
-        self.data = {'simulation_step': [], 'mean_travel_time': [], 'exiting_vehicles': [], 'mean_CO2_per_travel': [], 'mean_phase_time': []}
+        capacity = -(-self.simulation_duration // self.data_frequency) if self.simulation_duration is not None else None
+        phases_capacity = self.simulation_duration
+        if self.sink is not None:
+            capacity = self.sink.chunk_rows
+            phases_capacity = self.sink.chunk_rows
+            for table in ['data', 'phases', 'edge_flows']:
+                self.sink.reset(table)
+        self.data = ColumnarDataStore(capacity=capacity)
         step = 0
-        running_vehicles = {}
+        running_vehicles = VehicleTracker()
         current_travel_times = []
         current_exiting_vehicles = []
         current_co2_travel = []
         tl_ids = traci.trafficlight.getIDList()
-        current_phase = {tls: traci.trafficlight.getPhase(tls) for tls in tl_ids}
         current_phase_durations = {tls: 0 for tls in tl_ids}
         phase_durations = []
         dt = 1
         deletion_step_to_index = {s: i for i, s in enumerate(self.vehicles_deletion_timesteps)}
         pbar_total = self.simulation_duration if self.simulation_duration is not None else None
-        _t = {"sumo": 0.0, "behav": 0.0}
-
+        profiler = self.profiler if self.profiler is not None else NULL_PROFILER
+        call_counter = self.call_counter if self.call_counter is not None else NULL_CALL_COUNTER
+        traci = call_counter.instrument(traci)
+        stats_spans = [f'stats:{self._function_name(function)}' for function in self.stats_functions]
+        behavioural_spans = [f'behaviour:{self._function_name(function)}' for function in self.behavioural_functions]
+        if self.profiler is not None:
+            self.profiler.attach(traci)
+
+        self.output_files = {}
         if self.graph_representation:
             G, pos = self.net_to_graph(traci)
-            nx.write_adjlist(G, path="lille_graph_adjacency.txt")
+            nx.write_adjlist(G, path=self._output_path('graph_file'))
 
         if self.save_phases:
-            for tl_id in tl_ids:
-                self.tl_phases[tl_id] = []
+            self.tl_phases = ColumnarDataStore(capacity=phases_capacity)
 
         if self.simulation_duration is None:
             resume = traci.simulation.getMinExpectedNumber() > 0
         else:
             resume = (step < self.simulation_duration) and (traci.simulation.getMinExpectedNumber()>0)
 
-        # if self.get_flows:
-        flows = {}
+        edge_flows = None
         if self.track_edge_flows:
-            # Built once here: edges don't change during a run, so there's no
-            # need to call traci.edge.getIDList() again on every step.
-            for edge in traci.edge.getIDList():
-                #if '_' not in edge:
-                from_junction = traci.edge.getFromJunction(edge)
-                if '#' in from_junction:
-                    from_junction = from_junction.split('#')[0]
-                to_junction = traci.edge.getToJunction(edge)
-                if '#' in to_junction:
-                    to_junction = to_junction.split('#')[0]
-                #flows[(from_junction, to_junction, edge)] = []
-                flows[(from_junction, to_junction, edge)] = set()
+            edge_flows = EdgeFlowCounter(traci, mode=self.edge_flow_mode)
+
+        reset_state, state_directory = self.reset_state, None
+        if self.reset_mode == 'state' and reset_state is None and self.vehicles_deletion_timesteps:
+            # The directory is removed at the end of the simulation, or when it is garbage collected after an error
+            state_directory = tempfile.TemporaryDirectory(prefix='sumo_experiments_')
+            reset_state = os.path.join(state_directory.name, 'reset.state.xml.gz')
+            traci.simulation.saveState(reset_state)
+
+        collector = None
+        if self.use_subscriptions:
+            collector = SubscriptionCollector.shared(traci)
+            collector.subscribe_vehicle_variables([tc.VAR_CO2EMISSION])
+            collector.subscribe_trafficlights(tl_ids, [tc.TL_RED_YELLOW_GREEN_STATE])
+            collector.update()
 
         with tqdm(total=pbar_total, desc='SUMO simulation', unit='step', disable=False, miniters=100, mininterval=1.0) as pbar:
             while resume:
@@ -193,119 +251,115 @@ class TraciWrapper:
                 reset_this_step = deletion_index is not None
                 setattr(traci, '_sumo_experiments_episode_reset', reset_this_step)
 
-            # Store the current state network as a graph
-            # if self.graph_representation:
-            #     plt.clf()
-            #     arc_rad = 0.25
-            #     colors = self.update_colors(G, traci)
-            #     sizes = []
-            #     for color in colors:
-            #         if color == "green":
-            #             sizes.append(3)
-            #         else:
-            #             sizes.append(1)
-            #     nx.draw(G, pos, connectionstyle=f'arc3, rad = {arc_rad}', node_size=100, edge_color=colors, width=sizes)
-            #     plt.savefig(f'./Graphs/{step}.png')
-
-
-                traci.simulationStep()
+                with profiler.span('simulationStep'):
+                    traci.simulationStep()
+                if collector is not None:
+                    with profiler.span('subscriptions'):
+                        collector.update()
 
                 simulation_time = traci.simulation.getTime()
                 pbar.update(1)
                 if self.print_timestep and simulation_time % self.print_timestep == 0:
                     pbar.set_postfix(active_vehicles=len(running_vehicles))
             # We catch each inserted vehicle ID
-                for id in traci.simulation.getDepartedIDList():
-                    running_vehicles[id] = {'simulation_time': simulation_time, 'sum_co2': 0}
-
-                arrived_ids = traci.simulation.getArrivedIDList()
-                arrived_set = set(arrived_ids)
-
-            # Updating CO2 emissions
-                for vid, record in list(running_vehicles.items()):
-                    try:
-                        record['sum_co2'] += traci.vehicle.getCO2Emission(vid) * dt
-                    except Exception:
-                        if vid not in arrived_set:
-                            running_vehicles.pop(vid, None)
-
-            # We add travel time and co2 emissions for each leaving vehicle
-                travel_times = []
-                co2_emissions = []
-                for vid in arrived_ids:
-                    record = running_vehicles.pop(vid, None)
-                    if record is None:
-                        continue
-                    travel_times.append(simulation_time - record['simulation_time'])
-                    co2_emissions.append(record['sum_co2'])
-
-                current_travel_times.append(np.nanmean(travel_times) if travel_times else np.nan)
-                current_co2_travel.append(np.nanmean(co2_emissions) if co2_emissions else np.nan)
-                current_exiting_vehicles.append(len(travel_times))
+                with profiler.span('vehicles'):
+                    running_vehicles.add(traci.simulation.getDepartedIDList(), simulation_time)
+
+                    arrived_ids = traci.simulation.getArrivedIDList()
+                    arrived_set = set(arrived_ids)
+
+                # Updating CO2 emissions
+                    if collector is not None:
+                        emissions = {vid: values[tc.VAR_CO2EMISSION] for vid, values in collector.vehicle_results.items()}
+                    else:
+                        emissions = {}
+                        for vid in running_vehicles.slots:
+                            try:
+                                emissions[vid] = traci.vehicle.getCO2Emission(vid)
+                            except Exception:
+                                pass
+                    running_vehicles.add_co2(emissions, dt, arrived_set)
+
+                # We add travel time and co2 emissions for each leaving vehicle
+                    travel_times, co2_emissions = running_vehicles.remove(arrived_ids, simulation_time)
+
+                    current_travel_times.append(np.nanmean(travel_times) if len(travel_times) else np.nan)
+                    current_co2_travel.append(np.nanmean(co2_emissions) if len(co2_emissions) else np.nan)
+                    current_exiting_vehicles.append(len(travel_times))
 
             # We store the phase time if the phase switches
-            # NOT USED ?????
-                for tls in tl_ids:
-                    state = traci.trafficlight.getRedYellowGreenState(tls)
-                    if 'y' in state and current_phase_durations[tls] != 0:
-                        current_phase[tls] = traci.trafficlight.getPhase(tls)
-                        phase_durations.append(current_phase_durations[tls])
-                        current_phase_durations[tls] = 0
-                    elif 'y' not in state:
-                        current_phase_durations[tls] += 1
+                with profiler.span('phases'):
+                    for tls in tl_ids:
+                        if collector is not None:
+                            state = collector.trafficlight_results[tls][tc.TL_RED_YELLOW_GREEN_STATE]
+                        else:
+                            state = traci.trafficlight.getRedYellowGreenState(tls)
+                        if 'y' in state and current_phase_durations[tls] != 0:
+                            phase_durations.append(current_phase_durations[tls])
+                            current_phase_durations[tls] = 0
+                        elif 'y' not in state:
+                            current_phase_durations[tls] += 1
 
                 if step % self.data_frequency == 0:
-
-                # Statistical functions
-                    for stats_function in self.stats_functions:
-                        res = stats_function(traci)
-                        for key in res:
-                            if key in self.data:
-                                self.data[key].append(res[key])
-                            else:
-                                self.data[key] = [res[key]]
-
-                    self.data['simulation_step'].append(step + 1)
+                    row = {'simulation_step': step + 1}
                     cev = np.array(current_exiting_vehicles)
                     ctt = np.array(current_travel_times)
                     cco2 = np.array(current_co2_travel)
                     valid = cev > 0
-                    self.data['mean_travel_time'].append(np.average(ctt[valid], weights=cev[valid]) if np.any(valid) else np.nan)
-                    self.data['mean_CO2_per_travel'].append(np.average(cco2[valid], weights=cev[valid]) if np.any(valid) else np.nan)
-                    self.data['exiting_vehicles'].append(np.nansum(cev))
-                    self.data['mean_phase_time'].append(np.average(phase_durations) if phase_durations else np.nan)
+                    row['mean_travel_time'] = np.average(ctt[valid], weights=cev[valid]) if np.any(valid) else np.nan
+                    row['exiting_vehicles'] = np.nansum(cev)
+                    row['mean_CO2_per_travel'] = np.average(cco2[valid], weights=cev[valid]) if np.any(valid) else np.nan
+                    row['mean_phase_time'] = np.average(phase_durations) if phase_durations else np.nan
+
+                # Statistical functions
+                    for stats_function, span_name in zip(self.stats_functions, stats_spans):
+                        with profiler.span(span_name), call_counter.caller(span_name):
+                            row.update(stats_function(traci))
+                    self.data.append(row)
+                    self._flush_to_sink('data', self.data)
                     current_travel_times = []
                     current_co2_travel = []
                     current_exiting_vehicles = []
                     phase_durations = []
 
             # Behavioural functions
-                for behavioural_function in self.behavioural_functions:
-                    behavioural_function(traci)
+                for behavioural_function, span_name in zip(self.behavioural_functions, behavioural_spans):
+                    with profiler.span(span_name), call_counter.caller(span_name):
+                        behavioural_function(traci)
                 if self.save_phases:
-                    for tl_id in tl_ids:
-                        self.tl_phases[tl_id].append(traci.trafficlight.getPhase(tl_id))
+                    with profiler.span('phases'):
+                        self.tl_phases.append({tl_id: traci.trafficlight.getPhase(tl_id) for tl_id in tl_ids})
+                        self._flush_to_sink('phases', self.tl_phases)
 
-            #if self.get_flows:
-                if self.track_edge_flows:
-                    for flow in flows:
-                        edge = flow[2]
-                        #flows[flow].append(traci.edge.getLastStepOccupancy(edge))
-                        flows[flow].update(traci.edge.getLastStepVehicleIDs(edge))
+                if edge_flows is not None:
+                    with profiler.span('edge_flows'):
+                        edge_flows.update()
 
             # Defer hard reset until after this step's control/stats so terminal
             # transition uses pre-reset environment dynamics.
                 if reset_this_step:
-                    for vehicle_id in traci.vehicle.getIDList():
-                        traci.vehicle.remove(vehicle_id)
-                    # Drain the pending insertion backlog too: getIDList() returns
-                    # only running vehicles, so undeparted vehicles would otherwise
-                    # accumulate forever and make every simulationStep O(backlog).
-                    traci.simulation.clearPending()
-                    running_vehicles.clear()
-                    if self.scale_factors is not None:
-                        factor = self.scale_factors[deletion_index]
-                        traci.simulation.setScale(factor)
+                    with profiler.span('reset'):
+                        shared_collector = SubscriptionCollector.get_shared(traci)
+                        if self.reset_mode == 'state':
+                            self._load_state(traci, reset_state)
+                            if shared_collector is not None:
+                                shared_collector.reload()
+                            if edge_flows is not None:
+                                edge_flows.new_episode()
+                        else:
+                            # Removed vehicles must not stay subscribed (here or by stats functions), otherwise the next step fails
+                            if shared_collector is not None:
+                                shared_collector.release_vehicles()
+                            for vehicle_id in traci.vehicle.getIDList():
+                                traci.vehicle.remove(vehicle_id)
+                            # Drain the pending insertion backlog too: getIDList() returns
+                            # only running vehicles, so undeparted vehicles would otherwise
+                            # accumulate forever and make every simulationStep O(backlog).
+                            traci.simulation.clearPending()
+                        running_vehicles.clear()
+                        if self.scale_factors is not None:
+                            factor = self.scale_factors[deletion_index]
+                            traci.simulation.setScale(factor)
 
                 step += 1
 
@@ -315,31 +369,95 @@ class TraciWrapper:
                     resume = (step < self.simulation_duration) and (traci.simulation.getMinExpectedNumber() > 0)
 
         setattr(traci, '_sumo_experiments_episode_reset', False)
+        if state_directory is not None:
+            state_directory.cleanup()
+        shared_collector = SubscriptionCollector.get_shared(traci)
+        if shared_collector is not None:
+            shared_collector.stop()
+        if self.profiler is not None:
+            self.profiler.detach(traci)
 
         if self.save_phases:
-            pd.DataFrame(self.tl_phases).to_csv(self.phases_file)
-
-        if self.track_edge_flows:
-            flow_values = {}
-            for flow in flows:
-                flows[flow] = len(flows[flow])
-                flow_values[(flow[0], flow[1])] = flows[flow]
-            #print(flow_values)
+            if self.sink is not None:
+                self._flush_to_sink('phases', self.tl_phases, force=True)
+            else:
+                self.tl_phases.to_dataframe().to_csv(self._output_path('phases_file'))
 
-            with open("occupancies.txt", "w") as f:
-                f.write(str(flows))
+        if edge_flows is not None:
+            if self.sink is not None:
+                self.sink.write('edge_flows', edge_flows.get_flows())
+            else:
+                edge_flows.get_flows().to_csv(self._output_path('flows_file'), index=False)
 
-        tl_nodes = {}
-        for tl in traci.trafficlight.getIDList():
-            lanes = traci.trafficlight.getControlledLanes(tl)
-            edges = set([traci.lane.getEdgeID(l) for l in lanes])
-            nodes = set([traci.edge.getToJunction(e) for e in edges])
-            tl_nodes[tl] = list(nodes)
-        #print(tl_nodes)
+        if self.sink is not None:
+            self._flush_to_sink('data', self.data, force=True)
+            return self.sink.read('data')
+        return self.data.to_dataframe()
 
+    def _load_state(self, traci, state_file):
+        """
+        Load a state of the simulation, and subscribe again the objects subscribed before, as loadState drops all the
+        subscriptions. The traffic lights keep their current program, phase and remaining phase duration, so the
+        strategies controlling them are not disturbed.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        :param state_file: The state file
+        :type state_file: str
+        """
+        subscriptions = {}
+        for domain in self.RESTORED_DOMAINS:
+            results = getattr(traci, domain).getAllSubscriptionResults()
+            if results:
+                subscriptions[domain] = {object_id: list(values) for object_id, values in results.items()}
+        time = traci.simulation.getTime()
+        lights = [(tl_id, traci.trafficlight.getProgram(tl_id), traci.trafficlight.getPhase(tl_id), traci.trafficlight.getNextSwitch(tl_id) - time) for tl_id in traci.trafficlight.getIDList()]
+        traci.simulation.loadState(state_file)
+        for tl_id, program, phase, remaining_duration in lights:
+            if traci.trafficlight.getProgram(tl_id) != program:
+                traci.trafficlight.setProgram(tl_id, program)
+            traci.trafficlight.setPhase(tl_id, phase)
+            traci.trafficlight.setPhaseDuration(tl_id, remaining_duration)
+        for domain, objects in subscriptions.items():
+            for object_id, variables in objects.items():
+                getattr(traci, domain).subscribe(object_id, variables)
+
+    def _output_path(self, parameter):
+        """
+        Return the absolute path where an output file of the wrapper is written, and record it in output_files.
+        :param parameter: The name of the parameter holding the name of the file
+        :type parameter: str
+        :return: The path of the file
+        :rtype: str
+        """
+        path = os.path.abspath(getattr(self, parameter))
+        self.output_files[parameter] = path
+        return path
 
+    @staticmethod
+    def _function_name(function):
+        """
+        Return the name of a stats or behavioural function, for the profiler spans.
+        :param function: The function
+        :type function: function
+        :return: The qualified name of the function
+        :rtype: str
+        """
+        return getattr(function, '__qualname__', None) or getattr(function, '__name__', None) or repr(function)
 
-        return pd.DataFrame.from_dict(self.data)
-        #return flow_values
+    def _flush_to_sink(self, table, store, force=False):
+        """
+        Send the rows of a store to the sink and remove them from the store, if the store holds sink.chunk_rows rows.
+        :param table: The name of the table of the sink
+        :type table: str
+        :param store: The store holding the rows
+        :type store: ColumnarDataStore
+        :param force: If True, send the rows whatever their number.
+        :type force: bool
+        """
+        if self.sink is None or len(store) == 0:
+            return
+        if force or len(store) >= self.sink.chunk_rows:
+            self.sink.write(table, store.to_dataframe())
+            store.clear()
 
 
@@ -0,0 +1,240 @@
+import traci.constants as tc
+
+from sumo_experiments.traci_util.subscriptions import SubscriptionCollector
+
+
+class TrafficLightMirror:
+    """
+    Local mirror of the state of the traffic lights of a simulation, read by the strategies instead of calling
+    traci.trafficlight.getPhase and getRedYellowGreenState for each traffic light at each step.
+    The current phase, the state, the program and the time spent in the phase of the traffic lights are subscribed
+    through the shared SubscriptionCollector, so they are fetched with one TraCI call per step for all the traffic
+    lights. The phases set by the strategies during a step are mirrored locally from the cached programs of the
+    traffic lights, so the mirror stays exact until the next step, where it is synchronized with SUMO again.
+    The mirror is shared by all the users of the simulation (TrafficLightMirror.shared), and the phases and the
+    programs must be set through it (set_phase, set_program_logic). If a traffic light is changed with TraCI during a
+    step, the mirror must be told with invalidate.
+    The mirror belongs to the collector of one simulation. A mirror kept by a user after the end of its simulation
+    caches the programs of its traffic lights again when it is updated in the next simulation.
+    """
+
+    VARIABLES = [tc.TL_CURRENT_PHASE, tc.TL_RED_YELLOW_GREEN_STATE, tc.TL_CURRENT_PROGRAM, tc.TL_SPENT_DURATION]
+
+    def __init__(self, traci):
+        """
+        Init of class
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        """
+        self.traci = traci
+        self.trafficlights = []
+        self.logics = {}
+        self.local = {}
+        self.collector = None
+        self.nb_updates = None
+
+    @classmethod
+    def shared(cls, traci, trafficlights):
+        """
+        Return the mirror of the simulation, and create it if it doesn't exist. The mirror belongs to the shared
+        SubscriptionCollector of the simulation. The traffic lights are added to the mirror.
+        :param traci: The simulation Traci instance
+        :type traci: Traci
+        :param trafficlights: The ids of the traffic lights read by the user of the mirror
+        :type trafficlights: list
+        :return: The mirror of the simulation
+        :rtype: TrafficLightMirror
+        """
+        collector = SubscriptionCollector.shared(traci)
+        mirror = collector.trafficlight_mirror
+        if mirror is None:
+            mirror = cls(traci)
+            collector.trafficlight_mirror = mirror
+        mirror.add_trafficlights(trafficlights)
+        return mirror
+
+    def add_trafficlights(self, trafficlights):
+        """
+        Add traffic lights to the mirror, and cache their programs.
+        :param trafficlights: The ids of the traffic lights
+        :type trafficlights: list
+        """
+        known_trafficlights = set(self.trafficlights)
+        new_trafficlights = [tl_id for tl_id in dict.fromkeys(trafficlights) if tl_id not in known_trafficlights]
+        if not new_trafficlights:
+            return
+        self.trafficlights += new_trafficlights
+        for tl_id in new_trafficlights:
+            self.logics[tl_id] = self.traci.trafficlight.getAllProgramLogics(tl_id)
+            self.local[tl_id] = None
+        if self.collector is not None:
+            self.collector.subscribe_trafficlights(new_trafficlights, self.VARIABLES)
+            self.nb_updates = None
+
+    def update(self):
+        """
+        Synchronize the mirror with SUMO for the current step. Calling it twice in the same step does nothing.
+        Must be called before reading the traffic lights, after each simulation step.
+        """
+        collector = SubscriptionCollector.shared(self.traci)
+        if collector is not self.collector:
+            if self.collector is not None or collector.trafficlight_mirror is not self:
+                # The mirror was built for another simulation
+                for tl_id in self.trafficlights:
+                    self.logics[tl_id] = self.traci.trafficlight.getAllProgramLogics(tl_id)
+            collector.subscribe_trafficlights(self.trafficlights, self.VARIABLES)
+            if collector.trafficlight_mirror is None:
+                collector.trafficlight_mirror = self
+            self.collector = collector
+            self.nb_updates = None
+        collector.update()
+        if collector.nb_updates != self.nb_updates:
+            self.nb_updates = collector.nb_updates
+            self.local = dict.fromkeys(self.trafficlights)
+
+    def phase(self, tl_id):
+        """
+        Return the index of the current phase of a traffic light, as traci.trafficlight.getPhase.
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :return: The index of the current phase
+        :rtype: int
+        """
+        return self._read(tl_id, tc.TL_CURRENT_PHASE)
+
+    def state(self, tl_id):
+        """
+        Return the state of the signals of a traffic light, as traci.trafficlight.getRedYellowGreenState.
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :return: The state of the signals
+        :rtype: str
+        """
+        return self._read(tl_id, tc.TL_RED_YELLOW_GREEN_STATE)
+
+    def program(self, tl_id):
+        """
+        Return the id of the current program of a traffic light, as traci.trafficlight.getProgram.
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :return: The id of the program
+        :rtype: str
+        """
+        return self._read(tl_id, tc.TL_CURRENT_PROGRAM)
+
+    def spent_duration(self, tl_id):
+        """
+        Return the time spent in the current phase of a traffic light, as traci.trafficlight.getSpentDuration.
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :return: The time spent in the phase (s)
+        :rtype: float
+        """
+        return self._read(tl_id, tc.TL_SPENT_DURATION)
+
+    def phases(self, tl_ids):
+        """
+        Return the indexes of the current phases of several traffic lights.
+        :param tl_ids: The ids of the traffic lights
+        :type tl_ids: list
+        :return: The indexes of the current phases, in the order of tl_ids
+        :rtype: list
+        """
+        return [self._read(tl_id, tc.TL_CURRENT_PHASE) for tl_id in tl_ids]
+
+    def states(self, tl_ids):
+        """
+        Return the states of the signals of several traffic lights.
+        :param tl_ids: The ids of the traffic lights
+        :type tl_ids: list
+        :return: The states of the signals, in the order of tl_ids
+        :rtype: list
+        """
+        return [self._read(tl_id, tc.TL_RED_YELLOW_GREEN_STATE) for tl_id in tl_ids]
+
+    def is_yellow(self, tl_id):
+        """
+        Return True if a traffic light has yellow signals.
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :return: True if the state of the traffic light has yellow signals
+        :rtype: bool
+        """
+        return 'y' in self.state(tl_id)
+
+    def nb_phases(self, tl_id):
+        """
+        Return the number of phases of the first program of a traffic light, as
+        len(traci.trafficlight.getAllProgramLogics(tl_id)[0].phases).
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :return: The number of phases
+        :rtype: int
+        """
+        return len(self.logics[tl_id][0].phases)
+
+    def set_phase(self, tl_id, index):
+        """
+        Set the phase of a traffic light, as traci.trafficlight.setPhase, and mirror it until the next step.
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :param index: The index of the phase
+        :type index: int
+        """
+        self.traci.trafficlight.setPhase(tl_id, index)
+        program = self.program(tl_id)
+        for logic in self.logics[tl_id]:
+            if logic.programID == program:
+                self.local[tl_id] = {
+                    tc.TL_CURRENT_PHASE: int(index),
+                    tc.TL_RED_YELLOW_GREEN_STATE: logic.phases[index].state,
+                    tc.TL_CURRENT_PROGRAM: program,
+                    tc.TL_SPENT_DURATION: 0.0,
+                }
+                return
+        self.invalidate(tl_id)
+
+    def set_program_logic(self, tl_id, logic):
+        """
+        Set a program of a traffic light, as traci.trafficlight.setProgramLogic, and cache it.
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        :param logic: The program
+        :type logic: traci.trafficlight.Logic
+        """
+        self.traci.trafficlight.setProgramLogic(tl_id, logic)
+        self.logics[tl_id] = self.traci.trafficlight.getAllProgramLogics(tl_id)
+        self.invalidate(tl_id)
+
+    def invalidate(self, tl_id):
+        """
+        Read a traffic light with TraCI until the next step, after it was changed without the mirror.
+        :param tl_id: The id of the traffic light
+        :type tl_id: str
+        """
+        self.local[tl_id] = False
+
+    def _read(self, tl_id, variable):
+        """
+        Return a variable of a traffic light, from the local mirror, the subscription results or TraCI.
+        """
+        local = self.local.get(tl_id)
+        if local:
+            return local[variable]
+        if local is None and self.collector is not None:
+            results = self.collector.trafficlight_results.get(tl_id)
+            if results is not None:
+                return results[variable]
+        return self._query(tl_id, variable)
+
+    def _query(self, tl_id, variable):
+        """
+        Read a variable of a traffic light with TraCI.
+        """
+        if variable == tc.TL_CURRENT_PHASE:
+            return self.traci.trafficlight.getPhase(tl_id)
+        if variable == tc.TL_RED_YELLOW_GREEN_STATE:
+            return self.traci.trafficlight.getRedYellowGreenState(tl_id)
+        if variable == tc.TL_CURRENT_PROGRAM:
+            return self.traci.trafficlight.getProgram(tl_id)
+        return self.traci.trafficlight.getSpentDuration(tl_id)
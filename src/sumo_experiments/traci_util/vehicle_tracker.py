@@ -0,0 +1,125 @@
+import numpy as np
+
+
+class VehicleTracker:
+    """
+    Track the running vehicles of a simulation, with their departure time and their CO2 emissions since departure.
+    Each vehicle id is given an integer slot, and the departure times and the CO2 emissions are stored in NumPy arrays
+    indexed by slot. The slot of a vehicle is freed when it arrives, and reused by the next departed vehicle. The arrays
+    grow by doubling their size when all slots are used.
+    """
+
+    def __init__(self, capacity=1024):
+        """
+        Init of class
+        :param capacity: The number of slots to preallocate.
+        :type capacity: int
+        """
+        self.slots = {}
+        self.ids = [None] * capacity
+        self.departure_times = np.zeros(capacity)
+        self.co2 = np.zeros(capacity)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.free_slots = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, vehicle):
+        return vehicle in self.slots
+
+    def add(self, vehicles, time):
+        """
+        Start tracking departed vehicles. A vehicle already tracked is tracked again from this time.
+        :param vehicles: The ids of the departed vehicles
+        :type vehicles: list
+        :param time: The departure time
+        :type time: float
+        """
+        for vehicle in vehicles:
+            slot = self.slots.get(vehicle)
+            if slot is None:
+                if not self.free_slots:
+                    self._grow()
+                slot = self.free_slots.pop()
+                self.slots[vehicle] = slot
+                self.ids[slot] = vehicle
+                self.active[slot] = True
+            self.departure_times[slot] = time
+            self.co2[slot] = 0
+
+    def add_co2(self, emissions, dt, arrived=()):
+        """
+        Add the CO2 emitted during a step to the tracked vehicles.
+        Vehicles without emission value are not running anymore. They are dropped, except the ones that arrived, which
+        are kept until they are removed.
+        :param emissions: The CO2 emission of the running vehicles, by vehicle id. Can contain untracked vehicles.
+        :type emissions: dict
+        :param dt: The duration of the step
+        :type dt: float
+        :param arrived: The ids of the vehicles that arrived during the step
+        :type arrived: set
+        """
+        if not emissions:
+            self._drop(np.flatnonzero(self.active), arrived)
+            return
+        slots = np.fromiter((self.slots.get(vehicle, -1) for vehicle in emissions), dtype=np.int64, count=len(emissions))
+        values = np.fromiter(emissions.values(), dtype=np.float64, count=len(emissions))
+        tracked = slots >= 0
+        slots = slots[tracked]
+        self.co2[slots] += values[tracked] * dt
+        if len(slots) < len(self.slots):
+            running = np.zeros(len(self.active), dtype=bool)
+            running[slots] = True
+            self._drop(np.flatnonzero(self.active & ~running), arrived)
+
+    def remove(self, vehicles, time):
+        """
+        Stop tracking arrived vehicles, and return their travel times and CO2 emissions.
+        Untracked vehicles are ignored.
+        :param vehicles: The ids of the arrived vehicles
+        :type vehicles: list
+        :param time: The arrival time
+        :type time: float
+        :return: The travel times and the CO2 emissions of the tracked vehicles, in the order of vehicles
+        :rtype: tuple
+        """
+        slots = [self.slots.get(vehicle) for vehicle in vehicles]
+        slots = np.array([slot for slot in slots if slot is not None], dtype=np.int64)
+        travel_times = time - self.departure_times[slots]
+        co2 = self.co2[slots].copy()
+        self._free(slots)
+        return travel_times, co2
+
+    def clear(self):
+        """
+        Stop tracking all vehicles.
+        """
+        self._free(np.flatnonzero(self.active))
+
+    def _drop(self, slots, arrived):
+        """
+        Free the slots of the vehicles that are not running anymore and didn't arrive.
+        """
+        self._free([slot for slot in slots if self.ids[slot] not in arrived])
+
+    def _free(self, slots):
+        """
+        Free slots, so they can be used by other vehicles.
+        """
+        for slot in slots:
+            del self.slots[self.ids[slot]]
+            self.ids[slot] = None
+            self.active[slot] = False
+            self.free_slots.append(int(slot))
+
+    def _grow(self):
+        """
+        Double the number of slots.
+        """
+        capacity = len(self.active)
+        self.ids += [None] * capacity
+        self.departure_times = np.concatenate([self.departure_times, np.zeros(capacity)])
+        self.co2 = np.concatenate([self.co2, np.zeros(capacity)])
+        self.active = np.concatenate([self.active, np.zeros(capacity, dtype=bool)])
+        self.free_slots += range(2 * capacity - 1, capacity - 1, -1)
@@ -1 +1,2 @@
 from .csv_converter import import_flows_parameters_from_csv
+from .experiment_runner import ExperimentRunner
@@ -0,0 +1,210 @@
+import os
+import time
+import random
+import shutil
+import tempfile
+import traceback
+import multiprocessing
+from collections import deque
+from itertools import product
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from sumo_experiments.traci_util import TraciWrapper
+from sumo_experiments.preset_networks import WorkingDirectory
+
+
+class ExperimentRunner:
+    """
+    Run a set of experiments in parallel, each experiment in its own worker process.
+    libsumo can only drive one simulation per process, so the runner starts a new process for each experiment, with its
+    own libsumo instance and its own temporary working directory, where the files generated by the run are written.
+    The temporary directories of the networks (WorkingDirectory) are created in the directory of the experiment, which
+    is removed when the experiment ends, even if its worker was killed.
+    An experiment is defined by a network factory, a strategy factory, the parameters of the TraciWrapper and a seed :
+    - The network factory is called without argument and returns the Network to simulate.
+    - The strategy factory is called with the network and returns the Strategy controlling the traffic lights.
+    - The parameters of the TraciWrapper are the arguments used to create it.
+    - The seed is used for the Python and NumPy random generators of the worker, and for SUMO.
+    With the default 'fork' start method on Linux, factories can be any callable. With the 'spawn' method, they must be
+    picklable (functions defined at module level, classes, functools.partial...).
+    Results are returned in the order the experiments were added, whatever the order they finish.
+    """
+
+    def __init__(self, max_workers=None, timeout=None, retries=0, working_directory=None, start_method=None, warm_start=None):
+        """
+        Init of class
+        :param max_workers: The maximum number of experiments running at the same time. Default is the number of CPUs.
+        :type max_workers: int
+        :param timeout: The maximum duration of an experiment, in seconds. The worker is killed when it is reached. If None, no timeout.
+        :type timeout: float
+        :param retries: The number of times an experiment is run again after a crash or a timeout.
+        :type retries: int
+        :param working_directory: The directory where the temporary directories of the experiments are created. Default is the system temporary directory.
+        :type working_directory: str
+        :param start_method: The multiprocessing start method of the workers ('fork', 'spawn' or 'forkserver'). Default is the platform default.
+        :type start_method: str
+        :param warm_start: If set, all the experiments start from the warmed-up states of the WarmStart, so the warm-up of a network, flows and seed is simulated once for the whole sweep.
+        :type warm_start: WarmStart
+        """
+        self.max_workers = max_workers if max_workers is not None else os.cpu_count()
+        self.timeout = timeout
+        self.retries = retries
+        self.working_directory = working_directory
+        self.context = multiprocessing.get_context(start_method)
+        self.warm_start = warm_start
+        self.experiments = []
+
+    def add_experiment(self, network_factory, strategy_factory, wrapper_config=None, seed=None, stats_functions=None):
+        """
+        Add an experiment to the runner.
+        :param network_factory: The function returning the network of the experiment
+        :type network_factory: function
+        :param strategy_factory: The function returning the strategy of the experiment, from the network
+        :type strategy_factory: function
+        :param wrapper_config: The parameters of the TraciWrapper of the experiment
+        :type wrapper_config: dict
+        :param seed: The seed of the experiment
+        :type seed: int
+        :param stats_functions: The stats functions added to the TraciWrapper
+        :type stats_functions: list
+        """
+        self.experiments.append({
+            'network_factory': network_factory,
+            'strategy_factory': strategy_factory,
+            'wrapper_config': dict(wrapper_config) if wrapper_config is not None else {},
+            'seed': seed,
+            'stats_functions': list(stats_functions) if stats_functions is not None else []
+        })
+
+    def add_grid(self, network_factories, strategy_factories, wrapper_configs, seeds, stats_functions=None):
+        """
+        Add an experiment for each combination of network factory, strategy factory, TraciWrapper parameters and seed.
+        The experiments are added in the order of itertools.product.
+        :param network_factories: The functions returning the networks of the experiments
+        :type network_factories: list
+        :param strategy_factories: The functions returning the strategies of the experiments, from the network
+        :type strategy_factories: list
+        :param wrapper_configs: The parameters of the TraciWrappers of the experiments
+        :type wrapper_configs: list
+        :param seeds: The seeds of the experiments
+        :type seeds: list
+        :param stats_functions: The stats functions added to all TraciWrappers
+        :type stats_functions: list
+        """
+        for network_factory, strategy_factory, wrapper_config, seed in product(network_factories, strategy_factories, wrapper_configs, seeds):
+            self.add_experiment(network_factory, strategy_factory, wrapper_config, seed, stats_functions)
+
+    def run(self):
+        """
+        Run all the experiments added to the runner.
+        Each result is a dict with the keys of the experiment ('network_factory', 'strategy_factory', 'wrapper_config',
+        'seed', 'stats_functions') and :
+        - 'data' : The DataFrame returned by the TraciWrapper, or None if the experiment failed.
+        - 'error' : The error of the last attempt if the experiment failed, None otherwise.
+        - 'attempts' : The number of times the experiment was run.
+        - 'duration' : The duration of the last attempt, in seconds.
+        :return: The results of the experiments, in the order the experiments were added.
+        :rtype: list
+        """
+        results = [dict(experiment, data=None, error=None, attempts=0, duration=None) for experiment in self.experiments]
+        pending = deque(range(len(self.experiments)))
+        running = {}
+        while pending or running:
+            while pending and len(running) < self.max_workers:
+                index = pending.popleft()
+                running[index] = self._start_worker(index)
+                results[index]['attempts'] += 1
+            waitables = [worker['connection'] for worker in running.values()] + [worker['process'].sentinel for worker in running.values()]
+            wait(waitables, timeout=self._next_deadline(running))
+            for index in list(running):
+                worker = running[index]
+                status = self._poll_worker(worker)
+                if status is None:
+                    continue
+                del running[index]
+                self._stop_worker(worker)
+                results[index]['duration'] = time.monotonic() - worker['start']
+                data, error = status
+                results[index]['data'] = data
+                results[index]['error'] = error
+                if error is not None and results[index]['attempts'] <= self.retries:
+                    pending.append(index)
+        return results
+
+    def _start_worker(self, index):
+        """
+        Start the worker process of an experiment, in a new temporary directory.
+        """
+        directory = tempfile.mkdtemp(prefix='sumo_experiments_', dir=self.working_directory)
+        receiver, sender = self.context.Pipe(duplex=False)
+        process = self.context.Process(target=_run_experiment, args=(self.experiments[index], directory, sender, self.warm_start), daemon=True)
+        process.start()
+        sender.close()
+        return {'process': process, 'connection': receiver, 'directory': directory, 'start': time.monotonic()}
+
+    def _poll_worker(self, worker):
+        """
+        Return the (data, error) couple of a finished worker, or None if the worker is still running.
+        """
+        if worker['connection'].poll():
+            try:
+                return worker['connection'].recv()
+            except EOFError:
+                return None, f"Worker process exited with code {worker['process'].exitcode}"
+        if not worker['process'].is_alive():
+            return None, f"Worker process exited with code {worker['process'].exitcode}"
+        if self.timeout is not None and time.monotonic() - worker['start'] > self.timeout:
+            return None, f"Timeout after {self.timeout} seconds"
+        return None
+
+    def _next_deadline(self, running):
+        """
+        Return the time to wait before the next worker reaches the timeout.
+        """
+        if self.timeout is None:
+            return None
+        now = time.monotonic()
+        return max(0, min(worker['start'] + self.timeout - now for worker in running.values()))
+
+    @staticmethod
+    def _stop_worker(worker):
+        """
+        Kill the worker process if it is still running, and remove its temporary directory.
+        """
+        process = worker['process']
+        process.join(timeout=1)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        worker['connection'].close()
+        shutil.rmtree(worker['directory'], ignore_errors=True)
+
+
+def _run_experiment(experiment, directory, connection, warm_start=None):
+    """
+    Run one experiment in the current process, from the directory, and send the (data, error) couple through the connection.
+    """
+    try:
+        os.chdir(directory)
+        WorkingDirectory.ROOT = directory
+        seed = experiment['seed']
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+        network = experiment['network_factory']()
+        strategy = experiment['strategy_factory'](network)
+        wrapper = TraciWrapper(**experiment['wrapper_config'])
+        for stats_function in experiment['stats_functions']:
+            wrapper.add_stats_function(stats_function)
+        wrapper.add_behavioural_function(strategy.run_all_agents)
+        data = network.run(wrapper.final_function, seed=seed, warm_start=warm_start)
+        if data is None:
+            connection.send((None, 'The simulation failed'))
+        else:
+            connection.send((data, None))
+    except Exception:
+        connection.send((None, traceback.format_exc()))
+    finally:
+        connection.close()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from sumo_experiments.traci_util import ColumnarDataStore
+
+
+def test_missing_values_are_nan():
+    store = ColumnarDataStore(capacity=2)
+    store.append({'a': 1.5})
+    store.append({'a': 2.5, 'b': 3.5})
+    store.append({'b': 4.5})
+    np.testing.assert_array_equal(store['a'], [1.5, 2.5, np.nan])
+    np.testing.assert_array_equal(store['b'], [np.nan, 3.5, 4.5])
+
+
+def test_integer_column_widened_to_float():
+    store = ColumnarDataStore()
+    store.append({'count': 1})
+    assert store['count'].dtype == np.int64
+    store.append({'count': 2.5})
+    assert store['count'].dtype == np.float64
+    store.append({})
+    np.testing.assert_array_equal(store['count'], [1, 2.5, np.nan])
+
+
+def test_integer_column_with_missing_row_is_float():
+    store = ColumnarDataStore()
+    store.append({'step': 1})
+    store.append({'other': 0.5})
+    assert store['step'].dtype == np.float64
+    np.testing.assert_array_equal(store['step'], [1, np.nan])
+
+
+def test_new_integer_column_after_first_row_is_float():
+    store = ColumnarDataStore()
+    store.append({'a': 0.5})
+    store.append({'a': 0.5, 'count': 3})
+    assert store['count'].dtype == np.float64
+    np.testing.assert_array_equal(store['count'], [np.nan, 3])
+
+
+def test_boolean_column_mixed_with_numbers_is_object():
+    store = ColumnarDataStore()
+    store.append({'flag': True})
+    assert store['flag'].dtype == bool
+    store.append({'flag': 2})
+    assert store['flag'].dtype == object
+    assert list(store['flag']) == [True, 2]
+
+
+def test_string_values():
+    store = ColumnarDataStore()
+    store.append({'name': 'a', 'value': 1})
+    store.append({'name': 'b', 'value': 2})
+    assert store['name'].dtype == object
+    assert list(store['name']) == ['a', 'b']
+
+
+def test_growth_keeps_rows():
+    store = ColumnarDataStore(capacity=3, chunk_size=2)
+    rows = [{'step': step, 'speed': step / 2} for step in range(10)]
+    for row in rows:
+        store.append(row)
+    assert len(store) == 10
+    pd.testing.assert_frame_equal(store.to_dataframe(), pd.DataFrame(rows))
+    pd.testing.assert_frame_equal(store.to_dataframe(start=7), pd.DataFrame(rows[7:]))
+
+
+def test_clear_keeps_columns():
+    store = ColumnarDataStore()
+    store.append({'a': 1})
+    store.clear()
+    assert len(store) == 0
+    assert 'a' in store
+    store.append({'a': 2})
+    np.testing.assert_array_equal(store['a'], [2])
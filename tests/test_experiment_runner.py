@@ -0,0 +1,43 @@
+import os
+import shutil
+import time
+
+import pytest
+
+pytest.importorskip('libsumo')
+pytestmark = pytest.mark.skipif(shutil.which('sumo') is None or shutil.which('netconvert') is None, reason='SUMO is not installed')
+
+from sumo_experiments.benchmarks.scenarios import build_network, build_strategy
+from sumo_experiments.util.experiment_runner import ExperimentRunner
+
+
+def network_factory(paths_file, sleep=0):
+    """
+    Return a network factory writing the working directory of its network in paths_file.
+    """
+    def factory():
+        network = build_network('grid:2')
+        with open(paths_file, 'a') as file:
+            file.write(network.working_directory.path + '\n')
+        time.sleep(sleep)
+        return network
+    return factory
+
+
+def strategy_factory(network):
+    return build_strategy('fixedtime', network)
+
+
+@pytest.mark.parametrize('sleep, timeout', [(0, None), (60, 5)])
+def test_network_files_in_experiment_directory(tmp_path, sleep, timeout):
+    root = tmp_path / 'runs'
+    root.mkdir()
+    paths_file = str(tmp_path / 'paths.txt')
+    runner = ExperimentRunner(max_workers=1, timeout=timeout, working_directory=str(root))
+    runner.add_experiment(network_factory(paths_file, sleep), strategy_factory, {'max_simulation_duration': 20}, seed=1)
+    result, = runner.run()
+    assert (result['error'] is None) == (timeout is None)
+    with open(paths_file) as file:
+        path, = file.read().split()
+    assert os.path.commonpath([path, str(root)]) == str(root)
+    assert os.listdir(root) == []
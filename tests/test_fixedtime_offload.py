@@ -0,0 +1,150 @@
+import copy
+from types import SimpleNamespace
+
+import pytest
+import traci.constants as tc
+from traci import trafficlight
+
+from sumo_experiments.strategies import FixedTimeStrategy
+
+
+class FakeSimulation:
+    """
+    Simulation domain of FakeTraci.
+    """
+
+    def __init__(self):
+        self.time = 0.0
+
+    def getTime(self):
+        return self.time
+
+    def getDeltaT(self):
+        return 1.0
+
+
+class FakeTrafficLights:
+    """
+    Traffic light domain of FakeTraci. Each phase lasts its duration, and is followed by its next phase, or by the
+    following phase of the program.
+    """
+
+    Phase = trafficlight.Phase
+    Logic = trafficlight.Logic
+
+    def __init__(self, simulation, logics):
+        self.simulation = simulation
+        self.logics = {tl_id: {logic.programID: logic} for tl_id, logic in logics.items()}
+        self.program = {tl_id: logic.programID for tl_id, logic in logics.items()}
+        self.phase = {tl_id: 0 for tl_id in logics}
+        self.remaining = {tl_id: logic.phases[0].duration for tl_id, logic in logics.items()}
+        self.spent = {tl_id: 0.0 for tl_id in logics}
+        self.subscriptions = {}
+
+    def _phases(self, tl_id):
+        return self.logics[tl_id][self.program[tl_id]].phases
+
+    def getAllProgramLogics(self, tl_id):
+        return tuple(copy.deepcopy(logic) for logic in self.logics[tl_id].values())
+
+    def setProgramLogic(self, tl_id, logic):
+        self.logics[tl_id][logic.programID] = copy.deepcopy(logic)
+        self.program[tl_id] = logic.programID
+        self.setPhase(tl_id, logic.currentPhaseIndex)
+
+    def setPhase(self, tl_id, index):
+        self.phase[tl_id] = index
+        self.remaining[tl_id] = self._phases(tl_id)[index].duration
+        self.spent[tl_id] = 0.0
+
+    def setPhaseDuration(self, tl_id, duration):
+        self.remaining[tl_id] = duration
+
+    def getPhase(self, tl_id):
+        return self.phase[tl_id]
+
+    def getRedYellowGreenState(self, tl_id):
+        return self._phases(tl_id)[self.phase[tl_id]].state
+
+    def getProgram(self, tl_id):
+        return self.program[tl_id]
+
+    def getSpentDuration(self, tl_id):
+        return self.spent[tl_id]
+
+    def subscribe(self, tl_id, variables):
+        self.subscriptions[tl_id] = list(variables)
+
+    def getAllSubscriptionResults(self):
+        getters = {
+            tc.TL_CURRENT_PHASE: self.getPhase,
+            tc.TL_RED_YELLOW_GREEN_STATE: self.getRedYellowGreenState,
+            tc.TL_CURRENT_PROGRAM: self.getProgram,
+            tc.TL_SPENT_DURATION: self.getSpentDuration,
+        }
+        return {tl_id: {variable: getters[variable](tl_id) for variable in variables} for tl_id, variables in self.subscriptions.items()}
+
+    def step(self):
+        for tl_id in self.phase:
+            self.spent[tl_id] += 1
+            self.remaining[tl_id] -= 1
+            if self.remaining[tl_id] <= 0:
+                phases = self._phases(tl_id)
+                phase = phases[self.phase[tl_id]]
+                next_phase = phase.next[0] if phase.next else (self.phase[tl_id] + 1) % len(phases)
+                self.setPhase(tl_id, next_phase)
+
+
+class FakeTraci:
+    """
+    Replacement of the traci module with static traffic light programs only.
+    """
+
+    def __init__(self, logics):
+        self.simulation = FakeSimulation()
+        self.trafficlight = FakeTrafficLights(self.simulation, logics)
+
+    def simulationStep(self):
+        self.simulation.time += 1
+        self.trafficlight.step()
+
+
+def two_phases_logic():
+    states = ['GGrr', 'yyrr', 'rrGG', 'rryy']
+    durations = [30, 3, 30, 3]
+    return trafficlight.Logic('0', 0, 0, [trafficlight.Phase(duration, state, duration, duration) for duration, state in zip(durations, states)])
+
+
+def make_network():
+    tl_ids = ['t1', 't2']
+    tls_detectors = {tl_id: {0: {'boolean': [f'{tl_id}_b0']}, 2: {'boolean': [f'{tl_id}_b2']}} for tl_id in tl_ids}
+    return SimpleNamespace(TL_IDS=tl_ids, TLS_DETECTORS=tls_detectors)
+
+
+def run_fixed_time(offload, nb_steps):
+    network = make_network()
+    strategy = FixedTimeStrategy(network, phase_times={'t1': [10, 20], 't2': [7, 4]}, yellow_time={'t1': 3, 't2': 1}, offload=offload)
+    traci = FakeTraci({tl_id: two_phases_logic() for tl_id in network.TL_IDS})
+    for _ in range(nb_steps):
+        traci.simulationStep()
+        strategy.run_all_agents(traci)
+    return strategy.nb_switch, strategy.phases_durations, strategy.phases_occurences
+
+
+@pytest.mark.parametrize('nb_steps', [1, 2, 5, 12, 13, 14, 40, 157])
+def test_offload_statistics(nb_steps):
+    assert run_fixed_time(True, nb_steps) == run_fixed_time(False, nb_steps)
+
+
+def test_counters_read_as_dicts():
+    network = make_network()
+    strategy = FixedTimeStrategy(network, phase_times={'t1': [10, 20], 't2': [7, 4]}, yellow_time={'t1': 3, 't2': 1})
+    traci = FakeTraci({tl_id: two_phases_logic() for tl_id in network.TL_IDS})
+    for _ in range(12):
+        traci.simulationStep()
+        strategy.run_all_agents(traci)
+    assert strategy.nb_switch == {'t1': 0, 't2': 1}
+    assert strategy.current_phase == {'t1': 0, 't2': 2}
+    assert strategy.time == {'t1': 11, 't2': 0}
+    assert list(strategy.time) == list(network.TL_IDS)
+    assert all(type(value) is int for value in strategy.current_phase_duration.values())
@@ -0,0 +1,77 @@
+import os
+import shutil
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from sumo_experiments.preset_networks.net_model import NetModel
+
+PRESET_NETWORKS = os.path.join(os.path.dirname(__file__), '..', 'src', 'sumo_experiments', 'preset_networks')
+NET_FILES = [
+    os.path.join(PRESET_NETWORKS, 'bologna', 'acosta', 'acosta_buslanes.net.xml'),
+    os.path.join(PRESET_NETWORKS, 'champs_elysees', 'champs_elysees.net.xml'),
+]
+
+
+@pytest.fixture(params=NET_FILES, ids=['bologna', 'champs_elysees'])
+def net_file(request):
+    return request.param
+
+
+def test_elements_match_element_tree(net_file):
+    model = NetModel(net_file)
+    root = ET.parse(net_file).getroot()
+    junctions = root.findall('junction')
+    edges = root.findall('edge')
+    connections = root.findall('connection')
+    assert model.junction_ids == [junction.get('id') for junction in junctions]
+    assert model.junction_coordinates() == {junction.get('id'): (float(junction.get('x')), float(junction.get('y'))) for junction in junctions if junction.get('x') is not None}
+    assert model.declared_edge_ids() == [edge.get('id') for edge in edges]
+    assert model.edge_endpoints() == {edge.get('id'): (edge.get('from'), edge.get('to')) for edge in edges if edge.get('from') is not None and edge.get('to') is not None}
+    expected_links = {}
+    for connection in connections:
+        if connection.get('tl') is not None:
+            expected_links.setdefault(connection.get('tl'), []).append((connection.get('from'), connection.get('to')))
+    assert model.controlled_links() == expected_links
+    assert set(model.graph().edges) == {(connection.get('from'), connection.get('to')) for connection in connections}
+    traffic_lights = [junction.get('id') for junction in junctions if junction.get('type') == 'traffic_light']
+    assert [junction.get('id') for junction in model.traffic_light_junctions()] == traffic_lights
+    assert [edge.get('id') for edge in model.edges_from_junctions(traffic_lights)] == [edge.get('id') for edge in edges if edge.get('from') in traffic_lights]
+    assert [edge.get('id') for edge in model.edges_to_junctions(traffic_lights)] == [edge.get('id') for edge in edges if edge.get('to') in traffic_lights]
+
+
+def test_successors_match_graph(net_file):
+    model = NetModel(net_file)
+    graph = model.graph()
+    for i, edge_id in enumerate(model.edge_ids):
+        successors = model.successors[model.successors_indptr[i]:model.successors_indptr[i + 1]]
+        assert sorted(model.edge_ids[j] for j in successors) == sorted(graph.successors(edge_id))
+
+
+def test_cache_invalidated_when_file_changes(tmp_path, monkeypatch):
+    net_file = str(tmp_path / 'network.net.xml')
+    cache_file = str(tmp_path / 'network.model.pkl')
+    shutil.copyfile(NET_FILES[0], net_file)
+    model = NetModel.load(net_file, cache_file)
+    assert NetModel.load(net_file, cache_file) is model
+    # Loaded from the cache file by another process, without reading the network file
+    NetModel._MODELS.clear()
+
+    def fail(self, net_file):
+        raise AssertionError('The network file was read')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(NetModel, '__init__', fail)
+        assert NetModel.load(net_file, cache_file).declared_edge_ids() == model.declared_edge_ids()
+        # Same content with another modification time
+        stat = os.stat(net_file)
+        os.utime(net_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        NetModel._MODELS.clear()
+        assert NetModel.load(net_file, cache_file).declared_edge_ids() == model.declared_edge_ids()
+    # New content
+    tree = ET.parse(net_file)
+    ET.SubElement(tree.getroot(), 'edge', {'id': 'added_edge'})
+    tree.write(net_file)
+    assert NetModel.load(net_file, cache_file).declared_edge_ids() == model.declared_edge_ids() + ['added_edge']
+    NetModel._MODELS.clear()
+    assert NetModel.load(net_file, cache_file).declared_edge_ids()[-1] == 'added_edge'
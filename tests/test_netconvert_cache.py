@@ -0,0 +1,109 @@
+import os
+
+import pytest
+
+from sumo_experiments.components import NetconvertCache
+
+
+class FakeNetconvertCache(NetconvertCache):
+    """
+    Cache running a fake netconvert, writing the concatenation of the input files as network.
+    """
+
+    def __init__(self, directory, max_size=512 * 1024 * 1024):
+        super().__init__(directory, max_size)
+        self.enabled = True
+        self.nb_runs = 0
+
+    def version(self):
+        return 'netconvert 1.0'
+
+    def _run_netconvert(self, filenames, options):
+        self.nb_runs += 1
+        with open(filenames['network'], 'w') as network_file:
+            for name in self.INPUTS:
+                with open(filenames[name]) as file:
+                    network_file.write(file.read())
+        return True
+
+
+def make_inputs(directory, content):
+    """
+    Write the input files of a network, and return the filenames.
+    """
+    os.makedirs(directory, exist_ok=True)
+    filenames = {name: os.path.join(directory, f'{name}.xml') for name in NetconvertCache.INPUTS}
+    for name, path in filenames.items():
+        with open(path, 'w') as file:
+            file.write(f'<{name}>{content}</{name}>\n')
+    filenames['network'] = os.path.join(directory, 'network.net.xml')
+    return filenames
+
+
+def cached_files(cache):
+    return sorted(file for file in os.listdir(cache.directory) if file.endswith('.net.xml'))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return FakeNetconvertCache(str(tmp_path / 'cache'))
+
+
+def test_hit_copies_cached_network(tmp_path, cache):
+    first = make_inputs(str(tmp_path / 'first'), 'a')
+    cache.build(first)
+    second = make_inputs(str(tmp_path / 'second'), 'a')
+    cache.build(second)
+    assert cache.nb_runs == 1
+    with open(first['network']) as first_file, open(second['network']) as second_file:
+        assert first_file.read() == second_file.read()
+    assert len(cached_files(cache)) == 1
+
+
+def test_changed_input_misses(tmp_path, cache):
+    filenames = make_inputs(str(tmp_path / 'network'), 'a')
+    cache.build(filenames)
+    with open(filenames['edges'], 'a') as file:
+        file.write('<edge/>\n')
+    cache.build(filenames)
+    assert cache.nb_runs == 2
+    assert len(cached_files(cache)) == 2
+
+
+def test_options_and_version_in_key(tmp_path, cache):
+    filenames = make_inputs(str(tmp_path / 'network'), 'a')
+    key = cache.key(filenames, ['--no-warnings'])
+    assert cache.key(filenames, []) != key
+    cache.version = lambda: 'netconvert 2.0'
+    assert cache.key(filenames, ['--no-warnings']) != key
+
+
+def test_least_recently_used_evicted(tmp_path, cache):
+    networks = [make_inputs(str(tmp_path / name), name) for name in ['a', 'b', 'c']]
+    cache.build(networks[0])
+    cache.build(networks[1])
+    size = sum(os.path.getsize(os.path.join(cache.directory, file)) for file in cached_files(cache))
+    keys = [cache.key(filenames, ['--no-warnings']) for filenames in networks]
+    for key, mtime in zip(keys, [1000, 2000]):
+        os.utime(os.path.join(cache.directory, f'{key}.net.xml'), (mtime, mtime))
+    # a is used again, so b is the least recently used network
+    cache.build(networks[0])
+    assert cache.nb_runs == 2
+    cache.max_size = size
+    cache.build(networks[2])
+    assert cached_files(cache) == sorted([f'{keys[0]}.net.xml', f'{keys[2]}.net.xml'])
+
+
+def test_disabled_cache_always_runs(tmp_path, cache):
+    cache.enabled = False
+    filenames = make_inputs(str(tmp_path / 'network'), 'a')
+    cache.build(filenames)
+    cache.build(filenames)
+    assert cache.nb_runs == 2
+    assert not os.path.exists(cache.directory)
+
+
+def test_clear(tmp_path, cache):
+    cache.build(make_inputs(str(tmp_path / 'network'), 'a'))
+    cache.clear()
+    assert cached_files(cache) == []
@@ -0,0 +1,70 @@
+import os
+import random
+from collections import deque
+
+import networkx as nx
+import pytest
+
+from sumo_experiments.preset_networks.reachability_index import ReachabilityIndex
+
+
+def reachable(graph, source):
+    """
+    Return the nodes reachable from source with a breadth-first search, source included.
+    """
+    seen = {source}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        for successor in graph.successors(node):
+            if successor not in seen:
+                seen.add(successor)
+                queue.append(successor)
+    return seen
+
+
+def random_graph(seed):
+    """
+    Return a small directed graph with cycles, isolated nodes and string ids, as the edges of a network.
+    """
+    graph = nx.gnp_random_graph(40, 0.04, seed=seed, directed=True)
+    return nx.relabel_nodes(graph, {node: f'edge_{node}' for node in graph.nodes})
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_has_path_matches_breadth_first_search(seed):
+    graph = random_graph(seed)
+    index = ReachabilityIndex(graph)
+    for source in graph.nodes:
+        expected = reachable(graph, source)
+        for target in graph.nodes:
+            assert index.has_path(source, target) == (target in expected)
+
+
+def test_more_than_eight_components():
+    # A chain, so the bitsets span several bytes
+    graph = nx.DiGraph([(f'edge_{i}', f'edge_{i + 1}') for i in range(20)])
+    index = ReachabilityIndex(graph)
+    assert index.has_path('edge_3', 'edge_20')
+    assert not index.has_path('edge_20', 'edge_3')
+    assert index.has_path('edge_9', 'edge_9')
+
+
+def test_cache_file(tmp_path):
+    graph = random_graph(1)
+    source_file = tmp_path / 'network.net.xml'
+    source_file.write_text('<net/>')
+    cache_file = str(tmp_path / 'network.reachability.pkl')
+    index = ReachabilityIndex(graph, cache_file, str(source_file))
+    assert os.path.isfile(cache_file)
+    # Loaded from the cache, without the edges of the graph
+    cached_index = ReachabilityIndex(nx.DiGraph(nx.empty_graph(graph.nodes)), cache_file, str(source_file))
+    nodes = list(graph.nodes)
+    random_generator = random.Random(0)
+    pairs = [(random_generator.choice(nodes), random_generator.choice(nodes)) for _ in range(400)]
+    assert any(index.has_path(source, target) for source, target in pairs if source != target)
+    assert [cached_index.has_path(*pair) for pair in pairs] == [index.has_path(*pair) for pair in pairs]
+    # The cache is built again when the source file changes
+    source_file.write_text('<net version="2"/>')
+    empty_index = ReachabilityIndex(nx.DiGraph(nx.empty_graph(graph.nodes)), cache_file, str(source_file))
+    assert not any(empty_index.has_path(source, target) for source, target in pairs if source != target)
@@ -0,0 +1,68 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+libsumo = pytest.importorskip('libsumo')
+pytestmark = pytest.mark.skipif(shutil.which('sumo') is None or shutil.which('netconvert') is None, reason='SUMO is not installed')
+
+from sumo_experiments.benchmarks.scenarios import build_network, build_strategy
+from sumo_experiments.traci_util import SubscriptionCollector, TraciWrapper
+
+
+def run_strategy(scenario, strategy_name, steps, fail_at=None):
+    """
+    Run a strategy without the TraciWrapper, and return its phase durations.
+    """
+    network = build_network(scenario)
+    strategy = build_strategy(strategy_name, network)
+
+    def function(traci):
+        for step in range(steps):
+            traci.simulationStep()
+            strategy.run_all_agents(traci)
+            if step == fail_at:
+                raise RuntimeError('Simulation failure')
+        return strategy.phases_durations
+
+    return network.run(function, seed=1)
+
+
+@pytest.mark.parametrize('strategy_name', ['acolight', 'maxpressure'])
+@pytest.mark.parametrize('fail_at', [None, 20])
+def test_networks_back_to_back(strategy_name, fail_at):
+    expected = run_strategy('grid:2', strategy_name, 200)
+    assert SubscriptionCollector.get_shared(libsumo) is None
+    # Another network, with other detectors and traffic lights, run in the same process
+    run_strategy('grid:3', strategy_name, 50, fail_at=fail_at)
+    assert SubscriptionCollector.get_shared(libsumo) is None
+    assert run_strategy('grid:2', strategy_name, 200) == expected
+
+
+def test_wrapper_outputs_in_current_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    network = build_network('grid:2')
+    strategy = build_strategy('fixedtime', network)
+    wrapper = TraciWrapper(max_simulation_duration=20, save_phases=True)
+    wrapper.add_behavioural_function(strategy.run_all_agents)
+    network.run(wrapper.final_function, seed=1)
+    assert wrapper.output_files == {'phases_file': str(tmp_path / 'phases.csv'), 'flows_file': str(tmp_path / 'edge_flows.csv')}
+    assert len(pd.read_csv(tmp_path / 'phases.csv')) == 20
+    # The network files are generated in a temporary directory, removed after the run
+    assert not os.path.exists(network.working_directory.path)
+
+
+def test_offloaded_phases_one_step_behind(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    phases = {}
+    for offload in [False, True]:
+        network = build_network('grid:3')
+        strategy = build_strategy('fixedtime', network, offload=offload)
+        phases_file = str(tmp_path / f'phases_{offload}.csv')
+        wrapper = TraciWrapper(max_simulation_duration=300, save_phases=True, phases_file=phases_file)
+        wrapper.add_behavioural_function(strategy.run_all_agents)
+        network.run(wrapper.final_function, seed=1)
+        phases[offload] = pd.read_csv(phases_file, index_col=0).values
+    assert (phases[True] != phases[False]).any()
+    assert (phases[True][1:] == phases[False][:-1]).all()
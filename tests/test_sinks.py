@@ -0,0 +1,63 @@
+import os
+
+import pandas as pd
+import pytest
+
+from sumo_experiments.traci_util import ChunkedFileSink
+
+
+@pytest.fixture(params=['csv', 'parquet', 'arrow'])
+def file_format(request):
+    if request.param != 'csv':
+        pytest.importorskip('pyarrow')
+    return request.param
+
+
+def test_chunks_round_trip(tmp_path, file_format):
+    sink = ChunkedFileSink(str(tmp_path), file_format=file_format, chunk_rows=2)
+    chunks = [
+        pd.DataFrame({'simulation_step': [1, 2], 'mean_speed': [0.5, 1.5]}),
+        pd.DataFrame({'simulation_step': [3], 'mean_speed': [2.5]}),
+    ]
+    for chunk in chunks:
+        sink.write('data', chunk)
+    read_chunks = list(sink.read_chunks('data'))
+    assert len(read_chunks) == 2
+    for chunk, read_chunk in zip(chunks, read_chunks):
+        pd.testing.assert_frame_equal(read_chunk, chunk)
+    pd.testing.assert_frame_equal(sink.read('data'), pd.concat(chunks, ignore_index=True))
+
+
+def test_chunks_keep_writing_order(tmp_path):
+    sink = ChunkedFileSink(str(tmp_path), file_format='csv')
+    for step in range(12):
+        sink.write('data', pd.DataFrame({'simulation_step': [step]}))
+    assert sink.read('data')['simulation_step'].tolist() == list(range(12))
+
+
+def test_new_sink_appends_to_existing_chunks(tmp_path):
+    ChunkedFileSink(str(tmp_path), file_format='csv').write('data', pd.DataFrame({'a': [1]}))
+    ChunkedFileSink(str(tmp_path), file_format='csv').write('data', pd.DataFrame({'a': [2]}))
+    assert ChunkedFileSink(str(tmp_path), file_format='csv').read('data')['a'].tolist() == [1, 2]
+
+
+def test_reset_removes_only_the_table(tmp_path):
+    sink = ChunkedFileSink(str(tmp_path), file_format='csv')
+    sink.write('data', pd.DataFrame({'a': [1]}))
+    sink.write('data', pd.DataFrame({'a': [2]}))
+    sink.write('phases', pd.DataFrame({'t1': [0]}))
+    sink.reset('data')
+    assert os.listdir(tmp_path / 'data') == []
+    assert sink.read('data').empty
+    assert sink.read('phases')['t1'].tolist() == [0]
+    sink.write('data', pd.DataFrame({'a': [3]}))
+    assert sink.read('data')['a'].tolist() == [3]
+
+
+def test_read_missing_table(tmp_path):
+    assert ChunkedFileSink(str(tmp_path), file_format='csv').read('edge_flows').empty
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        ChunkedFileSink(str(tmp_path), file_format='json')
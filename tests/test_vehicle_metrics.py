@@ -0,0 +1,73 @@
+import shutil
+
+import numpy as np
+import pytest
+
+libsumo = pytest.importorskip('libsumo')
+pytestmark = pytest.mark.skipif(shutil.which('sumo') is None or shutil.which('netconvert') is None, reason='SUMO is not installed')
+
+from sumo_experiments.benchmarks.scenarios import build_network, build_strategy
+from sumo_experiments.traci_util import SubscriptionCollector, VehicleMetrics
+
+GETTERS = {
+    'speed': 'getSpeed',
+    'acceleration': 'getAcceleration',
+    'co2_emissions': 'getCO2Emission',
+    'fuel_consumption': 'getFuelConsumption',
+}
+
+
+def expected_statistics(traci, metric):
+    """
+    Compute the statistics of a metric with the getters of the running vehicles, as the stats functions did before
+    the subscriptions.
+    """
+    vehicles = traci.vehicle.getIDList()
+    if metric == 'waiting_time':
+        values = [1 if traci.vehicle.getSpeed(vehicle) < 0.05 else 0 for vehicle in vehicles]
+    else:
+        values = [getattr(traci.vehicle, GETTERS[metric])(vehicle) for vehicle in vehicles]
+    if not values:
+        return {f'{stat}_{metric}': np.nan for stat in ['mean', 'sum', 'max', 'min', 'std_dev']}
+    return {
+        f'mean_{metric}': np.mean(values),
+        f'sum_{metric}': np.sum(values),
+        f'max_{metric}': np.max(values),
+        f'min_{metric}': np.min(values),
+        f'std_dev_{metric}': np.std(values),
+    }
+
+
+def test_teleported_vehicles_are_ignored():
+    # Long phases and a short time to teleport, so blocked vehicles are teleported
+    network = build_network('grid:2')
+    strategy = build_strategy('fixedtime', network, phase_times={tl_id: [90] * len(network.TLS_DETECTORS[tl_id]) for tl_id in network.TLS_DETECTORS})
+    metrics = list(GETTERS) + ['waiting_time']
+
+    def function(traci):
+        nb_teleported_steps = 0
+        for _ in range(600):
+            traci.simulationStep()
+            strategy.run_all_agents(traci)
+            for metric in metrics:
+                results = VehicleMetrics.shared(traci).get(traci, metric)
+                np.testing.assert_allclose(list(results.values()), list(expected_statistics(traci, metric).values()), rtol=1e-9, atol=1e-9)
+            if len(SubscriptionCollector.shared(traci).vehicle_results) > traci.vehicle.getIDCount():
+                nb_teleported_steps += 1
+        return nb_teleported_steps
+
+    assert network.run(function, seed=1, time_to_teleport=5) > 0
+
+
+def test_instance_belongs_to_one_simulation():
+    instances = []
+
+    def function(traci):
+        traci.simulationStep()
+        instances.append(VehicleMetrics.shared(traci))
+        return instances[-1].get(traci, 'speed')
+
+    build_network('grid:2').run(function, seed=1)
+    build_network('grid:3').run(function, seed=1)
+    assert instances[0] is not instances[1]
+    assert instances[1].metrics == ['speed']
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from sumo_experiments.preset_networks import WorkingDirectory
+
+
+def test_temporary_directory_removed_by_cleanup():
+    directory = WorkingDirectory()
+    with open(directory.path_of('network.net.xml'), 'w') as file:
+        file.write('<net/>')
+    directory.cleanup()
+    assert not os.path.exists(directory.path)
+
+
+def test_explicit_directory_keeps_other_files(tmp_path):
+    (tmp_path / 'notes.txt').write_text('kept')
+    directory = WorkingDirectory(str(tmp_path))
+    with open(directory.path_of('network.net.xml'), 'w') as file:
+        file.write('<net/>')
+    directory.cleanup()
+    assert os.listdir(tmp_path) == ['notes.txt']
+
+
+def test_explicit_directory_not_shared(tmp_path):
+    directory = WorkingDirectory.of(str(tmp_path))
+    with pytest.raises(ValueError):
+        WorkingDirectory.of(str(tmp_path))
+    directory.cleanup()
+    WorkingDirectory.of(str(tmp_path)).cleanup()
+
+
+def test_explicit_directory_unlocked_when_collected(tmp_path):
+    directory = WorkingDirectory(str(tmp_path))
+    del directory
+    WorkingDirectory(str(tmp_path)).cleanup()
+
+
+def test_lock_of_finished_process_replaced(tmp_path):
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    (tmp_path / WorkingDirectory.LOCK_FILE).write_text(str(process.pid))
+    WorkingDirectory(str(tmp_path)).cleanup()
+    assert os.listdir(tmp_path) == []
+
+
+def test_instance_belongs_to_one_network(tmp_path):
+    directory = WorkingDirectory(str(tmp_path / 'shared'))
+    assert WorkingDirectory.of(directory) is directory
+    with pytest.raises(ValueError):
+        WorkingDirectory.of(directory)
+    directory.cleanup()